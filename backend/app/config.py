@@ -49,6 +49,146 @@ class Settings(BaseSettings):
     # Logging Configuration
     log_level: str = "INFO"
 
+    # Database Pool Configuration
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 5.0
+
+    # Query Budgets (seconds per statement and readings per scan, 0 disables; timeouts by route path)
+    query_timeout_seconds: float = 30.0
+    query_route_timeouts: dict[str, float] = {
+        "/sensor-readings": 10.0,
+        "/sensor-readings/device/{device_id}/average": 10.0,
+        "/sensor-readings/device/{device_id}/range": 10.0,
+        "/sensor-readings/resample": 20.0,
+        "/sensor-readings/export": 120.0,
+        "/analytics/fleet": 20.0,
+    }
+    query_max_scan_rows: int = 1_000_000
+    average_max_hours: int = 8784
+
+    # Reading Shards (JSON name -> URL; readings of each device live on one shard)
+    shard_urls: dict[str, str] = {}
+    shard_weights: dict[str, float] = {}
+    shard_vnodes: int = 64
+    shard_placement_refresh_seconds: float = 30.0
+    shard_scatter_workers: int = 8
+    shard_unknown_device_ttl_seconds: float = 5.0
+
+    # Ingest Admission Control (a rate of 0 disables the limiter)
+    device_rate_limit_per_second: float = 10.0
+    device_rate_limit_burst: int = 50
+    ip_rate_limit_per_second: float = 0.0
+    ip_rate_limit_burst: int = 500
+    rate_limit_idle_seconds: float = 300.0
+    ingest_max_concurrency: int = 30
+    ingest_queue_timeout: float = 0.5
+
+    # Ingest Deduplication (keys remembered per device, 0 disables the filter)
+    ingest_recent_keys_per_device: int = 256
+    ingest_batch_max_size: int = 10_000
+
+    # Bulk Import (CSV/Parquet files through COPY or executemany)
+    import_chunk_rows: int = 50_000
+    import_max_reported_rejects: int = 100
+
+    # Line Protocol Gateway (TCP/UDP ingestion; 0 disables a port)
+    gateway_enabled: bool = False
+    gateway_host: str = "0.0.0.0"
+    gateway_tcp_port: int = 8089
+    gateway_udp_port: int = 8089
+    gateway_batch_lines: int = 50_000
+    gateway_block_kb: int = 256
+    gateway_flush_seconds: float = 0.2
+    gateway_max_queued_blocks: int = 64
+    gateway_max_blocks_per_connection: int = 4
+    gateway_max_line_bytes: int = 4096
+
+    # Response Compression (bodies smaller than this are sent as-is)
+    compression_minimum_size: int = 1024
+
+    # Analytics Limits
+    resample_max_cells: int = 1_000_000
+
+    # Compute Pool (CPU-heavy analytics run in worker processes, 0 workers runs them inline)
+    compute_workers: int = 2
+    compute_max_queue: int = 8
+    compute_job_timeout_seconds: float = 30.0
+    compute_shm_min_kb: int = 256
+
+    # Dashboard Summary (identical requests share one result for this long)
+    dashboard_cache_seconds: float = 5.0
+    dashboard_query_workers: int = 4
+
+    # Spatial Index Configuration
+    geo_index_cell_degrees: float = 0.05
+    geo_index_refresh_seconds: float = 30.0
+
+    # Alert Deduplication and Correlation (without dedup every repeat is looked up in the database)
+    alert_dedup_enabled: bool = True
+    alert_incident_window_seconds: float = 300.0
+
+    # Alert Backtesting (history is scanned in chunks of this many hours)
+    alert_backtest_chunk_hours: int = 24
+    alert_backtest_max_days: int = 366
+
+    # Heartbeat Tracking (devices go offline after interval * grace factor)
+    heartbeat_default_interval_seconds: float = 300.0
+    heartbeat_grace_factor: float = 2.0
+    heartbeat_tick_seconds: float = 5.0
+    heartbeat_offline_alerts: bool = True
+
+    # Late Reading Handling (per-series lateness watermark)
+    lateness_watermark_seconds: float = 60.0
+
+    # Hot Window Store (recent readings served from memory)
+    hot_store_enabled: bool = True
+    hot_store_window_hours: float = 48.0
+    hot_store_max_mb: int = 256
+    hot_store_chunk_size: int = 512
+    hot_store_sync_seconds: float = 5.0
+
+    # Historical Range Cache (closed chunks of range queries, optional disk spill)
+    range_cache_enabled: bool = True
+    range_cache_chunk_seconds: int = 3600
+    range_cache_max_mb: int = 128
+    range_cache_spill_dir: Optional[str] = None
+    range_cache_spill_max_mb: int = 1024
+
+    # Device Purge (larger devices are deleted in the background)
+    purge_batch_size: int = 5000
+    purge_inline_max_readings: int = 10_000
+    purge_interval_seconds: float = 2.0
+    purge_stale_seconds: float = 300.0
+    purge_propagation_seconds: float = 5.0
+
+    # Quantile Sketches (per-series, per-bucket DDSketches for percentiles)
+    sketch_enabled: bool = True
+    sketch_bucket_seconds: int = 3600
+    sketch_relative_accuracy: float = 0.01
+    sketch_interval_seconds: float = 30.0
+    sketch_scan_batch: int = 100_000
+
+    # Forecasting (per-series forecasts fitted to the sketch buckets; needs sketches)
+    forecast_enabled: bool = True
+    forecast_interval_seconds: float = 900.0
+    forecast_stale_seconds: float = 3600.0
+    forecast_lookback_hours: int = 168
+    forecast_horizon_hours: int = 24
+    forecast_season_hours: int = 24
+    forecast_min_points: int = 12
+    forecast_smoothing_level: float = 0.3
+    forecast_smoothing_trend: float = 0.05
+    forecast_smoothing_season: float = 0.1
+    forecast_confidence: float = 0.95
+    forecast_chunk_series: int = 2000
+
+    # Change Feed (outbox of device, alert and reading changes behind /changes)
+    change_feed_enabled: bool = True
+    change_feed_retention_hours: float = 168.0
+    change_feed_sequence_seconds: float = 1.0
+    change_feed_trim_interval_seconds: float = 300.0
+
     class Config:
         env_file = ".env"
         case_sensitive = False
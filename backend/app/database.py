@@ -1,9 +1,14 @@
 """Database connection and session management."""
 
-from sqlalchemy import create_engine
+from typing import Sequence
+
+from fastapi import Request
+from sqlalchemy import create_engine, insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, Session
 
 from .config import get_settings
+from .query_budget import attach
 
 settings = get_settings()
 
@@ -12,23 +17,68 @@ engine = create_engine(
     settings.database_url,
     echo=settings.debug,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-def get_db() -> Session:
+def get_db(request: Request) -> Session:
     """
     Get database session dependency for FastAPI.
+
+    The session gets the statement time budget of the matched route
+    (``QUERY_ROUTE_TIMEOUTS``, else ``QUERY_TIMEOUT_SECONDS``), registered
+    on the request so a client disconnect cancels its queries.
     
     Yields:
         Session: Database session instance
     """
     db = SessionLocal()
+    route = request.scope.get("route")
+    path = getattr(route, "path", None)
+    budget = attach(db, settings.query_route_timeouts.get(path, settings.query_timeout_seconds))
+    request.scope.setdefault("query_budgets", []).append(budget)
     try:
         yield db
     finally:
         db.close()
+
+
+def insert_ignore(db: Session, target, index_elements: Sequence[str]):
+    """
+    INSERT that skips rows conflicting with a unique key.
+
+    Uses ``ON CONFLICT DO NOTHING`` on PostgreSQL and SQLite, and
+    ``INSERT IGNORE`` elsewhere.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(target).on_conflict_do_nothing(index_elements=list(index_elements))
+    if dialect == "sqlite":
+        return sqlite.insert(target).on_conflict_do_nothing()
+    return insert(target).prefix_with("IGNORE")
+
+
+def upsert(db: Session, target, index_elements: Sequence[str], update_columns: Sequence[str]):
+    """
+    INSERT that overwrites ``update_columns`` of rows conflicting with a unique key.
+
+    Uses ``ON CONFLICT DO UPDATE`` on PostgreSQL and SQLite, and
+    ``ON DUPLICATE KEY UPDATE`` elsewhere.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        statement = module.insert(target)
+        return statement.on_conflict_do_update(
+            index_elements=list(index_elements),
+            set_={column: statement.excluded[column] for column in update_columns},
+        )
+    from sqlalchemy.dialects import mysql
+
+    statement = mysql.insert(target)
+    return statement.on_duplicate_key_update({column: statement.inserted[column] for column in update_columns})
@@ -5,18 +5,46 @@ This module initializes the FastAPI application, configures middleware,
 registers routes, and sets up database initialization.
 """
 
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 from .config import get_settings
-from .database import engine
+from .database import engine, SessionLocal
+from .middleware import CompressionMiddleware, QueryCancellationMiddleware
 from .models import Base
-from .routes import devices_router, sensor_readings_router, alerts_router, health_router
+from .query_budget import QueryCancelled, QueryInterrupted
+from .routes import (
+    devices_router,
+    sensor_readings_router,
+    alerts_router,
+    health_router,
+    analytics_router,
+    dashboard_router,
+    changes_router,
+)
+from .services.admission import retry_after_header
+from .services.alert_index import alert_index
+from .services.change_feed_service import run_change_feed_cycle, run_change_feed_sequencer
+from .services.compute_pool import ComputeError, ComputeTimeout, compute_pool
+from .services.forecast_service import run_forecast_cycle
+from .services.geo_index import geo_index, run_geo_index_cycle
+from .services.heartbeat import heartbeat_tracker, run_heartbeat_cycle
+from .services.hot_store import hot_store, run_hot_store_cycle
+from .services.line_gateway import line_gateway
+from .services.purge_service import device_change_follower, run_device_change_cycle, run_purge_cycle
+from .services.shard_map import run_placement_refresh, shard_map
+from .services.sketch_service import run_sketch_cycle
 from .utils import logger
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+shard_map.create_schemas()
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -41,12 +69,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+)
+
+app.add_middleware(QueryCancellationMiddleware)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """Shed load with 503 when no pooled connection frees up in time."""
+    logger.warning(f"Database pool exhausted on {request.url.path}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, retry later"},
+        headers=retry_after_header(settings.db_pool_timeout),
+    )
+
+
+@app.exception_handler(ComputeError)
+async def compute_error_handler(request: Request, exc: ComputeError):
+    """Answer 504 for analytics jobs that timed out and 503 when the compute pool is full."""
+    logger.warning(f"Compute job on {request.url.path} failed: {str(exc)}")
+    if isinstance(exc, ComputeTimeout):
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Analytics capacity exhausted, retry later"},
+        headers=retry_after_header(exc.retry_after),
+    )
+
+
+@app.exception_handler(QueryInterrupted)
+async def query_interrupted_handler(request: Request, exc: QueryInterrupted):
+    """Answer 504 for queries past their route's time budget; cancelled ones have no one to answer."""
+    if isinstance(exc, QueryCancelled):
+        logger.info(f"Queries on {request.url.path} cancelled: client disconnected")
+        return JSONResponse(status_code=499, content={"detail": "Client closed request"})
+    logger.warning(f"Query on {request.url.path} timed out: {str(exc)}")
+    return JSONResponse(status_code=504, content={"detail": "Query exceeded its time budget"})
+
 
 # Include API route modules
 app.include_router(health_router)
 app.include_router(devices_router)
 app.include_router(sensor_readings_router)
 app.include_router(alerts_router)
+app.include_router(analytics_router)
+app.include_router(dashboard_router)
+app.include_router(changes_router)
 
 
 @app.on_event("startup")
@@ -56,13 +128,104 @@ async def startup_event():
     logger.info(f"Environment: {settings.environment}")
     logger.info(f"Debug mode: {settings.debug}")
 
+    # Fork the compute workers before any request or background thread runs.
+    compute_pool.start()
+
+    db = SessionLocal()
+    try:
+        device_change_follower.start(db)
+        shard_map.load_placements(db)
+        geo_index.load(db)
+        logger.info(f"Spatial index loaded: {len(geo_index)} devices")
+        alert_index.load(db)
+        heartbeat_tracker.load(db)
+        if settings.hot_store_enabled:
+            hot_store.load(db)
+            logger.info(f"Hot window store loaded: {hot_store.stats()}")
+    finally:
+        db.close()
+
+    app.state.background_tasks = [
+        asyncio.create_task(
+            _run_periodically("Heartbeat cycle", run_heartbeat_cycle, settings.heartbeat_tick_seconds)
+        ),
+        asyncio.create_task(
+            _run_periodically("Purge cycle", run_purge_cycle, settings.purge_interval_seconds)
+        ),
+        asyncio.create_task(
+            _run_periodically("Device change cycle", run_device_change_cycle, settings.purge_propagation_seconds)
+        ),
+        asyncio.create_task(
+            _run_periodically("Spatial index refresh", run_geo_index_cycle, settings.geo_index_refresh_seconds)
+        ),
+    ]
+    if settings.hot_store_enabled:
+        app.state.background_tasks.append(
+            asyncio.create_task(
+                _run_periodically("Hot store cycle", run_hot_store_cycle, settings.hot_store_sync_seconds)
+            )
+        )
+    if settings.sketch_enabled:
+        app.state.background_tasks.append(
+            asyncio.create_task(
+                _run_periodically("Sketch cycle", run_sketch_cycle, settings.sketch_interval_seconds)
+            )
+        )
+        if settings.forecast_enabled:
+            app.state.background_tasks.append(
+                asyncio.create_task(
+                    _run_periodically("Forecast cycle", run_forecast_cycle, settings.forecast_interval_seconds)
+                )
+            )
+    if settings.change_feed_enabled:
+        app.state.background_tasks.append(
+            asyncio.create_task(
+                _run_periodically(
+                    "Change feed sequencer", run_change_feed_sequencer, settings.change_feed_sequence_seconds
+                )
+            )
+        )
+        app.state.background_tasks.append(
+            asyncio.create_task(
+                _run_periodically(
+                    "Change feed trim", run_change_feed_cycle, settings.change_feed_trim_interval_seconds
+                )
+            )
+        )
+    if shard_map.sharded:
+        app.state.background_tasks.append(
+            asyncio.create_task(
+                _run_periodically(
+                    "Shard placement refresh", run_placement_refresh, settings.shard_placement_refresh_seconds
+                )
+            )
+        )
+    if settings.gateway_enabled:
+        await line_gateway.start()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event handler."""
+    if settings.gateway_enabled:
+        await line_gateway.stop()
+    for task in app.state.background_tasks:
+        task.cancel()
+    await run_in_threadpool(run_heartbeat_cycle)
+    await run_in_threadpool(compute_pool.stop)
     logger.info("Application shutdown")
 
 
+async def _run_periodically(name: str, job, interval_seconds: float):
+    """Run a blocking maintenance job in the threadpool every ``interval_seconds``."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            logger.error(f"{name} failed: {str(e)}")
+
+
 @app.get("/")
 def root():
     """Root endpoint returning API information."""
@@ -0,0 +1,186 @@
+"""ASGI middleware for response compression and query cancellation."""
+
+import asyncio
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class _GzipCodec:
+    """Incremental gzip encoder that flushes at chunk boundaries."""
+
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _ZstdCodec:
+    """Incremental zstd encoder that flushes at chunk boundaries."""
+
+    encoding = "zstd"
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        if final:
+            return out + self._compressor.flush()
+        return out + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd or gzip based on ``Accept-Encoding``.
+
+    Unlike Starlette's ``GZipMiddleware``, streaming bodies are flushed at
+    every chunk so NDJSON consumers see rows as soon as they are produced.
+    Bodies smaller than ``minimum_size`` are sent uncompressed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    def _select_codec(self, accept_encoding: str):
+        accepted = {token.split(";")[0].strip().lower() for token in accept_encoding.split(",")}
+        if zstandard is not None and "zstd" in accepted:
+            return _ZstdCodec(self.zstd_level)
+        if "gzip" in accepted:
+            return _GzipCodec(self.gzip_level)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            codec = self._select_codec(Headers(scope=scope).get("Accept-Encoding", ""))
+            if codec is not None:
+                responder = _CompressionResponder(self.app, codec, self.minimum_size)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, codec, minimum_size: int) -> None:
+        self.app = app
+        self.codec = codec
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Hold the start message until the first body chunk tells us
+            # whether the response is worth compressing.
+            self.initial_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        if not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.codec.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.codec.compress(body, final=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.initial_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = self.codec.compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+class QueryCancellationMiddleware:
+    """
+    Cancel a request's database queries when its client disconnects.
+
+    ``get_db`` registers each session's query budget under
+    ``scope["query_budgets"]``. Incoming messages are read ahead of the
+    app, so an ``http.disconnect`` is seen while a sync handler is still
+    blocked on the database, and every registered budget is cancelled
+    unless the response already went out in full.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budgets = scope.setdefault("query_budgets", [])
+        queue: "asyncio.Queue[Message]" = asyncio.Queue()
+        completed = False
+
+        async def read_ahead() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect" and not completed:
+                    for budget in budgets:
+                        budget.cancel()
+                await queue.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def send_tracked(message: Message) -> None:
+            nonlocal completed
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                completed = True
+            await send(message)
+
+        reader = asyncio.create_task(read_ahead())
+        try:
+            await self.app(scope, queue.get, send_tracked)
+        finally:
+            reader.cancel()
@@ -5,7 +5,16 @@ from sqlalchemy.orm import declarative_base
 Base = declarative_base()
 
 from .device import Device
+from .series import Series
 from .sensor_reading import SensorReading
 from .alert import Alert
+from .incident import Incident
+from .purge_job import PurgeJob
+from .reading_sketch import ReadingSketch
+from .sketch_dirty_bucket import SketchDirtyBucket
+from .reading_forecast import ReadingForecast
+from .forecast_run import ForecastRun
+from .change import Change
+from .change_sequence import ChangeSequence
 
-__all__ = ["Base", "Device", "SensorReading", "Alert"]
+__all__ = ["Base", "Device", "Series", "SensorReading", "Alert", "Incident", "PurgeJob", "ReadingSketch", "SketchDirtyBucket", "ReadingForecast", "ForecastRun", "Change", "ChangeSequence"]
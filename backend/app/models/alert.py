@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Boolean, Integer, Index, text
 from sqlalchemy.orm import relationship
 
 from . import Base
@@ -24,7 +24,10 @@ class Alert(Base):
         threshold_value: The threshold that was exceeded
         actual_value: The actual measured value
         is_resolved: Whether the alert has been resolved
+        occurrence_count: How many times the open alert has been raised
+        incident_id: Incident this alert was correlated into
         created_at: When the alert was created
+        last_seen_at: When the alert was last raised
         resolved_at: When the alert was resolved
     """
 
@@ -38,11 +41,37 @@ class Alert(Base):
     threshold_value = Column(Float, nullable=True)
     actual_value = Column(Float, nullable=True)
     is_resolved = Column(Boolean, default=False, nullable=False)
+    occurrence_count = Column(Integer, default=1, nullable=False)
+    incident_id = Column(String(36), ForeignKey("incidents.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     resolved_at = Column(DateTime, nullable=True)
 
     # Relationships
     device = relationship("Device", back_populates="alerts")
+    incident = relationship("Incident", back_populates="alerts")
+
+    # Composite indexes for fleet-wide and per-device listings ordered by
+    # recency, a partial index covering only open alerts, and one open
+    # alert per device and type for deduplication across workers
+    __table_args__ = (
+        Index("idx_alert_resolved_created", "is_resolved", "created_at"),
+        Index("idx_alert_device_resolved_created", "device_id", "is_resolved", "created_at"),
+        Index(
+            "idx_alert_open_created",
+            "created_at",
+            postgresql_where=text("is_resolved = false"),
+            sqlite_where=text("is_resolved = 0"),
+        ),
+        Index(
+            "uq_alert_open_key",
+            "device_id",
+            "alert_type",
+            unique=True,
+            postgresql_where=text("is_resolved = false"),
+            sqlite_where=text("is_resolved = 0"),
+        ),
+    )
 
     def __repr__(self) -> str:
         return f"<Alert(id={self.id}, device_id={self.device_id}, severity={self.severity})>"
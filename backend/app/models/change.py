@@ -0,0 +1,42 @@
+"""Change model: one entry of the outbox feeding ``GET /changes``."""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Integer, String
+
+from . import Base
+
+
+class Change(Base):
+    """
+    A device, alert or reading change, numbered in the order it committed.
+
+    Rows are written by the service layer in the transaction making the
+    change (readings on another shard right after it) without a ``seq``.
+    The change feed's sequencer numbers them once committed, so a change
+    never gets a lower ``seq`` than one a consumer may already have read.
+
+    Attributes:
+        id: Insert order, internal to the outbox
+        seq: Position in the feed, None until sequenced
+        entity: ``device``, ``alert`` or ``readings``
+        op: ``insert``, ``update`` or ``delete``
+        entity_id: Device or alert ID; the device for readings
+        data: Inserted row or changed fields; for readings the series and
+            the time span written
+        changed_at: When the change was made
+    """
+
+    __tablename__ = "changes"
+
+    # SQLite only auto-increments an INTEGER primary key.
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    seq = Column(BigInteger, nullable=True, unique=True, index=True)
+    entity = Column(String(20), nullable=False)
+    op = Column(String(10), nullable=False)
+    entity_id = Column(String(36), nullable=True)
+    data = Column(JSON, nullable=True)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<Change(seq={self.seq}, entity={self.entity}, op={self.op}, entity_id={self.entity_id})>"
@@ -0,0 +1,26 @@
+"""Change sequence model: the feed's last assigned position."""
+
+from sqlalchemy import BigInteger, Column, Integer
+
+from . import Base
+
+
+class ChangeSequence(Base):
+    """
+    Single row holding the last ``seq`` given to a change.
+
+    The sequencer locks it for the transaction numbering changes, so
+    workers never number concurrently.
+
+    Attributes:
+        id: Always 1
+        last_seq: Last position assigned
+    """
+
+    __tablename__ = "change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    last_seq = Column(BigInteger, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ChangeSequence(last_seq={self.last_seq})>"
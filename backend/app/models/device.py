@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Boolean, Float
+from sqlalchemy import Column, String, DateTime, Boolean, Float, Integer
 from sqlalchemy.orm import relationship
 
 from . import Base
@@ -20,7 +20,11 @@ class Device(Base):
         status: Current operational status
         latitude: Geographic latitude coordinate
         longitude: Geographic longitude coordinate
+        geohash: Geohash of the coordinates for prefix-based proximity lookups
         is_active: Whether the device is currently active
+        heartbeat_interval_seconds: Expected reporting interval, default if unset
+        last_seen_at: When the device last reported data
+        shard: Name of the shard holding the device's readings (primary if unset)
         created_at: Timestamp when device was created
         updated_at: Timestamp of last update
     """
@@ -34,13 +38,18 @@ class Device(Base):
     status = Column(String(50), default="active", nullable=False)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True, index=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    heartbeat_interval_seconds = Column(Integer, nullable=True)
+    last_seen_at = Column(DateTime, nullable=True)
+    shard = Column(String(64), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
-    # Relationships
-    sensor_readings = relationship("SensorReading", back_populates="device", cascade="all, delete-orphan")
-    alerts = relationship("Alert", back_populates="device", cascade="all, delete-orphan")
+    # Relationships (children are removed by the database or the purge job,
+    # never loaded just to be deleted)
+    series = relationship("Series", back_populates="device", cascade="all, delete-orphan", passive_deletes=True)
+    alerts = relationship("Alert", back_populates="device", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Device(id={self.id}, name={self.name}, location={self.location})>"
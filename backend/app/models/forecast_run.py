@@ -0,0 +1,30 @@
+"""Forecast run model: which worker is refitting a shard's forecasts."""
+
+from sqlalchemy import Column, DateTime, String
+
+from . import Base
+
+
+class ForecastRun(Base):
+    """
+    Claim on the forecast cycle of one shard, kept on the primary.
+
+    A worker refits a shard only after moving ``claimed_at`` forward with
+    a conditional UPDATE, so each interval one worker fits it.
+
+    Attributes:
+        shard: Name of the shard the row describes
+        status: ``idle`` or ``running``
+        claimed_at: When the last run was claimed, used to pick up abandoned runs
+        finished_at: When the last run ended
+    """
+
+    __tablename__ = "forecast_runs"
+
+    shard = Column(String(100), primary_key=True)
+    status = Column(String(20), default="idle", nullable=False)
+    claimed_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ForecastRun(shard={self.shard}, status={self.status}, claimed_at={self.claimed_at})>"
@@ -0,0 +1,50 @@
+"""Incident model grouping correlated alerts."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, Index
+from sqlalchemy.orm import relationship
+
+from . import Base
+
+
+class Incident(Base):
+    """
+    Incident model collapsing an alert storm into one record.
+
+    Alerts of the same type raised by devices in the same location within
+    the correlation window are attached to a single incident.
+
+    Attributes:
+        id: Unique identifier for the incident
+        location: Device location shared by the grouped alerts
+        alert_type: Alert type shared by the grouped alerts
+        severity: Highest severity among the grouped alerts
+        alert_count: Number of distinct alerts attached
+        is_resolved: Whether the incident has been resolved
+        first_seen_at: When the first grouped alert was raised
+        last_seen_at: When the most recent grouped alert was raised
+        resolved_at: When the incident was resolved
+    """
+
+    __tablename__ = "incidents"
+
+    id = Column(String(36), primary_key=True, index=True)
+    location = Column(String(255), nullable=False)
+    alert_type = Column(String(100), nullable=False)
+    severity = Column(String(50), nullable=False)
+    alert_count = Column(Integer, default=1, nullable=False)
+    is_resolved = Column(Boolean, default=False, nullable=False)
+    first_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    resolved_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    alerts = relationship("Alert", back_populates="incident")
+
+    __table_args__ = (
+        Index("idx_incident_resolved_last_seen", "is_resolved", "last_seen_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Incident(id={self.id}, location={self.location}, alert_type={self.alert_type})>"
@@ -0,0 +1,46 @@
+"""Purge job model tracking background deletes of device data."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
+
+from . import Base
+
+
+class PurgeJob(Base):
+    """
+    Background delete of a device and everything stored for it.
+
+    The device ID is kept without a foreign key so the job outlives the
+    device it removes and can still be polled afterwards.
+
+    Attributes:
+        id: Unique identifier for the job
+        device_id: Device being deleted
+        status: ``pending``, ``running``, ``completed`` or ``failed``
+        readings_deleted: Readings removed so far
+        alerts_deleted: Alerts removed so far
+        error: Failure message of a failed job
+        created_at: When the delete was requested
+        updated_at: Last progress update, used to pick up abandoned jobs
+        finished_at: When the job completed or failed
+    """
+
+    __tablename__ = "purge_jobs"
+
+    id = Column(String(36), primary_key=True)
+    device_id = Column(String(36), nullable=False, index=True)
+    status = Column(String(20), default="pending", nullable=False)
+    readings_deleted = Column(Integer, default=0, nullable=False)
+    alerts_deleted = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_purge_job_status_updated", "status", "updated_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PurgeJob(id={self.id}, device_id={self.device_id}, status={self.status})>"
@@ -0,0 +1,35 @@
+"""Forecast model holding the next hours of one series."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, SmallInteger
+
+from . import Base
+
+
+class ReadingForecast(Base):
+    """
+    Latest short-horizon forecast of a series, replaced by every forecast cycle.
+
+    Attributes:
+        series_id: Series the forecast is for
+        origin: Start of the first forecast step
+        step_seconds: Length of each step (the sketch bucket width)
+        steps: Number of forecast steps
+        model: Model code (see ``app.services.forecasting.MODEL_NAMES``)
+        bands: Forecast, lower and upper band as ``3 x steps`` float32 values
+        fitted_at: When the forecast was computed
+    """
+
+    __tablename__ = "reading_forecasts"
+
+    series_id = Column(Integer, ForeignKey("series.id", ondelete="CASCADE"), primary_key=True)
+    origin = Column(DateTime, nullable=False)
+    step_seconds = Column(Integer, nullable=False)
+    steps = Column(Integer, nullable=False)
+    model = Column(SmallInteger, nullable=False)
+    bands = Column(LargeBinary, nullable=False)
+    fitted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ReadingForecast(series_id={self.series_id}, origin={self.origin}, steps={self.steps})>"
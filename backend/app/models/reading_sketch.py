@@ -0,0 +1,39 @@
+"""Quantile sketch model summarizing one series over one time bucket."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, LargeBinary
+
+from . import Base
+
+
+class ReadingSketch(Base):
+    """
+    Mergeable quantile sketch of the readings of a series in one time bucket.
+
+    Attributes:
+        series_id: Series the readings belong to
+        bucket_start: Start of the bucket (aligned to ``SKETCH_BUCKET_SECONDS``)
+        count: Number of readings in the bucket
+        total: Sum of the values, for exact averages
+        min_value: Smallest value in the bucket
+        max_value: Largest value in the bucket
+        max_reading_id: Largest reading ID summarized, the builder's resume point
+        sketch: Serialized DDSketch of the values
+        updated_at: When the bucket was last rebuilt
+    """
+
+    __tablename__ = "reading_sketches"
+
+    series_id = Column(Integer, ForeignKey("series.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    max_reading_id = Column(Integer, nullable=False, index=True)
+    sketch = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ReadingSketch(series_id={self.series_id}, bucket_start={self.bucket_start}, count={self.count})>"
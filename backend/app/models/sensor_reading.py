@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Integer, Index
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 
 from . import Base
@@ -12,37 +12,46 @@ class SensorReading(Base):
     """
     Sensor reading model for IoT device measurements.
     
-    Stores individual sensor readings with timestamps and values.
-    Includes indexes for efficient querying by device and time.
+    Stores individual sensor readings with timestamps and values. The
+    device, sensor type and unit live on the referenced :class:`Series`
+    row and are exposed here as read-only properties.
     
     Attributes:
         id: Unique identifier for the reading
-        device_id: Foreign key reference to the device
-        sensor_type: Type of sensor (e.g., temperature, humidity)
+        series_id: Foreign key reference to the series
         value: The measured value
-        unit: Unit of measurement (e.g., Celsius, percentage)
         timestamp: When the reading was taken
         created_at: When the record was created
     """
 
     __tablename__ = "sensor_readings"
 
-    id = Column(Integer, primary_key=True, index=True)
-    device_id = Column(String(36), ForeignKey("devices.id", ondelete="CASCADE"), nullable=False, index=True)
-    sensor_type = Column(String(100), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    series_id = Column(Integer, ForeignKey("series.id", ondelete="CASCADE"), nullable=False)
     value = Column(Float, nullable=False)
-    unit = Column(String(50), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
-    device = relationship("Device", back_populates="sensor_readings")
+    series = relationship("Series", back_populates="readings", lazy="joined")
 
-    # Composite indexes for common query patterns
+    # The natural key is unique so retried ingests are idempotent; it also
+    # serves per-series time range scans
     __table_args__ = (
-        Index("idx_device_timestamp", "device_id", "timestamp"),
-        Index("idx_sensor_type_timestamp", "sensor_type", "timestamp"),
+        Index("uq_reading_natural_key", "series_id", "timestamp", unique=True),
     )
 
+    @property
+    def device_id(self) -> str:
+        return self.series.device_id
+
+    @property
+    def sensor_type(self) -> str:
+        return self.series.sensor_type
+
+    @property
+    def unit(self) -> str:
+        return self.series.unit
+
     def __repr__(self) -> str:
-        return f"<SensorReading(device_id={self.device_id}, sensor_type={self.sensor_type}, value={self.value})>"
+        return f"<SensorReading(series_id={self.series_id}, timestamp={self.timestamp}, value={self.value})>"
@@ -0,0 +1,45 @@
+"""Series catalog model mapping series keys to compact integer IDs."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Index
+from sqlalchemy.orm import relationship
+
+from . import Base
+
+
+class Series(Base):
+    """
+    One time series: a sensor of a device reporting in one unit.
+
+    Readings reference the series by a small integer instead of repeating
+    the device ID, sensor type and unit strings on every row.
+
+    Attributes:
+        id: Compact series identifier stored on each reading
+        device_id: Foreign key reference to the device
+        sensor_type: Type of sensor (e.g., temperature, humidity)
+        unit: Unit of measurement (e.g., Celsius, percentage)
+        created_at: When the series first reported
+    """
+
+    __tablename__ = "series"
+
+    id = Column(Integer, primary_key=True)
+    device_id = Column(String(36), ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
+    sensor_type = Column(String(100), nullable=False, index=True)
+    unit = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    device = relationship("Device", back_populates="series")
+    readings = relationship(
+        "SensorReading", back_populates="series", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    __table_args__ = (
+        Index("uq_series_key", "device_id", "sensor_type", "unit", unique=True),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Series(id={self.id}, device_id={self.device_id}, sensor_type={self.sensor_type})>"
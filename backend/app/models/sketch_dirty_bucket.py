@@ -0,0 +1,35 @@
+"""Marker of a sketch bucket holding readings its sketch does not summarize yet."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, UniqueConstraint
+
+from . import Base
+
+
+class SketchDirtyBucket(Base):
+    """
+    A ``(series, bucket)`` written to since the sketch builder last rebuilt it.
+
+    Every ingest path writes the marker in the transaction inserting the
+    readings, so a reading is never visible without its marker. The
+    builder deletes the markers it reads in the transaction rebuilding
+    their buckets; a write committed after that marks the bucket again.
+
+    Attributes:
+        id: Order in which the builder consumes markers
+        series_id: Series written to
+        bucket_start: Start of the bucket (aligned to ``SKETCH_BUCKET_SECONDS``)
+        marked_at: When the bucket was last written to
+    """
+
+    __tablename__ = "sketch_dirty_buckets"
+    __table_args__ = (UniqueConstraint("series_id", "bucket_start", name="uq_sketch_dirty_bucket"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    series_id = Column(Integer, ForeignKey("series.id", ondelete="CASCADE"), nullable=False)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    marked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SketchDirtyBucket(series_id={self.series_id}, bucket_start={self.bucket_start})>"
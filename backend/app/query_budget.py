@@ -0,0 +1,161 @@
+"""Statement time budgets and cancellation for request sessions."""
+
+import sqlite3
+import threading
+import time
+from typing import Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+from .utils import logger
+
+# SQLite calls the progress handler every this many virtual machine steps.
+_SQLITE_PROGRESS_STEPS = 1000
+# SQLSTATE of a statement cancelled by statement_timeout or a cancel request.
+_PG_QUERY_CANCELED = "57014"
+
+_INFO_KEY = "query_budget"
+
+
+class QueryInterrupted(Exception):
+    """A statement was stopped before it finished."""
+
+
+class QueryTimeout(QueryInterrupted):
+    """A statement ran past the time budget of its route."""
+
+
+class QueryCancelled(QueryInterrupted):
+    """A statement was stopped because its client went away."""
+
+
+class ScanBudgetExceeded(Exception):
+    """A query was estimated to read more rows than it may."""
+
+    def __init__(self, estimated_rows: int, max_rows: int):
+        super().__init__(f"Query would read about {estimated_rows} readings, limit is {max_rows}")
+        self.estimated_rows = estimated_rows
+        self.max_rows = max_rows
+
+
+class QueryBudget:
+    """
+    Time budget shared by the sessions serving one request.
+
+    The budget is attached to a session with :func:`attach` and follows it
+    onto every connection it begins a transaction on. On PostgreSQL each
+    transaction starts with ``SET LOCAL statement_timeout``; on SQLite a
+    progress handler aborts statements past their deadline. :meth:`cancel`
+    stops whatever the sessions are running and every later statement.
+
+    Attributes:
+        timeout: Seconds each statement may run, 0 for no limit
+        cancelled: Whether :meth:`cancel` was called
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.cancelled = False
+        self._connections: Set[object] = set()
+        self._lock = threading.Lock()
+
+    def _checkout(self, dbapi_connection) -> None:
+        with self._lock:
+            self._connections.add(dbapi_connection)
+
+    def _checkin(self, dbapi_connection) -> None:
+        with self._lock:
+            self._connections.discard(dbapi_connection)
+
+    def cancel(self) -> None:
+        """Interrupt running statements; later ones fail immediately."""
+        with self._lock:
+            self.cancelled = True
+            connections = list(self._connections)
+        for dbapi_connection in connections:
+            try:
+                if isinstance(dbapi_connection, sqlite3.Connection):
+                    dbapi_connection.interrupt()
+                elif hasattr(dbapi_connection, "cancel"):
+                    dbapi_connection.cancel()
+            except Exception as e:
+                logger.warning(f"Could not cancel query: {str(e)}")
+
+
+def attach(db: Session, timeout: float) -> QueryBudget:
+    """Give ``db`` a statement time budget; returns it for cancellation."""
+    budget = QueryBudget(timeout)
+    db.info[_INFO_KEY] = budget
+    return budget
+
+
+def inherit(parent: Session, child: Session) -> None:
+    """Apply ``parent``'s budget, if any, to a session opened on its behalf."""
+    budget = parent.info.get(_INFO_KEY)
+    if budget is not None:
+        child.info[_INFO_KEY] = budget
+
+
+def budget_of(db: Session) -> Optional[QueryBudget]:
+    return db.info.get(_INFO_KEY)
+
+
+def is_interrupt(error: BaseException) -> bool:
+    """Whether a driver error is a statement stopped by a timeout or cancel request."""
+    if isinstance(error, sqlite3.OperationalError):
+        return "interrupted" in str(error)
+    return getattr(error, "pgcode", None) == _PG_QUERY_CANCELED
+
+
+@event.listens_for(Session, "after_begin")
+def _begin(session: Session, transaction, connection) -> None:
+    budget = session.info.get(_INFO_KEY)
+    if budget is None:
+        return
+    dbapi_connection = connection.connection.dbapi_connection
+    connection.info[_INFO_KEY] = budget
+    budget._checkout(dbapi_connection)
+    if budget.timeout and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(int(budget.timeout * 1000), 1)}")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(connection, cursor, statement, parameters, context, executemany) -> None:
+    budget = connection.info.get(_INFO_KEY)
+    if budget is None:
+        return
+    if budget.cancelled:
+        raise QueryCancelled("Client disconnected")
+    dbapi_connection = connection.connection.dbapi_connection
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        if budget.timeout:
+            deadline = time.monotonic() + budget.timeout
+            dbapi_connection.set_progress_handler(
+                lambda: budget.cancelled or time.monotonic() > deadline, _SQLITE_PROGRESS_STEPS
+            )
+        else:
+            dbapi_connection.set_progress_handler(lambda: budget.cancelled, _SQLITE_PROGRESS_STEPS)
+
+
+@event.listens_for(Engine, "handle_error")
+def _translate_interrupt(context) -> None:
+    connection = context.connection
+    budget = connection.info.get(_INFO_KEY) if connection is not None and not connection.closed else None
+    if budget is None or not is_interrupt(context.original_exception):
+        return
+    if budget.cancelled:
+        raise QueryCancelled("Client disconnected") from context.original_exception
+    raise QueryTimeout(f"Query exceeded its {budget.timeout:g}s time budget") from context.original_exception
+
+
+@event.listens_for(Pool, "checkin")
+def _release(dbapi_connection, connection_record) -> None:
+    budget = connection_record.info.pop(_INFO_KEY, None) if connection_record is not None else None
+    if budget is None:
+        return
+    budget._checkin(dbapi_connection)
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(None, 0)
@@ -4,5 +4,16 @@ from .devices import router as devices_router
 from .sensor_readings import router as sensor_readings_router
 from .alerts import router as alerts_router
 from .health import router as health_router
+from .analytics import router as analytics_router
+from .dashboard import router as dashboard_router
+from .changes import router as changes_router
 
-__all__ = ["devices_router", "sensor_readings_router", "alerts_router", "health_router"]
+__all__ = [
+    "devices_router",
+    "sensor_readings_router",
+    "alerts_router",
+    "health_router",
+    "analytics_router",
+    "dashboard_router",
+    "changes_router",
+]
@@ -1,25 +1,46 @@
 """API endpoints for alert management."""
 
+from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
+from ..config import get_settings
 from ..database import get_db
-from ..schemas import AlertCreate, AlertResponse, AlertUpdate
-from ..services import AlertService
+from ..query_budget import QueryInterrupted
+from ..schemas import (
+    AlertCreate,
+    AlertResponse,
+    AlertUpdate,
+    BacktestRequest,
+    BacktestResponse,
+    IncidentResponse,
+    IncidentDetailResponse,
+)
+from ..services import AlertService, BacktestService
+from ..services.alert_service import AlertAlreadyOpen
+from ..services.compute_pool import ComputeError
+from ..services.shard_map import UnknownDevice
 from ..utils import logger
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
+settings = get_settings()
+
 
 @router.post("", response_model=AlertResponse, status_code=201)
 def create_alert(alert_in: AlertCreate, db: Session = Depends(get_db)):
-    """Create a new alert."""
+    """Create a new alert, or record a repeat of an open one. Alerts for unknown devices are refused with 404."""
     try:
         alert = AlertService.create_alert(db, alert_in)
-        logger.warning(f"Alert created: {alert.id} - {alert.severity}")
+        if alert.occurrence_count > 1:
+            logger.info(f"Alert repeated: {alert.id} x{alert.occurrence_count}")
+        else:
+            logger.warning(f"Alert created: {alert.id} - {alert.severity}")
         return alert
+    except UnknownDevice as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating alert: {str(e)}")
         raise HTTPException(status_code=500, detail="Error creating alert")
@@ -29,22 +50,104 @@ def create_alert(alert_in: AlertCreate, db: Session = Depends(get_db)):
 def list_alerts(
     device_id: Optional[str] = None,
     is_resolved: Optional[bool] = None,
+    severity: Optional[str] = Query(None, pattern="^(LOW|MEDIUM|HIGH|CRITICAL)$"),
+    alert_type: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
 ):
-    """List alerts with optional filtering."""
+    """List alerts across the fleet with optional filtering."""
     try:
-        if device_id:
-            alerts = AlertService.get_alerts_by_device(db, device_id, skip, limit, is_resolved)
-        else:
-            alerts = AlertService.get_unresolved_alerts(db, skip, limit) if is_resolved is False else []
-        return alerts
+        return AlertService.get_alerts(
+            db,
+            skip=skip,
+            limit=limit,
+            device_id=device_id,
+            is_resolved=is_resolved,
+            severity=severity,
+            alert_type=alert_type,
+            start_time=start_time,
+            end_time=end_time,
+        )
     except Exception as e:
         logger.error(f"Error listing alerts: {str(e)}")
         raise HTTPException(status_code=500, detail="Error listing alerts")
 
 
+@router.get("/summary", response_model=dict)
+def get_alert_summary(device_id: Optional[str] = None, db: Session = Depends(get_db)):
+    """Get alert counts by severity and resolution state."""
+    try:
+        return AlertService.get_alert_summary(db, device_id)
+    except Exception as e:
+        logger.error(f"Error getting alert summary: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error getting alert summary")
+
+
+@router.get("/incidents", response_model=List[IncidentResponse])
+def list_incidents(
+    is_resolved: Optional[bool] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """List correlated alert incidents, most recently active first."""
+    try:
+        return AlertService.get_incidents(db, skip, limit, is_resolved)
+    except Exception as e:
+        logger.error(f"Error listing incidents: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error listing incidents")
+
+
+@router.get("/incidents/{incident_id}", response_model=IncidentDetailResponse)
+def get_incident(incident_id: str, db: Session = Depends(get_db)):
+    """Get an incident together with its alerts."""
+    incident = AlertService.get_incident(db, incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return incident
+
+
+@router.post("/incidents/{incident_id}/resolve", response_model=IncidentResponse)
+def resolve_incident(incident_id: str, db: Session = Depends(get_db)):
+    """Mark an incident and all of its open alerts as resolved."""
+    try:
+        incident = AlertService.resolve_incident(db, incident_id)
+        if not incident:
+            raise HTTPException(status_code=404, detail="Incident not found")
+        logger.info(f"Incident resolved: {incident_id}")
+        return incident
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error resolving incident: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error resolving incident")
+
+
+@router.post("/backtest", response_model=BacktestResponse)
+def backtest_rules(request_in: BacktestRequest, db: Session = Depends(get_db)):
+    """
+    Count the alerts candidate threshold rules would have raised.
+
+    Replays stored readings over the window without creating alerts, and
+    reports counts, durations and the most affected devices per rule.
+    """
+    if request_in.days > settings.alert_backtest_max_days:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window is {request_in.days} days, limit is {settings.alert_backtest_max_days}",
+        )
+    try:
+        return BacktestService.backtest(db, request_in)
+    except (ComputeError, QueryInterrupted):
+        raise
+    except Exception as e:
+        logger.error(f"Error backtesting alert rules: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error backtesting alert rules")
+
+
 @router.get("/{alert_id}", response_model=AlertResponse)
 def get_alert(alert_id: str, db: Session = Depends(get_db)):
     """Get a specific alert."""
@@ -69,6 +172,8 @@ def update_alert(
         return alert
     except HTTPException:
         raise
+    except AlertAlreadyOpen as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating alert: {str(e)}")
         raise HTTPException(status_code=500, detail="Error updating alert")
@@ -0,0 +1,98 @@
+"""API endpoints for fleet-wide analytics."""
+
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..query_budget import QueryInterrupted
+from ..schemas import FleetAnalyticsResponse, PercentilesResponse
+from ..services import AnalyticsService, SketchService
+from ..services.compute_pool import ComputeError
+from ..utils import logger, parse_window
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/fleet", response_model=FleetAnalyticsResponse)
+def get_fleet_analytics(
+    group_by: Literal["location", "device_type"] = Query(...),
+    sensor_type: str = Query(...),
+    window: str = Query("1h", description="Look-back window, e.g. 15m, 1h, 7d"),
+    db: Session = Depends(get_db),
+):
+    """Get count/avg/min/max of a sensor type per device group."""
+    try:
+        duration = parse_window(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        end_time = datetime.utcnow()
+        start_time = end_time - duration
+        groups = AnalyticsService.fleet_aggregates(db, group_by, sensor_type, start_time, end_time)
+        return {
+            "group_by": group_by,
+            "sensor_type": sensor_type,
+            "start_time": start_time,
+            "end_time": end_time,
+            "groups": groups,
+        }
+    except QueryInterrupted:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing fleet analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error computing fleet analytics")
+
+
+def _naive_utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/percentiles", response_model=PercentilesResponse)
+def get_percentiles(
+    sensor_type: str = Query(...),
+    device_id: Optional[List[str]] = Query(None, description="Repeat to select several devices"),
+    location: Optional[str] = None,
+    device_type: Optional[str] = None,
+    window: str = Query("1h", description="Look-back window, e.g. 15m, 1h, 7d; ignored if start_time is set"),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    q: List[float] = Query([0.5, 0.95, 0.99], description="Quantiles in [0, 1]; repeat for several"),
+    db: Session = Depends(get_db),
+):
+    """Get percentiles of a sensor type across devices, merged from per-bucket sketches."""
+    if any(not 0 <= quantile <= 1 for quantile in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    end_time = _naive_utc(end_time) if end_time is not None else datetime.utcnow()
+    if start_time is not None:
+        start_time = _naive_utc(start_time)
+    else:
+        try:
+            start_time = end_time - parse_window(window)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if end_time < start_time:
+        raise HTTPException(status_code=400, detail="end_time must not be before start_time")
+
+    try:
+        result = SketchService.percentiles(
+            db,
+            sensor_type,
+            start_time,
+            end_time,
+            q,
+            device_ids=device_id,
+            location=location,
+            device_type=device_type,
+        )
+        return {"sensor_type": sensor_type, "start_time": start_time, "end_time": end_time, **result}
+    except (ComputeError, QueryInterrupted):
+        raise
+    except Exception as e:
+        logger.error(f"Error computing percentiles: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error computing percentiles")
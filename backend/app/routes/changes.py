@@ -0,0 +1,37 @@
+"""API endpoint for the change feed."""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..query_budget import QueryInterrupted
+from ..schemas import ChangeFeedResponse
+from ..services import ChangeFeedService
+from ..services.change_feed_service import ChangesExpired
+from ..utils import logger
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+@router.get("", response_model=ChangeFeedResponse)
+def get_changes(
+    since: int = Query(0, ge=0, description="Last seq seen; 0 for the oldest change kept"),
+    limit: int = Query(1000, ge=1, le=10000),
+    entity: Optional[List[str]] = Query(None, description="device, alert or readings; repeat for several"),
+    db: Session = Depends(get_db),
+):
+    """Get device, alert and reading changes after ``since``, oldest first."""
+    try:
+        return ChangeFeedService.get_changes(db, since=since, limit=limit, entities=entity)
+    except ChangesExpired as e:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Changes after {e.since} are no longer kept; re-list, then resume from since={e.newest}",
+        )
+    except QueryInterrupted:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading changes: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error reading changes")
@@ -0,0 +1,35 @@
+"""API endpoint for the dashboard summary."""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..schemas import DashboardSummaryResponse
+from ..services import DashboardService
+from ..utils import logger
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("/summary", response_model=DashboardSummaryResponse)
+def get_dashboard_summary(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    alert_limit: int = Query(10, ge=0, le=100),
+    sensor_type: List[str] = Query(["temperature", "humidity"], description="Repeat for several"),
+    history_device_id: Optional[str] = None,
+    history_limit: int = Query(24, ge=0, le=1000),
+):
+    """Get device and alert counts, recent alerts and latest readings in one response."""
+    try:
+        return DashboardService.summary(
+            skip=skip,
+            limit=limit,
+            alert_limit=alert_limit,
+            sensor_types=sensor_type,
+            history_device_id=history_device_id,
+            history_limit=history_limit,
+        )
+    except Exception as e:
+        logger.error(f"Error building dashboard summary: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error building dashboard summary")
@@ -6,8 +6,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..schemas import DeviceCreate, DeviceUpdate, DeviceResponse
-from ..services import DeviceService
+from ..schemas import DeviceCreate, DeviceUpdate, DeviceResponse, DeviceNearResponse, PurgeJobResponse
+from ..services import DeviceService, PurgeService
 from ..utils import logger
 
 router = APIRouter(prefix="/devices", tags=["devices"])
@@ -50,6 +50,47 @@ def list_devices(
         raise HTTPException(status_code=500, detail="Error listing devices")
 
 
+@router.get("/near", response_model=List[DeviceNearResponse])
+def list_devices_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0, le=20000),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """List devices within a radius of a point, nearest first."""
+    try:
+        hits = DeviceService.get_devices_near(db, lat, lon, radius_km, limit)
+        return [
+            {**DeviceResponse.model_validate(device).model_dump(), "distance_km": distance}
+            for device, distance in hits
+        ]
+    except Exception as e:
+        logger.error(f"Error listing nearby devices: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error listing nearby devices")
+
+
+@router.get("/within", response_model=List[DeviceResponse])
+def list_devices_within(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """List devices inside a bounding box."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="bbox is out of range")
+
+    try:
+        return DeviceService.get_devices_within(db, min_lat, min_lon, max_lat, max_lon, limit)
+    except Exception as e:
+        logger.error(f"Error listing devices in bbox: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error listing devices in bbox")
+
+
 @router.get("/{device_id}", response_model=DeviceResponse)
 def get_device(device_id: str, db: Session = Depends(get_db)):
     """Get a specific device by ID."""
@@ -79,14 +120,20 @@ def update_device(
         raise HTTPException(status_code=500, detail="Error updating device")
 
 
-@router.delete("/{device_id}", status_code=204)
+@router.delete("/{device_id}", response_model=PurgeJobResponse, status_code=202)
 def delete_device(device_id: str, db: Session = Depends(get_db)):
-    """Delete a device."""
+    """
+    Delete a device with its readings and alerts.
+
+    Returns the purge job; poll ``GET /devices/purge-jobs/{job_id}`` until
+    its status is ``completed``.
+    """
     try:
-        success = DeviceService.delete_device(db, device_id)
-        if not success:
+        job = DeviceService.delete_device(db, device_id)
+        if not job:
             raise HTTPException(status_code=404, detail="Device not found")
-        logger.info(f"Device deleted: {device_id}")
+        logger.info(f"Device delete requested: {device_id} (job {job.id}, {job.status})")
+        return job
     except HTTPException:
         raise
     except Exception as e:
@@ -94,13 +141,20 @@ def delete_device(device_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error deleting device")
 
 
+@router.get("/purge-jobs/{job_id}", response_model=PurgeJobResponse)
+def get_purge_job(job_id: str, db: Session = Depends(get_db)):
+    """Get the status of a device delete."""
+    job = PurgeService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Purge job not found")
+    return job
+
+
 @router.get("/stats/count", response_model=dict)
 def get_device_stats(db: Session = Depends(get_db)):
     """Get device statistics."""
     try:
-        total = DeviceService.get_device_count(db)
-        active = len(DeviceService.get_active_devices(db))
-        return {"total": total, "active": active}
+        return DeviceService.get_device_counts(db)
     except Exception as e:
         logger.error(f"Error getting device stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Error getting device stats")
@@ -4,6 +4,13 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from ..database import get_db
+from ..services.compute_pool import compute_pool
+from ..services.hot_store import hot_store
+from ..services.line_gateway import line_gateway
+from ..services.metrics import metrics
+from ..services.range_cache import range_cache
+from ..services.lateness import lateness_tracker
+from ..services.shard_map import shard_map
 
 router = APIRouter(tags=["health"])
 
@@ -22,3 +29,16 @@ def health_check_db(db: Session = Depends(get_db)):
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
+
+
+@router.get("/health/metrics", response_model=dict)
+def health_metrics():
+    """Operational counters for this worker process."""
+    snapshot = metrics.snapshot()
+    snapshot.update({f"lateness.{name}": value for name, value in lateness_tracker.stats().items()})
+    snapshot.update({f"hot_store.{name}": value for name, value in hot_store.stats().items()})
+    snapshot.update({f"range_cache.{name}": value for name, value in range_cache.stats().items()})
+    snapshot.update({f"compute.{name}": value for name, value in compute_pool.stats().items()})
+    snapshot.update({f"gateway.{name}": value for name, value in line_gateway.stats().items()})
+    snapshot.update({f"shard_map.{name}": value for name, value in shard_map.stats().items()})
+    return snapshot
@@ -1,56 +1,292 @@
 """API endpoints for sensor reading management."""
 
+from collections import Counter
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
 
+from ..config import get_settings
 from ..database import get_db
-from ..schemas import SensorReadingCreate, SensorReadingResponse
-from ..services import SensorReadingService
+from ..query_budget import QueryInterrupted, ScanBudgetExceeded
+from ..schemas import (
+    ForecastResponse,
+    ResampleRequest,
+    ResampleResponse,
+    SensorReadingBatch,
+    SensorReadingBatchResponse,
+    SensorReadingCreate,
+    SensorReadingImportResponse,
+    SensorReadingResponse,
+    SeriesWatermark,
+)
+from ..services import ForecastService, ResampleService, SensorReadingService
+from ..services.admission import (
+    Overloaded,
+    RateLimitExceeded,
+    admit_batch,
+    admit_ingest,
+    ingest_limiter,
+    retry_after_header,
+)
+from ..services.bulk_import import ImportFormatError, detect_format, import_readings, iter_chunks
+from ..services.compute_pool import ComputeError
+from ..services.lateness import lateness_tracker
+from ..services.shard_map import InactiveDevice, UnknownDevice, shard_map
+from ..streaming import merged_ndjson_response, ndjson_response, wants_ndjson
 from ..utils import logger
 
 router = APIRouter(prefix="/sensor-readings", tags=["sensor-readings"])
 
+settings = get_settings()
+
+
+def _readings_ndjson(
+    db: Session,
+    device_id: Optional[str],
+    sensor_type: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    descending: bool = False,
+    skip: int = 0,
+    limit: Optional[int] = None,
+):
+    """
+    Stream readings from the device's shard, or merged across every shard.
+
+    The streams run under the query budget of the request session ``db``.
+    """
+    statement = SensorReadingService.readings_select(device_id, sensor_type, start_time, end_time, descending)
+    if device_id or not shard_map.sharded:
+        if limit is not None:
+            statement = statement.offset(skip).limit(limit)
+        owner = shard_map.owner(device_id) if device_id else shard_map.primary
+        return ndjson_response(statement, session_factory=owner.session_factory, parent=db)
+    if limit is not None:
+        statement = statement.limit(skip + limit)
+    return merged_ndjson_response(
+        statement,
+        [shard.session_factory for shard in shard_map.shards.values()],
+        "timestamp",
+        descending=descending,
+        skip=skip,
+        limit=limit,
+        parent=db,
+    )
+
 
 @router.post("", response_model=SensorReadingResponse, status_code=201)
-def create_reading(reading_in: SensorReadingCreate, db: Session = Depends(get_db)):
-    """Create a new sensor reading."""
+def create_reading(
+    reading_in: SensorReadingCreate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    """
+    Create a new sensor reading.
+
+    Resending a reading with the same device, sensor type and timestamp is
+    idempotent: the stored reading is returned with status 200 and an
+    ``X-Duplicate-Reading`` header. Readings for devices that do not
+    exist are refused with 404, for inactive ones with 409.
+    """
     try:
-        reading = SensorReadingService.create_reading(db, reading_in)
-        logger.info(f"Sensor reading created for device: {reading.device_id}")
+        client_ip = request.client.host if request.client else None
+        admit_ingest(reading_in.device_id, client_ip)
+        with ingest_limiter.slot():
+            reading, duplicate = SensorReadingService.ingest_reading(db, reading_in)
+        if duplicate:
+            response.status_code = 200
+            response.headers["X-Duplicate-Reading"] = "true"
+            logger.info(f"Duplicate sensor reading dropped for device: {reading.device_id}")
+        else:
+            logger.info(f"Sensor reading created for device: {reading.device_id}")
         return reading
+    except UnknownDevice as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InactiveDevice as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers=retry_after_header(e.retry_after),
+        )
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server overloaded, retry later",
+            headers=retry_after_header(e.retry_after),
+        )
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         logger.error(f"Error creating sensor reading: {str(e)}")
         raise HTTPException(status_code=500, detail="Error creating sensor reading")
 
 
+@router.post("/batch", response_model=SensorReadingBatchResponse)
+def create_readings_batch(
+    batch_in: SensorReadingBatch,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """
+    Store many readings in one request.
+
+    Rate limits are charged one token per reading: the client for the
+    whole batch, each device for its own readings, and nothing unless
+    every bucket admits the batch. Duplicates are skipped
+    and reported in the response; a reading for a device that does not
+    exist or is inactive fails the whole batch with 404 or 409.
+    """
+    if len(batch_in.readings) > settings.ingest_batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.ingest_batch_max_size} readings",
+        )
+    try:
+        admit_batch(
+            Counter(reading.device_id for reading in batch_in.readings),
+            request.client.host if request.client else None,
+        )
+        with ingest_limiter.slot():
+            result = SensorReadingService.ingest_readings(db, batch_in.readings)
+        logger.info(
+            f"Sensor reading batch: {result['inserted']} inserted, {result['duplicates']} duplicates"
+        )
+        return result
+    except UnknownDevice as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InactiveDevice as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for {e.key}",
+            headers=retry_after_header(e.retry_after),
+        )
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server overloaded, retry later",
+            headers=retry_after_header(e.retry_after),
+        )
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating sensor reading batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error creating sensor reading batch")
+
+
+@router.post("/import", response_model=SensorReadingImportResponse)
+def import_readings_file(
+    file: UploadFile = File(...),
+    fmt: Optional[str] = Query(
+        None, alias="format", pattern="^(csv|parquet)$", description="Defaults to the file extension"
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk import readings from a CSV or Parquet file.
+
+    The file needs ``device_id``, ``sensor_type``, ``value``, ``unit`` and
+    ``timestamp`` columns. Rows are validated and loaded in chunks; rows
+    that fail validation are rejected, and rows already stored are skipped
+    as duplicates. Readings are written directly, bypassing the live
+    ingest path (rate limits, lateness tracking and heartbeats).
+    """
+    fmt = fmt or detect_format(file.filename)
+    try:
+        with ingest_limiter.slot():
+            return import_readings(
+                db,
+                iter_chunks(file.file, fmt, file.filename),
+                max_reported_rejects=settings.import_max_reported_rejects,
+            )
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server overloaded, retry later",
+            headers=retry_after_header(e.retry_after),
+        )
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing sensor readings: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error importing sensor readings")
+
+
 @router.get("", response_model=List[SensorReadingResponse])
 def list_readings(
+    request: Request,
     device_id: Optional[str] = None,
     sensor_type: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
 ):
-    """List sensor readings with optional filtering."""
+    """
+    List sensor readings with optional filtering.
+
+    Send ``Accept: application/x-ndjson`` to stream rows as they are fetched.
+    """
     try:
+        if wants_ndjson(request):
+            return _readings_ndjson(db, device_id, sensor_type, descending=True, skip=skip, limit=limit)
         if device_id:
             readings = SensorReadingService.get_readings_by_device(
                 db, device_id, skip, limit, sensor_type
             )
         else:
-            from sqlalchemy import desc
-            query = db.query(SensorReading)
-            if sensor_type:
-                query = query.filter(SensorReading.sensor_type == sensor_type)
-            readings = query.order_by(desc(SensorReading.timestamp)).offset(skip).limit(limit).all()
+            readings = SensorReadingService.get_readings(db, skip, limit, sensor_type)
         return readings
+    except QueryInterrupted:
+        raise
     except Exception as e:
         logger.error(f"Error listing sensor readings: {str(e)}")
         raise HTTPException(status_code=500, detail="Error listing sensor readings")
 
 
+@router.get("/export")
+def export_readings(
+    device_id: Optional[str] = None,
+    sensor_type: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Stream every matching reading as NDJSON in timestamp order.
+
+    The stream is not limited by ``QUERY_MAX_SCAN_ROWS`` but runs under
+    the route's statement time budget.
+    """
+    return _readings_ndjson(db, device_id, sensor_type, start_time, end_time)
+
+
+@router.post("/resample", response_model=ResampleResponse)
+def resample_readings(request_in: ResampleRequest, db: Session = Depends(get_db)):
+    """Align several series onto one time grid and return a columnar matrix."""
+    cells = ResampleService.grid_size(request_in) * len(request_in.series)
+    if cells > settings.resample_max_cells:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Requested grid has {cells} cells, limit is {settings.resample_max_cells}",
+        )
+    try:
+        return ResampleService.resample(db, request_in)
+    except (ComputeError, QueryInterrupted):
+        raise
+    except Exception as e:
+        logger.error(f"Error resampling readings: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error resampling readings")
+
+
 @router.get("/{reading_id}", response_model=SensorReadingResponse)
 def get_reading(reading_id: int, db: Session = Depends(get_db)):
     """Get a specific sensor reading."""
@@ -72,24 +308,112 @@ def get_latest_reading(
         if not reading:
             raise HTTPException(status_code=404, detail="No readings found")
         return reading
-    except HTTPException:
+    except (HTTPException, QueryInterrupted):
         raise
     except Exception as e:
         logger.error(f"Error getting latest reading: {str(e)}")
         raise HTTPException(status_code=500, detail="Error getting latest reading")
 
 
+@router.get("/device/{device_id}/watermark", response_model=List[SeriesWatermark])
+def get_device_watermark(device_id: str, db: Session = Depends(get_db)):
+    """
+    Lateness watermark and lag of each series of a device.
+
+    Watermarks follow the newest stored reading, so every worker reports
+    the same; reordered and late counts cover readings ingested by the
+    worker serving the request.
+    """
+    return lateness_tracker.device_lag(db, device_id)
+
+
 @router.get("/device/{device_id}/average", response_model=dict)
 def get_average_value(
     device_id: str,
     sensor_type: str = Query(...),
-    hours: int = Query(24, ge=1),
+    hours: int = Query(24, ge=1, le=settings.average_max_hours),
     db: Session = Depends(get_db),
 ):
-    """Get average sensor value for the last N hours."""
+    """
+    Get average sensor value for the last N hours.
+
+    Windows too long to scan are answered from the quantile sketches.
+    """
     try:
         average = SensorReadingService.get_average_value(db, device_id, sensor_type, hours)
         return {"device_id": device_id, "sensor_type": sensor_type, "average": average, "hours": hours}
+    except ScanBudgetExceeded as e:
+        raise HTTPException(status_code=422, detail=f"{str(e)}; use fewer hours")
+    except QueryInterrupted:
+        raise
     except Exception as e:
         logger.error(f"Error calculating average: {str(e)}")
         raise HTTPException(status_code=500, detail="Error calculating average")
+
+
+@router.get("/device/{device_id}/forecast", response_model=ForecastResponse)
+def get_forecast(
+    device_id: str,
+    sensor_type: str = Query(...),
+    unit: Optional[str] = None,
+    hours: Optional[float] = Query(None, gt=0, description="Only the steps within this many hours"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the forecast of a device's sensor type with its confidence band.
+
+    Forecasts are refit for every series by a background cycle every
+    ``FORECAST_INTERVAL_SECONDS``; this reads the stored one.
+    """
+    try:
+        forecast = ForecastService.get_forecast(db, device_id, sensor_type, unit, hours)
+    except QueryInterrupted:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting forecast: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error getting forecast")
+    if forecast is None:
+        raise HTTPException(status_code=404, detail="No forecast for this series yet")
+    return forecast
+
+
+@router.get("/device/{device_id}/range", response_model=List[SensorReadingResponse])
+def get_readings_in_range(
+    request: Request,
+    device_id: str,
+    sensor_type: str = Query(...),
+    start_time: datetime = Query(...),
+    end_time: datetime = Query(...),
+    max_points: Optional[int] = Query(
+        None, ge=3, le=100_000, description="Downsample to at most this many shape-preserving points"
+    ),
+    db: Session = Depends(get_db),
+):
+    """
+    Get readings for a device and sensor type within a time range.
+
+    With ``max_points``, long ranges are reduced server-side with
+    Largest-Triangle-Three-Buckets, which keeps spikes that bucket averages
+    would flatten. Send ``Accept: application/x-ndjson`` to stream rows as
+    they are fetched; streamed ranges are not limited by
+    ``QUERY_MAX_SCAN_ROWS``.
+    """
+    if end_time < start_time:
+        raise HTTPException(status_code=400, detail="end_time must not be before start_time")
+    try:
+        if wants_ndjson(request) and max_points is None:
+            return _readings_ndjson(db, device_id, sensor_type, start_time, end_time)
+        return SensorReadingService.get_readings_in_range(
+            db, device_id, sensor_type, start_time, end_time, max_points
+        )
+    except ScanBudgetExceeded as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{str(e)}; narrow the window, or stream it with Accept: application/x-ndjson "
+            "or from /sensor-readings/export",
+        )
+    except (ComputeError, QueryInterrupted):
+        raise
+    except Exception as e:
+        logger.error(f"Error getting readings in range: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error getting readings in range")
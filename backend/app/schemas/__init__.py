@@ -1,16 +1,73 @@
 """Pydantic schemas for request/response validation."""
 
-from .device import DeviceCreate, DeviceUpdate, DeviceResponse
-from .sensor_reading import SensorReadingCreate, SensorReadingResponse
-from .alert import AlertCreate, AlertResponse, AlertUpdate
+from .device import DeviceCreate, DeviceUpdate, DeviceResponse, DeviceNearResponse, PurgeJobResponse
+from .sensor_reading import (
+    SensorReadingCreate,
+    SensorReadingResponse,
+    SensorReadingBatch,
+    SensorReadingBatchResponse,
+    SensorReadingImportResponse,
+    ImportReject,
+    SeriesWatermark,
+    SeriesKey,
+    ResampleRequest,
+    ResampledSeries,
+    ResampleResponse,
+    ForecastPoint,
+    ForecastResponse,
+)
+from .alert import (
+    AlertCreate,
+    AlertResponse,
+    AlertUpdate,
+    IncidentResponse,
+    IncidentDetailResponse,
+    ThresholdRule,
+    BacktestRequest,
+    BacktestDeviceStats,
+    BacktestRuleResult,
+    BacktestResponse,
+)
+from .analytics import FleetGroupStats, FleetAnalyticsResponse, PercentileValue, PercentilesResponse
+from .dashboard import AlertCounts, DeviceCounts, DashboardSummaryResponse
+from .change import ChangeResponse, ChangeFeedResponse
 
 __all__ = [
     "DeviceCreate",
     "DeviceUpdate",
     "DeviceResponse",
+    "DeviceNearResponse",
+    "PurgeJobResponse",
     "SensorReadingCreate",
     "SensorReadingResponse",
+    "SensorReadingBatch",
+    "SensorReadingBatchResponse",
+    "SensorReadingImportResponse",
+    "ImportReject",
+    "SeriesWatermark",
+    "SeriesKey",
+    "ResampleRequest",
+    "ResampledSeries",
+    "ResampleResponse",
+    "ForecastPoint",
+    "ForecastResponse",
     "AlertCreate",
     "AlertResponse",
     "AlertUpdate",
+    "IncidentResponse",
+    "IncidentDetailResponse",
+    "ThresholdRule",
+    "BacktestRequest",
+    "BacktestDeviceStats",
+    "BacktestRuleResult",
+    "BacktestResponse",
+    "FleetGroupStats",
+    "FleetAnalyticsResponse",
+    "PercentileValue",
+    "PercentilesResponse",
+    "AlertCounts",
+    "DeviceCounts",
+    "DashboardSummaryResponse",
+    "ChangeResponse",
+    "ChangeFeedResponse",
 ]
@@ -1,7 +1,7 @@
 """Pydantic schemas for Alert model."""
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -35,8 +35,86 @@ class AlertResponse(BaseModel):
     threshold_value: Optional[float] = None
     actual_value: Optional[float] = None
     is_resolved: bool
+    occurrence_count: int = 1
+    incident_id: Optional[str] = None
     created_at: datetime
+    last_seen_at: Optional[datetime] = None
     resolved_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+
+class IncidentResponse(BaseModel):
+    """Schema for incident response in API."""
+
+    id: str
+    location: str
+    alert_type: str
+    severity: str
+    alert_count: int
+    is_resolved: bool
+    first_seen_at: datetime
+    last_seen_at: datetime
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class IncidentDetailResponse(IncidentResponse):
+    """Schema for an incident together with its alerts."""
+
+    alerts: List[AlertResponse] = []
+
+
+class ThresholdRule(BaseModel):
+    """Candidate alert rule: a sensor type breaking a threshold for long enough."""
+
+    sensor_type: str = Field(..., min_length=1, max_length=100, description="Type of sensor")
+    comparison: Literal[">", ">=", "<", "<="] = Field(..., description="How readings break the threshold")
+    value: float = Field(..., description="Threshold value")
+    min_duration_seconds: float = Field(
+        0, ge=0, description="Readings must break the threshold this long before an alert fires"
+    )
+
+
+class BacktestRequest(BaseModel):
+    """Schema for replaying threshold rules over past readings."""
+
+    rules: List[ThresholdRule] = Field(..., min_length=1, max_length=20, description="Rules to simulate")
+    days: int = Field(90, ge=1, description="Length of the window in days")
+    end_time: Optional[datetime] = Field(None, description="End of the window, now by default")
+    device_ids: Optional[List[str]] = Field(None, max_length=1000, description="Restrict to these devices")
+    max_devices: int = Field(100, ge=0, le=1000, description="Devices listed per rule, most alerts first")
+
+
+class BacktestDeviceStats(BaseModel):
+    """Simulated alerts of one device under one rule."""
+
+    device_id: str
+    alerts: int
+    total_duration_seconds: float
+    max_duration_seconds: float
+
+
+class BacktestRuleResult(BaseModel):
+    """Simulated alerts of one rule across the selected devices."""
+
+    rule: ThresholdRule
+    alerts: int = Field(..., description="Alerts the rule would have raised")
+    ongoing: int = Field(..., description="Alerts still open at the end of the window")
+    devices_alerted: int
+    total_duration_seconds: float
+    mean_duration_seconds: Optional[float] = None
+    max_duration_seconds: Optional[float] = None
+    devices: List[BacktestDeviceStats]
+
+
+class BacktestResponse(BaseModel):
+    """Outcome of a threshold backtest; no alerts are stored."""
+
+    start_time: datetime
+    end_time: datetime
+    readings_scanned: int
+    rules: List[BacktestRuleResult]
@@ -0,0 +1,49 @@
+"""Pydantic schemas for fleet analytics."""
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class FleetGroupStats(BaseModel):
+    """Aggregate statistics for one group of devices."""
+
+    group: str
+    device_count: int
+    count: int
+    avg: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class FleetAnalyticsResponse(BaseModel):
+    """Schema for fleet-wide grouped aggregates."""
+
+    group_by: str
+    sensor_type: str
+    start_time: datetime
+    end_time: datetime
+    groups: List[FleetGroupStats]
+
+
+class PercentileValue(BaseModel):
+    """One requested quantile and its value."""
+
+    quantile: float
+    value: Optional[float] = None
+
+
+class PercentilesResponse(BaseModel):
+    """Schema for fleet percentiles over a window."""
+
+    sensor_type: str
+    start_time: datetime
+    end_time: datetime
+    count: int
+    avg: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: List[PercentileValue]
+    sketch_buckets: int
+    raw_readings: int
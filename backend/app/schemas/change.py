@@ -0,0 +1,28 @@
+"""Pydantic schemas for the change feed."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ChangeResponse(BaseModel):
+    """Schema for one change feed entry."""
+
+    seq: int
+    entity: str = Field(..., description="device, alert or readings")
+    op: str = Field(..., description="insert, update or delete")
+    entity_id: Optional[str] = Field(None, description="Device or alert ID; the device for readings")
+    data: Optional[Dict[str, Any]] = None
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ChangeFeedResponse(BaseModel):
+    """Schema for a page of the change feed."""
+
+    changes: List[ChangeResponse]
+    next_since: int = Field(..., description="Pass as since to get the following changes")
+    has_more: bool
@@ -0,0 +1,38 @@
+"""Pydantic schemas for the dashboard summary."""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .alert import AlertResponse
+from .device import DeviceResponse
+from .sensor_reading import SensorReadingResponse
+
+
+class DeviceCounts(BaseModel):
+    """Total and active device counts."""
+
+    total: int
+    active: int
+
+
+class AlertCounts(BaseModel):
+    """Alert totals with resolved/unresolved counts per severity."""
+
+    total: int
+    unresolved: int
+    by_severity: Dict[str, Dict[str, int]]
+
+
+class DashboardSummaryResponse(BaseModel):
+    """Schema for everything the dashboard shows on one refresh."""
+
+    generated_at: datetime
+    devices: List[DeviceResponse]
+    device_counts: DeviceCounts
+    alert_counts: AlertCounts
+    recent_alerts: List[AlertResponse]
+    latest_readings: List[SensorReadingResponse]
+    history_device_id: Optional[str] = None
+    history: Dict[str, List[SensorReadingResponse]]
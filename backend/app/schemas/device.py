@@ -14,6 +14,9 @@ class DeviceCreate(BaseModel):
     device_type: str = Field(..., min_length=1, max_length=100, description="Device type/category")
     latitude: Optional[float] = Field(None, description="Geographic latitude")
     longitude: Optional[float] = Field(None, description="Geographic longitude")
+    heartbeat_interval_seconds: Optional[int] = Field(
+        None, gt=0, description="Expected reporting interval in seconds"
+    )
 
 
 class DeviceUpdate(BaseModel):
@@ -25,6 +28,7 @@ class DeviceUpdate(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     is_active: Optional[bool] = None
+    heartbeat_interval_seconds: Optional[int] = Field(None, gt=0)
 
 
 class DeviceResponse(BaseModel):
@@ -37,9 +41,36 @@ class DeviceResponse(BaseModel):
     status: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    geohash: Optional[str] = None
     is_active: bool
+    heartbeat_interval_seconds: Optional[int] = None
+    last_seen_at: Optional[datetime] = None
+    shard: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class DeviceNearResponse(DeviceResponse):
+    """Schema for a device returned by a radius query."""
+
+    distance_km: float
+
+
+class PurgeJobResponse(BaseModel):
+    """Schema for the status of a device delete."""
+
+    id: str
+    device_id: str
+    status: str
+    readings_deleted: int
+    alerts_deleted: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,9 +1,9 @@
 """Pydantic schemas for SensorReading model."""
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class SensorReadingCreate(BaseModel):
@@ -16,6 +16,39 @@ class SensorReadingCreate(BaseModel):
     timestamp: Optional[datetime] = Field(None, description="Measurement timestamp")
 
 
+class SensorReadingBatch(BaseModel):
+    """Schema for ingesting many readings in one request."""
+
+    readings: List[SensorReadingCreate] = Field(..., min_length=1, description="Readings to store")
+
+
+class SensorReadingBatchResponse(BaseModel):
+    """Outcome of a batch ingest."""
+
+    received: int
+    inserted: int
+    duplicates: int
+
+
+class ImportReject(BaseModel):
+    """A row refused by a bulk import."""
+
+    row: int = Field(..., description="1-based data row number in the file")
+    reason: str
+
+
+class SensorReadingImportResponse(BaseModel):
+    """Outcome of a bulk import."""
+
+    rows: int
+    inserted: int
+    duplicates: int
+    rejected: int
+    seconds: float
+    rows_per_second: int
+    rejects: List[ImportReject] = Field(..., description="First rejected rows")
+
+
 class SensorReadingResponse(BaseModel):
     """Schema for sensor reading response in API."""
 
@@ -29,3 +62,79 @@ class SensorReadingResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SeriesWatermark(BaseModel):
+    """Lateness watermark and lag of one series; the counters are the serving worker's."""
+
+    sensor_type: str
+    max_event_time: datetime = Field(..., description="Timestamp of the newest stored reading")
+    watermark: datetime
+    lag_seconds: float = Field(..., description="Seconds since the newest reading's timestamp")
+    watermark_lag_seconds: float = Field(..., description="Seconds the watermark trails now")
+    reordered: int = Field(..., description="Readings that arrived out of order within the window")
+    late: int = Field(..., description="Readings older than the watermark")
+
+
+class SeriesKey(BaseModel):
+    """Identifies one time series by device and sensor type."""
+
+    device_id: str = Field(..., description="Device ID")
+    sensor_type: str = Field(..., min_length=1, max_length=100, description="Type of sensor")
+
+
+class ResampleRequest(BaseModel):
+    """Schema for aligning several series onto a common time grid."""
+
+    series: List[SeriesKey] = Field(..., min_length=1, max_length=100, description="Series to align")
+    start_time: datetime = Field(..., description="Start of the grid (inclusive)")
+    end_time: datetime = Field(..., description="End of the grid (inclusive)")
+    step_seconds: float = Field(..., gt=0, description="Grid step in seconds")
+    fill: Literal["none", "ffill", "linear"] = Field("ffill", description="Gap filling method")
+
+    @model_validator(mode="after")
+    def check_range(self) -> "ResampleRequest":
+        if self.end_time < self.start_time:
+            raise ValueError("end_time must not be before start_time")
+        return self
+
+
+class ResampledSeries(BaseModel):
+    """One column of a resampled matrix."""
+
+    device_id: str
+    sensor_type: str
+    values: List[Optional[float]]
+    observed: List[bool]
+
+
+class ResampleResponse(BaseModel):
+    """Columnar, time-aligned matrix of resampled series."""
+
+    start_time: datetime
+    step_seconds: float
+    fill: str
+    timestamps: List[int] = Field(..., description="Grid timestamps in epoch milliseconds")
+    series: List[ResampledSeries]
+
+
+class ForecastPoint(BaseModel):
+    """Forecast mean of one step and its confidence band."""
+
+    timestamp: datetime = Field(..., description="Start of the step")
+    value: float
+    lower: float
+    upper: float
+
+
+class ForecastResponse(BaseModel):
+    """Latest stored forecast of one series."""
+
+    device_id: str
+    sensor_type: str
+    unit: str
+    model: str = Field(..., description="linear or holt_winters")
+    fitted_at: datetime
+    origin: datetime = Field(..., description="Start of the first forecast step")
+    step_seconds: int
+    points: List[ForecastPoint]
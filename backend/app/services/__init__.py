@@ -3,5 +3,25 @@
 from .device_service import DeviceService
 from .sensor_reading_service import SensorReadingService
 from .alert_service import AlertService
+from .resample_service import ResampleService
+from .analytics_service import AnalyticsService
+from .purge_service import PurgeService
+from .sketch_service import SketchService
+from .dashboard_service import DashboardService
+from .forecast_service import ForecastService
+from .backtest_service import BacktestService
+from .change_feed_service import ChangeFeedService
 
-__all__ = ["DeviceService", "SensorReadingService", "AlertService"]
+__all__ = [
+    "DeviceService",
+    "SensorReadingService",
+    "AlertService",
+    "ResampleService",
+    "AnalyticsService",
+    "PurgeService",
+    "SketchService",
+    "DashboardService",
+    "ForecastService",
+    "BacktestService",
+    "ChangeFeedService",
+]
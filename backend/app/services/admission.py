@@ -0,0 +1,223 @@
+"""Admission control and load shedding for the ingest path."""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Mapping, Optional, Tuple
+
+from ..config import get_settings
+
+settings = get_settings()
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a key has exhausted its token bucket."""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {key}")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """Raised when no ingest slot frees up within the queueing budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Server overloaded")
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    """Per-key token bucket state."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class TokenBucketLimiter:
+    """
+    In-memory token bucket rate limiter keyed by an arbitrary string.
+
+    Buckets are kept in least-recently-used order so idle keys can be
+    evicted from the front in amortized O(1). A bucket idle for longer than
+    ``burst / rate`` seconds is full again, so evicting it loses nothing.
+
+    Attributes:
+        rate: Tokens refilled per second
+        burst: Bucket capacity
+        idle_seconds: Idle time after which a key is forgotten
+        max_keys: Hard cap on tracked keys
+    """
+
+    def __init__(self, rate: float, burst: int, idle_seconds: float = 300.0, max_keys: int = 200_000):
+        self.rate = rate
+        self.burst = burst
+        self.idle_seconds = max(idle_seconds, burst / rate if rate > 0 else 0.0)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the limiter is configured to limit anything."""
+        return self.rate > 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> None:
+        """
+        Take ``cost`` tokens from the bucket for ``key``.
+
+        A cost above ``burst`` is admitted once the bucket is full and
+        leaves it in debt, so a large batch waits for its tokens after
+        the fact instead of never fitting.
+
+        Raises:
+            RateLimitExceeded: If the bucket does not hold enough tokens
+        """
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(float(self.burst), now)
+                self._buckets[key] = bucket
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+                self._buckets.move_to_end(key)
+
+            self._evict(now)
+
+            needed = min(cost, self.burst)
+            if bucket.tokens < needed:
+                retry_after = (needed - bucket.tokens) / self.rate
+                raise RateLimitExceeded(key, retry_after)
+            bucket.tokens -= cost
+
+    def refund(self, key: str, cost: float = 1.0) -> None:
+        """Give back tokens taken by :meth:`acquire` for a request refused elsewhere."""
+        if not self.enabled:
+            return
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.tokens = min(self.burst, bucket.tokens + cost)
+
+    def _evict(self, now: float) -> None:
+        """Drop idle keys from the LRU front. Caller must hold the lock."""
+        buckets = self._buckets
+        while buckets:
+            key, oldest = next(iter(buckets.items()))
+            if len(buckets) <= self.max_keys and now - oldest.updated < self.idle_seconds:
+                break
+            del buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """
+    Global cap on in-flight ingest requests.
+
+    Sized to the database pool so requests queue here, with a bounded wait,
+    instead of piling up inside the pool until they time out.
+    """
+
+    def __init__(self, max_concurrency: int, wait_budget: float):
+        self.max_concurrency = max_concurrency
+        self.wait_budget = wait_budget
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Hold one ingest slot for the duration of the block.
+
+        Raises:
+            Overloaded: If no slot frees up within ``wait_budget`` seconds
+        """
+        if not self._semaphore.acquire(timeout=self.wait_budget):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(retry_after=max(1.0, self.wait_budget))
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+
+def retry_after_header(seconds: float) -> dict:
+    """Build a ``Retry-After`` header in whole seconds."""
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+device_limiter = TokenBucketLimiter(
+    rate=settings.device_rate_limit_per_second,
+    burst=settings.device_rate_limit_burst,
+    idle_seconds=settings.rate_limit_idle_seconds,
+)
+
+ip_limiter = TokenBucketLimiter(
+    rate=settings.ip_rate_limit_per_second,
+    burst=settings.ip_rate_limit_burst,
+    idle_seconds=settings.rate_limit_idle_seconds,
+)
+
+ingest_limiter = ConcurrencyLimiter(
+    max_concurrency=settings.ingest_max_concurrency,
+    wait_budget=settings.ingest_queue_timeout,
+)
+
+
+def _acquire_all(charges: List[Tuple[TokenBucketLimiter, str, float]]) -> None:
+    """Take every ``(limiter, key, cost)`` charge, or none: taken ones are refunded on refusal."""
+    taken = []
+    try:
+        for limiter, key, cost in charges:
+            limiter.acquire(key, cost)
+            taken.append((limiter, key, cost))
+    except RateLimitExceeded:
+        for limiter, key, cost in taken:
+            limiter.refund(key, cost)
+        raise
+
+
+def admit_ingest(device_id: str, client_ip: Optional[str] = None, cost: float = 1.0) -> None:
+    """
+    Apply per-device and per-client rate limits to an ingest request.
+
+    Tokens are only spent if both buckets admit the request.
+
+    Raises:
+        RateLimitExceeded: If either bucket is exhausted
+    """
+    admit_batch({device_id: cost}, client_ip)
+
+
+def admit_batch(device_costs: Mapping[str, float], client_ip: Optional[str] = None) -> None:
+    """
+    Charge the client for every reading of a batch and each device for its own.
+
+    Tokens are only spent if every bucket admits the batch.
+
+    Raises:
+        RateLimitExceeded: If any bucket is exhausted
+    """
+    charges = [(device_limiter, device_id, cost) for device_id, cost in device_costs.items()]
+    if client_ip:
+        charges.insert(0, (ip_limiter, client_ip, sum(device_costs.values())))
+    _acquire_all(charges)
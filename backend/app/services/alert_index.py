@@ -0,0 +1,130 @@
+"""In-memory index of open alerts and incidents used for deduplication."""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import Alert, Device, Incident
+
+settings = get_settings()
+
+SEVERITY_RANK = {"LOW": 0, "MEDIUM": 1, "HIGH": 2, "CRITICAL": 3}
+
+_LOCK_STRIPES = 64
+
+
+class OpenAlertIndex:
+    """
+    Maps dedup keys to the IDs of open alerts and incidents.
+
+    ``(device_id, alert_type)`` resolves to the open alert that repeats
+    should be folded into, and ``(location, alert_type)`` to the incident
+    that new alerts correlate with while it is inside the correlation
+    window. Entries are hints: callers load the row by primary key and
+    fall back to inserting when it has been resolved or deleted elsewhere.
+
+    Striped locks serialize creates per key so concurrent repeats of the
+    same alert cannot both miss and insert twice.
+    """
+
+    def __init__(self, incident_window_seconds: float = 300.0):
+        self.incident_window = timedelta(seconds=incident_window_seconds)
+        self._alerts: Dict[Tuple[str, str], str] = {}
+        self._incidents: Dict[Tuple[str, str], Tuple[str, datetime]] = {}
+        self._locations: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._alert_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._incident_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    def alert_lock(self, device_id: str, alert_type: str) -> threading.Lock:
+        """Lock guarding creates for one alert key."""
+        return self._alert_locks[hash((device_id, alert_type)) % _LOCK_STRIPES]
+
+    def incident_lock(self, location: str, alert_type: str) -> threading.Lock:
+        """Lock guarding correlation for one incident key."""
+        return self._incident_locks[hash((location, alert_type)) % _LOCK_STRIPES]
+
+    def load(self, db: Session) -> None:
+        """Rebuild the index from open alerts and recent open incidents."""
+        alerts = db.execute(
+            select(Alert.device_id, Alert.alert_type, Alert.id)
+            .where(Alert.is_resolved == False)
+            .order_by(Alert.created_at.asc())
+        ).all()
+        cutoff = datetime.utcnow() - self.incident_window
+        incidents = db.execute(
+            select(Incident.location, Incident.alert_type, Incident.id, Incident.last_seen_at)
+            .where(Incident.is_resolved == False, Incident.last_seen_at >= cutoff)
+            .order_by(Incident.last_seen_at.asc())
+        ).all()
+        with self._lock:
+            self._alerts = {(device_id, alert_type): alert_id for device_id, alert_type, alert_id in alerts}
+            self._incidents = {
+                (location, alert_type): (incident_id, last_seen)
+                for location, alert_type, incident_id, last_seen in incidents
+            }
+            self._locations.clear()
+
+    def get_alert(self, device_id: str, alert_type: str) -> Optional[str]:
+        """ID of the open alert for a key, if any."""
+        return self._alerts.get((device_id, alert_type))
+
+    def add_alert(self, device_id: str, alert_type: str, alert_id: str) -> None:
+        """Record an open alert."""
+        with self._lock:
+            self._alerts[(device_id, alert_type)] = alert_id
+
+    def discard_alert(self, device_id: str, alert_type: str, alert_id: Optional[str] = None) -> None:
+        """Forget the open alert for a key, optionally only if it matches ``alert_id``."""
+        key = (device_id, alert_type)
+        with self._lock:
+            if alert_id is None or self._alerts.get(key) == alert_id:
+                self._alerts.pop(key, None)
+
+    def get_incident(self, location: str, alert_type: str, now: datetime) -> Optional[str]:
+        """ID of the incident a new alert should join, if one is inside the window."""
+        entry = self._incidents.get((location, alert_type))
+        if entry is None or now - entry[1] > self.incident_window:
+            return None
+        return entry[0]
+
+    def touch_incident(self, location: str, alert_type: str, incident_id: str, now: datetime) -> None:
+        """Record activity on an incident, extending its correlation window."""
+        with self._lock:
+            self._incidents[(location, alert_type)] = (incident_id, now)
+
+    def discard_incident(self, incident_id: str) -> None:
+        """Forget a resolved incident."""
+        with self._lock:
+            for key, (known_id, _) in list(self._incidents.items()):
+                if known_id == incident_id:
+                    del self._incidents[key]
+
+    def location_of(self, db: Session, device_id: str) -> Optional[str]:
+        """Location of a device, cached after the first lookup."""
+        location = self._locations.get(device_id)
+        if location is None:
+            location = db.execute(select(Device.location).where(Device.id == device_id)).scalar()
+            if location is not None:
+                with self._lock:
+                    self._locations[device_id] = location
+        return location
+
+    def invalidate_location(self, device_id: str) -> None:
+        """Drop the cached location of a device that moved."""
+        with self._lock:
+            self._locations.pop(device_id, None)
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop all cached state for a deleted device."""
+        with self._lock:
+            self._locations.pop(device_id, None)
+            for key in [key for key in self._alerts if key[0] == device_id]:
+                del self._alerts[key]
+
+
+alert_index = OpenAlertIndex(incident_window_seconds=settings.alert_incident_window_seconds)
@@ -4,10 +4,46 @@ import uuid
 from datetime import datetime
 from typing import Optional, List
 
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from ..models import Alert
+from ..config import get_settings
+from ..models import Alert, Incident
 from ..schemas import AlertCreate, AlertUpdate
+from .alert_index import SEVERITY_RANK, alert_index
+from .change_feed_service import ChangeFeedService
+from .shard_map import UnknownDevice
+
+settings = get_settings()
+
+# Unique index on the key of open alerts; see ``Alert``.
+OPEN_KEY_INDEX = "uq_alert_open_key"
+
+# Inserts retried when the open alert they clashed with was resolved meanwhile.
+MAX_OPEN_KEY_RETRIES = 3
+
+
+class AlertAlreadyOpen(Exception):
+    """An alert cannot be reopened while another one with its key is open."""
+
+    def __init__(self, alert_id: str):
+        super().__init__(f"Another alert with the device and type of {alert_id} is open")
+        self.alert_id = alert_id
+
+
+def _open_key_clash(error: IntegrityError) -> bool:
+    """Whether a write failed on the open-alert key rather than on another constraint."""
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+    if constraint is not None:
+        return constraint == OPEN_KEY_INDEX
+    # SQLite names the columns instead of the index.
+    message = str(error.orig)
+    return OPEN_KEY_INDEX in message or "alerts.device_id, alerts.alert_type" in message
+
+
+def _max_severity(current: str, new: str) -> str:
+    return new if SEVERITY_RANK.get(new, 0) > SEVERITY_RANK.get(current, 0) else current
 
 
 class AlertService:
@@ -15,26 +51,207 @@ class AlertService:
 
     @staticmethod
     def create_alert(db: Session, alert_in: AlertCreate) -> Alert:
-        """Create a new alert."""
-        alert = Alert(
-            id=str(uuid.uuid4()),
-            device_id=alert_in.device_id,
-            alert_type=alert_in.alert_type,
-            severity=alert_in.severity,
-            message=alert_in.message,
-            threshold_value=alert_in.threshold_value,
-            actual_value=alert_in.actual_value,
+        """
+        Create a new alert, or fold a repeat into the open one.
+
+        While an alert with the same ``(device_id, alert_type)`` is open, a
+        repeat increments its occurrence count and refreshes its last-seen
+        time and values instead of inserting a row. The open alert is found
+        through the in-memory index; one opened by another worker is found
+        when the insert hits the unique index on open keys. New alerts are attached
+        to an incident shared with same-type alerts from devices in the same
+        location within the correlation window.
+
+        Args:
+            db: Database session
+            alert_in: Alert creation data
+
+        Returns:
+            Alert: The created or updated alert
+
+        Raises:
+            UnknownDevice: If there is no such device
+        """
+        now = datetime.utcnow()
+        with alert_index.alert_lock(alert_in.device_id, alert_in.alert_type):
+            if settings.alert_dedup_enabled:
+                alert = AlertService._record_repeat(db, alert_in, now)
+                if alert is not None:
+                    return alert
+            if alert_index.location_of(db, alert_in.device_id) is None:
+                raise UnknownDevice(alert_in.device_id)
+
+            retries = 0
+            while True:
+                try:
+                    with db.begin_nested():
+                        incident = AlertService._correlate(db, alert_in, now)
+                        alert = Alert(
+                            id=str(uuid.uuid4()),
+                            device_id=alert_in.device_id,
+                            alert_type=alert_in.alert_type,
+                            severity=alert_in.severity,
+                            message=alert_in.message,
+                            threshold_value=alert_in.threshold_value,
+                            actual_value=alert_in.actual_value,
+                            incident_id=incident.id if incident else None,
+                            created_at=now,
+                            last_seen_at=now,
+                        )
+                        db.add(alert)
+                        db.flush()
+                    break
+                except IntegrityError as e:
+                    # Opened through another worker, which this process's index
+                    # does not see: the open-alert key is unique in the database.
+                    if not _open_key_clash(e) or retries == MAX_OPEN_KEY_RETRIES:
+                        raise
+                    retries += 1
+                    open_alert = db.execute(
+                        select(Alert).where(
+                            Alert.device_id == alert_in.device_id,
+                            Alert.alert_type == alert_in.alert_type,
+                            Alert.is_resolved == False,
+                        )
+                    ).scalar()
+                    if open_alert is not None:
+                        alert_index.add_alert(open_alert.device_id, open_alert.alert_type, open_alert.id)
+                        return AlertService._fold(db, open_alert, alert_in, now)
+
+            ChangeFeedService.record_insert(db, "alert", alert)
+            db.commit()
+            db.refresh(alert)
+            alert_index.add_alert(alert.device_id, alert.alert_type, alert.id)
+            return alert
+
+    @staticmethod
+    def _record_repeat(db: Session, alert_in: AlertCreate, now: datetime) -> Optional[Alert]:
+        """Fold ``alert_in`` into the open alert the index knows for its key, if there is one."""
+        alert_id = alert_index.get_alert(alert_in.device_id, alert_in.alert_type)
+        if alert_id is None:
+            return None
+
+        alert = db.get(Alert, alert_id)
+        if alert is None or alert.is_resolved:
+            alert_index.discard_alert(alert_in.device_id, alert_in.alert_type, alert_id)
+            return None
+        return AlertService._fold(db, alert, alert_in, now)
+
+    @staticmethod
+    def _fold(db: Session, alert: Alert, alert_in: AlertCreate, now: datetime) -> Alert:
+        """Record ``alert_in`` as a repeat of the open ``alert``."""
+        alert.occurrence_count = Alert.occurrence_count + 1
+        alert.last_seen_at = now
+        alert.message = alert_in.message
+        alert.severity = _max_severity(alert.severity, alert_in.severity)
+        if alert_in.actual_value is not None:
+            alert.actual_value = alert_in.actual_value
+        if alert_in.threshold_value is not None:
+            alert.threshold_value = alert_in.threshold_value
+        if alert.incident_id:
+            incident = db.get(Incident, alert.incident_id)
+            if incident is not None:
+                incident.last_seen_at = now
+                incident.severity = _max_severity(incident.severity, alert.severity)
+        db.flush()
+        ChangeFeedService.record(
+            db,
+            "alert",
+            "update",
+            alert.id,
+            {
+                "occurrence_count": alert.occurrence_count,
+                "last_seen_at": alert.last_seen_at,
+                "message": alert.message,
+                "severity": alert.severity,
+                "actual_value": alert.actual_value,
+                "threshold_value": alert.threshold_value,
+            },
         )
-        db.add(alert)
         db.commit()
         db.refresh(alert)
         return alert
 
+    @staticmethod
+    def _correlate(db: Session, alert_in: AlertCreate, now: datetime) -> Optional[Incident]:
+        """Attach a new alert to an open incident for its location, or open one."""
+        location = alert_index.location_of(db, alert_in.device_id)
+        if location is None:
+            return None
+
+        with alert_index.incident_lock(location, alert_in.alert_type):
+            incident_id = alert_index.get_incident(location, alert_in.alert_type, now)
+            incident = db.get(Incident, incident_id) if incident_id else None
+            if incident is not None and not incident.is_resolved:
+                incident.alert_count = Incident.alert_count + 1
+                incident.last_seen_at = now
+                incident.severity = _max_severity(incident.severity, alert_in.severity)
+            else:
+                incident = Incident(
+                    id=str(uuid.uuid4()),
+                    location=location,
+                    alert_type=alert_in.alert_type,
+                    severity=alert_in.severity,
+                    alert_count=1,
+                    first_seen_at=now,
+                    last_seen_at=now,
+                )
+                db.add(incident)
+            db.flush()
+            alert_index.touch_incident(location, alert_in.alert_type, incident.id, now)
+            return incident
+
     @staticmethod
     def get_alert(db: Session, alert_id: str) -> Optional[Alert]:
         """Get an alert by ID."""
         return db.query(Alert).filter(Alert.id == alert_id).first()
 
+    @staticmethod
+    def get_alerts(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        device_id: Optional[str] = None,
+        is_resolved: Optional[bool] = None,
+        severity: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> List[Alert]:
+        """
+        Get alerts across the fleet with optional filtering, newest first.
+
+        Args:
+            db: Database session
+            skip: Number of records to skip
+            limit: Maximum number of records to return
+            device_id: Filter by device
+            is_resolved: Filter by resolution state
+            severity: Filter by severity level
+            alert_type: Filter by alert type
+            start_time: Only alerts created at or after this time
+            end_time: Only alerts created at or before this time
+
+        Returns:
+            List[Alert]: List of matching alerts
+        """
+        query = db.query(Alert)
+
+        if device_id:
+            query = query.filter(Alert.device_id == device_id)
+        if is_resolved is not None:
+            query = query.filter(Alert.is_resolved == is_resolved)
+        if severity:
+            query = query.filter(Alert.severity == severity)
+        if alert_type:
+            query = query.filter(Alert.alert_type == alert_type)
+        if start_time:
+            query = query.filter(Alert.created_at >= start_time)
+        if end_time:
+            query = query.filter(Alert.created_at <= end_time)
+
+        return query.order_by(Alert.created_at.desc()).offset(skip).limit(limit).all()
+
     @staticmethod
     def get_alerts_by_device(
         db: Session,
@@ -65,7 +282,12 @@ class AlertService:
 
     @staticmethod
     def update_alert(db: Session, alert_id: str, alert_in: AlertUpdate) -> Optional[Alert]:
-        """Update an alert."""
+        """
+        Update an alert.
+
+        Raises:
+            AlertAlreadyOpen: If reopening it while another alert with its key is open
+        """
         alert = AlertService.get_alert(db, alert_id)
         if not alert:
             return None
@@ -78,8 +300,19 @@ class AlertService:
             setattr(alert, field, value)
 
         db.add(alert)
-        db.commit()
+        ChangeFeedService.record(db, "alert", "update", alert.id, update_data)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if not _open_key_clash(e):
+                raise
+            raise AlertAlreadyOpen(alert_id)
         db.refresh(alert)
+        if alert.is_resolved:
+            alert_index.discard_alert(alert.device_id, alert.alert_type, alert.id)
+        else:
+            alert_index.add_alert(alert.device_id, alert.alert_type, alert.id)
         return alert
 
     @staticmethod
@@ -92,8 +325,12 @@ class AlertService:
         alert.is_resolved = True
         alert.resolved_at = datetime.utcnow()
         db.add(alert)
+        ChangeFeedService.record(
+            db, "alert", "update", alert.id, {"is_resolved": True, "resolved_at": alert.resolved_at}
+        )
         db.commit()
         db.refresh(alert)
+        alert_index.discard_alert(alert.device_id, alert.alert_type, alert.id)
         return alert
 
     @staticmethod
@@ -104,7 +341,9 @@ class AlertService:
             return False
 
         db.delete(alert)
+        ChangeFeedService.record(db, "alert", "delete", alert.id)
         db.commit()
+        alert_index.discard_alert(alert.device_id, alert.alert_type, alert.id)
         return True
 
     @staticmethod
@@ -114,3 +353,81 @@ class AlertService:
         if is_resolved is not None:
             query = query.filter(Alert.is_resolved == is_resolved)
         return query.count()
+
+    @staticmethod
+    def get_alert_summary(db: Session, device_id: Optional[str] = None) -> dict:
+        """
+        Get alert counts by severity and resolution state in one grouped query.
+
+        Returns:
+            dict: Totals plus ``by_severity`` mapping each severity to its
+            resolved and unresolved counts
+        """
+        query = db.query(Alert.severity, Alert.is_resolved, func.count(Alert.id))
+        if device_id:
+            query = query.filter(Alert.device_id == device_id)
+
+        by_severity = {
+            severity: {"resolved": 0, "unresolved": 0}
+            for severity in ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+        }
+        total = unresolved = 0
+        for severity, is_resolved, count in query.group_by(Alert.severity, Alert.is_resolved):
+            bucket = by_severity.setdefault(severity, {"resolved": 0, "unresolved": 0})
+            bucket["resolved" if is_resolved else "unresolved"] += count
+            total += count
+            if not is_resolved:
+                unresolved += count
+
+        return {"total": total, "unresolved": unresolved, "by_severity": by_severity}
+
+    @staticmethod
+    def get_incident(db: Session, incident_id: str) -> Optional[Incident]:
+        """Get an incident by ID."""
+        return db.query(Incident).filter(Incident.id == incident_id).first()
+
+    @staticmethod
+    def get_incidents(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        is_resolved: Optional[bool] = None,
+    ) -> List[Incident]:
+        """Get incidents, most recently active first."""
+        query = db.query(Incident)
+        if is_resolved is not None:
+            query = query.filter(Incident.is_resolved == is_resolved)
+        return query.order_by(Incident.last_seen_at.desc()).offset(skip).limit(limit).all()
+
+    @staticmethod
+    def resolve_incident(db: Session, incident_id: str) -> Optional[Incident]:
+        """Mark an incident and all of its open alerts as resolved."""
+        incident = AlertService.get_incident(db, incident_id)
+        if not incident:
+            return None
+
+        now = datetime.utcnow()
+        open_alerts = (
+            db.query(Alert.id, Alert.device_id, Alert.alert_type)
+            .filter(Alert.incident_id == incident_id, Alert.is_resolved == False)
+            .all()
+        )
+        db.query(Alert).filter(Alert.incident_id == incident_id, Alert.is_resolved == False).update(
+            {Alert.is_resolved: True, Alert.resolved_at: now}, synchronize_session=False
+        )
+        incident.is_resolved = True
+        incident.resolved_at = now
+        db.add(incident)
+        ChangeFeedService.record_many(
+            db,
+            "alert",
+            "update",
+            ((alert_id, {"is_resolved": True, "resolved_at": now}) for alert_id, _, _ in open_alerts),
+        )
+        db.commit()
+        db.refresh(incident)
+
+        for alert_id, device_id, alert_type in open_alerts:
+            alert_index.discard_alert(device_id, alert_type, alert_id)
+        alert_index.discard_incident(incident_id)
+        return incident
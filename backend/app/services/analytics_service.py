@@ -0,0 +1,127 @@
+"""Service layer for fleet-wide analytics."""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import Session
+
+from ..models import Device, SensorReading, Series
+from .shard_map import shard_map
+
+# Device columns that fleet aggregates may be grouped by.
+GROUP_COLUMNS = {
+    "location": Device.location,
+    "device_type": Device.device_type,
+}
+
+
+class AnalyticsService:
+    """Business logic for cross-device analytics."""
+
+    @staticmethod
+    def fleet_aggregates(
+        db: Session,
+        group_by: str,
+        sensor_type: str,
+        start_time: datetime,
+        end_time: Optional[datetime] = None,
+    ) -> List[dict]:
+        """
+        Compute count/avg/min/max per device group in one joined query.
+
+        With several shards, readings are aggregated per device on every
+        shard in parallel and the partials are merged into groups using
+        the devices on the primary.
+
+        Args:
+            db: Database session
+            group_by: Key of :data:`GROUP_COLUMNS`
+            sensor_type: Sensor type to aggregate
+            start_time: Start of the window (inclusive)
+            end_time: End of the window (inclusive), open-ended if omitted
+
+        Returns:
+            List[dict]: One row per group, ordered by group name
+        """
+        group_column = GROUP_COLUMNS[group_by]
+        if shard_map.sharded:
+            return AnalyticsService._scattered_aggregates(db, group_column, sensor_type, start_time, end_time)
+        statement = (
+            select(
+                group_column.label("group"),
+                func.count(distinct(Series.device_id)).label("device_count"),
+                func.count(SensorReading.id).label("count"),
+                func.avg(SensorReading.value).label("avg"),
+                func.min(SensorReading.value).label("min"),
+                func.max(SensorReading.value).label("max"),
+            )
+            .select_from(SensorReading)
+            .join(Series, Series.id == SensorReading.series_id)
+            .join(Device, Device.id == Series.device_id)
+            .where(
+                Series.sensor_type == sensor_type,
+                SensorReading.timestamp >= start_time,
+            )
+            .group_by(group_column)
+            .order_by(group_column)
+        )
+        if end_time is not None:
+            statement = statement.where(SensorReading.timestamp <= end_time)
+
+        return [dict(row) for row in db.execute(statement).mappings()]
+
+    @staticmethod
+    def _scattered_aggregates(
+        db: Session,
+        group_column,
+        sensor_type: str,
+        start_time: datetime,
+        end_time: Optional[datetime],
+    ) -> List[dict]:
+        """:meth:`fleet_aggregates` from per-device partials gathered across shards."""
+        statement = (
+            select(
+                Series.device_id,
+                func.count(SensorReading.id),
+                func.sum(SensorReading.value),
+                func.min(SensorReading.value),
+                func.max(SensorReading.value),
+            )
+            .select_from(SensorReading)
+            .join(Series, Series.id == SensorReading.series_id)
+            .where(
+                Series.sensor_type == sensor_type,
+                SensorReading.timestamp >= start_time,
+            )
+            .group_by(Series.device_id)
+        )
+        if end_time is not None:
+            statement = statement.where(SensorReading.timestamp <= end_time)
+        partials = shard_map.scatter(db, lambda shard, shard_db: shard_db.execute(statement).all())
+
+        device_ids = {row[0] for rows in partials for row in rows}
+        groups = dict(db.execute(select(Device.id, group_column).where(Device.id.in_(device_ids))).all())
+        merged = defaultdict(lambda: {"devices": set(), "count": 0, "total": 0.0, "min": None, "max": None})
+        for rows in partials:
+            for device_id, count, total, low, high in rows:
+                if device_id not in groups:
+                    continue
+                group = merged[groups[device_id]]
+                group["devices"].add(device_id)
+                group["count"] += count
+                group["total"] += total
+                group["min"] = low if group["min"] is None else min(group["min"], low)
+                group["max"] = high if group["max"] is None else max(group["max"], high)
+        return [
+            {
+                "group": name,
+                "device_count": len(group["devices"]),
+                "count": group["count"],
+                "avg": group["total"] / group["count"],
+                "min": group["min"],
+                "max": group["max"],
+            }
+            for name, group in sorted(merged.items(), key=lambda item: (item[0] is None, item[0]))
+        ]
@@ -0,0 +1,293 @@
+"""Replay of candidate threshold rules over stored readings."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import SensorReading, Series
+from ..query_budget import inherit
+from ..schemas import BacktestRequest, ThresholdRule
+from .chunk_codec import to_micros
+from .compute_pool import compute_pool
+from .ingest_dedup import normalize_timestamp
+from .shard_map import Shard, shard_map
+
+settings = get_settings()
+
+COMPARISONS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+
+def detect_runs(
+    series: np.ndarray,
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    series_keys: np.ndarray,
+    series_types: np.ndarray,
+    rules: List[Tuple[int, str, float]],
+) -> list:
+    """
+    Runs of consecutive readings breaking each rule, within one chunk.
+
+    Rows are sorted by series, then timestamp. Each rule is
+    ``(sensor type code, comparison, value)``; ``series_types`` gives the
+    code of every series in ``series_keys`` (sorted). A run ends at the
+    first reading back within the threshold; a run still open at the end
+    of the chunk ends at its last reading and is flagged, as is a run
+    starting at a series' first reading in the chunk, so the caller can
+    join runs across chunks.
+
+    Returns:
+        list: Per rule, a tuple of the runs' series, start, last breaking
+        reading and end (µs), the open-start and open-end flags, and each
+        series' first timestamp and whether that reading breaks the rule
+    """
+    types = series_types[np.searchsorted(series_keys, series)]
+    results = []
+    for type_code, comparison, threshold in rules:
+        rows = np.flatnonzero(types == type_code)
+        s, t = series[rows], timestamps[rows]
+        breaking = COMPARISONS[comparison](values[rows], threshold)
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = s[1:] != s[:-1]
+        last = np.ones(len(rows), dtype=bool)
+        last[:-1] = first[1:]
+
+        starts = breaking & (first | ~np.roll(breaking, 1))
+        ends = breaking & (last | ~np.roll(breaking, -1))
+        start_rows, end_rows = np.flatnonzero(starts), np.flatnonzero(ends)
+        open_end = last[end_rows]
+        # A closed run lasts until the reading that brought the value back.
+        recovered = np.where(open_end, end_rows, np.minimum(end_rows + 1, len(rows) - 1))
+        results.append(
+            (
+                s[start_rows],
+                t[start_rows],
+                t[end_rows],
+                t[recovered],
+                first[start_rows],
+                open_end,
+                s[first],
+                t[first],
+                breaking[first],
+            )
+        )
+    return results
+
+
+class _RunJoiner:
+    """Joins one rule's runs across the time-ordered chunks of a shard."""
+
+    def __init__(self):
+        # Series -> (start, last breaking reading) of a run open at the last chunk's end.
+        self.open: Dict[int, Tuple[int, int]] = {}
+        self.series: List[np.ndarray] = []
+        self.starts: List[np.ndarray] = []
+        self.lasts: List[np.ndarray] = []
+        self.ends: List[np.ndarray] = []
+
+    def add(self, chunk: tuple) -> None:
+        series, starts, lasts, ends, open_start, open_end, first_series, first_ts, first_breaking = chunk
+        starts = starts.copy()
+        if self.open:
+            continuing = {s: i for s, i in zip(series[open_start].tolist(), np.flatnonzero(open_start).tolist())}
+            closed = []
+            for s, timestamp, breaking in zip(first_series.tolist(), first_ts.tolist(), first_breaking.tolist()):
+                if s not in self.open:
+                    continue
+                start, last = self.open.pop(s)
+                if breaking:
+                    starts[continuing[s]] = start
+                else:
+                    closed.append((s, start, last, timestamp))
+            if closed:
+                self._keep(*(np.array(column, dtype=np.int64) for column in zip(*closed)))
+        done = ~open_end
+        self._keep(series[done], starts[done], lasts[done], ends[done])
+        for s, start, last in zip(series[open_end].tolist(), starts[open_end].tolist(), lasts[open_end].tolist()):
+            self.open[s] = (start, last)
+
+    def _keep(self, series, starts, lasts, ends) -> None:
+        self.series.append(series)
+        self.starts.append(starts)
+        self.lasts.append(lasts)
+        self.ends.append(ends)
+
+    def finish(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Every run as series, start, last breaking reading and end, and whether it is still ongoing."""
+        ongoing = np.zeros(sum(len(part) for part in self.series) + len(self.open), dtype=bool)
+        ongoing[len(ongoing) - len(self.open) :] = True
+        if self.open:
+            open_series = np.array(list(self.open), dtype=np.int64)
+            open_runs = np.array(list(self.open.values()), dtype=np.int64).reshape(-1, 2)
+            self._keep(open_series, open_runs[:, 0], open_runs[:, 1], open_runs[:, 1])
+            self.open = {}
+        if not self.series:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, empty, ongoing
+        return (
+            np.concatenate(self.series),
+            np.concatenate(self.starts),
+            np.concatenate(self.lasts),
+            np.concatenate(self.ends),
+            ongoing,
+        )
+
+
+class BacktestService:
+    """
+    How often candidate threshold rules would have fired in the past.
+
+    The window is cut into ``ALERT_BACKTEST_CHUNK_HOURS`` chunks per shard.
+    Chunks are read concurrently and their runs of breaking readings
+    detected with vectorized comparisons in the compute pool; runs are
+    then joined across chunk boundaries. A run fires an alert when its
+    readings break the rule for at least ``min_duration_seconds``, from
+    the first breaking reading to the last. Nothing is written.
+    """
+
+    @staticmethod
+    def _read_chunk(
+        db: Session, shard: Shard, series_ids, start: datetime, end: datetime
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Series, timestamps (µs) and values of a chunk, on a session of its own under ``db``'s budget."""
+        shard_db = shard.session_factory()
+        inherit(db, shard_db)
+        try:
+            rows = shard_db.execute(
+                select(SensorReading.series_id, SensorReading.timestamp, SensorReading.value)
+                .where(
+                    SensorReading.series_id.in_(series_ids),
+                    SensorReading.timestamp >= start,
+                    SensorReading.timestamp < end,
+                )
+                .order_by(SensorReading.series_id.asc(), SensorReading.timestamp.asc())
+            ).all()
+        finally:
+            shard_db.close()
+        return (
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((to_micros(row[1]) for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)),
+        )
+
+    @staticmethod
+    def _run_shard(
+        db: Session,
+        shard: Shard,
+        rules: Sequence[ThresholdRule],
+        device_ids: Optional[Sequence[str]],
+        start: datetime,
+        end: datetime,
+    ) -> Tuple[List[tuple], Dict[int, str], int]:
+        """Joined runs of every rule on one shard, the shard's series owners and readings read."""
+        sensor_types = sorted({rule.sensor_type for rule in rules})
+        series_ids = select(Series.id).where(Series.sensor_type.in_(sensor_types))
+        if device_ids:
+            series_ids = series_ids.where(Series.device_id.in_(device_ids))
+        with shard.session(db) as shard_db:
+            catalog = shard_db.execute(
+                select(Series.id, Series.device_id, Series.sensor_type).where(Series.id.in_(series_ids))
+            ).all()
+        if not catalog:
+            return [], {}, 0
+        catalog.sort()
+        series_keys = np.array([row[0] for row in catalog], dtype=np.int64)
+        series_types = np.array([sensor_types.index(row[2]) for row in catalog], dtype=np.int64)
+        coded = [(sensor_types.index(rule.sensor_type), rule.comparison, rule.value) for rule in rules]
+
+        step = timedelta(hours=settings.alert_backtest_chunk_hours)
+        bounds = []
+        chunk_start = start
+        while chunk_start < end:
+            bounds.append((chunk_start, min(chunk_start + step, end)))
+            chunk_start += step
+
+        def scan(bound: Tuple[datetime, datetime]):
+            series, timestamps, values = BacktestService._read_chunk(db, shard, series_ids, *bound)
+            if not len(series):
+                return 0, None
+            runs = compute_pool.run(detect_runs, series, timestamps, values, series_keys, series_types, coded)
+            return len(series), runs
+
+        joiners = [_RunJoiner() for _ in rules]
+        scanned = 0
+        with ThreadPoolExecutor(max_workers=max(compute_pool.workers, 1)) as executor:
+            for count, chunk_runs in executor.map(scan, bounds):
+                scanned += count
+                if chunk_runs is None:
+                    continue
+                for joiner, runs in zip(joiners, chunk_runs):
+                    joiner.add(runs)
+        owners = {series_id: device_id for series_id, device_id, _ in catalog}
+        return [joiner.finish() for joiner in joiners], owners, scanned
+
+    @staticmethod
+    def backtest(db: Session, request: BacktestRequest) -> dict:
+        """
+        Simulate ``request.rules`` over the requested window.
+
+        Returns:
+            dict: The window, readings scanned and, per rule, alert counts,
+            durations and the devices with the most alerts
+        """
+        end = normalize_timestamp(request.end_time) if request.end_time else datetime.utcnow()
+        start = end - timedelta(days=request.days)
+        names = list(shard_map.group(request.device_ids)) if request.device_ids else list(shard_map.shards)
+        # Shards are scanned one after another; each one's chunks already use every compute worker.
+        shard_results = [
+            BacktestService._run_shard(db, shard_map.shards[name], request.rules, request.device_ids, start, end)
+            for name in names
+        ]
+
+        results = []
+        for i, rule in enumerate(request.rules):
+            min_duration = int(rule.min_duration_seconds * 1_000_000)
+            devices: Dict[str, List[float]] = {}
+            alerts, ongoing, durations = 0, 0, []
+            for runs, owners, _ in shard_results:
+                if not runs:
+                    continue
+                series, starts, lasts, ends, still_open = runs[i]
+                fired = lasts - starts >= min_duration
+                seconds = (ends[fired] - starts[fired]) / 1_000_000
+                alerts += int(fired.sum())
+                ongoing += int((fired & still_open).sum())
+                durations.append(seconds)
+                for series_id, duration in zip(series[fired].tolist(), seconds.tolist()):
+                    stats = devices.setdefault(owners[series_id], [0, 0.0, 0.0])
+                    stats[0] += 1
+                    stats[1] += duration
+                    stats[2] = max(stats[2], duration)
+            seconds = np.concatenate(durations) if durations else np.empty(0)
+            ranked = sorted(devices.items(), key=lambda item: (-item[1][0], item[0]))
+            results.append(
+                {
+                    "rule": rule,
+                    "alerts": alerts,
+                    "ongoing": ongoing,
+                    "devices_alerted": len(devices),
+                    "total_duration_seconds": float(seconds.sum()),
+                    "mean_duration_seconds": float(seconds.mean()) if len(seconds) else None,
+                    "max_duration_seconds": float(seconds.max()) if len(seconds) else None,
+                    "devices": [
+                        {
+                            "device_id": device_id,
+                            "alerts": count,
+                            "total_duration_seconds": total,
+                            "max_duration_seconds": longest,
+                        }
+                        for device_id, (count, total, longest) in ranked[: request.max_devices]
+                    ],
+                }
+            )
+        return {
+            "start_time": start,
+            "end_time": end,
+            "readings_scanned": sum(scanned for _, _, scanned in shard_results),
+            "rules": results,
+        }
@@ -0,0 +1,493 @@
+"""Bulk import of sensor readings from CSV and Parquet files."""
+
+import csv
+import gzip
+import io
+import time
+import warnings
+from datetime import datetime
+from itertools import islice
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import insert_ignore
+from ..models import Device, SensorReading
+from ..utils import logger
+from .change_feed_service import ChangeFeedService
+from .hot_store import hot_store
+from .ingest_dedup import normalize_timestamp
+from .metrics import metrics
+from .range_cache import range_cache
+from .shard_map import shard_map
+from .sketch_service import sketch_builder
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pq = None
+
+settings = get_settings()
+
+COLUMNS = ("device_id", "sensor_type", "value", "unit", "timestamp")
+FORMATS = ("csv", "parquet")
+
+# Column name -> array of raw fields, plus "row" with 1-based data row numbers.
+Chunk = Dict[str, np.ndarray]
+# (row, reason, device_id, sensor_type, value, unit, timestamp)
+Reject = Tuple
+RejectSink = Callable[[List[Reject]], None]
+
+_MAX_LENGTHS = {"sensor_type": 100, "unit": 50}
+_STAGING_TABLE = "sensor_readings_import"
+_SEP = "\x1f"
+
+
+class ImportFormatError(ValueError):
+    """The input cannot be read as the requested format."""
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """Format implied by a file name, defaulting to CSV."""
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "parquet" if name.endswith((".parquet", ".pq")) else "csv"
+
+
+def iter_chunks(
+    stream: BinaryIO,
+    fmt: str,
+    filename: Optional[str] = None,
+    chunk_rows: Optional[int] = None,
+) -> Iterator[Chunk]:
+    """
+    Read an input stream in chunks of at most ``chunk_rows`` rows.
+
+    CSV needs a header naming at least :data:`COLUMNS`, with ISO 8601
+    timestamps; ``.gz`` files are decompressed on the fly. Parquet needs
+    pyarrow.
+
+    Raises:
+        ImportFormatError: If the format is unsupported or the header is incomplete
+    """
+    chunk_rows = chunk_rows or settings.import_chunk_rows
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unsupported format: {fmt}")
+    if fmt == "parquet":
+        return _iter_parquet(stream, chunk_rows)
+    if (filename or "").lower().endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=stream)
+    return _iter_csv(stream, chunk_rows)
+
+
+def _iter_csv(stream: BinaryIO, chunk_rows: int) -> Iterator[Chunk]:
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    header = [name.strip() for name in next(reader, [])]
+    missing = [name for name in COLUMNS if name not in header]
+    if missing:
+        raise ImportFormatError(f"CSV header is missing columns: {', '.join(missing)}")
+    positions = [header.index(name) for name in COLUMNS]
+    width = len(header)
+    row = 0
+    while True:
+        rows = list(islice(reader, chunk_rows))
+        if not rows:
+            return
+        numbers = np.arange(row + 1, row + len(rows) + 1)
+        row += len(rows)
+        # Rows with the wrong field count come back blank and fail validation.
+        columns = list(zip(*(fields if len(fields) == width else [""] * width for fields in rows)))
+        chunk = {
+            name: np.asarray(columns[position], dtype=object) for name, position in zip(COLUMNS, positions)
+        }
+        chunk["row"] = numbers
+        yield chunk
+
+
+def _iter_parquet(stream: BinaryIO, chunk_rows: int) -> Iterator[Chunk]:
+    if pq is None:
+        raise ImportFormatError("Parquet import requires pyarrow")
+    try:
+        parquet = pq.ParquetFile(stream)
+    except Exception as e:
+        raise ImportFormatError(f"Not a Parquet file: {str(e)}")
+    missing = [name for name in COLUMNS if name not in parquet.schema_arrow.names]
+    if missing:
+        raise ImportFormatError(f"Parquet file is missing columns: {', '.join(missing)}")
+    row = 0
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(COLUMNS)):
+        chunk = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in COLUMNS}
+        chunk["row"] = np.arange(row + 1, row + batch.num_rows + 1)
+        row += batch.num_rows
+        yield chunk
+
+
+# -- validation -----------------------------------------------------------
+
+
+def _parse_values(column: np.ndarray) -> np.ndarray:
+    """Float64 values, NaN where a field does not parse."""
+    try:
+        return column.astype(np.float64)
+    except (TypeError, ValueError):
+        pass
+    parsed = np.full(len(column), np.nan)
+    for i, field in enumerate(column):
+        try:
+            parsed[i] = float(field)
+        except (TypeError, ValueError):
+            pass
+    return parsed
+
+
+def _parse_timestamps(column: np.ndarray) -> np.ndarray:
+    """Naive UTC ``datetime64[us]``, NaT where a field does not parse."""
+    if np.issubdtype(column.dtype, np.datetime64):
+        return column.astype("datetime64[us]")
+    try:
+        # numpy only warns about UTC offsets; fall through so they are
+        # converted instead of silently dropped.
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return column.astype("datetime64[us]")
+    except (TypeError, ValueError, Warning):
+        pass
+    parsed = np.full(len(column), np.datetime64("NaT"), dtype="datetime64[us]")
+    for i, field in enumerate(column):
+        try:
+            if not isinstance(field, datetime):
+                field = datetime.fromisoformat(str(field).strip().replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        parsed[i] = np.datetime64(normalize_timestamp(field), "us")
+    return parsed
+
+
+def _text(column: np.ndarray) -> np.ndarray:
+    """Stripped strings, empty where a field is null."""
+    if column.dtype == object:
+        column = np.where(np.equal(column, None), "", column)
+    return np.char.strip(column.astype(str))
+
+
+class DeviceCache:
+    """IDs of active devices, looked up once per import."""
+
+    def __init__(self):
+        self.known: Set[str] = set()
+        self.unknown: Set[str] = set()
+
+    def exist(self, db: Session, device_ids: np.ndarray) -> np.ndarray:
+        distinct = set(np.unique(device_ids).tolist()) - self.known - self.unknown - {""}
+        if distinct:
+            found = set(
+                db.execute(select(Device.id).where(Device.id.in_(distinct), Device.is_active.is_(True))).scalars()
+            )
+            self.known |= found
+            self.unknown |= distinct - found
+        return np.isin(device_ids, list(self.known))
+
+
+def validate_chunk(db: Session, chunk: Chunk, devices: DeviceCache) -> Tuple[dict, np.ndarray]:
+    """
+    Parse and check a chunk column by column.
+
+    Returns:
+        Tuple of the parsed columns and the reject reason per row (None if valid)
+    """
+    parsed = {name: _text(chunk[name]) for name in ("device_id", "sensor_type", "unit")}
+    parsed["value"] = _parse_values(chunk["value"])
+    parsed["timestamp"] = _parse_timestamps(chunk["timestamp"])
+
+    sensor_len = np.char.str_len(parsed["sensor_type"])
+    unit_len = np.char.str_len(parsed["unit"])
+    checks = [
+        (np.char.str_len(parsed["device_id"]) > 0, "missing device_id"),
+        ((sensor_len > 0) & (sensor_len <= _MAX_LENGTHS["sensor_type"]), "invalid sensor_type"),
+        ((unit_len > 0) & (unit_len <= _MAX_LENGTHS["unit"]), "invalid unit"),
+        (np.isfinite(parsed["value"]), "invalid value"),
+        (~np.isnat(parsed["timestamp"]), "invalid timestamp"),
+        (devices.exist(db, parsed["device_id"]), "unknown or inactive device"),
+    ]
+    reasons = np.full(len(chunk["row"]), None, dtype=object)
+    # Applied in reverse so the first failing check names the reason.
+    for ok, reason in reversed(checks):
+        reasons[~ok] = reason
+    return parsed, reasons
+
+
+# -- loading --------------------------------------------------------------
+
+
+def _load_copy(
+    db: Session,
+    series_ids: np.ndarray,
+    values: np.ndarray,
+    timestamps: np.ndarray,
+    created_at: datetime,
+) -> int:
+    """Load rows through ``COPY FROM STDIN`` into a staging table, then insert skipping conflicts."""
+    buffer = io.StringIO()
+    buffer.writelines(
+        f"{series_id}\t{value}\t{timestamp}\t{created_at.isoformat()}\n"
+        for series_id, value, timestamp in zip(
+            series_ids.tolist(),
+            values.astype(str).tolist(),
+            np.datetime_as_string(timestamps, unit="us").tolist(),
+        )
+    )
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} "
+            "(series_id integer, value double precision, timestamp timestamp, created_at timestamp) "
+            "ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(
+            f"COPY {_STAGING_TABLE} (series_id, value, timestamp, created_at) FROM STDIN", buffer
+        )
+        cursor.execute(
+            "INSERT INTO sensor_readings (series_id, value, timestamp, created_at) "
+            f"SELECT series_id, value, timestamp, created_at FROM {_STAGING_TABLE} "
+            "ON CONFLICT (series_id, timestamp) DO NOTHING"
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def _load_sqlite(
+    db: Session,
+    series_ids: np.ndarray,
+    values: np.ndarray,
+    timestamps: np.ndarray,
+    created_at: datetime,
+) -> int:
+    """
+    Load rows with one DBAPI ``executemany`` that skips conflicts.
+
+    Timestamps are formatted in bulk the way SQLAlchemy stores them on
+    SQLite, which skips its per-row type processing.
+    """
+    stamps = np.char.replace(np.datetime_as_string(timestamps, unit="us"), "T", " ")
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO sensor_readings (series_id, value, timestamp, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            zip(
+                series_ids.tolist(),
+                values.tolist(),
+                stamps.tolist(),
+                [created_at.strftime("%Y-%m-%d %H:%M:%S.%f")] * len(stamps),
+            ),
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def _load_executemany(
+    db: Session,
+    series_ids: np.ndarray,
+    values: np.ndarray,
+    timestamps: np.ndarray,
+    created_at: datetime,
+) -> int:
+    """Load rows with an executemany INSERT that skips conflicts."""
+    statement = insert_ignore(db, SensorReading.__table__, ("series_id", "timestamp"))
+    result = db.execute(
+        statement,
+        [
+            {"series_id": series_id, "value": value, "timestamp": timestamp, "created_at": created_at}
+            for series_id, value, timestamp in zip(series_ids.tolist(), values.tolist(), timestamps.tolist())
+        ],
+    )
+    return result.rowcount
+
+
+_LOADERS = {"postgresql": _load_copy, "sqlite": _load_sqlite}
+
+
+def _load(db: Session, parsed: dict, valid: np.ndarray) -> int:
+    """Insert the valid rows of a parsed chunk and commit; returns rows inserted."""
+    device_ids = parsed["device_id"][valid]
+    sensor_types = parsed["sensor_type"][valid]
+    units = parsed["unit"][valid]
+
+    # Encode each distinct (device_id, sensor_type, unit) once per chunk.
+    joined = np.char.add(np.char.add(np.char.add(np.char.add(device_ids, _SEP), sensor_types), _SEP), units)
+    keys, inverse = np.unique(joined, return_inverse=True)
+    key_list = [tuple(key.split(_SEP)) for key in keys.tolist()]
+    return _load_series(db, key_list, inverse, parsed["value"][valid], parsed["timestamp"][valid])
+
+
+def _load_series(
+    db: Session,
+    keys: List[Tuple[str, str, str]],
+    inverse: np.ndarray,
+    values: np.ndarray,
+    timestamps: np.ndarray,
+) -> int:
+    """
+    Insert readings of the series ``keys[inverse]`` and commit, on the shards owning them.
+
+    Each series a shard inserted into is recorded in the change feed with
+    the span of its rows.
+
+    Returns:
+        int: Rows inserted
+    """
+    owners = np.asarray([shard_map.owner(key[0]).name for key in keys], dtype=object)
+    micros = timestamps.astype(np.int64)
+    first = np.full(len(keys), np.iinfo(np.int64).max)
+    last = np.full(len(keys), np.iinfo(np.int64).min)
+    np.minimum.at(first, inverse, micros)
+    np.maximum.at(last, inverse, micros)
+    spans = [
+        (*key, np.datetime64(start, "us").item(), np.datetime64(end, "us").item())
+        for key, start, end in zip(keys, first.tolist(), last.tolist())
+    ]
+    created_at = datetime.utcnow()
+    inserted = 0
+    for name in dict.fromkeys(owners.tolist()):
+        shard = shard_map.shards[name]
+        owned = owners == name
+        if owned.all():
+            used, rows, shard_keys, shard_inverse = range(len(keys)), slice(None), keys, inverse
+        else:
+            used = np.flatnonzero(owned).tolist()
+            rows = owned[inverse]
+            shard_keys = [keys[i] for i in used]
+            shard_inverse = np.searchsorted(used, inverse[rows])
+        with shard.session(db) as shard_db:
+            ids = shard.catalog.resolve_many(shard_db, shard_keys)
+            series_ids = np.asarray([ids[key] for key in shard_keys], dtype=np.int64)[shard_inverse]
+            loader = _LOADERS.get(shard_db.get_bind().dialect.name, _load_executemany)
+            shard_inserted = loader(shard_db, series_ids, values[rows], timestamps[rows], created_at)
+            if shard_inserted:
+                # Rows skipped as duplicates mark their bucket too, which only costs a rebuild.
+                shard_micros = micros[rows]
+                buckets = np.stack([series_ids, shard_micros - shard_micros % sketch_builder.width], axis=1)
+                sketch_builder.mark_buckets(shard_db, np.unique(buckets, axis=0).tolist())
+                ChangeFeedService.record_spans(db, [spans[i] for i in used])
+            shard_db.commit()
+        if not shard.is_primary:
+            db.commit()
+        inserted += shard_inserted
+
+    # Imported history usually lands in chunks the range cache holds.
+    for device_id, sensor_type, _, start, end in spans:
+        range_cache.invalidate_span(device_id, sensor_type, start, end)
+    return inserted
+
+
+def load_series(
+    db: Session,
+    keys: List[Tuple[str, str, str]],
+    inverse: np.ndarray,
+    values: np.ndarray,
+    timestamps: np.ndarray,
+    devices: DeviceCache,
+) -> Tuple[np.ndarray, int]:
+    """
+    Validate and load readings already grouped by series, in one transaction.
+
+    Row ``i`` is a reading of ``keys[inverse[i]]``, a ``(device_id,
+    sensor_type, unit)`` tuple, with ``values[i]`` at ``timestamps[i]``
+    (naive UTC ``datetime64[us]``). Rows are checked like
+    :func:`validate_chunk` checks them, but the series checks run once
+    per key instead of once per row.
+
+    Returns:
+        Tuple of the reject reason per row (None if valid) and rows inserted
+    """
+    device_ids = np.asarray([key[0] for key in keys], dtype=str)
+    sensor_len = np.asarray([len(key[1]) for key in keys], dtype=np.int64)
+    unit_len = np.asarray([len(key[2]) for key in keys], dtype=np.int64)
+    key_checks = [
+        np.char.str_len(device_ids) > 0,
+        (sensor_len > 0) & (sensor_len <= _MAX_LENGTHS["sensor_type"]),
+        (unit_len > 0) & (unit_len <= _MAX_LENGTHS["unit"]),
+    ]
+    known = devices.exist(db, device_ids)
+    checks = [
+        (key_checks[0][inverse], "missing device_id"),
+        (key_checks[1][inverse], "invalid sensor_type"),
+        (key_checks[2][inverse], "invalid unit"),
+        (np.isfinite(values), "invalid value"),
+        (~np.isnat(timestamps), "invalid timestamp"),
+        (known[inverse], "unknown or inactive device"),
+    ]
+    reasons = np.full(len(inverse), None, dtype=object)
+    for ok, reason in reversed(checks):
+        reasons[~ok] = reason
+    valid = np.equal(reasons, None)
+    if not valid.any():
+        return reasons, 0
+    used, compact = np.unique(inverse[valid], return_inverse=True)
+    inserted = _load_series(db, [keys[i] for i in used.tolist()], compact, values[valid], timestamps[valid])
+    return reasons, inserted
+
+
+def import_readings(
+    db: Session,
+    chunks: Iterable[Chunk],
+    on_rejects: Optional[RejectSink] = None,
+    max_reported_rejects: int = 100,
+) -> dict:
+    """
+    Validate and load chunks of readings, one transaction per chunk.
+
+    Rows already stored under the same natural key are skipped and counted
+    as duplicates. Rejected rows are passed to ``on_rejects`` as they are
+    found, and the first ``max_reported_rejects`` are returned.
+
+    Returns:
+        dict: Row, insert, duplicate and reject counts, timing and sample rejects
+    """
+    started = time.perf_counter()
+    devices = DeviceCache()
+    report = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "rejects": []}
+    for chunk in chunks:
+        parsed, reasons = validate_chunk(db, chunk, devices)
+        valid = np.equal(reasons, None)
+        n_valid = int(valid.sum())
+        inserted = _load(db, parsed, valid) if n_valid else 0
+
+        report["rows"] += len(reasons)
+        report["inserted"] += inserted
+        report["duplicates"] += n_valid - inserted
+        if n_valid < len(reasons):
+            invalid = ~valid
+            rejects = list(
+                zip(
+                    chunk["row"][invalid].tolist(),
+                    reasons[invalid].tolist(),
+                    *(np.asarray(chunk[name], dtype=object)[invalid].tolist() for name in COLUMNS),
+                )
+            )
+            report["rejected"] += len(rejects)
+            room = max_reported_rejects - len(report["rejects"])
+            report["rejects"].extend({"row": reject[0], "reason": reject[1]} for reject in rejects[:room])
+            if on_rejects is not None:
+                on_rejects(rejects)
+
+    # The rows bypassed the hot store; read them in now so this process answers with them.
+    hot_store.sync(db)
+
+    seconds = time.perf_counter() - started
+    report["seconds"] = round(seconds, 3)
+    report["rows_per_second"] = round(report["rows"] / seconds) if seconds > 0 else report["rows"]
+    metrics.inc("import.inserted", report["inserted"])
+    metrics.inc("import.rejected", report["rejected"])
+    logger.info(
+        f"Import: {report['rows']} rows, {report['inserted']} inserted, {report['duplicates']} duplicates, "
+        f"{report['rejected']} rejected in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+    )
+    return report
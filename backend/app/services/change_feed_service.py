@@ -0,0 +1,297 @@
+"""Outbox of device, alert and reading changes, read back as a feed."""
+
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, func, inspect, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import Change, ChangeSequence
+from ..utils import logger
+from .metrics import metrics
+from .series_catalog import ReadingRow
+
+settings = get_settings()
+
+# Changes deleted per statement when trimming the feed.
+TRIM_BATCH = 10_000
+
+# Changes numbered per sequencer transaction.
+SEQUENCE_BATCH = 10_000
+
+# Device, sensor type, unit and the first and last timestamp written.
+ReadingSpan = Tuple[str, str, str, datetime, datetime]
+
+
+class ChangesExpired(Exception):
+    """
+    Changes after a consumer's position were trimmed from the feed.
+
+    The consumer should re-list everything and resume from ``newest``.
+    """
+
+    def __init__(self, since: int, newest: int):
+        super().__init__(f"Changes after {since} are no longer kept; resume from {newest} after re-listing")
+        self.since = since
+        self.newest = newest
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ChangeFeedService:
+    """
+    Change feed for downstream sync, kept in ``changes`` on the primary.
+
+    Services record every device and alert insert, update and delete in
+    the transaction making it, and every write of readings as one entry
+    per series with the time span written, so consumers re-read only
+    those windows. Readings on another shard are recorded right after
+    their shard commits. A device delete implies its alerts and readings;
+    last-seen times, which move with every reading, are not recorded.
+
+    Changes are written without a position. :meth:`sequence` numbers
+    those committed so far in a short transaction of its own, holding the
+    lock on ``change_sequence``, so positions follow commit order and a
+    consumer's position never moves past a change still to appear.
+    Reading entries of one series waiting to be numbered are merged into
+    one, so single-reading writes cost one entry per series and cycle.
+    """
+
+    @staticmethod
+    def record(db: Session, entity: str, op: str, entity_id: Optional[str], data: Optional[dict] = None) -> None:
+        """Add one change to ``db``'s transaction."""
+        ChangeFeedService.record_many(db, entity, op, [(entity_id, data)])
+
+    @staticmethod
+    def record_many(
+        db: Session, entity: str, op: str, changes: Iterable[Tuple[Optional[str], Optional[dict]]]
+    ) -> None:
+        """Add ``(entity_id, data)`` changes of one kind to ``db``'s transaction."""
+        if not settings.change_feed_enabled:
+            return
+        now = datetime.utcnow()
+        rows = [
+            {
+                "entity": entity,
+                "op": op,
+                "entity_id": entity_id,
+                "data": {key: _jsonable(value) for key, value in data.items()} if data is not None else None,
+                "changed_at": now,
+            }
+            for entity_id, data in changes
+        ]
+        if rows:
+            db.execute(insert(Change.__table__), rows)
+
+    @staticmethod
+    def record_insert(db: Session, entity: str, obj) -> None:
+        """Flush a new ORM object and record it with every column."""
+        if not settings.change_feed_enabled:
+            return
+        db.flush()
+        data = {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+        ChangeFeedService.record(db, entity, "insert", data.pop("id"), data)
+
+    @staticmethod
+    def record_readings(db: Session, rows: Iterable[ReadingRow]) -> None:
+        """Record stored readings as one span per series."""
+        if not settings.change_feed_enabled:
+            return
+        spans = {}
+        for row in rows:
+            key = (row.device_id, row.sensor_type, row.unit)
+            span = spans.get(key)
+            if span is None:
+                spans[key] = [row.timestamp, row.timestamp]
+            elif row.timestamp < span[0]:
+                span[0] = row.timestamp
+            elif row.timestamp > span[1]:
+                span[1] = row.timestamp
+        ChangeFeedService.record_spans(db, [(*key, start, end) for key, (start, end) in spans.items()])
+
+    @staticmethod
+    def record_spans(db: Session, spans: Iterable[ReadingSpan]) -> None:
+        """Record readings written to each series between two timestamps."""
+        ChangeFeedService.record_many(
+            db,
+            "readings",
+            "insert",
+            (
+                (device_id, {"sensor_type": sensor_type, "unit": unit, "start": start, "end": end})
+                for device_id, sensor_type, unit, start, end in spans
+            ),
+        )
+
+    @staticmethod
+    def get_changes(
+        db: Session,
+        since: int = 0,
+        limit: int = 1000,
+        entities: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """
+        Changes after ``since``, oldest first, read by ``seq`` range.
+
+        Args:
+            db: Database session
+            since: Last ``seq`` the consumer has seen, 0 for the oldest kept
+            limit: Maximum number of changes to return
+            entities: Only changes of these entity types
+
+        Returns:
+            dict: The changes, the ``seq`` to pass next and whether more
+            follow
+
+        Raises:
+            ChangesExpired: If changes after ``since`` were already trimmed
+        """
+        if since:
+            oldest = db.execute(select(func.min(Change.seq))).scalar()
+            if oldest is not None and oldest > since + 1:
+                raise ChangesExpired(since, ChangeFeedService.newest(db))
+
+        statement = select(Change).where(Change.seq > since)
+        if entities:
+            statement = statement.where(Change.entity.in_(entities))
+        changes = db.execute(statement.order_by(Change.seq.asc()).limit(limit)).scalars().all()
+        return {
+            "changes": changes,
+            "next_since": changes[-1].seq if changes else since,
+            "has_more": len(changes) == limit,
+        }
+
+    @staticmethod
+    def sequence(db: Session, batch: int = SEQUENCE_BATCH) -> int:
+        """
+        Number the committed changes still without a position, one batch per transaction.
+
+        Each batch locks the ``change_sequence`` row first, so changes
+        committed while another worker numbers wait for the next batch and
+        get higher positions. Reading entries of one series in a batch are
+        merged into the last of them, spanning all their time spans.
+
+        Returns:
+            int: Number of changes published
+        """
+        table = Change.__table__
+        published = 0
+        while True:
+            last = db.execute(
+                select(ChangeSequence.last_seq).where(ChangeSequence.id == 1).with_for_update()
+            ).scalar()
+            if last is None:
+                # A database created without migrations has no counter yet.
+                try:
+                    db.execute(
+                        insert(ChangeSequence).values(id=1, last_seq=ChangeFeedService.newest(db))
+                    )
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                continue
+
+            rows = db.execute(
+                select(Change.id, Change.entity, Change.entity_id, Change.data)
+                .where(Change.seq.is_(None))
+                .order_by(Change.id.asc())
+                .limit(batch)
+            ).all()
+            if not rows:
+                db.commit()
+                return published
+
+            spans = {}
+            merged = []
+            grown = set()
+            for change_id, entity, entity_id, data in rows:
+                if entity != "readings" or not data:
+                    continue
+                key = (entity_id, data.get("sensor_type"), data.get("unit"))
+                start, end = datetime.fromisoformat(data["start"]), datetime.fromisoformat(data["end"])
+                previous = spans.get(key)
+                if previous is not None:
+                    merged.append(previous[0])
+                    grown.add(key)
+                    start, end = min(start, previous[1]), max(end, previous[2])
+                spans[key] = (change_id, start, end, data)
+            if merged:
+                db.execute(delete(table).where(table.c.id.in_(merged)))
+                db.execute(
+                    update(table).where(table.c.id == bindparam("change_id")).values(data=bindparam("span")),
+                    [
+                        {"change_id": change_id, "span": {**data, "start": start.isoformat(), "end": end.isoformat()}}
+                        for change_id, start, end, data in (spans[key] for key in grown)
+                    ],
+                )
+
+            merged_ids = set(merged)
+            kept = [row[0] for row in rows if row[0] not in merged_ids]
+            db.execute(
+                update(table).where(table.c.id == bindparam("change_id")).values(seq=bindparam("position")),
+                [{"change_id": change_id, "position": last + i} for i, change_id in enumerate(kept, 1)],
+            )
+            db.execute(update(ChangeSequence).where(ChangeSequence.id == 1).values(last_seq=last + len(kept)))
+            db.commit()
+            published += len(kept)
+            metrics.inc("changes.merged", len(merged))
+            if len(rows) < batch:
+                return published
+
+    @staticmethod
+    def newest(db: Session) -> int:
+        """``seq`` of the newest change, 0 if there is none."""
+        return db.execute(select(func.max(Change.seq))).scalar() or 0
+
+    @staticmethod
+    def trim(db: Session) -> int:
+        """
+        Delete changes older than ``CHANGE_FEED_RETENTION_HOURS``, one batch per transaction.
+
+        The newest change is always kept, so a consumer whose position was
+        trimmed is told so instead of silently starting over.
+
+        Returns:
+            int: Number of changes deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=settings.change_feed_retention_hours)
+        newest = db.execute(select(func.max(Change.seq))).scalar()
+        if newest is None:
+            return 0
+        trimmed = 0
+        while True:
+            batch = select(Change.id).where(Change.changed_at < cutoff, Change.seq < newest).limit(TRIM_BATCH)
+            deleted = db.execute(
+                delete(Change).where(Change.id.in_(batch)),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+            db.commit()
+            trimmed += deleted
+            if deleted < TRIM_BATCH:
+                break
+        metrics.inc("changes.trimmed", trimmed)
+        return trimmed
+
+
+def run_change_feed_sequencer() -> None:
+    """Number committed changes on a short-lived session."""
+    db = SessionLocal()
+    try:
+        ChangeFeedService.sequence(db)
+    finally:
+        db.close()
+
+
+def run_change_feed_cycle() -> None:
+    """Trim the change feed on a short-lived session."""
+    db = SessionLocal()
+    try:
+        trimmed = ChangeFeedService.trim(db)
+        if trimmed:
+            logger.info(f"Change feed trimmed {trimmed} changes")
+    finally:
+        db.close()
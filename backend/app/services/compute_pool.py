@@ -0,0 +1,360 @@
+"""Worker processes for CPU-heavy analytics, off the API workers' GIL."""
+
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+from ..config import get_settings
+from ..utils import logger
+from .metrics import metrics
+
+settings = get_settings()
+
+
+class ComputeError(Exception):
+    """Raised when a job could not be run by the compute pool."""
+
+    retry_after = 1.0
+
+
+class ComputeOverloaded(ComputeError):
+    """Raised when the pool already holds as many jobs as it may queue."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Compute pool overloaded")
+        self.retry_after = retry_after
+
+
+class ComputeTimeout(ComputeError):
+    """Raised when a job did not finish within its timeout."""
+
+
+class _SharedArray(NamedTuple):
+    """Reference to an array packed into a worker's shared memory arena."""
+
+    name: str
+    offset: int
+    shape: tuple
+    dtype: str
+
+
+def _aligned(nbytes: int) -> int:
+    return -(-nbytes // 64) * 64
+
+
+class _Arena:
+    """
+    Shared memory block reused across jobs.
+
+    Mapping a fresh block costs a page fault per page on both sides, so
+    arrays are packed into one block that only grows. One side creates and
+    grows it; the other attaches by name when the name changes.
+    """
+
+    def __init__(self):
+        self.block: Optional[SharedMemory] = None
+
+    def reserve(self, size: int) -> SharedMemory:
+        """Creating side: a block of at least ``size`` bytes."""
+        if self.block is None or self.block.size < size:
+            self.release()
+            self.block = SharedMemory(create=True, size=1 << max(size - 1, 1).bit_length())
+        return self.block
+
+    def attach(self, name: str) -> SharedMemory:
+        """Attaching side: the block called ``name``."""
+        if self.block is None or self.block.name != name:
+            self.close()
+            self.block = SharedMemory(name=name)
+        return self.block
+
+    def close(self) -> None:
+        if self.block is None:
+            return
+        try:
+            self.block.close()
+        except BufferError:
+            # A view outlived its job; the mapping goes with the process.
+            pass
+        self.block = None
+
+    def release(self) -> None:
+        """Close and remove the block."""
+        if self.block is None:
+            return
+        block = self.block
+        self.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _large_arrays(value: Any, min_bytes: int):
+    if isinstance(value, tuple):
+        for item in value:
+            yield from _large_arrays(item, min_bytes)
+    elif isinstance(value, np.ndarray) and value.nbytes >= min_bytes and value.dtype != object:
+        yield value
+
+
+def _pack(value: Any, arena: _Arena, min_bytes: int) -> Any:
+    """Move large arrays in ``value`` (or a tuple of values) into ``arena``, leaving references."""
+    total = sum(_aligned(array.nbytes) for array in _large_arrays(value, min_bytes))
+    block = arena.reserve(total) if total else None
+    offset = 0
+
+    def encode(item: Any) -> Any:
+        nonlocal offset
+        if isinstance(item, tuple):
+            return tuple(encode(part) for part in item)
+        if not isinstance(item, np.ndarray):
+            return item
+        if item.nbytes >= min_bytes and item.dtype != object:
+            np.ndarray(item.shape, dtype=item.dtype, buffer=block.buf, offset=offset)[...] = item
+            reference = _SharedArray(block.name, offset, item.shape, item.dtype.str)
+            offset += _aligned(item.nbytes)
+            return reference
+        # A small view may still point into shared memory.
+        return item.copy() if item.base is not None else item
+
+    return encode(value)
+
+
+def _unpack(value: Any, arena: _Arena, copy: bool) -> Any:
+    """Arrays for the references in ``value``: views into ``arena``, or copies."""
+    if isinstance(value, _SharedArray):
+        block = arena.attach(value.name)
+        view = np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=block.buf, offset=value.offset)
+        return view.copy() if copy else view
+    if isinstance(value, tuple):
+        return tuple(_unpack(item, arena, copy) for item in value)
+    return value
+
+
+def _execute(fn: Callable, args: tuple, kwargs: dict, inputs: _Arena, outputs: _Arena, min_bytes: int) -> Any:
+    error = None
+    try:
+        # Views into the input arena live only in _call's frame, and a
+        # failure keeps no traceback, so nothing pins the arena afterwards.
+        result = _pack(_call(fn, _unpack(args, inputs, copy=False), kwargs), outputs, min_bytes)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    if error is not None:
+        raise RuntimeError(error)
+    return result
+
+
+def _call(fn: Callable, args: tuple, kwargs: dict) -> Any:
+    return fn(*args, **kwargs)
+
+
+def _worker_main(conn, min_bytes: int) -> None:
+    """Run jobs received on ``conn`` until told to stop."""
+    # The parent shuts workers down; a Ctrl-C in the terminal is for it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    inputs, outputs = _Arena(), _Arena()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            message = None
+        if message is None:
+            # The parent removes the output arena.
+            inputs.close()
+            outputs.close()
+            return
+        fn, args, kwargs = message
+        try:
+            reply = (True, _execute(fn, args, kwargs, inputs, outputs, min_bytes))
+        except RuntimeError as e:
+            reply = (False, e)
+        conn.send(reply)
+
+
+class _Worker:
+    """One worker process, the parent's end of its pipe and both arenas."""
+
+    def __init__(self, context, min_bytes: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, min_bytes), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.inputs = _Arena()
+        self.outputs = _Arena()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.inputs.release()
+        self.outputs.release()
+
+
+class ComputePool:
+    """
+    Fixed set of worker processes for NumPy-heavy analytics.
+
+    Request threads hand a module-level function and its arguments to
+    :meth:`run`, which blocks until an idle worker has run it. Arrays of at
+    least ``shm_min_bytes`` are not pickled: they are copied into a shared
+    memory arena owned by the worker, which the job reads in place, and
+    results come back the same way through a second arena.
+
+    At most ``workers + max_queue`` jobs are admitted at once; further jobs
+    fail fast with :class:`ComputeOverloaded`. A job that does not finish
+    within its timeout, queueing included, raises :class:`ComputeTimeout`
+    and its worker is killed and replaced, so a runaway job cannot hold a
+    worker. Workers are forked at startup, before the API serves requests,
+    and inherit the loaded application modules. Until :meth:`start` is
+    called (scripts, tests) or with ``workers`` set to 0, jobs run inline.
+
+    Attributes:
+        workers: Number of worker processes
+        max_queue: Jobs allowed to wait for a worker
+        job_timeout: Default per-job timeout in seconds
+        shm_min_bytes: Arrays from this size go through shared memory
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 8, job_timeout: float = 30.0, shm_min_bytes: int = 2**18):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.shm_min_bytes = shm_min_bytes
+        self._context = None
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._all: List[_Worker] = []
+        self._slots = threading.BoundedSemaphore(max(workers + max_queue, 1))
+        self._lock = threading.Lock()
+        self._admitted = 0
+
+    @property
+    def started(self) -> bool:
+        return self._context is not None
+
+    def start(self) -> None:
+        """Fork the worker processes."""
+        if self.started or self.workers <= 0:
+            return
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        # Forked workers share the parent's tracker, so blocks they create
+        # and the parent unlinks are accounted for in one place.
+        resource_tracker.ensure_running()
+        for _ in range(self.workers):
+            self._add_worker()
+        logger.info(f"Compute pool started: {self.workers} workers")
+
+    def stop(self) -> None:
+        """Stop every worker; jobs still running are abandoned."""
+        if not self.started:
+            return
+        with self._lock:
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.stop()
+        self._idle = queue.Queue()
+        self._context = None
+
+    def _add_worker(self) -> None:
+        worker = _Worker(self._context, self.shm_min_bytes)
+        with self._lock:
+            self._all.append(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            if worker not in self._all:
+                return
+            self._all.remove(worker)
+        self._add_worker()
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` in a worker process and return its result.
+
+        ``fn`` must be a module-level function. Large NumPy arrays among the
+        positional arguments, and in the result or a tuple result, are
+        passed through shared memory.
+
+        Raises:
+            ComputeOverloaded: If the pool is full
+            ComputeTimeout: If the job did not finish within ``timeout``
+            ComputeError: If the worker died while running the job
+        """
+        if not self.started:
+            return fn(*args, **kwargs)
+        timeout = self.job_timeout if timeout is None else timeout
+        if not self._slots.acquire(blocking=False):
+            metrics.inc("compute.rejected")
+            raise ComputeOverloaded(retry_after=1.0)
+        with self._lock:
+            self._admitted += 1
+        deadline = time.monotonic() + timeout
+        try:
+            try:
+                worker = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                metrics.inc("compute.timeouts")
+                raise ComputeTimeout(f"No compute worker became free within {timeout:g}s")
+            replaced = False
+            try:
+                payload = _pack(args, worker.inputs, self.shm_min_bytes)
+                worker.conn.send((fn, payload, kwargs))
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                    replaced = True
+                    self._replace(worker)
+                    metrics.inc("compute.timeouts")
+                    raise ComputeTimeout(f"Compute job did not finish within {timeout:g}s")
+                ok, result = worker.conn.recv()
+                if not ok:
+                    raise result
+                metrics.inc("compute.jobs")
+                return _unpack(result, worker.outputs, copy=True)
+            except (EOFError, OSError) as e:
+                replaced = True
+                self._replace(worker)
+                logger.error(f"Compute worker failed: {str(e)}")
+                raise ComputeError("Compute worker failed")
+            finally:
+                if not replaced:
+                    self._idle.put(worker)
+        finally:
+            with self._lock:
+                self._admitted -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """Worker and job counts."""
+        with self._lock:
+            return {
+                "workers": len(self._all),
+                "idle": self._idle.qsize(),
+                "admitted": self._admitted,
+            }
+
+
+compute_pool = ComputePool(
+    workers=settings.compute_workers,
+    max_queue=settings.compute_max_queue,
+    job_timeout=settings.compute_job_timeout_seconds,
+    shm_min_bytes=settings.compute_shm_min_kb * 1024,
+)
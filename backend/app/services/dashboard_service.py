@@ -0,0 +1,176 @@
+"""Service layer for the one-request dashboard summary."""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import Device
+from .alert_service import AlertService
+from .device_service import DeviceService
+from .metrics import metrics
+from .sensor_reading_service import SensorReadingService
+from .shard_map import shard_map
+
+settings = get_settings()
+
+
+class SharedResultCache:
+    """
+    Short-lived results shared by identical concurrent requests.
+
+    The first request for a key computes the value; requests arriving
+    while it runs wait for the same result instead of computing their own,
+    and later ones reuse it for ``ttl_seconds``. Failures are not cached.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Future]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                metrics.inc("dashboard.cache_hits")
+                future = entry[1]
+                owner = False
+            else:
+                if len(self._entries) >= self.max_entries:
+                    self._evict(now)
+                future = Future()
+                self._entries[key] = (now + self.ttl_seconds, future)
+                owner = True
+        if not owner:
+            return future.result()
+
+        metrics.inc("dashboard.cache_misses")
+        try:
+            future.set_result(compute())
+        except BaseException as e:
+            with self._lock:
+                if self._entries.get(key, (None, None))[1] is future:
+                    del self._entries[key]
+            future.set_exception(e)
+        return future.result()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the oldest ones. Caller holds the lock."""
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+summary_cache = SharedResultCache(settings.dashboard_cache_seconds)
+
+# Sub-queries of a summary run here, each on its own session and connection.
+_executor = ThreadPoolExecutor(max_workers=settings.dashboard_query_workers, thread_name_prefix="dashboard")
+
+
+def _on_session(query: Callable, *args):
+    db = SessionLocal()
+    try:
+        return query(db, *args)
+    finally:
+        db.close()
+
+
+def _history(db: Session, device_id: str, sensor_types: Sequence[str], limit: int) -> Dict[str, list]:
+    history = {}
+    with shard_map.owner(device_id).session(db) as shard_db:
+        for sensor_type in sensor_types:
+            statement = SensorReadingService.readings_select(device_id, sensor_type, descending=True).limit(limit)
+            history[sensor_type] = shard_db.execute(statement).all()[::-1]
+    return history
+
+
+class DashboardService:
+    """Business logic for the dashboard summary."""
+
+    @staticmethod
+    def summary(
+        skip: int = 0,
+        limit: int = 100,
+        alert_limit: int = 10,
+        sensor_types: Sequence[str] = ("temperature", "humidity"),
+        history_device_id: Optional[str] = None,
+        history_limit: int = 24,
+    ) -> dict:
+        """
+        Everything the dashboard shows, in one call.
+
+        Device counts, alert counts, recent unresolved alerts and the device
+        page are independent and run concurrently on separate connections;
+        the latest readings of the page's devices follow the device page.
+        Results are shared per parameter set for ``DASHBOARD_CACHE_SECONDS``.
+
+        Args:
+            skip: Offset of the device page
+            limit: Size of the device page
+            alert_limit: Number of recent unresolved alerts
+            sensor_types: Sensor types of the latest readings and history
+            history_device_id: Device whose recent readings to include;
+                the first device of the page if omitted
+            history_limit: Readings per sensor type in the history, 0 for none
+
+        Returns:
+            dict: Payload shaped like ``DashboardSummaryResponse``
+        """
+        sensor_types = tuple(dict.fromkeys(sensor_types))
+        key = (skip, limit, alert_limit, sensor_types, history_device_id, history_limit)
+        return summary_cache.get_or_compute(
+            key,
+            lambda: DashboardService._compute(skip, limit, alert_limit, sensor_types, history_device_id, history_limit),
+        )
+
+    @staticmethod
+    def _compute(
+        skip: int,
+        limit: int,
+        alert_limit: int,
+        sensor_types: Tuple[str, ...],
+        history_device_id: Optional[str],
+        history_limit: int,
+    ) -> dict:
+        devices = _executor.submit(_on_session, lambda db: DeviceService.get_devices(db, skip=skip, limit=limit))
+        device_counts = _executor.submit(_on_session, DeviceService.get_device_counts)
+        alert_counts = _executor.submit(_on_session, AlertService.get_alert_summary)
+        recent_alerts = _executor.submit(
+            _on_session, lambda db: AlertService.get_unresolved_alerts(db, limit=alert_limit)
+        )
+        history = None
+        if history_device_id is not None and history_limit > 0:
+            history = _executor.submit(_on_session, _history, history_device_id, sensor_types, history_limit)
+
+        # The latest readings, and the history of the first device unless
+        # one was named, need the device page.
+        device_page: List[Device] = devices.result()
+        if history is None and device_page and history_limit > 0:
+            history_device_id = device_page[0].id
+            history = _executor.submit(_on_session, _history, history_device_id, sensor_types, history_limit)
+        latest = _on_session(
+            SensorReadingService.get_latest_readings, [device.id for device in device_page], sensor_types
+        )
+        return {
+            "generated_at": datetime.utcnow(),
+            "devices": device_page,
+            "device_counts": device_counts.result(),
+            "alert_counts": alert_counts.result(),
+            "recent_alerts": recent_alerts.result(),
+            "latest_readings": latest,
+            "history_device_id": history_device_id if history is not None else None,
+            "history": history.result() if history is not None else {},
+        }
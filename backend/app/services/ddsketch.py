@@ -0,0 +1,160 @@
+"""DDSketch: mergeable quantile sketch with relative error guarantees."""
+
+import math
+import struct
+import zlib
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# Magnitudes below this count as zero.
+_MIN_INDEXABLE = 1e-9
+_HEADER = struct.Struct("<fIIQ")
+
+
+class DDSketch:
+    """
+    Logarithmically bucketed histogram answering quantiles within ``alpha``.
+
+    A value ``x`` lands in bucket ``ceil(log_gamma(|x|))`` of the positive or
+    negative store, with ``gamma = (1 + alpha) / (1 - alpha)``, so any
+    quantile is returned within relative error ``alpha`` of a true sample.
+    Merging adds bucket counts and is exact: a sketch of the union equals the
+    merge of the sketches. Stores are sparse sorted ``(keys, counts)``
+    arrays so building and merging are single numpy passes.
+
+    Attributes:
+        alpha: Relative accuracy
+        count: Number of values added
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._log_gamma = math.log((1 + alpha) / (1 - alpha))
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64))
+        self.negative = empty
+        self.positive = empty
+        self.zero = 0
+
+    @property
+    def count(self) -> int:
+        return int(self.negative[1].sum() + self.positive[1].sum()) + self.zero
+
+    # -- building ---------------------------------------------------------
+
+    def _keys(self, magnitudes: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int32)
+
+    @staticmethod
+    def _combine(*stores: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        keys = np.concatenate([store[0] for store in stores])
+        counts = np.concatenate([store[1] for store in stores])
+        if not len(keys):
+            return keys.astype(np.int32), counts.astype(np.int64)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        merged = np.bincount(inverse, weights=counts, minlength=len(unique))
+        return unique.astype(np.int32), merged.astype(np.int64)
+
+    def add_values(self, values: Iterable[float]) -> "DDSketch":
+        """Add a batch of values; non-finite values are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        magnitudes = np.abs(values)
+        indexable = magnitudes >= _MIN_INDEXABLE
+        self.zero += int((~indexable).sum())
+        for sign, attr in ((values > 0, "positive"), (values < 0, "negative")):
+            keys = self._keys(magnitudes[sign & indexable])
+            if len(keys):
+                store = (keys, np.ones(len(keys), dtype=np.int64))
+                setattr(self, attr, self._combine(getattr(self, attr), store))
+        return self
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], alpha: float = 0.01) -> "DDSketch":
+        return cls(alpha).add_values(values)
+
+    def merge(self, *others: "DDSketch") -> "DDSketch":
+        """Add the counts of other sketches with the same ``alpha``."""
+        for other in others:
+            if other.alpha != self.alpha:
+                raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.negative = self._combine(self.negative, *(other.negative for other in others))
+        self.positive = self._combine(self.positive, *(other.positive for other in others))
+        self.zero += sum(other.zero for other in others)
+        return self
+
+    # -- queries ----------------------------------------------------------
+
+    def _value(self, key: int) -> float:
+        """Representative value of a bucket, within ``alpha`` of all its members."""
+        return 2 * math.exp(key * self._log_gamma) / (1 + math.exp(self._log_gamma))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile ``q`` in ``[0, 1]``, or None for an empty sketch."""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        # Ascending value order: negatives from the largest magnitude down,
+        # then zeros, then positives.
+        neg_keys, neg_counts = self.negative
+        neg_cumulative = np.cumsum(neg_counts[::-1])
+        if len(neg_cumulative) and rank < neg_cumulative[-1]:
+            i = int(np.searchsorted(neg_cumulative, rank, side="right"))
+            return -self._value(int(neg_keys[::-1][i]))
+        rank -= neg_cumulative[-1] if len(neg_cumulative) else 0
+        if rank < self.zero:
+            return 0.0
+        rank -= self.zero
+        pos_keys, pos_counts = self.positive
+        i = int(np.searchsorted(np.cumsum(pos_counts), rank, side="right"))
+        return self._value(int(pos_keys[min(i, len(pos_keys) - 1)]))
+
+    # -- serialization ----------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        """Compact form: header, delta-encoded keys and counts, zlib-compressed."""
+        header = _HEADER.pack(self.alpha, len(self.negative[0]), len(self.positive[0]), self.zero)
+        body = b"".join(
+            array.tobytes()
+            for keys, counts in (self.negative, self.positive)
+            for array in (np.diff(keys, prepend=0).astype(np.int32), counts.astype(np.uint32))
+        )
+        return header + zlib.compress(body, 1)
+
+    @staticmethod
+    def _decode(blob: bytes):
+        alpha, n_negative, n_positive, zero = _HEADER.unpack_from(blob)
+        body = np.frombuffer(zlib.decompress(blob[_HEADER.size:]), dtype=np.uint32)
+        stores = []
+        offset = 0
+        for n in (n_negative, n_positive):
+            keys = np.cumsum(body[offset : offset + n].view(np.int32), dtype=np.int32)
+            stores.append((keys, body[offset + n : offset + 2 * n]))
+            offset += 2 * n
+        return round(alpha, 6), stores[0], stores[1], zero
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "DDSketch":
+        alpha, negative, positive, zero = cls._decode(blob)
+        sketch = cls(alpha)
+        sketch.negative = (negative[0], negative[1].astype(np.int64))
+        sketch.positive = (positive[0], positive[1].astype(np.int64))
+        sketch.zero = zero
+        return sketch
+
+    @classmethod
+    def merge_blobs(cls, blobs: Iterable[bytes], alpha: float = 0.01) -> "DDSketch":
+        """Merge serialized sketches with one ``np.unique`` per store, without building each sketch."""
+        sketch = cls(alpha)
+        negatives, positives = [sketch.negative], [sketch.positive]
+        for blob in blobs:
+            blob_alpha, negative, positive, zero = cls._decode(blob)
+            if blob_alpha != alpha:
+                raise ValueError("Cannot merge sketches with different relative accuracy")
+            negatives.append(negative)
+            positives.append(positive)
+            sketch.zero += zero
+        sketch.negative = cls._combine(*negatives)
+        sketch.positive = cls._combine(*positives)
+        return sketch
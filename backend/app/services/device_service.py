@@ -1,12 +1,25 @@
 """Service layer for device-related operations."""
 
 import uuid
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
-from ..models import Device
+from ..models import Device, PurgeJob
 from ..schemas import DeviceCreate, DeviceUpdate
+from .alert_index import alert_index
+from .change_feed_service import ChangeFeedService
+from .geo_index import encode_geohash, geo_index
+from .heartbeat import heartbeat_tracker
+from .purge_service import PurgeService
+from .shard_map import shard_map
+
+
+def _geohash_for(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return encode_geohash(latitude, longitude)
 
 
 class DeviceService:
@@ -24,17 +37,24 @@ class DeviceService:
         Returns:
             Device: Created device instance
         """
+        device_id = str(uuid.uuid4())
         device = Device(
-            id=str(uuid.uuid4()),
+            id=device_id,
             name=device_in.name,
             location=device_in.location,
             device_type=device_in.device_type,
             latitude=device_in.latitude,
             longitude=device_in.longitude,
+            geohash=_geohash_for(device_in.latitude, device_in.longitude),
+            heartbeat_interval_seconds=device_in.heartbeat_interval_seconds,
+            shard=shard_map.assign(device_id) if shard_map.sharded else None,
         )
         db.add(device)
+        ChangeFeedService.record_insert(db, "device", device)
         db.commit()
         db.refresh(device)
+        geo_index.upsert(device.id, device.latitude, device.longitude)
+        heartbeat_tracker.set_interval(device.id, device.heartbeat_interval_seconds)
         return device
 
     @staticmethod
@@ -42,6 +62,44 @@ class DeviceService:
         """Get a device by ID."""
         return db.query(Device).filter(Device.id == device_id).first()
 
+    @staticmethod
+    def get_devices_by_ids(db: Session, device_ids: List[str]) -> List[Device]:
+        """Get devices by ID, in no particular order."""
+        if not device_ids:
+            return []
+        return db.query(Device).filter(Device.id.in_(device_ids)).all()
+
+    @staticmethod
+    def get_devices_near(
+        db: Session,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: int = 100,
+    ) -> List[Tuple[Device, float]]:
+        """
+        Get devices within a radius, nearest first.
+
+        Returns:
+            List of ``(device, distance_km)`` pairs
+        """
+        hits = geo_index.near(latitude, longitude, radius_km)[:limit]
+        devices = {d.id: d for d in DeviceService.get_devices_by_ids(db, [h[0] for h in hits])}
+        return [(devices[device_id], distance) for device_id, distance in hits if device_id in devices]
+
+    @staticmethod
+    def get_devices_within(
+        db: Session,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        limit: int = 1000,
+    ) -> List[Device]:
+        """Get devices inside a bounding box."""
+        device_ids = geo_index.within(min_lat, min_lon, max_lat, max_lon)[:limit]
+        return DeviceService.get_devices_by_ids(db, device_ids)
+
     @staticmethod
     def get_devices(
         db: Session,
@@ -86,28 +144,55 @@ class DeviceService:
         update_data = device_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(device, field, value)
+        changes = dict(update_data)
+        if "latitude" in update_data or "longitude" in update_data:
+            device.geohash = changes["geohash"] = _geohash_for(device.latitude, device.longitude)
 
         db.add(device)
+        ChangeFeedService.record(db, "device", "update", device.id, changes)
         db.commit()
         db.refresh(device)
+        geo_index.upsert(device.id, device.latitude, device.longitude)
+        if "location" in update_data:
+            alert_index.invalidate_location(device.id)
+        if "heartbeat_interval_seconds" in update_data:
+            heartbeat_tracker.set_interval(device.id, device.heartbeat_interval_seconds)
+        if "is_active" in update_data:
+            shard_map.set_active(device.id, device.is_active)
         return device
 
     @staticmethod
-    def delete_device(db: Session, device_id: str) -> bool:
-        """Delete a device."""
+    def delete_device(db: Session, device_id: str) -> Optional[PurgeJob]:
+        """
+        Delete a device and its data.
+
+        The device is deactivated at once; small devices are removed before
+        returning and larger ones by the background purge job.
+
+        Returns:
+            Optional[PurgeJob]: Job tracking the delete, or None if the device does not exist
+        """
         device = DeviceService.get_device(db, device_id)
         if not device:
-            return False
-
-        db.delete(device)
-        db.commit()
-        return True
+            return None
+        return PurgeService.request_purge(db, device)
 
     @staticmethod
     def get_device_count(db: Session) -> int:
         """Get total count of devices."""
         return db.query(Device).count()
 
+    @staticmethod
+    def get_device_counts(db: Session) -> dict:
+        """Get total and active device counts in one query."""
+        total, active = db.execute(
+            select(
+                func.count(Device.id),
+                func.coalesce(func.sum(case((Device.is_active == True, 1), else_=0)), 0),
+            )
+        ).one()
+        return {"total": total, "active": active}
+
     @staticmethod
     def get_active_devices(db: Session) -> List[Device]:
         """Get all active devices."""
@@ -0,0 +1,330 @@
+"""Batch forecasts of every series, fitted from the sketch buckets."""
+
+import math
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal, insert_ignore, upsert
+from ..models import ForecastRun, ReadingForecast, ReadingSketch, SensorReading, Series
+from ..utils import logger
+from .chunk_codec import EPOCH, to_micros
+from .compute_pool import compute_pool
+from .forecasting import MODEL_NAMES, fit_forecasts
+from .metrics import metrics
+from .shard_map import shard_map
+from .sketch_service import SketchService, sketch_builder
+
+settings = get_settings()
+
+FORECAST_COLUMNS = ("origin", "step_seconds", "steps", "model", "bands", "fitted_at")
+
+
+def _steps(hours: float, width_seconds: int) -> int:
+    return max(round(hours * 3600 / width_seconds), 1)
+
+
+class ForecastBuilder:
+    """
+    Refits the forecast of every active series in ``reading_forecasts``.
+
+    Each cycle reads the count and total of every sketch bucket in the
+    lookback window into one ``series x bucket`` matrix of hourly means
+    per shard, so a week of history costs 168 rows per series whatever
+    the reading rate; buckets the sketch builder has not caught up with
+    are aggregated from their readings instead. The matrix is cut into
+    row chunks fitted in the compute pool in parallel (see
+    :func:`~app.services.forecasting.fit_forecasts`), and each series'
+    forecast is stored as one row. Series with too few buckets or none
+    recent enough lose their forecast.
+
+    Every worker runs the cycle, but a shard is only refit by the worker
+    claiming its ``forecast_runs`` row, at most once per interval. A
+    worker only releases a claim that is still its own, so one whose
+    refit ran past ``stale`` and was taken over leaves the new claim be.
+
+    Attributes:
+        lookback: Buckets of history fitted
+        horizon: Buckets forecast
+        season: Buckets per seasonal cycle
+        interval: Time between refits of a shard
+        stale: Time after which a running refit is taken over
+    """
+
+    def __init__(
+        self,
+        lookback_hours: float = 168,
+        horizon_hours: float = 24,
+        season_hours: float = 24,
+        min_points: int = 12,
+        chunk_series: int = 2000,
+        interval_seconds: float = 900.0,
+        stale_seconds: float = 3600.0,
+    ):
+        width_seconds = sketch_builder.width // 1_000_000
+        self.lookback = _steps(lookback_hours, width_seconds)
+        self.horizon = _steps(horizon_hours, width_seconds)
+        self.season = _steps(season_hours, width_seconds)
+        self.min_points = min_points
+        self.chunk_series = max(chunk_series, 1)
+        self.interval = timedelta(seconds=interval_seconds)
+        self.stale = timedelta(seconds=stale_seconds)
+        self._lock = threading.Lock()
+
+    def run(self, db: Session) -> int:
+        """
+        Refit every series on the shards this worker claims.
+
+        Returns:
+            int: Number of series with a fresh forecast
+        """
+        fitted = 0
+        with self._lock:
+            claims = [(shard, self.claim(db, shard.name)) for shard in shard_map.shards.values()]
+            claimed = [(shard, claimed_at) for shard, claimed_at in claims if claimed_at is not None]
+            if not claimed:
+                return 0
+            # Catch the sketches up first so little history is read row by row.
+            sketch_builder.run(db)
+            for shard, claimed_at in claimed:
+                try:
+                    with shard.session(db) as shard_db:
+                        fitted += self._run_shard(shard_db)
+                finally:
+                    db.rollback()
+                    db.execute(
+                        update(ForecastRun)
+                        .where(ForecastRun.shard == shard.name, ForecastRun.claimed_at == claimed_at)
+                        .values(status="idle", finished_at=datetime.utcnow())
+                    )
+                    db.commit()
+        metrics.inc("forecast.series_fitted", fitted)
+        return fitted
+
+    def claim(self, db: Session, name: str) -> Optional[datetime]:
+        """
+        Claim the refit of a shard if it is due, or if its running refit stopped.
+
+        The claim is a conditional UPDATE, so concurrent workers never refit
+        the same shard at once.
+
+        Returns:
+            Optional[datetime]: The ``claimed_at`` this worker stored, or
+            None if the shard was not claimed
+        """
+        now = datetime.utcnow()
+        db.execute(insert_ignore(db, ForecastRun.__table__, ("shard",)).values(shard=name, status="idle"))
+        db.commit()
+        status, claimed_at = db.execute(
+            select(ForecastRun.status, ForecastRun.claimed_at).where(ForecastRun.shard == name)
+        ).one()
+        if claimed_at is not None:
+            if status == "idle" and claimed_at > now - self.interval:
+                return None
+            if status == "running" and claimed_at >= now - self.stale:
+                return None
+        claimed = db.execute(
+            update(ForecastRun)
+            .where(
+                ForecastRun.shard == name,
+                ForecastRun.status == status,
+                ForecastRun.claimed_at.is_(None) if claimed_at is None else ForecastRun.claimed_at == claimed_at,
+            )
+            .values(status="running", claimed_at=now)
+        ).rowcount
+        db.commit()
+        return now if claimed else None
+
+    def history(self, db: Session, now: datetime):
+        """
+        Hourly means of the series on one shard.
+
+        Returns:
+            tuple: Series IDs, the ``series x lookback`` matrix (NaN where
+            a bucket is empty) and the start of the bucket after the last
+            one, where forecasts begin
+        """
+        width = sketch_builder.width
+        end = to_micros(now)
+        _, origin = SketchService.full_buckets(end - self.lookback * width, end)
+        start = origin - self.lookback * width
+        pending = sketch_builder.unbuilt(db, start, origin)
+        rows = db.execute(
+            select(
+                ReadingSketch.series_id,
+                ReadingSketch.bucket_start,
+                ReadingSketch.count,
+                ReadingSketch.total,
+            ).where(
+                ReadingSketch.bucket_start >= EPOCH + timedelta(microseconds=start),
+                ReadingSketch.bucket_start < EPOCH + timedelta(microseconds=origin),
+                sketch_builder.built_only(pending),
+            )
+        ).all()
+        if pending:
+            raw = defaultdict(lambda: [0, 0.0])
+            for series_id, timestamp, value in db.execute(
+                select(SensorReading.series_id, SensorReading.timestamp, SensorReading.value).where(
+                    or_(*sketch_builder.in_buckets(pending))
+                )
+            ):
+                bucket = raw[series_id, sketch_builder.bucket_of(timestamp)]
+                bucket[0] += 1
+                bucket[1] += value
+            rows.extend(
+                (series_id, EPOCH + timedelta(microseconds=bucket), count, total)
+                for (series_id, bucket), (count, total) in raw.items()
+            )
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.lookback)), origin
+        series = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        buckets = np.fromiter((to_micros(row[1]) for row in rows), dtype=np.int64, count=len(rows))
+        means = np.fromiter((row[3] / row[2] for row in rows), dtype=np.float64, count=len(rows))
+        series_ids, index = np.unique(series, return_inverse=True)
+        history = np.full((len(series_ids), self.lookback), np.nan)
+        history[index, (buckets - start) // width] = means
+        return series_ids, history, origin
+
+    def _run_shard(self, db: Session) -> int:
+        """Refit the series of one shard. Caller holds the lock."""
+        now = datetime.utcnow()
+        series_ids, history, origin = self.history(db, now)
+        observed = ~np.isnan(history)
+        # Columns index buckets oldest first; a series must have data within the horizon.
+        recent = observed[:, -self.horizon :].any(axis=1)
+        active = (observed.sum(axis=1) >= self.min_points) & recent
+        series_ids, history = series_ids[active], history[active]
+
+        rows = []
+        if len(series_ids):
+            chunks = [history[i : i + self.chunk_series] for i in range(0, len(history), self.chunk_series)]
+            z = NormalDist().inv_cdf(0.5 + settings.forecast_confidence / 2)
+
+            def fit(chunk: np.ndarray):
+                return compute_pool.run(
+                    fit_forecasts,
+                    chunk,
+                    self.horizon,
+                    self.season,
+                    settings.forecast_smoothing_level,
+                    settings.forecast_smoothing_trend,
+                    settings.forecast_smoothing_season,
+                    z,
+                )
+
+            with ThreadPoolExecutor(max_workers=max(min(compute_pool.workers, len(chunks)), 1)) as executor:
+                results = list(executor.map(fit, chunks))
+            models = np.concatenate([result[0] for result in results])
+            bands = np.stack([np.concatenate([result[i] for result in results]) for i in (1, 2, 3)], axis=1)
+            origin_time = EPOCH + timedelta(microseconds=origin)
+            step_seconds = sketch_builder.width // 1_000_000
+            rows = [
+                {
+                    "series_id": int(series_id),
+                    "origin": origin_time,
+                    "step_seconds": step_seconds,
+                    "steps": self.horizon,
+                    "model": int(model),
+                    "bands": band.tobytes(),
+                    "fitted_at": now,
+                }
+                for series_id, model, band in zip(series_ids.tolist(), models, bands)
+            ]
+            db.execute(upsert(db, ReadingForecast, ("series_id",), FORECAST_COLUMNS), rows)
+        db.execute(delete(ReadingForecast).where(ReadingForecast.fitted_at < now))
+        db.commit()
+        return len(rows)
+
+
+forecast_builder = ForecastBuilder(
+    lookback_hours=settings.forecast_lookback_hours,
+    horizon_hours=settings.forecast_horizon_hours,
+    season_hours=settings.forecast_season_hours,
+    min_points=settings.forecast_min_points,
+    chunk_series=settings.forecast_chunk_series,
+    interval_seconds=settings.forecast_interval_seconds,
+    stale_seconds=settings.forecast_stale_seconds,
+)
+
+
+class ForecastService:
+    """Forecasts stored by the forecast cycle, one indexed row per series."""
+
+    @staticmethod
+    def get_forecast(
+        db: Session,
+        device_id: str,
+        sensor_type: str,
+        unit: Optional[str] = None,
+        hours: Optional[float] = None,
+    ) -> Optional[dict]:
+        """
+        Latest forecast of a device's sensor type.
+
+        Args:
+            db: Database session
+            device_id: Device whose series to look up
+            sensor_type: Sensor type of the series
+            unit: Pick the series reporting in this unit; the most recently
+                fitted one otherwise
+            hours: Return only the steps starting within this many hours of
+                the origin
+
+        Returns:
+            dict: Model, origin, step length and the forecast points, or
+            None if the series has no forecast
+        """
+        statement = (
+            select(ReadingForecast, Series.unit)
+            .join(Series, Series.id == ReadingForecast.series_id)
+            .where(Series.device_id == device_id, Series.sensor_type == sensor_type)
+        )
+        if unit is not None:
+            statement = statement.where(Series.unit == unit)
+        with shard_map.owner(device_id).session(db) as shard_db:
+            row = shard_db.execute(statement.order_by(ReadingForecast.fitted_at.desc()).limit(1)).first()
+        if row is None:
+            return None
+        forecast, series_unit = row
+        values, lower, upper = np.frombuffer(forecast.bands, dtype=np.float32).reshape(3, forecast.steps)
+        steps = forecast.steps
+        if hours is not None:
+            steps = min(steps, max(math.ceil(hours * 3600 / forecast.step_seconds), 1))
+        step = timedelta(seconds=forecast.step_seconds)
+        return {
+            "device_id": device_id,
+            "sensor_type": sensor_type,
+            "unit": series_unit,
+            "model": MODEL_NAMES[forecast.model],
+            "fitted_at": forecast.fitted_at,
+            "origin": forecast.origin,
+            "step_seconds": forecast.step_seconds,
+            "points": [
+                {
+                    "timestamp": forecast.origin + i * step,
+                    "value": float(values[i]),
+                    "lower": float(lower[i]),
+                    "upper": float(upper[i]),
+                }
+                for i in range(steps)
+            ],
+        }
+
+
+def run_forecast_cycle() -> None:
+    """Refit every forecast on a short-lived session."""
+    db = SessionLocal()
+    try:
+        fitted = forecast_builder.run(db)
+        if fitted:
+            logger.info(f"Forecast cycle fitted {fitted} series")
+    finally:
+        db.close()
@@ -0,0 +1,140 @@
+"""Short-horizon forecasts fitted to many regular series at once."""
+
+from typing import Tuple
+
+import numpy as np
+
+# Model codes stored with each forecast.
+LINEAR = 0
+HOLT_WINTERS = 1
+MODEL_NAMES = ("linear", "holt_winters")
+
+
+def _linear_trend(y: np.ndarray, mask: np.ndarray, horizon: int):
+    """
+    Least-squares line through the observed points of every row.
+
+    Returns intercept and slope, the forecasts for steps
+    ``T .. T + horizon - 1`` and their standard errors, which widen away
+    from the observed points.
+    """
+    rows, steps = y.shape
+    t = np.arange(steps, dtype=np.float64)
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    t_mean = np.where(mask, t, 0.0).sum(axis=1) / safe_n
+    y_mean = np.where(mask, y, 0.0).sum(axis=1) / safe_n
+    dt = np.where(mask, t - t_mean[:, None], 0.0)
+    dy = np.where(mask, y - y_mean[:, None], 0.0)
+    spread = (dt * dt).sum(axis=1)
+    slope = np.divide((dt * dy).sum(axis=1), spread, out=np.zeros(rows), where=spread > 0)
+    intercept = y_mean - slope * t_mean
+
+    residuals = np.where(mask, y - (intercept[:, None] + slope[:, None] * t), 0.0)
+    sigma = np.sqrt((residuals * residuals).sum(axis=1) / np.maximum(n - 2, 1))
+    future = np.arange(steps, steps + horizon, dtype=np.float64)
+    forecast = intercept[:, None] + slope[:, None] * future
+    leverage = np.divide(
+        (future - t_mean[:, None]) ** 2,
+        spread[:, None],
+        out=np.zeros((rows, horizon)),
+        where=spread[:, None] > 0,
+    )
+    error = sigma[:, None] * np.sqrt(1 + 1 / safe_n[:, None] + leverage)
+    return intercept, slope, forecast, error
+
+
+def _holt_winters(
+    y: np.ndarray,
+    mask: np.ndarray,
+    horizon: int,
+    season: int,
+    intercept: np.ndarray,
+    slope: np.ndarray,
+    alpha: float,
+    beta: float,
+    gamma: float,
+):
+    """
+    Additive Holt-Winters smoothing of every row, one time step at a time.
+
+    Level and trend start from the least-squares line and the seasonal
+    profile from the mean detrended value at each phase, so no history is
+    spent warming up. Missing points carry the state forward unchanged.
+    The error scale comes from one-step-ahead errors after the first
+    season.
+    """
+    rows, steps = y.shape
+    t = np.arange(steps, dtype=np.float64)
+    detrended = np.where(mask, y - (intercept[:, None] + slope[:, None] * t), 0.0)
+    seasonal = np.zeros((rows, season))
+    counts = np.zeros((rows, season))
+    for k in range(season):
+        seasonal[:, k] = detrended[:, k::season].sum(axis=1)
+        counts[:, k] = mask[:, k::season].sum(axis=1)
+    seasonal = np.divide(seasonal, counts, out=np.zeros_like(seasonal), where=counts > 0)
+    seasonal -= seasonal.mean(axis=1, keepdims=True)
+
+    level = intercept - slope
+    trend = slope.copy()
+    squared_error = np.zeros(rows)
+    errors = np.zeros(rows)
+    for i in range(steps):
+        k = i % season
+        observed = mask[:, i]
+        value = y[:, i]
+        expected = level + trend
+        if i >= season:
+            error = np.where(observed, value - expected - seasonal[:, k], 0.0)
+            squared_error += error * error
+            errors += observed
+        new_level = np.where(observed, alpha * (value - seasonal[:, k]) + (1 - alpha) * expected, expected)
+        trend = np.where(observed, beta * (new_level - level) + (1 - beta) * trend, trend)
+        seasonal[:, k] = np.where(observed, gamma * (value - new_level) + (1 - gamma) * seasonal[:, k], seasonal[:, k])
+        level = new_level
+
+    h = np.arange(1, horizon + 1)
+    forecast = level[:, None] + h * trend[:, None] + seasonal[:, (steps - 1 + h) % season]
+    sigma = np.sqrt(squared_error / np.maximum(errors, 1))
+    # Variance of an h-step forecast grows with the smoothed shocks carried forward.
+    j = np.arange(1, horizon)
+    carried = (alpha * (1 + j * beta) + gamma * (j % season == 0)) ** 2
+    growth = np.sqrt(1 + np.concatenate(([0.0], np.cumsum(carried))))
+    return forecast, sigma[:, None] * growth
+
+
+def fit_forecasts(
+    y: np.ndarray,
+    horizon: int,
+    season: int,
+    alpha: float,
+    beta: float,
+    gamma: float,
+    z: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Forecast the next ``horizon`` steps of every row of ``y``.
+
+    ``y`` holds one regular series per row, NaN where a step has no data.
+    Rows with two full seasons of observations get additive Holt-Winters,
+    the rest a linear trend. Bands are ``forecast ± z * standard error``.
+
+    Returns:
+        tuple: Model codes, forecasts, lower and upper bands (float32)
+    """
+    mask = ~np.isnan(y)
+    intercept, slope, forecast, error = _linear_trend(y, mask, horizon)
+    models = np.full(len(y), LINEAR, dtype=np.int8)
+    seasonal = mask.sum(axis=1) >= 2 * season
+    if seasonal.any():
+        rows = np.flatnonzero(seasonal)
+        forecast[rows], error[rows] = _holt_winters(
+            y[rows], mask[rows], horizon, season, intercept[rows], slope[rows], alpha, beta, gamma
+        )
+        models[rows] = HOLT_WINTERS
+    return (
+        models,
+        forecast.astype(np.float32),
+        (forecast - z * error).astype(np.float32),
+        (forecast + z * error).astype(np.float32),
+    )
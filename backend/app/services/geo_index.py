@@ -0,0 +1,240 @@
+"""In-memory spatial index over device coordinates."""
+
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import Device
+
+settings = get_settings()
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = 9) -> str:
+    """
+    Encode a coordinate as a geohash string.
+
+    Nine characters resolve to roughly 5 m, which is finer than any device
+    placement we store; shorter prefixes give coarser enclosing cells.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid mapping cells to device IDs.
+
+    Range queries visit only the cells overlapping the query box, then
+    filter exact coordinates, so cost scales with the candidates near the
+    query rather than with fleet size. The index is per-process: it is
+    loaded at startup, kept in sync by ``DeviceService`` writes, and
+    topped up by a background cycle from ``Device.updated_at`` so writes
+    made by other workers become visible. Each pass re-reads one refresh
+    interval before the last, so an update committing after its
+    ``updated_at`` is still picked up. Devices deleted elsewhere are
+    removed when the device change cycle sees the delete; until then
+    callers re-fetching matched rows from the database drop them.
+
+    Attributes:
+        cell_degrees: Edge length of one grid cell in degrees
+        refresh_seconds: Interval of the background refresh
+    """
+
+    def __init__(self, cell_degrees: float = 0.05, refresh_seconds: float = 30.0):
+        self.cell_degrees = cell_degrees
+        self.refresh_seconds = refresh_seconds
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._points: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.RLock()
+        self._synced_at: Optional[datetime] = None
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (
+            int(math.floor(latitude / self.cell_degrees)),
+            int(math.floor(longitude / self.cell_degrees)),
+        )
+
+    def upsert(self, device_id: str, latitude: Optional[float], longitude: Optional[float]) -> None:
+        """Insert or move a device; devices without coordinates are removed."""
+        with self._lock:
+            self.remove(device_id)
+            if latitude is None or longitude is None:
+                return
+            self._points[device_id] = (latitude, longitude)
+            self._cells.setdefault(self._cell(latitude, longitude), set()).add(device_id)
+
+    def remove(self, device_id: str) -> None:
+        """Drop a device from the index if present."""
+        with self._lock:
+            point = self._points.pop(device_id, None)
+            if point is None:
+                return
+            key = self._cell(*point)
+            members = self._cells.get(key)
+            if members is not None:
+                members.discard(device_id)
+                if not members:
+                    del self._cells[key]
+
+    def load(self, db: Session) -> None:
+        """Rebuild the index from the devices table."""
+        synced_at = datetime.utcnow()
+        rows = db.execute(
+            select(Device.id, Device.latitude, Device.longitude).where(
+                Device.latitude.is_not(None), Device.longitude.is_not(None)
+            )
+        ).all()
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            for device_id, latitude, longitude in rows:
+                self.upsert(device_id, latitude, longitude)
+            self._synced_at = synced_at
+
+    def refresh(self, db: Session) -> None:
+        """Apply device changes made since the last sync."""
+        if self._synced_at is None:
+            self.load(db)
+            return
+        synced_at = datetime.utcnow()
+        since = self._synced_at - timedelta(seconds=self.refresh_seconds)
+        rows = db.execute(
+            select(Device.id, Device.latitude, Device.longitude).where(Device.updated_at >= since)
+        ).all()
+        with self._lock:
+            for device_id, latitude, longitude in rows:
+                self.upsert(device_id, latitude, longitude)
+            self._synced_at = synced_at
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> Iterable[str]:
+        lat_lo, lon_lo = self._cell(min_lat, min_lon)
+        lat_hi, lon_hi = self._cell(max_lat, max_lon)
+        n_cells = (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1)
+        if n_cells > len(self._cells):
+            # Sparse grid: walking occupied cells is cheaper than the box.
+            for (cy, cx), members in self._cells.items():
+                if lat_lo <= cy <= lat_hi and lon_lo <= cx <= lon_hi:
+                    yield from members
+            return
+        for cy in range(lat_lo, lat_hi + 1):
+            for cx in range(lon_lo, lon_hi + 1):
+                members = self._cells.get((cy, cx))
+                if members:
+                    yield from members
+
+    def within(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[str]:
+        """
+        Return IDs of devices inside a bounding box.
+
+        A box with ``min_lon > max_lon`` is treated as crossing the
+        antimeridian.
+        """
+        if min_lon > max_lon:
+            return self.within(min_lat, min_lon, max_lat, 180.0) + self.within(
+                min_lat, -180.0, max_lat, max_lon
+            )
+        with self._lock:
+            points = self._points
+            return [
+                device_id
+                for device_id in self._candidates(min_lat, min_lon, max_lat, max_lon)
+                if min_lat <= points[device_id][0] <= max_lat
+                and min_lon <= points[device_id][1] <= max_lon
+            ]
+
+    def near(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[str, float]]:
+        """
+        Return ``(device_id, distance_km)`` pairs within a radius, nearest first.
+
+        The radius is first converted to an enclosing bounding box for grid
+        pruning; exact haversine distances are only computed for candidates.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        min_lat = max(-90.0, latitude - dlat)
+        max_lat = min(90.0, latitude + dlat)
+        cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+        if cos_lat <= 1e-9 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180.0:
+            boxes = [(min_lat, -180.0, max_lat, 180.0)]
+        else:
+            dlon = radius_km / (KM_PER_DEGREE * cos_lat)
+            min_lon = (longitude - dlon + 540.0) % 360.0 - 180.0
+            max_lon = (longitude + dlon + 540.0) % 360.0 - 180.0
+            boxes = [(min_lat, min_lon, max_lat, max_lon)]
+
+        with self._lock:
+            hits = []
+            for box in boxes:
+                for device_id in self.within(*box):
+                    point = self._points[device_id]
+                    distance = haversine_km(latitude, longitude, point[0], point[1])
+                    if distance <= radius_km:
+                        hits.append((device_id, distance))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+
+geo_index = GridIndex(
+    cell_degrees=settings.geo_index_cell_degrees,
+    refresh_seconds=settings.geo_index_refresh_seconds,
+)
+
+
+def run_geo_index_cycle() -> None:
+    """Refresh the spatial index on a short-lived session."""
+    db = SessionLocal()
+    try:
+        geo_index.refresh(db)
+    finally:
+        db.close()
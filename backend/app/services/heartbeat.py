@@ -0,0 +1,327 @@
+"""Device heartbeat tracking and offline detection."""
+
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import Alert, Device
+from ..schemas import AlertCreate
+from ..utils import logger
+from .alert_service import AlertService
+from .change_feed_service import ChangeFeedService
+
+settings = get_settings()
+
+OFFLINE_ALERT_TYPE = "Device Offline"
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel holding at most one entry per key.
+
+    Scheduling is O(1). When a slot fires, each key is checked against its
+    current deadline: keys whose deadline moved later are re-inserted at
+    the new slot instead of expiring. Heartbeats therefore only update the
+    deadline map and never touch the wheel once a key is scheduled.
+
+    Attributes:
+        tick_seconds: Resolution of one slot
+        size: Number of slots in one rotation
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, size: int = 512):
+        self.tick_seconds = tick_seconds
+        self.size = size
+        self._slots: List[Set[str]] = [set() for _ in range(size)]
+        self._deadlines: Dict[str, float] = {}
+        self._scheduled: Set[str] = set()
+        self._current_tick: Optional[int] = None
+
+    def _tick_of(self, at: float) -> int:
+        return int(math.floor(at / self.tick_seconds))
+
+    def _insert(self, key: str, deadline: float) -> None:
+        tick = self._tick_of(deadline)
+        if self._current_tick is not None:
+            # Past-due or current-tick deadlines fire on the next advance.
+            tick = max(tick, self._current_tick + 1)
+        self._scheduled.add(key)
+        self._slots[tick % self.size].add(key)
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Set the deadline for ``key``, inserting it into the wheel if absent."""
+        self._deadlines[key] = deadline
+        if key not in self._scheduled:
+            self._insert(key, deadline)
+
+    def cancel(self, key: str) -> None:
+        """Stop tracking ``key``; a stale wheel entry is skipped when it fires."""
+        self._deadlines.pop(key, None)
+
+    def deadline(self, key: str) -> Optional[float]:
+        """Current deadline for ``key``, if tracked."""
+        return self._deadlines.get(key)
+
+    def advance(self, now: float) -> List[str]:
+        """
+        Fire every slot up to ``now`` and return keys whose deadline passed.
+
+        Expired keys are removed from the wheel.
+        """
+        target = self._tick_of(now)
+        if self._current_tick is None:
+            self._current_tick = target - 1
+        # Never walk more than one full rotation after a stall.
+        start = max(self._current_tick + 1, target - self.size + 1)
+        expired = []
+        for tick in range(start, target + 1):
+            self._current_tick = tick
+            slot = self._slots[tick % self.size]
+            if not slot:
+                continue
+            pending = list(slot)
+            slot.clear()
+            for key in pending:
+                self._scheduled.discard(key)
+                deadline = self._deadlines.get(key)
+                if deadline is None:
+                    continue
+                if deadline <= now:
+                    del self._deadlines[key]
+                    expired.append(key)
+                else:
+                    self._insert(key, deadline)
+        self._current_tick = target
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+
+class HeartbeatTracker:
+    """
+    Tracks when each device last reported and flips silent devices offline.
+
+    ``beat`` is called on every ingest and only touches in-memory maps.
+    A background loop calls :meth:`run_once`, which persists last-seen
+    times in one batched UPDATE and expires devices whose reporting
+    interval (times the grace factor) has elapsed. Expiry is confirmed
+    against the persisted ``last_seen_at`` so a device reporting through
+    another worker process is not marked offline, and every flush sets
+    devices it has beats for back to ``active`` if they are stored as
+    ``offline``, whichever worker marked them. Beats for IDs with no
+    device row are dropped at the next flush.
+    """
+
+    def __init__(
+        self,
+        default_interval_seconds: float,
+        grace_factor: float,
+        tick_seconds: float = 1.0,
+        raise_alerts: bool = True,
+    ):
+        self.default_interval = default_interval_seconds
+        self.grace_factor = grace_factor
+        self.raise_alerts = raise_alerts
+        self._wheel = TimingWheel(tick_seconds=tick_seconds)
+        self._intervals: Dict[str, float] = {}
+        self._last_seen: Dict[str, datetime] = {}
+        self._dirty: Dict[str, datetime] = {}
+        self._offline: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _timeout(self, device_id: str) -> float:
+        return self._intervals.get(device_id, self.default_interval) * self.grace_factor
+
+    def set_interval(self, device_id: str, interval_seconds: Optional[float]) -> None:
+        """Set the expected reporting interval of a device (``None`` for the default)."""
+        with self._lock:
+            if interval_seconds:
+                self._intervals[device_id] = interval_seconds
+            else:
+                self._intervals.pop(device_id, None)
+
+    def forget(self, device_id: str) -> None:
+        """Stop tracking a deleted device."""
+        with self._lock:
+            self._drop(device_id)
+
+    def _drop(self, device_id: str) -> None:
+        """Remove every trace of a device. Caller holds the lock."""
+        self._wheel.cancel(device_id)
+        self._intervals.pop(device_id, None)
+        self._last_seen.pop(device_id, None)
+        self._dirty.pop(device_id, None)
+        self._offline.discard(device_id)
+
+    def beat(self, device_id: str, seen_at: Optional[datetime] = None) -> None:
+        """Record that a device reported. O(1)."""
+        seen_at = seen_at or datetime.utcnow()
+        with self._lock:
+            self._last_seen[device_id] = seen_at
+            self._dirty[device_id] = seen_at
+            self._wheel.schedule(device_id, time.time() + self._timeout(device_id))
+            self._offline.discard(device_id)
+
+    def last_seen(self, device_id: str) -> Optional[datetime]:
+        """Last time a device was seen by this process."""
+        return self._last_seen.get(device_id)
+
+    def load(self, db: Session) -> None:
+        """Seed intervals, last-seen times and offline state from the devices table."""
+        rows = db.execute(
+            select(Device.id, Device.status, Device.last_seen_at, Device.heartbeat_interval_seconds)
+        ).all()
+        now_wall = time.time()
+        now = datetime.utcnow()
+        with self._lock:
+            for device_id, status, last_seen_at, interval in rows:
+                if interval:
+                    self._intervals[device_id] = interval
+                if status == "offline":
+                    self._offline.add(device_id)
+                if last_seen_at is None or status == "offline":
+                    continue
+                self._last_seen[device_id] = last_seen_at
+                elapsed = (now - last_seen_at).total_seconds()
+                self._wheel.schedule(device_id, now_wall + self._timeout(device_id) - elapsed)
+
+    def run_once(self, db: Session) -> None:
+        """Flush last-seen times, then expire and recover devices."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            expired = self._wheel.advance(time.time())
+
+        try:
+            if dirty:
+                known = set(db.execute(select(Device.id).where(Device.id.in_(list(dirty)))).scalars())
+                if len(known) < len(dirty):
+                    with self._lock:
+                        for device_id in dirty.keys() - known:
+                            self._drop(device_id)
+                    dirty = {device_id: seen_at for device_id, seen_at in dirty.items() if device_id in known}
+            if dirty:
+                devices = Device.__table__
+                # Last-seen times are not edits: keep updated_at from moving with them.
+                db.execute(
+                    update(devices)
+                    .where(devices.c.id == bindparam("device_id"))
+                    .values(last_seen_at=bindparam("seen_at"), updated_at=devices.c.updated_at),
+                    [{"device_id": k, "seen_at": v} for k, v in dirty.items()],
+                )
+                db.commit()
+                self._mark_online(db, list(dirty))
+            if expired:
+                self._expire(db, expired)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for device_id, seen_at in dirty.items():
+                    self._dirty.setdefault(device_id, seen_at)
+            raise
+
+    def _mark_online(self, db: Session, device_ids: List[str]) -> None:
+        """Set devices stored as offline back to active and resolve their offline alerts."""
+        online = db.execute(
+            update(Device)
+            .where(Device.id.in_(device_ids), Device.status == "offline")
+            .values(status="active", updated_at=datetime.utcnow())
+            .returning(Device.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if not online:
+            return
+        ChangeFeedService.record_many(
+            db, "device", "update", ((device_id, {"status": "active"}) for device_id in online)
+        )
+        db.commit()
+        # The alert may have been raised by another worker, so look it up in the database.
+        alert_ids = db.execute(
+            select(Alert.id).where(
+                Alert.device_id.in_(online),
+                Alert.alert_type == OFFLINE_ALERT_TYPE,
+                Alert.is_resolved == False,
+            )
+        ).scalars().all()
+        for alert_id in alert_ids:
+            AlertService.resolve_alert(db, alert_id)
+        logger.info(f"Devices back online: {len(online)}")
+
+    def _expire(self, db: Session, device_ids: List[str]) -> None:
+        persisted = dict(
+            db.execute(select(Device.id, Device.last_seen_at).where(Device.id.in_(device_ids))).all()
+        )
+        now = datetime.utcnow()
+        offline = []
+        with self._lock:
+            for device_id in device_ids:
+                if device_id not in persisted:
+                    self._drop(device_id)
+                    continue
+                seen_at = persisted[device_id]
+                timeout = self._timeout(device_id)
+                if seen_at is not None and (now - seen_at).total_seconds() < timeout:
+                    # Reported through another worker: resume tracking.
+                    remaining = timeout - (now - seen_at).total_seconds()
+                    self._wheel.schedule(device_id, time.time() + remaining)
+                    continue
+                self._offline.add(device_id)
+                offline.append(device_id)
+
+        if not offline:
+            return
+        marked = db.execute(
+            update(Device)
+            .where(Device.id.in_(offline), Device.status == "active", Device.is_active == True)
+            .values(status="offline", updated_at=now)
+            .returning(Device.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        ChangeFeedService.record_many(
+            db, "device", "update", ((device_id, {"status": "offline"}) for device_id in marked)
+        )
+        if not marked:
+            return
+        logger.warning(f"Devices marked offline: {len(marked)}")
+        if self.raise_alerts:
+            # Inactive, purging and maintenance devices are not marked, and
+            # devices already offline got their alert when they were.
+            for device_id in marked:
+                AlertService.create_alert(
+                    db,
+                    AlertCreate(
+                        device_id=device_id,
+                        alert_type=OFFLINE_ALERT_TYPE,
+                        severity="HIGH",
+                        message=f"No data received for more than {self._timeout(device_id):.0f} seconds",
+                    ),
+                )
+
+    def stats(self) -> dict:
+        """Counts of tracked and offline devices in this process."""
+        return {"tracked": len(self._wheel), "offline": len(self._offline)}
+
+
+heartbeat_tracker = HeartbeatTracker(
+    default_interval_seconds=settings.heartbeat_default_interval_seconds,
+    grace_factor=settings.heartbeat_grace_factor,
+    tick_seconds=settings.heartbeat_tick_seconds,
+    raise_alerts=settings.heartbeat_offline_alerts,
+)
+
+
+def run_heartbeat_cycle() -> None:
+    """Run one tracker cycle on a short-lived session."""
+    db = SessionLocal()
+    try:
+        heartbeat_tracker.run_once(db)
+    finally:
+        db.close()
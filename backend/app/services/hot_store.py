@@ -0,0 +1,471 @@
+"""Compressed in-memory store of recent readings, per series."""
+
+import bisect
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import SensorReading
+from ..utils import logger
+from .chunk_codec import EPOCH, Columns, EncodedChunk, to_micros
+from .range_cache import range_cache
+from .series_catalog import ReadingRow, select_readings
+from .shard_map import shard_map
+
+settings = get_settings()
+
+SeriesId = Tuple[str, str]
+
+# IDs skipped by a sync are re-read on later syncs for this long, so rows
+# committed out of ID order by concurrent writers are still picked up.
+_SYNC_GAP_SECONDS = 600.0
+# Gap ranges re-read per shard and sync; the oldest are given up beyond this.
+_SYNC_MAX_GAPS = 1000
+# Open chunks whose newest point is older than this are sealed.
+_IDLE_SEAL_MICROS = 10 * 60 * 1_000_000
+# Bytes per point held in the uncompressed open chunk.
+_OPEN_POINT_BYTES = 32
+
+
+def _missing(lo: int, hi: int, ids: np.ndarray) -> List[Tuple[int, int]]:
+    """Ranges of IDs in ``[lo, hi]`` absent from the sorted ``ids``."""
+    inside = ids[(ids >= lo) & (ids <= hi)]
+    bounds = np.concatenate(([lo - 1], inside, [hi + 1]))
+    holes = np.flatnonzero(np.diff(bounds) > 1)
+    return [(int(bounds[i]) + 1, int(bounds[i + 1]) - 1) for i in holes.tolist()]
+
+
+class _Series:
+    """Sealed chunks plus an uncompressed, array-backed open chunk."""
+
+    __slots__ = ("unit", "covered_from", "chunks", "timestamps", "values", "ids", "created")
+
+    def __init__(self, unit: str, covered_from: int):
+        self.unit = unit
+        self.covered_from = covered_from
+        self.chunks: List[EncodedChunk] = []
+        self._reset_open()
+
+    def _reset_open(self) -> None:
+        self.timestamps = array("q")
+        self.values = array("d")
+        self.ids = array("q")
+        self.created = array("q")
+
+    def open_columns(self) -> Columns:
+        return (
+            np.array(self.timestamps, dtype=np.int64),
+            np.array(self.values, dtype=np.float64),
+            np.array(self.ids, dtype=np.int64),
+            np.array(self.created, dtype=np.int64),
+        )
+
+
+class HotWindowStore:
+    """
+    Recent readings of every series, compressed in memory.
+
+    Points land in a per-series open chunk backed by ``array`` columns and
+    are sealed into compressed :class:`EncodedChunk` objects every ``chunk_size``
+    points. Range, latest-value and average queries over the window are
+    answered from memory; chunks fully inside an average's range contribute
+    their precomputed sum and count without being decoded.
+
+    The store only answers a query when it is sure to hold every point of
+    the range: from the moment it was loaded or started, minus anything
+    aged out of the window, evicted under the memory cap or deleted. Other
+    queries return ``None`` and callers fall back to the database. Rows
+    this process did not add itself (other workers, bulk imports, the line
+    gateway) are picked up by :meth:`sync`.
+
+    Attributes:
+        window: How far back points are kept
+        max_bytes: Memory cap across all series
+        chunk_size: Points per sealed chunk
+    """
+
+    def __init__(self, window_hours: float = 48.0, max_bytes: int = 256 * 2**20, chunk_size: int = 512):
+        self.window = timedelta(hours=window_hours)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._series: Dict[SeriesId, _Series] = {}
+        self._sealed_bytes = 0
+        self._covered_from: Optional[int] = None
+        # Newest reading ID read from each shard by load or sync (IDs are only
+        # ordered within one), and the ID ranges below it not read yet with
+        # when they were found. Local writes do not move the cursor: rows
+        # written around them with lower IDs must still be read.
+        self._sync_ids: Dict[str, int] = {}
+        self._gaps: Dict[str, List[Tuple[int, int, float]]] = {}
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._covered_from is not None
+
+    def _window_start(self) -> int:
+        return to_micros(datetime.utcnow() - self.window)
+
+    def _coverage(self, series: Optional[_Series]) -> Optional[int]:
+        if self._covered_from is None:
+            return None
+        covered_from = max(self._covered_from, self._window_start())
+        if series is not None:
+            covered_from = max(covered_from, series.covered_from)
+        return covered_from
+
+    # -- writes -----------------------------------------------------------
+
+    def add_many(self, rows: Iterable) -> None:
+        """Add stored readings shaped like :class:`ReadingRow`; re-adding a timestamp replaces the point."""
+        if self._covered_from is None:
+            return
+        with self._lock:
+            for row in rows:
+                self._add(
+                    row.device_id,
+                    row.sensor_type,
+                    row.unit,
+                    to_micros(row.timestamp),
+                    row.value,
+                    row.id,
+                    to_micros(row.created_at),
+                )
+
+    def _add(self, device_id, sensor_type, unit, ts, value, reading_id, created) -> None:
+        key = (device_id, sensor_type)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(unit, 0)
+        elif series.unit != unit:
+            # Points of one series must share a unit; restart coverage at the change.
+            self._drop_series(key)
+            series = self._series[key] = _Series(unit, ts)
+        if ts < self._coverage(series):
+            return
+
+        open_ts = series.timestamps
+        if series.chunks and (not open_ts or ts < open_ts[0]) and ts <= series.chunks[-1].end:
+            self._rewrite(series, ts, value, reading_id, created)
+            return
+
+        if not open_ts or ts > open_ts[-1]:
+            index = len(open_ts)
+        else:
+            index = bisect.bisect_left(open_ts, ts)
+            if open_ts[index] == ts:
+                series.values[index] = value
+                series.ids[index] = reading_id
+                series.created[index] = created
+                return
+        open_ts.insert(index, ts)
+        series.values.insert(index, value)
+        series.ids.insert(index, reading_id)
+        series.created.insert(index, created)
+        if len(open_ts) >= self.chunk_size:
+            self._seal(series)
+
+    def _seal(self, series: _Series) -> None:
+        if not series.timestamps:
+            return
+        chunk = EncodedChunk(*series.open_columns())
+        series.chunks.append(chunk)
+        series._reset_open()
+        self._sealed_bytes += chunk.nbytes
+
+    def _rewrite(self, series: _Series, ts: int, value: float, reading_id: int, created: int) -> None:
+        """Insert a late point into the sealed chunk covering it."""
+        starts = [chunk.start for chunk in series.chunks]
+        index = max(bisect.bisect_right(starts, ts) - 1, 0)
+        old = series.chunks[index]
+        timestamps, values, ids, created_at = (column.copy() for column in old.decode())
+        position = int(np.searchsorted(timestamps, ts))
+        if position < len(timestamps) and timestamps[position] == ts:
+            values[position] = value
+            ids[position] = reading_id
+            created_at[position] = created
+        else:
+            timestamps = np.insert(timestamps, position, ts)
+            values = np.insert(values, position, value)
+            ids = np.insert(ids, position, reading_id)
+            created_at = np.insert(created_at, position, created)
+        chunk = EncodedChunk(timestamps, values, ids, created_at)
+        series.chunks[index] = chunk
+        self._sealed_bytes += chunk.nbytes - old.nbytes
+
+    def _drop_series(self, key: SeriesId) -> None:
+        series = self._series.pop(key, None)
+        if series is not None:
+            self._sealed_bytes -= sum(chunk.nbytes for chunk in series.chunks)
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop every series of a deleted device."""
+        with self._lock:
+            for key in [key for key in self._series if key[0] == device_id]:
+                self._drop_series(key)
+
+    def drop_before(self, cutoff: datetime) -> None:
+        """Stop answering for data before ``cutoff`` after it was deleted from the database."""
+        with self._lock:
+            if self._covered_from is not None:
+                self._covered_from = max(self._covered_from, to_micros(cutoff))
+
+    # -- reads ------------------------------------------------------------
+
+    def _snapshot(self, device_id: str, sensor_type: str, start: int) -> Optional[Tuple[_Series, List[EncodedChunk], Columns]]:
+        with self._lock:
+            series = self._series.get((device_id, sensor_type))
+            covered_from = self._coverage(series)
+            if covered_from is None or start < covered_from:
+                return None
+            if series is None:
+                return None, [], None
+            return series, list(series.chunks), series.open_columns()
+
+    def range(
+        self,
+        device_id: str,
+        sensor_type: str,
+        start_time: datetime,
+        end_time: Optional[datetime] = None,
+    ) -> Optional[Tuple[Optional[str], Columns]]:
+        """
+        Columns of the points in ``[start_time, end_time]``.
+
+        Returns:
+            ``(unit, (timestamps_us, values, ids, created_us))``, or None if
+            the range is not fully held in memory
+        """
+        start = to_micros(start_time)
+        end = to_micros(end_time) if end_time is not None else np.iinfo(np.int64).max
+        snapshot = self._snapshot(device_id, sensor_type, start)
+        if snapshot is None:
+            return None
+        series, chunks, open_columns = snapshot
+        parts = [chunk.decode() for chunk in chunks if chunk.end >= start and chunk.start <= end]
+        if open_columns is not None:
+            parts.append(open_columns)
+        sliced = []
+        for columns in parts:
+            lo = int(np.searchsorted(columns[0], start, side="left"))
+            hi = int(np.searchsorted(columns[0], end, side="right"))
+            if hi > lo:
+                sliced.append(tuple(column[lo:hi] for column in columns))
+        if not sliced:
+            empty = np.empty(0, dtype=np.int64)
+            return (series.unit if series else None), (empty, np.empty(0), empty, empty)
+        return series.unit, tuple(np.concatenate(column) for column in zip(*sliced))
+
+    def latest(self, device_id: str, sensor_type: str) -> Optional[ReadingRow]:
+        """Newest point of a series as a reading row, if held in memory."""
+        with self._lock:
+            series = self._series.get((device_id, sensor_type))
+            covered_from = self._coverage(series)
+            if series is None or covered_from is None:
+                return None
+            if series.timestamps:
+                point = (series.timestamps[-1], series.values[-1], series.ids[-1], series.created[-1])
+            elif series.chunks:
+                columns = series.chunks[-1].decode()
+                point = tuple(column[-1].item() for column in columns)
+            else:
+                return None
+            if point[0] < covered_from:
+                return None
+        return ReadingRow(
+            point[2],
+            device_id,
+            sensor_type,
+            point[1],
+            series.unit,
+            EPOCH + timedelta(microseconds=point[0]),
+            EPOCH + timedelta(microseconds=point[3]),
+        )
+
+    def average(self, device_id: str, sensor_type: str, start_time: datetime) -> Optional[Tuple[float, int]]:
+        """
+        Sum and count of the points since ``start_time``.
+
+        Returns:
+            ``(total, count)``, or None if the range is not fully held
+        """
+        start = to_micros(start_time)
+        snapshot = self._snapshot(device_id, sensor_type, start)
+        if snapshot is None:
+            return None
+        _, chunks, open_columns = snapshot
+        total = 0.0
+        count = 0
+        for chunk in chunks:
+            if chunk.end < start:
+                continue
+            if chunk.start >= start:
+                total += chunk.total
+                count += chunk.count
+                continue
+            timestamps, values, _, _ = chunk.decode()
+            selected = values[timestamps >= start]
+            total += float(selected.sum())
+            count += len(selected)
+        if open_columns is not None:
+            selected = open_columns[1][open_columns[0] >= start]
+            total += float(selected.sum())
+            count += len(selected)
+        return total, count
+
+    # -- maintenance ------------------------------------------------------
+
+    def load(self, db: Session) -> None:
+        """Fill the store with the readings inside the window, from every shard."""
+        window_start = datetime.utcnow() - self.window
+        statement = (
+            select_readings()
+            .where(SensorReading.timestamp >= window_start)
+            .order_by(SensorReading.timestamp.asc())
+            .execution_options(yield_per=10_000)
+        )
+        with self._sync_lock:
+            with self._lock:
+                self._series.clear()
+                self._sealed_bytes = 0
+                self._covered_from = to_micros(window_start)
+            self._sync_ids = {}
+            self._gaps = {}
+            for shard in shard_map.shards.values():
+                with shard.session(db) as shard_db:
+                    newest = shard_db.execute(select(func.max(SensorReading.id))).scalar()
+                    self._sync_ids[shard.name] = newest or 0
+                    for partition in shard_db.execute(statement).partitions():
+                        self.add_many(partition)
+                        self.trim()
+
+    def sync(self, db: Session, on_rows: Optional[Callable[[list], None]] = None) -> int:
+        """
+        Add readings written since the last load or sync, on every shard.
+
+        Reads every row past the shard's cursor, whoever wrote it, plus the
+        ID ranges below the cursor that earlier syncs found missing: a row
+        whose ID was allocated before a newer row's but committed after it
+        is picked up when it lands, for up to ``_SYNC_GAP_SECONDS``.
+        ``on_rows`` is called with each batch read, so other caches can
+        invalidate what those writes touched.
+
+        Returns:
+            int: Number of rows read
+        """
+        if self._covered_from is None:
+            return 0
+        read = 0
+        with self._sync_lock:
+            for shard in shard_map.shards.values():
+                read += self._sync_shard(db, shard, on_rows)
+        return read
+
+    def _sync_shard(self, db: Session, shard, on_rows: Optional[Callable[[list], None]]) -> int:
+        """Sync one shard and move its cursor and gaps. Caller holds the sync lock."""
+        now = time.monotonic()
+        cursor = self._sync_ids.get(shard.name, 0)
+        gaps = [gap for gap in self._gaps.get(shard.name, []) if now - gap[2] < _SYNC_GAP_SECONDS]
+        gaps = gaps[-_SYNC_MAX_GAPS:]
+        condition = SensorReading.id > cursor
+        if gaps:
+            condition = or_(condition, *(SensorReading.id.between(lo, hi) for lo, hi, _ in gaps))
+        statement = (
+            select_readings()
+            .where(condition)
+            .order_by(SensorReading.id.asc())
+            .execution_options(yield_per=10_000)
+        )
+        read_ids = []
+        with shard.session(db) as shard_db:
+            for partition in shard_db.execute(statement).partitions():
+                self.add_many(partition)
+                if on_rows is not None:
+                    on_rows(partition)
+                read_ids.append(np.fromiter((row.id for row in partition), dtype=np.int64, count=len(partition)))
+        ids = np.concatenate(read_ids) if read_ids else np.empty(0, dtype=np.int64)
+
+        remaining = [(lo, hi, found) for lo, hi, found in gaps for lo, hi in _missing(lo, hi, ids)]
+        newest = int(ids[-1]) if len(ids) else cursor
+        if newest > cursor:
+            remaining.extend((lo, hi, now) for lo, hi in _missing(cursor + 1, newest, ids))
+            self._sync_ids[shard.name] = newest
+        self._gaps[shard.name] = remaining
+        return len(ids)
+
+    def trim(self) -> None:
+        """Seal idle open chunks, age out old chunks and evict down to the memory cap."""
+        with self._lock:
+            covered_from = self._coverage(None)
+            if covered_from is None:
+                return
+            idle_before = to_micros(datetime.utcnow()) - _IDLE_SEAL_MICROS
+            open_bytes = 0
+            for key, series in list(self._series.items()):
+                if series.timestamps and series.timestamps[-1] < idle_before:
+                    self._seal(series)
+                kept = [chunk for chunk in series.chunks if chunk.end >= covered_from]
+                self._sealed_bytes -= sum(chunk.nbytes for chunk in series.chunks) - sum(
+                    chunk.nbytes for chunk in kept
+                )
+                series.chunks = kept
+                if not kept and not series.timestamps:
+                    del self._series[key]
+                open_bytes += len(series.timestamps) * _OPEN_POINT_BYTES
+
+            excess = self._sealed_bytes + open_bytes - self.max_bytes
+            if excess <= 0:
+                return
+            candidates = sorted(
+                (chunk.end, key) for key, series in self._series.items() for chunk in series.chunks
+            )
+            evicted_until = None
+            for end, key in candidates:
+                if excess <= 0:
+                    break
+                series = self._series[key]
+                chunk = series.chunks.pop(0)
+                self._sealed_bytes -= chunk.nbytes
+                excess -= chunk.nbytes
+                evicted_until = end
+            if evicted_until is not None:
+                self._covered_from = max(self._covered_from, evicted_until + 1)
+                evicted_at = EPOCH + timedelta(microseconds=evicted_until)
+                logger.warning(f"Hot window store over memory cap, evicted data up to {evicted_at}")
+
+    def stats(self) -> dict:
+        """Series, point and byte counts of the store."""
+        with self._lock:
+            open_points = sum(len(series.timestamps) for series in self._series.values())
+            return {
+                "series": len(self._series),
+                "points": open_points
+                + sum(chunk.count for series in self._series.values() for chunk in series.chunks),
+                "bytes": self._sealed_bytes + open_points * _OPEN_POINT_BYTES,
+            }
+
+
+hot_store = HotWindowStore(
+    window_hours=settings.hot_store_window_hours,
+    max_bytes=settings.hot_store_max_mb * 2**20,
+    chunk_size=settings.hot_store_chunk_size,
+)
+
+
+def run_hot_store_cycle() -> None:
+    """Pick up rows from other writers and trim the store on a short-lived session."""
+    db = SessionLocal()
+    try:
+        hot_store.sync(db, on_rows=range_cache.invalidate_rows)
+    finally:
+        db.close()
+    hot_store.trim()
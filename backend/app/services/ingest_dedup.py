@@ -0,0 +1,83 @@
+"""Recent-key filter that drops duplicate readings before they reach the database."""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Hashable, Iterable, Tuple
+
+from ..config import get_settings
+
+settings = get_settings()
+
+
+def normalize_timestamp(timestamp: datetime) -> datetime:
+    """Convert an aware timestamp to naive UTC, matching how readings are stored."""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+class RecentKeyFilter:
+    """
+    Bounded set of recently ingested ``(sensor_type, unit, timestamp)`` keys per device.
+
+    Gateway retries resend readings that were accepted moments earlier, so
+    remembering the last few hundred keys per device catches almost all
+    duplicates without a database round-trip. Membership is exact: a hit is
+    always a real duplicate, and a miss falls through to the unique
+    constraint. Devices are kept in LRU order and the least recently active
+    are dropped beyond ``max_devices``.
+
+    Attributes:
+        per_device: Keys remembered per device (0 disables the filter)
+        max_devices: Devices tracked at once
+    """
+
+    def __init__(self, per_device: int = 256, max_devices: int = 100_000):
+        self.per_device = per_device
+        self.max_devices = max_devices
+        self._devices: "OrderedDict[str, OrderedDict[Hashable, None]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the filter remembers anything."""
+        return self.per_device > 0
+
+    def seen(self, device_id: str, key: Hashable) -> bool:
+        """Whether ``key`` was recently ingested for ``device_id``."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            keys = self._devices.get(device_id)
+            return keys is not None and key in keys
+
+    def add(self, device_id: str, key: Hashable) -> None:
+        """Remember a key that was just ingested."""
+        self.add_many([(device_id, key)])
+
+    def add_many(self, items: Iterable[Tuple[str, Hashable]]) -> None:
+        """Remember several ``(device_id, key)`` pairs."""
+        if not self.enabled:
+            return
+        with self._lock:
+            devices = self._devices
+            for device_id, key in items:
+                keys = devices.get(device_id)
+                if keys is None:
+                    keys = devices[device_id] = OrderedDict()
+                    if len(devices) > self.max_devices:
+                        devices.popitem(last=False)
+                else:
+                    devices.move_to_end(device_id)
+                keys[key] = None
+                if len(keys) > self.per_device:
+                    keys.popitem(last=False)
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop remembered keys for a device."""
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+
+recent_keys = RecentKeyFilter(per_device=settings.ingest_recent_keys_per_device)
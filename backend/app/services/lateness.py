@@ -0,0 +1,121 @@
+"""Per-series lateness watermark for incoming readings."""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import SensorReading, Series
+from .metrics import metrics
+from .shard_map import shard_map
+
+settings = get_settings()
+
+SeriesId = Tuple[str, str]
+
+
+class _SeriesState:
+    """Lateness state of one (device_id, sensor_type) series."""
+
+    __slots__ = ("max_event", "reordered", "late")
+
+    def __init__(self):
+        self.max_event: Optional[datetime] = None
+        self.reordered = 0
+        self.late = 0
+
+
+class LatenessTracker:
+    """
+    Tracks how far behind event time each series' readings arrive.
+
+    A series' watermark trails its newest stored reading by ``lateness``.
+    A reading older than the newest this worker has seen but within the
+    lateness counts as reordered, one older than that as late. Nothing is
+    held back: stores and aggregates accept readings in any order, and a
+    late reading marks its sketch bucket dirty like any other write, so
+    this only reports lag.
+
+    Watermarks are read from the database, so every worker reports the
+    same; the reordered and late counts cover what this worker ingested.
+
+    Attributes:
+        lateness: How far behind the newest reading a series accepts data as in order
+    """
+
+    def __init__(self, lateness_seconds: float):
+        self.lateness = timedelta(seconds=lateness_seconds)
+        self._series: Dict[SeriesId, _SeriesState] = {}
+        self._lock = threading.Lock()
+
+    def add(self, device_id: str, sensor_type: str, timestamp: datetime) -> bool:
+        """
+        Account for one stored reading.
+
+        Returns:
+            bool: False if the reading was older than the series' watermark
+        """
+        key = (device_id, sensor_type)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                state = self._series[key] = _SeriesState()
+            if state.max_event is None or timestamp > state.max_event:
+                state.max_event = timestamp
+                return True
+            if timestamp < state.max_event - self.lateness:
+                state.late += 1
+                late = True
+            else:
+                state.reordered += 1
+                late = False
+        metrics.inc("lateness.late" if late else "lateness.reordered")
+        return not late
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop all series state of a deleted device."""
+        with self._lock:
+            for key in [key for key in self._series if key[0] == device_id]:
+                del self._series[key]
+
+    def stats(self) -> dict:
+        """Counts of tracked series and of reordered and late readings."""
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "reordered": sum(state.reordered for state in self._series.values()),
+                "late": sum(state.late for state in self._series.values()),
+            }
+
+    def device_lag(self, db: Session, device_id: str, now: Optional[datetime] = None) -> List[dict]:
+        """Watermark and lag of each series of a device, from its newest stored reading."""
+        now = now or datetime.utcnow()
+        with shard_map.owner(device_id).session(db) as shard_db:
+            newest = shard_db.execute(
+                select(Series.sensor_type, func.max(SensorReading.timestamp))
+                .join(SensorReading, SensorReading.series_id == Series.id)
+                .where(Series.device_id == device_id)
+                .group_by(Series.sensor_type)
+            ).all()
+        rows = []
+        with self._lock:
+            for sensor_type, max_event in newest:
+                state = self._series.get((device_id, sensor_type))
+                rows.append(
+                    {
+                        "sensor_type": sensor_type,
+                        "max_event_time": max_event,
+                        "watermark": max_event - self.lateness,
+                        "lag_seconds": (now - max_event).total_seconds(),
+                        "watermark_lag_seconds": (now - max_event + self.lateness).total_seconds(),
+                        "reordered": state.reordered if state is not None else 0,
+                        "late": state.late if state is not None else 0,
+                    }
+                )
+        return sorted(rows, key=lambda row: row["sensor_type"])
+
+
+lateness_tracker = LatenessTracker(lateness_seconds=settings.lateness_watermark_seconds)
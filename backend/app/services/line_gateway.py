@@ -0,0 +1,297 @@
+"""Asyncio TCP/UDP listener ingesting the line protocol through the bulk insert path."""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..utils import logger
+from .bulk_import import DeviceCache, load_series
+from .heartbeat import heartbeat_tracker
+from .line_protocol import parse_lines
+from .metrics import metrics
+
+settings = get_settings()
+
+# Known and unknown device IDs are looked up again after this long, so
+# devices registered while the gateway runs are accepted.
+DEVICE_CACHE_SECONDS = 60.0
+
+# A block of complete lines and the callback releasing its sender's slot.
+_Block = Tuple[bytes, Optional[Callable[[], None]]]
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    """Collects datagrams into blocks; drops them while the writer is behind."""
+
+    def __init__(self, gateway: "LineGateway"):
+        self.gateway = gateway
+        self.parts: List[bytes] = []
+        self.size = 0
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if not data.endswith(b"\n"):
+            data += b"\n"
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= self.gateway.block_bytes:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.gateway.flush_seconds, self.flush)
+
+    def flush(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.parts:
+            return
+        block = b"".join(self.parts)
+        self.parts, self.size = [], 0
+        try:
+            self.gateway.queue.put_nowait((block, None))
+        except asyncio.QueueFull:
+            metrics.inc("gateway.udp_dropped_lines", block.count(b"\n"))
+
+
+class LineGateway:
+    """
+    Line-protocol listener feeding :func:`~app.services.bulk_import.load_series`.
+
+    Each TCP connection reads into its own buffer and hands blocks of
+    complete lines to a bounded queue once ``block_bytes`` are buffered or
+    ``flush_seconds`` have passed. A connection may have at most
+    ``max_blocks_per_connection`` blocks queued or being written; past
+    that it stops reading, so a sender faster than the database is slowed
+    down by TCP flow control instead of growing memory, and cannot crowd
+    out other connections. UDP has no flow control: datagrams arriving
+    while the queue is full are dropped and counted.
+
+    One writer thread merges queued blocks into batches of up to
+    ``batch_lines`` lines, parses them with :func:`parse_lines` and loads
+    them through the same COPY/executemany path as file imports, so
+    readings with a natural key already stored are skipped. Lines are not
+    acknowledged; malformed and rejected ones are counted and logged.
+
+    Attributes:
+        host: Interface to listen on
+        tcp_port: TCP port, 0 to disable TCP
+        udp_port: UDP port, 0 to disable UDP
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        tcp_port: int = 8089,
+        udp_port: int = 8089,
+        batch_lines: int = 50_000,
+        block_kb: int = 256,
+        flush_seconds: float = 0.2,
+        max_queued_blocks: int = 64,
+        max_blocks_per_connection: int = 4,
+        max_line_bytes: int = 4096,
+    ):
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.batch_lines = batch_lines
+        self.block_bytes = block_kb * 1024
+        self.flush_seconds = flush_seconds
+        self.max_queued_blocks = max_queued_blocks
+        self.max_blocks_per_connection = max_blocks_per_connection
+        self.max_line_bytes = max_line_bytes
+        self.queue: Optional[asyncio.Queue] = None
+        self._servers: list = []
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._devices = DeviceCache()
+        self._devices_loaded = time.monotonic()
+        self._connections = 0
+
+    # -- lifecycle --------------------------------------------------------
+
+    async def start(self) -> None:
+        """Bind the listeners and start the writer."""
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queued_blocks)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="line-gateway")
+        self._tasks = [asyncio.create_task(self._write_loop())]
+        # reuse_port lets every API worker process bind the same ports.
+        if self.tcp_port:
+            self._servers.append(
+                await asyncio.start_server(
+                    self._handle_connection, self.host, self.tcp_port, reuse_port=True, limit=self.block_bytes
+                )
+            )
+        if self.udp_port:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramReceiver(self), local_addr=(self.host, self.udp_port), reuse_port=True
+            )
+            self._servers.append(transport)
+        logger.info(f"Line gateway listening on {self.host} (tcp {self.tcp_port or 'off'}, udp {self.udp_port or 'off'})")
+
+    async def stop(self) -> None:
+        """Close the listeners, write what is queued and stop the writer."""
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        if self.queue is not None:
+            await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info("Line gateway stopped")
+
+    async def serve_forever(self) -> None:
+        """Run until cancelled."""
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    # -- receiving --------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        slots = asyncio.Semaphore(self.max_blocks_per_connection)
+        parts: List[bytes] = []
+        size = 0
+        partial = b""
+        self._connections += 1
+        metrics.inc("gateway.connections_accepted")
+        try:
+            while True:
+                try:
+                    if parts:
+                        data = await asyncio.wait_for(reader.read(self.block_bytes), self.flush_seconds)
+                    else:
+                        data = await reader.read(self.block_bytes)
+                except asyncio.TimeoutError:
+                    data = None
+                if data:
+                    end = data.rfind(b"\n") + 1
+                    if end:
+                        parts.append(partial + data[:end])
+                        size += len(parts[-1])
+                        partial = data[end:]
+                    else:
+                        partial += data
+                    if len(partial) > self.max_line_bytes:
+                        logger.warning(f"Line gateway: line over {self.max_line_bytes} bytes from {peer}, closing")
+                        break
+                    if size < self.block_bytes:
+                        continue
+                elif data is not None:
+                    # End of stream: a last line without newline still counts.
+                    if partial:
+                        parts.append(partial + b"\n")
+                    if parts:
+                        await self._enqueue(b"".join(parts), slots)
+                    break
+                if parts:
+                    # Waits while this connection has its share of blocks in
+                    # flight, leaving the rest unread in the socket.
+                    await self._enqueue(b"".join(parts), slots)
+                    parts, size = [], 0
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def _enqueue(self, block: bytes, slots: asyncio.Semaphore) -> None:
+        await slots.acquire()
+        await self.queue.put((block, slots.release))
+
+    # -- writing ----------------------------------------------------------
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            blocks: List[_Block] = [await self.queue.get()]
+            lines = blocks[0][0].count(b"\n")
+            while lines < self.batch_lines and not self.queue.empty():
+                blocks.append(self.queue.get_nowait())
+                lines += blocks[-1][0].count(b"\n")
+            try:
+                await loop.run_in_executor(self._executor, self.write, b"".join(block for block, _ in blocks))
+            except Exception as e:
+                metrics.inc("gateway.failed_lines", lines)
+                logger.error(f"Line gateway failed to write {lines} lines: {str(e)}")
+            finally:
+                for _, release in blocks:
+                    if release is not None:
+                        release()
+                    self.queue.task_done()
+
+    def write(self, data: bytes) -> dict:
+        """
+        Parse and load one batch of lines.
+
+        Returns:
+            dict: Line, insert, duplicate, malformed and rejected counts
+        """
+        parsed = parse_lines(data)
+        report = {"lines": 0, "inserted": 0, "duplicates": 0, "malformed": len(parsed.errors), "rejected": 0}
+        if parsed.keys:
+            if time.monotonic() - self._devices_loaded > DEVICE_CACHE_SECONDS:
+                self._devices = DeviceCache()
+                self._devices_loaded = time.monotonic()
+            db = SessionLocal()
+            try:
+                reasons, inserted = load_series(
+                    db, parsed.keys, parsed.inverse, parsed.values, parsed.timestamps, self._devices
+                )
+            finally:
+                db.close()
+            valid = np.equal(reasons, None)
+            n_valid = int(valid.sum())
+            report.update(
+                lines=len(reasons), inserted=inserted, duplicates=n_valid - inserted, rejected=len(reasons) - n_valid
+            )
+            for key_index in np.unique(parsed.inverse[valid]).tolist():
+                heartbeat_tracker.beat(parsed.keys[key_index][0])
+            if report["rejected"]:
+                first = int(np.flatnonzero(~valid)[0])
+                logger.warning(
+                    f"Line gateway rejected {report['rejected']} lines, first: {reasons[first]} "
+                    f"(device {parsed.keys[parsed.inverse[first]][0]})"
+                )
+        if parsed.errors:
+            number, reason, line = parsed.errors[0]
+            logger.warning(f"Line gateway: {len(parsed.errors)} malformed lines, first: {reason}: {line[:200]!r}")
+
+        metrics.inc("gateway.lines", report["lines"] + report["malformed"])
+        metrics.inc("gateway.inserted", report["inserted"])
+        metrics.inc("gateway.duplicates", report["duplicates"])
+        metrics.inc("gateway.malformed", report["malformed"])
+        metrics.inc("gateway.rejected", report["rejected"])
+        return report
+
+    def stats(self) -> dict:
+        """Open connections and queued blocks."""
+        return {
+            "open_connections": self._connections,
+            "queued_blocks": self.queue.qsize() if self.queue is not None else 0,
+        }
+
+
+line_gateway = LineGateway(
+    host=settings.gateway_host,
+    tcp_port=settings.gateway_tcp_port,
+    udp_port=settings.gateway_udp_port,
+    batch_lines=settings.gateway_batch_lines,
+    block_kb=settings.gateway_block_kb,
+    flush_seconds=settings.gateway_flush_seconds,
+    max_queued_blocks=settings.gateway_max_queued_blocks,
+    max_blocks_per_connection=settings.gateway_max_blocks_per_connection,
+    max_line_bytes=settings.gateway_max_line_bytes,
+)
@@ -0,0 +1,217 @@
+"""Parsing of the line protocol accepted by the ingestion gateway."""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# device_id,sensor_type=<type>,unit=<unit> value=<float> [<epoch ms>]
+#
+# Tags may come in either order, the timestamp is optional (receive time
+# is used) and lines starting with "#" are comments. Device IDs and tag
+# values cannot contain commas, spaces or "=".
+_NEWLINE, _RETURN, _SPACE, _COMMENT = ord("\n"), ord("\r"), ord(" "), ord("#")
+_FIELD = np.frombuffer(b"value=", dtype=np.uint8)
+_MAX_SERIES_BYTES = 256
+_MAX_VALUE_BYTES = 32
+_MAX_STAMP_BYTES = 15
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Epoch milliseconds representable as naive datetimes (years 1970-9999).
+_MAX_MILLIS = 253_402_300_799_999
+
+SeriesKey = Tuple[str, str, str]
+# (line number, reason, line)
+LineError = Tuple[int, str, str]
+
+
+class ParsedLines(NamedTuple):
+    """
+    Lines of a block grouped by series.
+
+    Row ``i`` is a reading of series ``keys[inverse[i]]`` with
+    ``values[i]`` at ``timestamps[i]``. Values that are not numbers are
+    NaN and timestamps out of range are NaT, left for the loader to
+    reject; lines that are not in the protocol's shape are in ``errors``.
+    """
+
+    keys: List[SeriesKey]
+    inverse: np.ndarray
+    values: np.ndarray
+    timestamps: np.ndarray
+    errors: List[LineError]
+
+
+def _parse_series(series: str) -> Tuple[Optional[SeriesKey], Optional[str]]:
+    """``(device_id, sensor_type, unit)`` of a series part, or the reason it is malformed."""
+    device_id, _, tag_text = series.partition(",")
+    if not device_id or "=" in device_id:
+        return None, "missing device_id"
+    tags = dict(tag.partition("=")[::2] for tag in tag_text.split(",")) if tag_text else {}
+    if set(tags) != {"sensor_type", "unit"} or len(tag_text.split(",")) != 2:
+        return None, "tags must be sensor_type and unit"
+    return (device_id, tags["sensor_type"], tags["unit"]), None
+
+
+def _line_error(line: str) -> Optional[str]:
+    """Why a line the vectorized pass could not take is malformed; None for blanks and comments."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    parts = line.split(" ")
+    if len(parts) not in (2, 3):
+        return "expected series, value and optional timestamp separated by single spaces"
+    if not parts[1].startswith("value="):
+        return "field must be value=<number>"
+    if len(parts[0].encode()) > _MAX_SERIES_BYTES or len(parts[1]) > len("value=") + _MAX_VALUE_BYTES:
+        return "line too long"
+    if len(parts) == 3 and len(parts[2]) > _MAX_STAMP_BYTES:
+        return "timestamp must be epoch milliseconds"
+    return _parse_series(parts[0])[1] or "malformed line"
+
+
+def _gather(buf: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Fields ``buf[start:start + length]`` as rows of a zero-padded byte matrix.
+
+    ``buf`` must be followed by at least the longest field's worth of
+    padding. Each row is one contiguous copy out of a strided window view,
+    with no Python object per field.
+    """
+    width = max(int(lengths.max(initial=0)), 1)
+    rows = sliding_window_view(buf, width)[starts]
+    rows[np.arange(width) >= lengths[:, None]] = 0
+    return rows
+
+
+def _strings(rows: np.ndarray) -> np.ndarray:
+    """Byte matrix rows as a fixed-width bytes array (trailing zeros dropped)."""
+    return np.ascontiguousarray(rows).view(f"S{rows.shape[1]}").ravel()
+
+
+def _unique_rows(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of the first of each distinct row, and each row's distinct index.
+
+    Rows are hashed to 64-bit integers, which sort much faster than
+    strings; the grouping is checked byte for byte and redone on the rows
+    themselves in the unlikely case of a collision.
+    """
+    width = -(-rows.shape[1] // 8) * 8
+    words = np.zeros((len(rows), width), dtype=np.uint8)
+    words[:, : rows.shape[1]] = rows
+    words = words.view(np.uint64)
+    hashes = np.zeros(len(rows), dtype=np.uint64)
+    for column in range(words.shape[1]):
+        hashes = (hashes ^ words[:, column]) * _HASH_MULTIPLIER
+    _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    if not np.array_equal(words[first][inverse], words):
+        _, first, inverse = np.unique(_strings(rows), return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def _numbers(fields: np.ndarray, convert, dtype, missing) -> np.ndarray:
+    """Fields converted in one pass, or one by one with ``missing`` where a field does not parse."""
+    try:
+        return fields.astype(dtype)
+    except (ValueError, OverflowError):
+        pass
+    parsed = np.full(len(fields), missing, dtype=dtype)
+    for i, field in enumerate(fields.tolist()):
+        try:
+            parsed[i] = convert(field)
+        except (ValueError, OverflowError):
+            pass
+    return parsed
+
+
+def parse_lines(data: bytes, received_ms: Optional[int] = None) -> ParsedLines:
+    """
+    Parse a block of newline-terminated lines.
+
+    Line boundaries, spaces and field extents are located with NumPy
+    passes over the raw bytes; values and timestamps are converted as
+    whole columns, and only the distinct series parts are decoded and
+    split in Python, once each. Lines the vectorized pass cannot take
+    (comments, blank and malformed lines) are looked at one by one.
+
+    Args:
+        data: Lines, each ending with a newline
+        received_ms: Epoch milliseconds for lines without a timestamp, now by default
+
+    Returns:
+        ParsedLines: Readings grouped by series, and the malformed lines
+    """
+    if received_ms is None:
+        received_ms = int(time.time() * 1000)
+    # Padding lets fields near the end be read as full-width windows.
+    buf = np.frombuffer(data + bytes(_MAX_SERIES_BYTES), dtype=np.uint8)
+    ends = np.flatnonzero(buf[: len(data)] == _NEWLINE)
+    if not len(ends):
+        empty = np.empty(0, dtype=np.int64)
+        return ParsedLines([], empty, empty.astype(np.float64), empty.astype("datetime64[us]"), [])
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+    ends = ends - ((ends > starts) & (buf[np.maximum(ends - 1, 0)] == _RETURN))
+
+    spaces = np.flatnonzero(buf[: len(data)] == _SPACE)
+    first = np.searchsorted(spaces, starts)
+    n_spaces = np.searchsorted(spaces, ends) - first
+    padded = np.append(spaces, [len(data), len(data)])
+    space1 = padded[first]
+    space2 = padded[first + 1]
+    stamped = n_spaces == 2
+    value_start = space1 + 1 + len(_FIELD)
+    value_end = np.where(stamped, space2, ends)
+
+    ok = (n_spaces >= 1) & (n_spaces <= 2) & (buf[starts] != _COMMENT)
+    ok &= (space1 > starts) & (space1 - starts <= _MAX_SERIES_BYTES)
+    ok &= (value_end > value_start) & (value_end - value_start <= _MAX_VALUE_BYTES)
+    ok &= ~stamped | ((ends - space2 > 1) & (ends - space2 - 1 <= _MAX_STAMP_BYTES))
+    field = _gather(buf, np.where(ok, space1 + 1, 0), np.full(len(ok), len(_FIELD)))
+    ok &= (field == _FIELD).all(axis=1)
+
+    # Series parts are decoded once per distinct value.
+    lines = np.flatnonzero(ok)
+    series_rows = _gather(buf, starts[lines], space1[lines] - starts[lines])
+    series_first, series_inverse = _unique_rows(series_rows)
+    series = _strings(series_rows[series_first])
+    keys: List[SeriesKey] = []
+    key_index: Dict[SeriesKey, int] = {}
+    series_key = np.full(len(series), -1, dtype=np.int64)
+    bad_series: Dict[int, str] = {}
+    for i, raw in enumerate(series.tolist()):
+        key, reason = _parse_series(raw.decode("utf-8", errors="replace"))
+        if key is None:
+            bad_series[i] = reason
+            continue
+        series_key[i] = key_index.setdefault(key, len(keys))
+        if series_key[i] == len(keys):
+            keys.append(key)
+    inverse = series_key[series_inverse]
+    parsed = inverse >= 0
+
+    errors: List[LineError] = []
+    if bad_series or not ok.all():
+        rejected = np.concatenate((np.flatnonzero(~ok), lines[~parsed]))
+        unparsed = series_inverse[~parsed].tolist()
+        reasons = dict(zip(lines[~parsed].tolist(), (bad_series[i] for i in unparsed)))
+        for line in np.sort(rejected).tolist():
+            text = data[starts[line] : ends[line]].decode("utf-8", errors="replace")
+            reason = reasons.get(line) or _line_error(text)
+            if reason is not None:
+                errors.append((line + 1, reason, text))
+        lines = lines[parsed]
+        inverse = inverse[parsed]
+
+    values = _numbers(
+        _strings(_gather(buf, value_start[lines], value_end[lines] - value_start[lines])), float, np.float64, np.nan
+    )
+    millis = np.full(len(lines), received_ms, dtype=np.int64)
+    with_stamp = stamped[lines]
+    stamp_lines = lines[with_stamp]
+    stamps = _gather(buf, space2[stamp_lines] + 1, ends[stamp_lines] - space2[stamp_lines] - 1)
+    millis[with_stamp] = _numbers(_strings(stamps), int, np.int64, -1)
+    timestamps = millis.astype("datetime64[ms]").astype("datetime64[us]")
+    timestamps[(millis < 0) | (millis > _MAX_MILLIS)] = np.datetime64("NaT")
+    return ParsedLines(keys, inverse, values, timestamps, errors)
@@ -0,0 +1,27 @@
+"""In-process counters for operational metrics."""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Counters:
+    """Thread-safe named counters, reported per worker process."""
+
+    def __init__(self):
+        self._values: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        """Increment counter ``name`` by ``amount``."""
+        if amount:
+            with self._lock:
+                self._values[name] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        """Current value of every counter."""
+        with self._lock:
+            return dict(self._values)
+
+
+metrics = Counters()
@@ -0,0 +1,314 @@
+"""Set-based, resumable deletes of devices and their data."""
+
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import Alert, Device, PurgeJob, ReadingForecast, ReadingSketch, SensorReading, Series, SketchDirtyBucket
+from ..utils import logger
+from .alert_index import alert_index
+from .change_feed_service import ChangeFeedService, ChangesExpired
+from .geo_index import geo_index
+from .heartbeat import heartbeat_tracker
+from .hot_store import hot_store
+from .ingest_dedup import recent_keys
+from .metrics import metrics
+from .range_cache import range_cache
+from .lateness import lateness_tracker
+from .shard_map import PRIMARY, shard_map
+
+settings = get_settings()
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def forget_device_state(device_id: str) -> None:
+    """Drop everything this process keeps in memory about a device."""
+    geo_index.remove(device_id)
+    alert_index.forget_device(device_id)
+    heartbeat_tracker.forget(device_id)
+    recent_keys.forget_device(device_id)
+    lateness_tracker.forget_device(device_id)
+    hot_store.forget_device(device_id)
+    range_cache.forget_device(device_id)
+    shard_map.forget_device(device_id)
+
+
+class PurgeService:
+    """
+    Deletes devices without loading their readings or alerts.
+
+    Children are removed with ``DELETE ... WHERE id IN (SELECT ... LIMIT n)``
+    in batches of ``PURGE_BATCH_SIZE``, one transaction per batch, so no
+    transaction or session grows with the size of the device. Devices with
+    at most ``PURGE_INLINE_MAX_READINGS`` readings are purged within the
+    request; larger ones are left to the periodic purge cycle. Progress is
+    committed with every batch, so a job abandoned by a stopped worker is
+    picked up again after ``PURGE_STALE_SECONDS``. Readings, sketches,
+    forecasts and series are deleted on the device's shard before the
+    alerts and the device itself on the primary, so an interrupted job is
+    safe to rerun.
+    """
+
+    @staticmethod
+    def request_purge(db: Session, device: Device) -> PurgeJob:
+        """
+        Deactivate a device and start deleting it.
+
+        Returns the device's active job if a delete is already under way.
+        """
+        job = (
+            db.query(PurgeJob)
+            .filter(PurgeJob.device_id == device.id, PurgeJob.status.in_(ACTIVE_STATUSES))
+            .first()
+        )
+        if job is not None:
+            return job
+
+        with shard_map.owner(device.id).session(db) as shard_db:
+            inline = PurgeService._reading_count(shard_db, device.id, settings.purge_inline_max_readings + 1) <= (
+                settings.purge_inline_max_readings
+            )
+        now = datetime.utcnow()
+        job = PurgeJob(
+            id=str(uuid.uuid4()),
+            device_id=device.id,
+            status="running" if inline else "pending",
+            readings_deleted=0,
+            alerts_deleted=0,
+            created_at=now,
+            updated_at=now,
+        )
+        device.is_active = False
+        db.add(job)
+        ChangeFeedService.record(db, "device", "update", device.id, {"is_active": False})
+        db.commit()
+        forget_device_state(device.id)
+        if inline:
+            PurgeService.purge(db, job)
+        return job
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[PurgeJob]:
+        """Get a purge job by ID."""
+        return db.query(PurgeJob).filter(PurgeJob.id == job_id).first()
+
+    @staticmethod
+    def _reading_count(db: Session, device_id: str, limit: int) -> int:
+        """Readings of a device, counted up to ``limit``."""
+        limited = (
+            select(SensorReading.id)
+            .where(SensorReading.series_id.in_(select(Series.id).where(Series.device_id == device_id)))
+            .limit(limit)
+            .subquery()
+        )
+        return db.execute(select(func.count()).select_from(limited)).scalar()
+
+    @staticmethod
+    def _delete_batch(db: Session, model, condition) -> int:
+        """Delete up to one batch of ``model`` rows matching ``condition``."""
+        batch = select(model.id).where(condition).limit(settings.purge_batch_size)
+        return db.execute(
+            delete(model).where(model.id.in_(batch)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+
+    @staticmethod
+    def purge(db: Session, job: PurgeJob) -> PurgeJob:
+        """Run a claimed job to completion, committing after every batch."""
+        device_id = job.device_id
+        readings = SensorReading.series_id.in_(select(Series.id).where(Series.device_id == device_id))
+        alerts = Alert.device_id == device_id
+        try:
+            with shard_map.owner(device_id).session(db) as shard_db:
+                for session, model, condition, counter in (
+                    (shard_db, SensorReading, readings, "readings_deleted"),
+                    (db, Alert, alerts, "alerts_deleted"),
+                ):
+                    while True:
+                        deleted = PurgeService._delete_batch(session, model, condition)
+                        if session is not db:
+                            session.commit()
+                        setattr(job, counter, getattr(job, counter) + deleted)
+                        job.updated_at = datetime.utcnow()
+                        db.commit()
+                        metrics.inc(f"purge.{counter}", deleted)
+                        if deleted < settings.purge_batch_size:
+                            break
+
+                # Whatever arrived during the batches is small; remove it with
+                # the sketches, forecasts and series in one transaction on the
+                # shard, then the alerts and the device in one on the primary.
+                job.readings_deleted += shard_db.execute(
+                    delete(SensorReading).where(readings), execution_options={"synchronize_session": False}
+                ).rowcount
+                series_ids = select(Series.id).where(Series.device_id == device_id)
+                for model in (ReadingSketch, SketchDirtyBucket, ReadingForecast):
+                    shard_db.execute(
+                        delete(model).where(model.series_id.in_(series_ids)),
+                        execution_options={"synchronize_session": False},
+                    )
+                shard_db.execute(delete(Series).where(Series.device_id == device_id))
+                shard_db.commit()
+            job.alerts_deleted += db.execute(
+                delete(Alert).where(alerts), execution_options={"synchronize_session": False}
+            ).rowcount
+            db.execute(delete(Device).where(Device.id == device_id))
+            ChangeFeedService.record(db, "device", "delete", device_id)
+            job.status = "completed"
+            job.updated_at = job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Purge of device {device_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+            job.updated_at = job.finished_at = datetime.utcnow()
+            db.commit()
+            return job
+
+        forget_device_state(device_id)
+        logger.info(
+            f"Device purged: {device_id} "
+            f"({job.readings_deleted} readings, {job.alerts_deleted} alerts)"
+        )
+        return job
+
+    @staticmethod
+    def claim_next(db: Session) -> Optional[PurgeJob]:
+        """
+        Claim the oldest pending job, or a running one that stopped making progress.
+
+        The claim is a conditional UPDATE, so concurrent workers never run
+        the same job.
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.purge_stale_seconds)
+        candidates = db.execute(
+            select(PurgeJob.id, PurgeJob.status, PurgeJob.updated_at)
+            .where(
+                (PurgeJob.status == "pending")
+                | ((PurgeJob.status == "running") & (PurgeJob.updated_at < stale_before))
+            )
+            .order_by(PurgeJob.created_at.asc())
+            .limit(10)
+        ).all()
+        for job_id, status, updated_at in candidates:
+            claimed = db.execute(
+                update(PurgeJob)
+                .where(
+                    PurgeJob.id == job_id,
+                    PurgeJob.status == status,
+                    PurgeJob.updated_at == updated_at,
+                )
+                .values(status="running", updated_at=now)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return PurgeService.get_job(db, job_id)
+        return None
+
+
+class DeviceChangeFollower:
+    """
+    Applies device deactivations and deletes made through other workers.
+
+    Every worker keeps devices in memory (placements, hot store, caches,
+    indexes), but a purge clears them only in the process running it.
+    Each cycle reads the device changes after this process's position in
+    the change feed: a delete drops everything kept about the device, an
+    update of ``is_active`` or ``shard`` is applied to the shard map. With
+    the change feed disabled, or after the feed was trimmed past the
+    position, every device is reloaded instead and devices gone from the
+    table are dropped.
+    """
+
+    def __init__(self, page_size: int = 1000):
+        self.page_size = page_size
+        self._since: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def start(self, db: Session) -> None:
+        """Follow changes from now on; call before loading device state."""
+        if settings.change_feed_enabled:
+            with self._lock:
+                self._since = ChangeFeedService.newest(db)
+
+    def run(self, db: Session) -> int:
+        """
+        Apply the device changes since the last call.
+
+        Returns:
+            int: Devices dropped from memory
+        """
+        with self._lock:
+            if not settings.change_feed_enabled:
+                return self._reload(db)
+            if self._since is None:
+                self._since = ChangeFeedService.newest(db)
+                return 0
+            dropped = 0
+            try:
+                while True:
+                    page = ChangeFeedService.get_changes(db, self._since, self.page_size, ["device"])
+                    for change in page["changes"]:
+                        dropped += self._apply(change.op, change.entity_id, change.data or {})
+                    self._since = page["next_since"]
+                    if not page["has_more"]:
+                        break
+            except ChangesExpired as e:
+                logger.warning(f"Device changes after {e.since} were trimmed; reloading every device")
+                self._since = e.newest
+                dropped += self._reload(db)
+            return dropped
+
+    @staticmethod
+    def _apply(op: str, device_id: str, data: dict) -> int:
+        if op == "delete":
+            forget_device_state(device_id)
+            return 1
+        if "is_active" in data:
+            shard_map.set_active(device_id, data["is_active"])
+        if "shard" in data:
+            shard_map.pin(device_id, data["shard"] or PRIMARY)
+        return 0
+
+    @staticmethod
+    def _reload(db: Session) -> int:
+        gone = shard_map.load_placements(db)
+        for device_id in gone:
+            forget_device_state(device_id)
+        return len(gone)
+
+
+device_change_follower = DeviceChangeFollower()
+
+
+def run_device_change_cycle() -> None:
+    """Apply device changes from other workers on a short-lived session."""
+    db = SessionLocal()
+    try:
+        dropped = device_change_follower.run(db)
+        if dropped:
+            logger.info(f"Dropped {dropped} deleted devices from memory")
+    finally:
+        db.close()
+
+
+def run_purge_cycle() -> None:
+    """Run every claimable purge job on a short-lived session."""
+    db = SessionLocal()
+    try:
+        while True:
+            job = PurgeService.claim_next(db)
+            if job is None:
+                break
+            PurgeService.purge(db, job)
+    finally:
+        db.close()
@@ -0,0 +1,336 @@
+"""Cache of historical range query results in time-aligned chunks."""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import SensorReading, Series
+from ..utils import logger
+from .chunk_codec import CHUNK_OVERHEAD, EPOCH, EncodedChunk, columns_to_rows, to_micros
+from .metrics import metrics
+from .series_catalog import ReadingRow, select_readings
+
+settings = get_settings()
+
+# (device_id, sensor_type, chunk start in µs since the epoch)
+ChunkKey = Tuple[str, str, int]
+# Unit and encoded points of one chunk; None for a chunk without readings.
+Entry = Tuple[Optional[str], Optional[EncodedChunk]]
+
+_SPILL_SUFFIX = ".chunk"
+
+
+def _entry_bytes(entry: Entry) -> int:
+    return entry[1].nbytes if entry[1] is not None else CHUNK_OVERHEAD
+
+
+class RangeCache:
+    """
+    LRU cache of per-series range results cut into fixed, aligned chunks.
+
+    A range query is split on ``chunk_seconds`` boundaries. Chunks that
+    ended more than ``lateness`` ago are closed: their readings are kept
+    compressed and reused by every later query touching them. Only missing
+    closed chunks (fetched together, one query per contiguous run) and the
+    open trailing chunk go to the database.
+
+    Any write whose timestamp falls in a closed chunk, such as a late
+    reading or a device uploading buffered data, invalidates that chunk.
+    Entries evicted from memory can spill to ``spill_dir`` and are read
+    back on the next hit.
+
+    Attributes:
+        width: Chunk width in microseconds
+        max_bytes: Memory cap of cached chunks
+    """
+
+    def __init__(
+        self,
+        chunk_seconds: int = 3600,
+        max_bytes: int = 128 * 2**20,
+        lateness_seconds: float = 60.0,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 2**30,
+    ):
+        self.width = chunk_seconds * 1_000_000
+        self.max_bytes = max_bytes
+        self.lateness = timedelta(seconds=lateness_seconds)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._memory: "OrderedDict[ChunkKey, Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled: "OrderedDict[ChunkKey, int]" = OrderedDict()
+        self._spilled_bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            # Files left by a previous process may be stale.
+            for name in os.listdir(spill_dir):
+                if name.endswith(_SPILL_SUFFIX):
+                    os.unlink(os.path.join(spill_dir, name))
+
+    def _closed_until(self) -> int:
+        """Chunks starting before this (µs) are closed."""
+        return to_micros(datetime.utcnow() - self.lateness) - self.width + 1
+
+    # -- storage ----------------------------------------------------------
+
+    def _spill_path(self, key: ChunkKey) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.spill_dir, digest + _SPILL_SUFFIX)
+
+    def _get(self, key: ChunkKey) -> Optional[Entry]:
+        """Look up a chunk, promoting spilled ones back to memory. Caller holds the lock."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        size = self._spilled.pop(key, None)
+        if size is None:
+            return None
+        self._spilled_bytes -= size
+        path = self._spill_path(key)
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(f"Range cache spill read failed: {str(e)}")
+            return None
+        self._put(key, entry)
+        return entry
+
+    def _put(self, key: ChunkKey, entry: Entry) -> None:
+        """Insert a chunk, evicting (or spilling) least recently used ones. Caller holds the lock."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= _entry_bytes(previous)
+        self._memory[key] = entry
+        self._memory_bytes += _entry_bytes(entry)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            old_key, old_entry = self._memory.popitem(last=False)
+            self._memory_bytes -= _entry_bytes(old_entry)
+            if self.spill_dir:
+                self._spill(old_key, old_entry)
+
+    def _spill(self, key: ChunkKey, entry: Entry) -> None:
+        path = self._spill_path(key)
+        try:
+            with open(path, "wb") as fh:
+                pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning(f"Range cache spill write failed: {str(e)}")
+            return
+        self._spilled[key] = size
+        self._spilled_bytes += size
+        while self._spilled_bytes > self.spill_max_bytes and self._spilled:
+            self._drop_spilled(next(iter(self._spilled)))
+
+    def _drop_spilled(self, key: ChunkKey) -> None:
+        size = self._spilled.pop(key, None)
+        if size is None:
+            return
+        self._spilled_bytes -= size
+        try:
+            os.unlink(self._spill_path(key))
+        except OSError:
+            pass
+
+    def _drop(self, key: ChunkKey) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= _entry_bytes(entry)
+        if self.spill_dir:
+            self._drop_spilled(key)
+
+    # -- invalidation -----------------------------------------------------
+
+    def invalidate_rows(self, rows: Iterable) -> None:
+        """Invalidate closed chunks touched by stored readings shaped like :class:`ReadingRow`."""
+        closed_until = self._closed_until()
+        touched = set()
+        for row in rows:
+            ts = to_micros(row.timestamp)
+            if ts < closed_until:
+                touched.add((row.device_id, row.sensor_type, ts - ts % self.width))
+        if not touched:
+            return
+        with self._lock:
+            self._generation += 1
+            for key in touched:
+                self._drop(key)
+        metrics.inc("range_cache.invalidated", len(touched))
+
+    def invalidate_span(self, device_id: str, sensor_type: str, start: datetime, end: datetime) -> None:
+        """Invalidate the closed chunks of a series overlapping ``[start, end]``."""
+        first = to_micros(start)
+        first -= first % self.width
+        last = min(to_micros(end), self._closed_until() - 1)
+        if last < first:
+            return
+        with self._lock:
+            self._generation += 1
+            for chunk_start in range(first, last + 1, self.width):
+                self._drop((device_id, sensor_type, chunk_start))
+        metrics.inc("range_cache.invalidated", (last - first) // self.width + 1)
+
+    def _drop_where(self, predicate) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._memory if predicate(key)]:
+                self._drop(key)
+            for key in [key for key in self._spilled if predicate(key)]:
+                self._drop_spilled(key)
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop every chunk of a deleted device."""
+        self._drop_where(lambda key: key[0] == device_id)
+
+    def clear_before(self, cutoff: datetime) -> None:
+        """Drop chunks overlapping data deleted before ``cutoff``."""
+        cutoff_us = to_micros(cutoff)
+        self._drop_where(lambda key: key[2] < cutoff_us)
+
+    # -- reads ------------------------------------------------------------
+
+    def read(
+        self,
+        db: Session,
+        device_id: str,
+        sensor_type: str,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> List[ReadingRow]:
+        """Readings of a series in ``[start_time, end_time]``, ordered by timestamp."""
+        start = to_micros(start_time)
+        end = to_micros(end_time)
+        width = self.width
+        first = start - start % width
+        closed_until = self._closed_until()
+        closed = list(range(first, min(end + 1, closed_until), width))
+
+        with self._lock:
+            generation = self._generation
+            cached: Dict[int, Entry] = {}
+            for chunk_start in closed:
+                entry = self._get((device_id, sensor_type, chunk_start))
+                if entry is not None:
+                    cached[chunk_start] = entry
+        missing = [chunk_start for chunk_start in closed if chunk_start not in cached]
+        metrics.inc("range_cache.hits", len(cached))
+        metrics.inc("range_cache.misses", len(missing))
+
+        fetched: Dict[int, List[ReadingRow]] = {}
+        for run_start, run_end in self._runs(missing):
+            rows = self._query(db, device_id, sensor_type, run_start, run_end + width)
+            fetched.update(self._split(rows, run_start, run_end))
+        if fetched:
+            self._store(device_id, sensor_type, fetched, generation)
+
+        result: List[ReadingRow] = []
+        for chunk_start in closed:
+            entry = cached.get(chunk_start)
+            if entry is None:
+                result.extend(row for row in fetched[chunk_start] if start <= to_micros(row.timestamp) <= end)
+                continue
+            unit, chunk = entry
+            if chunk is None:
+                continue
+            columns = chunk.decode()
+            lo = int(np.searchsorted(columns[0], start, side="left"))
+            hi = int(np.searchsorted(columns[0], end, side="right"))
+            if hi > lo:
+                result.extend(
+                    columns_to_rows(device_id, sensor_type, unit, tuple(column[lo:hi] for column in columns))
+                )
+
+        open_start = max(start, closed[-1] + width if closed else first)
+        if open_start <= end:
+            result.extend(self._query(db, device_id, sensor_type, open_start, end + 1))
+        return result
+
+    def _runs(self, chunk_starts: List[int]) -> List[Tuple[int, int]]:
+        """Group sorted chunk starts into contiguous ``(first, last)`` runs."""
+        runs = []
+        for chunk_start in chunk_starts:
+            if runs and runs[-1][1] + self.width == chunk_start:
+                runs[-1] = (runs[-1][0], chunk_start)
+            else:
+                runs.append((chunk_start, chunk_start))
+        return runs
+
+    def _query(self, db: Session, device_id: str, sensor_type: str, start: int, stop: int) -> list:
+        """Readings with ``start <= timestamp < stop`` (µs), ordered by timestamp."""
+        statement = (
+            select_readings()
+            .where(
+                Series.device_id == device_id,
+                Series.sensor_type == sensor_type,
+                SensorReading.timestamp >= EPOCH + timedelta(microseconds=start),
+                SensorReading.timestamp < EPOCH + timedelta(microseconds=stop),
+            )
+            .order_by(SensorReading.timestamp.asc())
+        )
+        return db.execute(statement).all()
+
+    def _split(self, rows: list, run_start: int, run_end: int) -> Dict[int, List[ReadingRow]]:
+        chunks: Dict[int, List[ReadingRow]] = {
+            chunk_start: [] for chunk_start in range(run_start, run_end + 1, self.width)
+        }
+        for row in rows:
+            ts = to_micros(row.timestamp)
+            chunks[ts - ts % self.width].append(row)
+        return chunks
+
+    def _store(self, device_id: str, sensor_type: str, fetched: Dict[int, list], generation: int) -> None:
+        entries = {}
+        for chunk_start, rows in fetched.items():
+            if not rows:
+                entries[chunk_start] = (None, None)
+                continue
+            units = {row.unit for row in rows}
+            if len(units) > 1:
+                continue
+            timestamps = np.fromiter((to_micros(row.timestamp) for row in rows), dtype=np.int64, count=len(rows))
+            columns = (
+                timestamps,
+                np.fromiter((row.value for row in rows), dtype=np.float64, count=len(rows)),
+                np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter((to_micros(row.created_at) for row in rows), dtype=np.int64, count=len(rows)),
+            )
+            entries[chunk_start] = (units.pop(), EncodedChunk(*columns))
+        with self._lock:
+            # A write landed in one of these chunks while they were fetched.
+            if self._generation != generation:
+                return
+            for chunk_start, entry in entries.items():
+                self._put((device_id, sensor_type, chunk_start), entry)
+
+    def stats(self) -> dict:
+        """Chunk and byte counts in memory and on disk."""
+        with self._lock:
+            return {
+                "chunks": len(self._memory),
+                "bytes": self._memory_bytes,
+                "spilled_chunks": len(self._spilled),
+                "spilled_bytes": self._spilled_bytes,
+            }
+
+
+range_cache = RangeCache(
+    chunk_seconds=settings.range_cache_chunk_seconds,
+    max_bytes=settings.range_cache_max_mb * 2**20,
+    lateness_seconds=settings.lateness_watermark_seconds,
+    spill_dir=settings.range_cache_spill_dir,
+    spill_max_bytes=settings.range_cache_spill_max_mb * 2**20,
+)
@@ -0,0 +1,181 @@
+"""Service layer for aligning multiple sensor series onto a common time grid."""
+
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from ..models import SensorReading, Series
+from ..schemas import ResampleRequest, SeriesKey
+from .compute_pool import compute_pool
+from .shard_map import shard_map
+
+
+def to_epoch_seconds(timestamps: Sequence[datetime]) -> np.ndarray:
+    """Convert naive UTC datetimes to float64 seconds since the epoch."""
+    return np.asarray(timestamps, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def align_series(
+    series_idx: np.ndarray,
+    epoch_s: np.ndarray,
+    values: np.ndarray,
+    n_series: int,
+    start_s: float,
+    step_s: float,
+    n_steps: int,
+    fill: str = "ffill",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bucket raw samples onto a dense ``(n_series, n_steps)`` grid.
+
+    Cell ``k`` of a series holds the mean of its samples in
+    ``[start + k * step, start + (k + 1) * step)``. Empty cells are filled
+    according to ``fill`` and reported as unobserved in the mask; cells that
+    cannot be filled (before the first sample, or outside the observed span
+    for linear interpolation) stay NaN.
+
+    Args:
+        series_idx: Row index of each sample
+        epoch_s: Sample timestamps in epoch seconds
+        values: Sample values
+        n_series: Number of output rows
+        start_s: Grid origin in epoch seconds
+        step_s: Grid step in seconds
+        n_steps: Number of grid columns
+        fill: ``none``, ``ffill`` or ``linear``
+
+    Returns:
+        Tuple of the value matrix and the boolean observed mask
+    """
+    bins = np.floor((epoch_s - start_s) / step_s).astype(np.int64)
+    keep = (bins >= 0) & (bins < n_steps)
+    flat = series_idx[keep].astype(np.int64) * n_steps + bins[keep]
+
+    size = n_series * n_steps
+    sums = np.bincount(flat, weights=values[keep], minlength=size)
+    counts = np.bincount(flat, minlength=size)
+
+    observed = (counts > 0).reshape(n_series, n_steps)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = (sums / counts).reshape(n_series, n_steps)
+
+    if fill == "ffill":
+        columns = np.arange(n_steps)
+        last_seen = np.where(observed, columns, -1)
+        np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+        rows = np.arange(n_series)[:, None]
+        matrix = np.where(last_seen >= 0, matrix[rows, np.maximum(last_seen, 0)], np.nan)
+    elif fill == "linear":
+        columns = np.arange(n_steps, dtype=np.float64)
+        for row in range(n_series):
+            hits = observed[row]
+            if hits.sum() < 2:
+                continue
+            x = columns[hits]
+            filled = np.interp(columns, x, matrix[row, hits])
+            outside = (columns < x[0]) | (columns > x[-1])
+            filled[outside] = np.nan
+            matrix[row] = filled
+
+    return matrix, observed
+
+
+class ResampleService:
+    """Business logic for multi-series resampling."""
+
+    @staticmethod
+    def fetch_series(
+        db: Session,
+        keys: List[SeriesKey],
+        start_time: datetime,
+        end_time: datetime,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Load every requested series with a single query per shard.
+
+        Returns:
+            Tuple of per-sample series index, epoch seconds and values
+        """
+        index = {(key.device_id, key.sensor_type): i for i, key in enumerate(keys)}
+        groups = shard_map.group(key.device_id for key in keys)
+
+        def fetch(shard, shard_db) -> list:
+            on_shard = set(groups[shard.name])
+            statement = select(
+                Series.device_id,
+                Series.sensor_type,
+                SensorReading.timestamp,
+                SensorReading.value,
+            ).join(Series, Series.id == SensorReading.series_id).where(
+                or_(
+                    *(
+                        and_(Series.device_id == device_id, Series.sensor_type == sensor_type)
+                        for device_id, sensor_type in index
+                        if device_id in on_shard
+                    )
+                ),
+                SensorReading.timestamp >= start_time,
+                SensorReading.timestamp <= end_time,
+            )
+            return shard_db.execute(statement).all()
+
+        rows = [row for shard_rows in shard_map.scatter(db, fetch, groups) for row in shard_rows]
+        if not rows:
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty, empty
+
+        device_ids, sensor_types, timestamps, values = zip(*rows)
+        series_idx = np.fromiter(
+            (index[key] for key in zip(device_ids, sensor_types)), dtype=np.int64, count=len(rows)
+        )
+        return series_idx, to_epoch_seconds(timestamps), np.asarray(values, dtype=np.float64)
+
+    @staticmethod
+    def grid_size(request: ResampleRequest) -> int:
+        """Number of grid columns for a request."""
+        span = (request.end_time - request.start_time).total_seconds()
+        return int(span // request.step_seconds) + 1
+
+    @staticmethod
+    def resample(db: Session, request: ResampleRequest) -> dict:
+        """Align the requested series and return a columnar response payload."""
+        keys = list({(k.device_id, k.sensor_type): k for k in request.series}.values())
+        n_steps = ResampleService.grid_size(request)
+        start_s = float(to_epoch_seconds([request.start_time])[0])
+
+        series_idx, epoch_s, values = ResampleService.fetch_series(
+            db, keys, request.start_time, request.end_time
+        )
+        matrix, observed = compute_pool.run(
+            align_series,
+            series_idx,
+            epoch_s,
+            values,
+            len(keys),
+            start_s,
+            request.step_seconds,
+            n_steps,
+            request.fill,
+        )
+
+        timestamps_ms = (start_s + np.arange(n_steps) * request.step_seconds) * 1000
+        cells = matrix.astype(object)
+        cells[np.isnan(matrix)] = None
+        return {
+            "start_time": request.start_time,
+            "step_seconds": request.step_seconds,
+            "fill": request.fill,
+            "timestamps": timestamps_ms.astype(np.int64).tolist(),
+            "series": [
+                {
+                    "device_id": key.device_id,
+                    "sensor_type": key.sensor_type,
+                    "values": cells[i].tolist(),
+                    "observed": observed[i].tolist(),
+                }
+                for i, key in enumerate(keys)
+            ],
+        }
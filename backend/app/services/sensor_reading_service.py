@@ -1,36 +1,326 @@
 """Service layer for sensor reading operations."""
 
 from datetime import datetime, timedelta
-from typing import Optional, List
+import heapq
+from typing import Dict, Optional, List, Sequence, Tuple
 
+import numpy as np
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
 
-from ..models import SensorReading
+from ..config import get_settings
+from ..database import insert_ignore
+from ..models import SensorReading, Series
+from ..query_budget import ScanBudgetExceeded
 from ..schemas import SensorReadingCreate
+from .change_feed_service import ChangeFeedService
+from .chunk_codec import columns_to_rows, to_micros
+from .compute_pool import compute_pool
+from .downsample import lttb_indices
+from .heartbeat import heartbeat_tracker
+from .hot_store import hot_store
+from .ingest_dedup import normalize_timestamp, recent_keys
+from .metrics import metrics
+from .range_cache import range_cache
+from .lateness import lateness_tracker
+from .series_catalog import ReadingRow, select_readings
+from .shard_map import shard_map
+from .sketch_service import SketchService, sketch_builder
+
+settings = get_settings()
+
+NATURAL_KEY = ("series_id", "timestamp")
+
+# Newest readings of a series read to estimate how many a window holds.
+ESTIMATE_SAMPLE = 1000
 
 
 class SensorReadingService:
-    """Business logic for sensor reading management."""
+    """
+    Business logic for sensor reading management.
+
+    Readings live on the shard owning their device (see
+    :class:`~app.services.shard_map.ShardMap`): writes and per-device reads
+    go to that shard, fleet-wide reads are scattered to every shard and
+    merged. Reading IDs are only unique within a shard.
+    """
 
     @staticmethod
-    def create_reading(db: Session, reading_in: SensorReadingCreate) -> SensorReading:
-        """Create a new sensor reading."""
-        reading = SensorReading(
-            device_id=reading_in.device_id,
-            sensor_type=reading_in.sensor_type,
-            value=reading_in.value,
-            unit=reading_in.unit,
-            timestamp=reading_in.timestamp or datetime.utcnow(),
-        )
-        db.add(reading)
-        db.commit()
-        db.refresh(reading)
+    def create_reading(db: Session, reading_in: SensorReadingCreate) -> ReadingRow:
+        """Create a new sensor reading, returning the stored one if it is a duplicate."""
+        reading, _ = SensorReadingService.ingest_reading(db, reading_in)
         return reading
 
     @staticmethod
-    def get_reading(db: Session, reading_id: int) -> Optional[SensorReading]:
-        """Get a sensor reading by ID."""
-        return db.query(SensorReading).filter(SensorReading.id == reading_id).first()
+    def ingest_reading(db: Session, reading_in: SensorReadingCreate) -> Tuple[ReadingRow, bool]:
+        """
+        Idempotently store one reading keyed on its series (device_id,
+        sensor_type, unit) and timestamp.
+
+        Args:
+            db: Database session
+            reading_in: Reading data
+
+        Returns:
+            Tuple of the stored reading and whether it was a duplicate
+
+        Raises:
+            UnknownDevice: If there is no device with the reading's ID
+            InactiveDevice: If the reading's device is inactive
+        """
+        shard = shard_map.owner(reading_in.device_id, write=True)
+        timestamp = normalize_timestamp(reading_in.timestamp or datetime.utcnow())
+        key = (reading_in.sensor_type, reading_in.unit, timestamp)
+        heartbeat_tracker.beat(reading_in.device_id)
+
+        if recent_keys.seen(reading_in.device_id, key):
+            existing = SensorReadingService.get_reading_by_key(
+                db, reading_in.device_id, reading_in.sensor_type, reading_in.unit, timestamp
+            )
+            if existing is not None:
+                metrics.inc("ingest.duplicates_filtered")
+                return existing, True
+
+        created_at = datetime.utcnow()
+        table = SensorReading.__table__
+        with shard.session(db) as shard_db:
+            series_id = shard.catalog.resolve(
+                shard_db, reading_in.device_id, reading_in.sensor_type, reading_in.unit
+            )
+            statement = (
+                insert_ignore(shard_db, table, NATURAL_KEY)
+                .values(series_id=series_id, value=reading_in.value, timestamp=timestamp, created_at=created_at)
+                .returning(table.c.id)
+            )
+            reading_id = shard_db.execute(statement).scalar_one_or_none()
+            if reading_id is not None:
+                sketch_builder.mark(shard_db, [(series_id, timestamp)])
+                ChangeFeedService.record_spans(
+                    db, [(reading_in.device_id, reading_in.sensor_type, reading_in.unit, timestamp, timestamp)]
+                )
+            shard_db.commit()
+        if not shard.is_primary:
+            db.commit()
+        recent_keys.add(reading_in.device_id, key)
+
+        if reading_id is None:
+            metrics.inc("ingest.duplicates_conflict")
+            existing = SensorReadingService.get_reading_by_key(
+                db, reading_in.device_id, reading_in.sensor_type, reading_in.unit, timestamp
+            )
+            return existing, True
+
+        reading = ReadingRow(
+            reading_id,
+            reading_in.device_id,
+            reading_in.sensor_type,
+            reading_in.value,
+            reading_in.unit,
+            timestamp,
+            created_at,
+        )
+        metrics.inc("ingest.inserted")
+        lateness_tracker.add(reading.device_id, reading.sensor_type, reading.timestamp)
+        hot_store.add_many([reading])
+        range_cache.invalidate_rows([reading])
+        return reading, False
+
+    @staticmethod
+    def ingest_readings(db: Session, readings_in: List[SensorReadingCreate]) -> dict:
+        """
+        Idempotently store a batch of readings with one multi-row INSERT.
+
+        Duplicates inside the batch, keys seen recently and rows conflicting
+        with stored readings are skipped and counted.
+
+        Returns:
+            dict: ``received``, ``inserted`` and ``duplicates`` counts
+
+        Raises:
+            UnknownDevice: If a reading names no existing device; nothing is stored then
+            InactiveDevice: If a reading's device is inactive; nothing is stored then
+        """
+        now = datetime.utcnow()
+        rows = []
+        batch_keys = set()
+        filtered = 0
+        for reading_in in readings_in:
+            timestamp = normalize_timestamp(reading_in.timestamp or now)
+            natural_key = (reading_in.device_id, reading_in.sensor_type, reading_in.unit, timestamp)
+            if natural_key in batch_keys:
+                filtered += 1
+                continue
+            batch_keys.add(natural_key)
+            if recent_keys.seen(reading_in.device_id, natural_key[1:]):
+                filtered += 1
+                continue
+            rows.append(
+                {
+                    "device_id": reading_in.device_id,
+                    "sensor_type": reading_in.sensor_type,
+                    "value": reading_in.value,
+                    "unit": reading_in.unit,
+                    "timestamp": timestamp,
+                    "created_at": now,
+                }
+            )
+
+        stored = []
+        for name, shard_rows in SensorReadingService.partition_rows(rows).items():
+            shard_stored = SensorReadingService.insert_rows(db, shard_rows, name)
+            hot_store.add_many(shard_stored)
+            stored.extend(shard_stored)
+        inserted = len(stored)
+        conflicts = len(rows) - inserted
+        stored.sort(key=lambda row: row.timestamp)
+        for row in stored:
+            lateness_tracker.add(row.device_id, row.sensor_type, row.timestamp)
+        range_cache.invalidate_rows(stored)
+
+        recent_keys.add_many((key[0], key[1:]) for key in batch_keys)
+        for device_id in {key[0] for key in batch_keys}:
+            heartbeat_tracker.beat(device_id)
+
+        metrics.inc("ingest.inserted", inserted)
+        metrics.inc("ingest.duplicates_filtered", filtered)
+        metrics.inc("ingest.duplicates_conflict", conflicts)
+        return {
+            "received": len(readings_in),
+            "inserted": inserted,
+            "duplicates": filtered + conflicts,
+        }
+
+    @staticmethod
+    def partition_rows(rows: List[dict]) -> Dict[str, List[dict]]:
+        """
+        Prepared reading rows by the name of the shard owning their device.
+
+        Raises:
+            UnknownDevice: If a row names no existing device
+            InactiveDevice: If a row's device is inactive
+        """
+        partitions: Dict[str, List[dict]] = {}
+        for row in rows:
+            partitions.setdefault(shard_map.owner(row["device_id"], write=True).name, []).append(row)
+        return partitions
+
+    @staticmethod
+    def insert_rows(db: Session, rows: List[dict], shard: Optional[str] = None) -> List[ReadingRow]:
+        """
+        Insert prepared reading rows, skipping natural-key conflicts, and commit.
+
+        Rows carry ``device_id``, ``sensor_type`` and ``unit``; they are
+        encoded to series IDs through the series catalog. All rows must
+        belong to devices on ``shard`` (the primary by default). The rows
+        inserted are recorded in the change feed on the primary.
+
+        Returns:
+            List[ReadingRow]: Rows actually inserted
+        """
+        owner = shard_map.shards[shard] if shard is not None else shard_map.primary
+        with owner.session(db) as shard_db:
+            series_ids = owner.catalog.resolve_many(
+                shard_db, {(row["device_id"], row["sensor_type"], row["unit"]) for row in rows}
+            )
+            table = SensorReading.__table__
+            statement = insert_ignore(shard_db, table, NATURAL_KEY).returning(
+                table.c.id, table.c.series_id, table.c.value, table.c.timestamp, table.c.created_at
+            )
+            params = [
+                {
+                    "series_id": series_ids[(row["device_id"], row["sensor_type"], row["unit"])],
+                    "value": row["value"],
+                    "timestamp": row["timestamp"],
+                    "created_at": row["created_at"],
+                }
+                for row in rows
+            ]
+            inserted = shard_db.execute(statement, params).all()
+            sketch_builder.mark(shard_db, ((row[1], row[3]) for row in inserted))
+            stored = []
+            for reading_id, series_id, value, timestamp, created_at in inserted:
+                device_id, sensor_type, unit = owner.catalog.key_of(series_id)
+                stored.append(ReadingRow(reading_id, device_id, sensor_type, value, unit, timestamp, created_at))
+            ChangeFeedService.record_readings(db, stored)
+            shard_db.commit()
+        if not owner.is_primary:
+            db.commit()
+        return stored
+
+    @staticmethod
+    def get_reading_by_key(
+        db: Session,
+        device_id: str,
+        sensor_type: str,
+        unit: str,
+        timestamp: datetime,
+    ) -> Optional[ReadingRow]:
+        """Get a reading by its natural key: its series and timestamp."""
+        statement = SensorReadingService.readings_select(device_id, sensor_type).where(
+            Series.unit == unit, SensorReading.timestamp == timestamp
+        )
+        with shard_map.owner(device_id).session(db) as shard_db:
+            return shard_db.execute(statement).one_or_none()
+
+    @staticmethod
+    def get_reading(db: Session, reading_id: int) -> Optional[ReadingRow]:
+        """
+        Get a sensor reading by ID.
+
+        IDs are assigned per shard, so with several shards the reading of
+        the first shard holding the ID is returned.
+        """
+        statement = select_readings().where(SensorReading.id == reading_id)
+        found = shard_map.scatter(db, lambda shard, shard_db: shard_db.execute(statement).first())
+        return next((row for row in found if row is not None), None)
+
+    @staticmethod
+    def get_readings(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        sensor_type: Optional[str] = None,
+    ) -> List[ReadingRow]:
+        """
+        Get the most recent sensor readings across all devices.
+
+        Each shard returns its newest ``skip + limit`` readings and the page
+        is cut from their merge.
+        """
+        statement = SensorReadingService.readings_select(sensor_type=sensor_type, descending=True)
+        if not shard_map.sharded:
+            return db.execute(statement.offset(skip).limit(limit)).all()
+        pages = shard_map.scatter(db, lambda shard, shard_db: shard_db.execute(statement.limit(skip + limit)).all())
+        merged = heapq.merge(*pages, key=lambda row: row.timestamp, reverse=True)
+        return list(merged)[skip : skip + limit]
+
+    @staticmethod
+    def readings_select(
+        device_id: Optional[str] = None,
+        sensor_type: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        descending: bool = False,
+    ) -> Select:
+        """
+        Build a column-only select over sensor readings joined to their series.
+
+        Selecting plain columns skips ORM identity-map bookkeeping, so rows
+        can be fetched from a server-side cursor in constant memory.
+        """
+        statement = select_readings()
+        if device_id:
+            statement = statement.where(Series.device_id == device_id)
+        if sensor_type:
+            statement = statement.where(Series.sensor_type == sensor_type)
+        if start_time:
+            statement = statement.where(SensorReading.timestamp >= start_time)
+        if end_time:
+            statement = statement.where(SensorReading.timestamp <= end_time)
+
+        order = SensorReading.timestamp.desc() if descending else SensorReading.timestamp.asc()
+        return statement.order_by(order)
 
     @staticmethod
     def get_readings_by_device(
@@ -39,27 +329,106 @@ class SensorReadingService:
         skip: int = 0,
         limit: int = 100,
         sensor_type: Optional[str] = None,
-    ) -> List[SensorReading]:
+    ) -> List[ReadingRow]:
         """Get sensor readings for a specific device."""
-        query = db.query(SensorReading).filter(SensorReading.device_id == device_id)
+        statement = SensorReadingService.readings_select(device_id, sensor_type, descending=True)
+        with shard_map.owner(device_id).session(db) as shard_db:
+            return shard_db.execute(statement.offset(skip).limit(limit)).all()
 
-        if sensor_type:
-            query = query.filter(SensorReading.sensor_type == sensor_type)
+    @staticmethod
+    def get_latest_reading(db: Session, device_id: str, sensor_type: str) -> Optional[ReadingRow]:
+        """
+        Get the latest reading for a device and sensor type.
 
-        return query.order_by(SensorReading.timestamp.desc()).offset(skip).limit(limit).all()
+        Served from the hot window store when it holds the series.
+        """
+        cached = hot_store.latest(device_id, sensor_type)
+        if cached is not None:
+            return cached
+        statement = SensorReadingService.readings_select(device_id, sensor_type, descending=True)
+        with shard_map.owner(device_id).session(db) as shard_db:
+            return shard_db.execute(statement.limit(1)).first()
 
     @staticmethod
-    def get_latest_reading(db: Session, device_id: str, sensor_type: str) -> Optional[SensorReading]:
-        """Get the latest reading for a device and sensor type."""
-        return (
-            db.query(SensorReading)
-            .filter(
-                SensorReading.device_id == device_id,
-                SensorReading.sensor_type == sensor_type,
+    def get_latest_readings(db: Session, device_ids: Sequence[str], sensor_types: Sequence[str]) -> List[ReadingRow]:
+        """
+        Latest reading of every listed device for each sensor type.
+
+        Series held by the hot window store are answered from memory; the
+        rest in one query that looks up each series' newest timestamp
+        through the ``(series_id, timestamp)`` index.
+        """
+        found, missing = [], []
+        for device_id in device_ids:
+            for sensor_type in sensor_types:
+                cached = hot_store.latest(device_id, sensor_type)
+                if cached is not None:
+                    found.append(cached)
+                else:
+                    missing.append((device_id, sensor_type))
+        if missing:
+            newest = (
+                select(func.max(SensorReading.timestamp))
+                .where(SensorReading.series_id == Series.id)
+                .correlate(Series)
+                .scalar_subquery()
             )
-            .order_by(SensorReading.timestamp.desc())
-            .first()
+            wanted = set(missing)
+            groups = shard_map.group({device_id for device_id, _ in missing})
+
+            def latest_on(shard, shard_db) -> List[ReadingRow]:
+                statement = select_readings().where(
+                    Series.device_id.in_(groups[shard.name]),
+                    Series.sensor_type.in_({sensor_type for _, sensor_type in missing}),
+                    SensorReading.timestamp == newest,
+                )
+                return [row for row in shard_db.execute(statement) if (row.device_id, row.sensor_type) in wanted]
+
+            for rows in shard_map.scatter(db, latest_on, groups):
+                found.extend(rows)
+        return found
+
+    @staticmethod
+    def estimate_rows(db: Session, device_id: str, sensor_type: str, start_time: datetime, end_time: datetime) -> int:
+        """
+        Estimate how many readings of a series a window holds, without scanning it.
+
+        The newest ``ESTIMATE_SAMPLE`` timestamps are read through the
+        ``(series_id, timestamp)`` index. A window they cover, or a series
+        with fewer readings, is counted exactly; otherwise the sample's rate
+        is applied to the part of the window between the series' oldest and
+        newest readings.
+        """
+        start_time, end_time = normalize_timestamp(start_time), normalize_timestamp(end_time)
+        statement = (
+            select_readings()
+            .with_only_columns(SensorReading.timestamp)
+            .where(Series.device_id == device_id, Series.sensor_type == sensor_type)
         )
+        with shard_map.owner(device_id).session(db) as shard_db:
+            sample = shard_db.execute(
+                statement.order_by(SensorReading.timestamp.desc()).limit(ESTIMATE_SAMPLE)
+            ).scalars().all()
+            if len(sample) < ESTIMATE_SAMPLE or start_time >= sample[-1]:
+                return sum(1 for timestamp in sample if start_time <= timestamp <= end_time)
+            oldest = shard_db.execute(
+                statement.with_only_columns(func.min(SensorReading.timestamp))
+            ).scalar()
+        span = (sample[0] - sample[-1]).total_seconds()
+        window = (min(end_time, sample[0]) - max(start_time, oldest)).total_seconds()
+        if window < 0:
+            return 0
+        if span <= 0:
+            return settings.query_max_scan_rows + 1
+        return int((len(sample) - 1) / span * window)
+
+    @staticmethod
+    def _over_scan_budget(db: Session, device_id: str, sensor_type: str, start_time: datetime, end_time: datetime):
+        """The estimated row count when it exceeds ``QUERY_MAX_SCAN_ROWS``, else None."""
+        if not settings.query_max_scan_rows:
+            return None
+        estimate = SensorReadingService.estimate_rows(db, device_id, sensor_type, start_time, end_time)
+        return estimate if estimate > settings.query_max_scan_rows else None
 
     @staticmethod
     def get_readings_in_range(
@@ -68,19 +437,43 @@ class SensorReadingService:
         sensor_type: str,
         start_time: datetime,
         end_time: datetime,
-    ) -> List[SensorReading]:
-        """Get sensor readings within a time range."""
-        return (
-            db.query(SensorReading)
-            .filter(
-                SensorReading.device_id == device_id,
-                SensorReading.sensor_type == sensor_type,
-                SensorReading.timestamp >= start_time,
-                SensorReading.timestamp <= end_time,
-            )
-            .order_by(SensorReading.timestamp.asc())
-            .all()
-        )
+        max_points: Optional[int] = None,
+    ) -> List[ReadingRow]:
+        """
+        Get sensor readings within a time range.
+
+        Ranges held by the hot window store are answered from memory; older
+        ranges reuse closed chunks from the range cache. With ``max_points``
+        the result is downsampled with LTTB to at most that many readings,
+        in the compute pool.
+
+        Raises:
+            ScanBudgetExceeded: If the range likely holds more than
+                ``QUERY_MAX_SCAN_ROWS`` readings
+        """
+        cached = hot_store.range(device_id, sensor_type, start_time, end_time)
+        if cached is not None:
+            unit, columns = cached
+            if max_points:
+                picked = compute_pool.run(lttb_indices, columns[0], columns[1], max_points)
+                columns = tuple(column[picked] for column in columns)
+            return columns_to_rows(device_id, sensor_type, unit, columns)
+
+        estimate = SensorReadingService._over_scan_budget(db, device_id, sensor_type, start_time, end_time)
+        if estimate is not None:
+            raise ScanBudgetExceeded(estimate, settings.query_max_scan_rows)
+        with shard_map.owner(device_id).session(db) as shard_db:
+            if settings.range_cache_enabled:
+                rows = range_cache.read(shard_db, device_id, sensor_type, start_time, end_time)
+            else:
+                statement = SensorReadingService.readings_select(device_id, sensor_type, start_time, end_time)
+                rows = shard_db.execute(statement).all()
+        if max_points and len(rows) > max_points:
+            timestamps = np.fromiter((to_micros(row.timestamp) for row in rows), dtype=np.int64, count=len(rows))
+            values = np.fromiter((row.value for row in rows), dtype=np.float64, count=len(rows))
+            picked = compute_pool.run(lttb_indices, timestamps, values, max_points)
+            rows = [rows[i] for i in picked.tolist()]
+        return rows
 
     @staticmethod
     def get_average_value(
@@ -89,25 +482,51 @@ class SensorReadingService:
         sensor_type: str,
         hours: int = 24,
     ) -> Optional[float]:
-        """Get average sensor value for the last N hours."""
-        from sqlalchemy import func
-
-        start_time = datetime.utcnow() - timedelta(hours=hours)
-        result = (
-            db.query(func.avg(SensorReading.value))
-            .filter(
-                SensorReading.device_id == device_id,
-                SensorReading.sensor_type == sensor_type,
-                SensorReading.timestamp >= start_time,
-            )
-            .scalar()
-        )
-        return result
+        """
+        Get average sensor value for the last N hours.
+
+        Windows likely to hold more than ``QUERY_MAX_SCAN_ROWS`` readings are
+        answered from the quantile sketches' per-bucket totals instead.
+
+        Raises:
+            ScanBudgetExceeded: If such a window cannot use sketches
+        """
+        now = datetime.utcnow()
+        start_time = now - timedelta(hours=hours)
+        cached = hot_store.average(device_id, sensor_type, start_time)
+        if cached is not None:
+            total, count = cached
+            return total / count if count else None
+        estimate = SensorReadingService._over_scan_budget(db, device_id, sensor_type, start_time, now)
+        if estimate is not None:
+            if not settings.sketch_enabled:
+                raise ScanBudgetExceeded(estimate, settings.query_max_scan_rows)
+            return SketchService.average(db, device_id, sensor_type, start_time, now)
+        with shard_map.owner(device_id).session(db) as shard_db:
+            return shard_db.execute(
+                select_readings()
+                .with_only_columns(func.avg(SensorReading.value))
+                .where(
+                    Series.device_id == device_id,
+                    Series.sensor_type == sensor_type,
+                    SensorReading.timestamp >= start_time,
+                )
+            ).scalar()
 
     @staticmethod
     def delete_old_readings(db: Session, days: int = 30) -> int:
-        """Delete sensor readings older than N days."""
+        """Delete sensor readings older than N days, on every shard."""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
-        deleted = db.query(SensorReading).filter(SensorReading.timestamp < cutoff_date).delete()
+
+        def delete_on(shard, shard_db) -> int:
+            deleted = shard_db.query(SensorReading).filter(SensorReading.timestamp < cutoff_date).delete()
+            shard_db.commit()
+            return deleted
+
+        deleted = sum(shard_map.scatter(db, delete_on))
+        ChangeFeedService.record(db, "readings", "delete", None, {"before": cutoff_date})
         db.commit()
+        hot_store.drop_before(cutoff_date)
+        range_cache.clear_before(cutoff_date)
+        sketch_builder.clear_before(db, cutoff_date)
         return deleted
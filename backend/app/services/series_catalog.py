@@ -0,0 +1,147 @@
+"""Series catalog: dictionary encoding of (device_id, sensor_type, unit)."""
+
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from ..database import insert_ignore
+from ..models import SensorReading, Series
+
+SeriesKey = Tuple[str, str, str]
+
+SERIES_KEY = ("device_id", "sensor_type", "unit")
+
+# Session.info entry holding series resolved in the open transaction.
+_PENDING = "series_catalog_pending"
+
+# Columns a reading is read back with, in the order of ReadingRow.
+READING_COLUMNS = (
+    SensorReading.id,
+    Series.device_id,
+    Series.sensor_type,
+    SensorReading.value,
+    Series.unit,
+    SensorReading.timestamp,
+    SensorReading.created_at,
+)
+
+
+class ReadingRow(NamedTuple):
+    """A reading with its series key resolved, shaped like the API response."""
+
+    id: int
+    device_id: str
+    sensor_type: str
+    value: float
+    unit: str
+    timestamp: datetime
+    created_at: datetime
+
+
+def select_readings() -> Select:
+    """Readings joined to their series, selecting :data:`READING_COLUMNS`."""
+    return select(*READING_COLUMNS).join(Series, Series.id == SensorReading.series_id)
+
+
+class SeriesCatalog:
+    """
+    In-memory cache of series IDs in front of the ``series`` table.
+
+    Every ingest resolves its key here, so after the first reading of a
+    series no lookup reaches the database. Misses insert the series with
+    ``ON CONFLICT DO NOTHING`` in the caller's transaction and read the ID
+    back, which is safe when several workers create the same series
+    concurrently. IDs are cached once that transaction commits, so the
+    cache never holds an ID a rolled-back transaction created.
+    """
+
+    def __init__(self):
+        self._ids: Dict[SeriesKey, int] = {}
+        self._keys: Dict[int, SeriesKey] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Session, device_id: str, sensor_type: str, unit: str) -> int:
+        """ID of a series, creating it on first use."""
+        key = (device_id, sensor_type, unit)
+        series_id = self._ids.get(key)
+        if series_id is None:
+            series_id = self.resolve_many(db, [key])[key]
+        return series_id
+
+    def resolve_many(self, db: Session, keys: Iterable[SeriesKey]) -> Dict[SeriesKey, int]:
+        """IDs of several series, creating missing ones with one INSERT in ``db``'s transaction."""
+        resolved = {}
+        missing = set()
+        for key in keys:
+            series_id = self._ids.get(key)
+            if series_id is None:
+                missing.add(key)
+            else:
+                resolved[key] = series_id
+        if not missing:
+            return resolved
+
+        now = datetime.utcnow()
+        db.execute(
+            insert_ignore(db, Series.__table__, SERIES_KEY),
+            [
+                {"device_id": device_id, "sensor_type": sensor_type, "unit": unit, "created_at": now}
+                for device_id, sensor_type, unit in missing
+            ],
+        )
+        rows = db.execute(
+            select(Series.id, Series.device_id, Series.sensor_type, Series.unit).where(
+                Series.device_id.in_({key[0] for key in missing})
+            )
+        ).all()
+        found = {}
+        for series_id, device_id, sensor_type, unit in rows:
+            key = (device_id, sensor_type, unit)
+            found[key] = series_id
+            if key in missing:
+                resolved[key] = series_id
+        with self._lock:
+            # Readings inserted in this transaction are read back by ID.
+            for key, series_id in found.items():
+                self._keys[series_id] = key
+        db.info.setdefault(_PENDING, []).append((self, found))
+        return resolved
+
+    def _cache(self, found: Dict[SeriesKey, int]) -> None:
+        with self._lock:
+            for key, series_id in found.items():
+                self._ids[key] = series_id
+                self._keys[series_id] = key
+
+    def key_of(self, series_id: int) -> SeriesKey:
+        """Key of a series resolved by this process."""
+        return self._keys[series_id]
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop cached series of a deleted device."""
+        with self._lock:
+            for key in [key for key in self._ids if key[0] == device_id]:
+                del self._keys[self._ids.pop(key)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+series_catalog = SeriesCatalog()
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed(session: Session) -> None:
+    for catalog, found in session.info.pop(_PENDING, ()):
+        catalog._cache(found)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_uncommitted(session: Session, transaction) -> None:
+    # Rolled back, or the session closed without committing.
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
@@ -0,0 +1,379 @@
+"""Placement of each device's readings on one of several databases."""
+
+import bisect
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TypeVar
+
+from sqlalchemy import MetaData, create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import Device, ReadingForecast, ReadingSketch, SensorReading, Series, SketchDirtyBucket
+from ..query_budget import inherit
+from ..utils import logger
+from .series_catalog import SeriesCatalog, series_catalog
+
+settings = get_settings()
+
+# The database behind ``database.engine``. It always holds devices and
+# alerts, and the readings of devices without another placement.
+PRIMARY = "primary"
+
+T = TypeVar("T")
+
+
+class ShardConfigError(RuntimeError):
+    """A device is placed on a shard that is not configured."""
+
+
+class UnknownDevice(LookupError):
+    """Readings were written for a device ID with no device row."""
+
+    def __init__(self, device_id: str):
+        super().__init__(f"Device {device_id} not found")
+        self.device_id = device_id
+
+
+class InactiveDevice(Exception):
+    """Readings were written for a deactivated (or purging) device."""
+
+    def __init__(self, device_id: str):
+        super().__init__(f"Device {device_id} is inactive")
+        self.device_id = device_id
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def shard_metadata() -> MetaData:
+    """
+    Tables of a non-primary shard: series, readings, sketches and forecasts.
+
+    Devices stay on the primary, so the copy of ``series`` drops its
+    foreign key to them.
+    """
+    metadata = MetaData()
+    for table in (
+        Series.__table__,
+        SensorReading.__table__,
+        ReadingSketch.__table__,
+        SketchDirtyBucket.__table__,
+        ReadingForecast.__table__,
+    ):
+        table.to_metadata(metadata)
+    series = metadata.tables[Series.__tablename__]
+    for foreign_key in list(series.foreign_keys):
+        if foreign_key.target_fullname == "devices.id":
+            series.constraints.discard(foreign_key.constraint)
+            series.foreign_keys.discard(foreign_key)
+            foreign_key.parent.foreign_keys.discard(foreign_key)
+    return metadata
+
+
+class Shard:
+    """
+    One database holding readings.
+
+    Series IDs are only unique within a shard, so each shard has its own
+    series catalog; the primary's is the process-wide ``series_catalog``.
+
+    Attributes:
+        name: Name used in ``devices.shard`` and the settings
+        weight: Share of new devices placed here
+        session_factory: Sessions on this shard's database
+        catalog: Series catalog of this shard
+    """
+
+    def __init__(self, name: str, weight: float, session_factory: sessionmaker, catalog: SeriesCatalog):
+        self.name = name
+        self.weight = weight
+        self.session_factory = session_factory
+        self.catalog = catalog
+
+    @property
+    def is_primary(self) -> bool:
+        return self.name == PRIMARY
+
+    @contextmanager
+    def session(self, db: Session) -> Iterator[Session]:
+        """``db`` itself on the primary, otherwise a session on this shard closed on exit."""
+        if self.is_primary:
+            yield db
+            return
+        shard_db = self.session_factory()
+        inherit(db, shard_db)
+        try:
+            yield shard_db
+        finally:
+            shard_db.close()
+
+    def __repr__(self) -> str:
+        return f"<Shard({self.name})>"
+
+
+class ShardMap:
+    """
+    Routes each device's readings to one shard.
+
+    New devices are placed by consistent hashing over a ring with
+    ``vnodes * weight`` points per shard, and the placement is stored in
+    ``devices.shard``. From then on the stored placement is what counts:
+    changing shards or weights never moves data implicitly, it only
+    changes where new devices go and what the rebalancing tool moves.
+    Placements are cached in memory, loaded at startup, refreshed
+    periodically and looked up on a miss; IDs without a device are
+    remembered for ``SHARD_UNKNOWN_DEVICE_TTL_SECONDS``. Shards hold no
+    devices, so writes look the device up through the same cache and
+    refuse IDs that have none, or whose device is inactive.
+
+    With no shards configured every device is on the primary and routing
+    is a constant lookup.
+    """
+
+    def __init__(
+        self,
+        urls: Dict[str, str],
+        weights: Dict[str, float],
+        vnodes: int = 64,
+        scatter_workers: int = 8,
+        unknown_ttl_seconds: float = 5.0,
+        max_unknown: int = 100_000,
+    ):
+        self.shards: Dict[str, Shard] = {
+            PRIMARY: Shard(PRIMARY, weights.get(PRIMARY, 0.0 if urls else 1.0), SessionLocal, series_catalog)
+        }
+        for name, url in urls.items():
+            if name == PRIMARY:
+                continue
+            shard_engine = create_engine(
+                url,
+                pool_pre_ping=True,
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_timeout=settings.db_pool_timeout,
+            )
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+            self.shards[name] = Shard(name, weights.get(name, 1.0), factory, SeriesCatalog())
+        self.vnodes = vnodes
+        self._ring: List[int] = []
+        self._owners: List[str] = []
+        self.set_weights({name: shard.weight for name, shard in self.shards.items()})
+        self._placements: Dict[str, str] = {}
+        self._inactive: Set[str] = set()
+        # Device IDs found missing, with when to look again, oldest first.
+        self._unknown: "OrderedDict[str, float]" = OrderedDict()
+        self.unknown_ttl = unknown_ttl_seconds
+        self.max_unknown = max_unknown
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(scatter_workers, 1), thread_name_prefix="shard")
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.shards) > 1
+
+    @property
+    def primary(self) -> Shard:
+        return self.shards[PRIMARY]
+
+    def set_weights(self, weights: Dict[str, float]) -> None:
+        """Rebuild the ring for new devices from ``{shard: weight}``."""
+        points = []
+        for name, weight in weights.items():
+            if name not in self.shards:
+                raise ShardConfigError(f"Unknown shard: {name}")
+            self.shards[name].weight = weight
+            points.extend((_hash(f"{name}#{i}"), name) for i in range(round(self.vnodes * weight)))
+        if not points:
+            raise ShardConfigError("No shard has a positive weight")
+        points.sort()
+        self._ring = [point for point, _ in points]
+        self._owners = [name for _, name in points]
+
+    # -- placement --------------------------------------------------------
+
+    def ring_owner(self, device_id: str) -> str:
+        """Shard the ring assigns to a device, regardless of where it is stored."""
+        i = bisect.bisect(self._ring, _hash(device_id))
+        return self._owners[i % len(self._owners)]
+
+    def assign(self, device_id: str) -> str:
+        """Placement for a new device, remembered in this process."""
+        name = self.ring_owner(device_id)
+        self.pin(device_id, name)
+        return name
+
+    def pin(self, device_id: str, name: str) -> None:
+        with self._lock:
+            self._placements[device_id] = name
+            self._unknown.pop(device_id, None)
+
+    def set_active(self, device_id: str, active: bool) -> None:
+        """Accept or refuse further readings of a device."""
+        with self._lock:
+            if active:
+                self._inactive.discard(device_id)
+            else:
+                self._inactive.add(device_id)
+
+    def forget_device(self, device_id: str) -> None:
+        """Drop the placement and cached series of a deleted device."""
+        with self._lock:
+            self._placements.pop(device_id, None)
+            self._inactive.discard(device_id)
+        for shard in self.shards.values():
+            shard.catalog.forget_device(device_id)
+
+    def load_placements(self, db: Session) -> List[str]:
+        """
+        Replace the cached placements and inactive devices with those stored on the devices.
+
+        Returns:
+            List[str]: Cached devices that no longer exist
+        """
+        rows = db.execute(select(Device.id, Device.shard, Device.is_active)).all()
+        placements = {device_id: shard or PRIMARY for device_id, shard, _ in rows}
+        inactive = {device_id for device_id, _, is_active in rows if not is_active}
+        with self._lock:
+            previous, self._placements, self._inactive = self._placements, placements, inactive
+        # Series IDs cached for a shard a device moved off are gone with its data.
+        for device_id, name in previous.items():
+            if placements.get(device_id, name) != name and name in self.shards:
+                self.shards[name].catalog.forget_device(device_id)
+        return [device_id for device_id in previous if device_id not in placements]
+
+    def owner(self, device_id: str, write: bool = False) -> Shard:
+        """
+        Shard holding a device's readings.
+
+        Args:
+            device_id: Device to look up
+            write: Readings are about to be written; the device must exist
+
+        Raises:
+            ShardConfigError: If the device is placed on an unconfigured shard
+            UnknownDevice: If ``write`` is set and there is no such device
+            InactiveDevice: If ``write`` is set and the device is inactive
+        """
+        if not self.sharded and not write:
+            return self.primary
+        if write and device_id in self._inactive:
+            raise InactiveDevice(device_id)
+        name = self._placements.get(device_id)
+        if name is None:
+            name = self._lookup(device_id)
+            if name is None:
+                if write:
+                    raise UnknownDevice(device_id)
+                # Not a device (yet); nothing is stored for it anywhere.
+                return self.shards[self.ring_owner(device_id)]
+            if write and device_id in self._inactive:
+                raise InactiveDevice(device_id)
+        shard = self.shards.get(name)
+        if shard is None:
+            raise ShardConfigError(f"Device {device_id} is placed on unconfigured shard {name}")
+        return shard
+
+    def _lookup(self, device_id: str) -> Optional[str]:
+        """Stored placement of a device not in the cache, None if it does not exist."""
+        now = time.monotonic()
+        with self._lock:
+            retry_at = self._unknown.get(device_id)
+            if retry_at is not None and retry_at > now:
+                return None
+        db = SessionLocal()
+        try:
+            row = db.execute(select(Device.shard, Device.is_active).where(Device.id == device_id)).first()
+        finally:
+            db.close()
+        if row is not None:
+            name = row[0] or PRIMARY
+            self.set_active(device_id, row[1])
+            self.pin(device_id, name)
+            return name
+        with self._lock:
+            self._unknown.pop(device_id, None)
+            self._unknown[device_id] = now + self.unknown_ttl
+            while self._unknown and (
+                len(self._unknown) > self.max_unknown or next(iter(self._unknown.values())) <= now
+            ):
+                self._unknown.popitem(last=False)
+        return None
+
+    def group(self, device_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Device IDs by the name of the shard holding them."""
+        groups: Dict[str, List[str]] = {}
+        for device_id in device_ids:
+            groups.setdefault(self.owner(device_id).name, []).append(device_id)
+        return groups
+
+    # -- fan-out ----------------------------------------------------------
+
+    def scatter(
+        self,
+        db: Session,
+        query: Callable[[Shard, Session], T],
+        names: Optional[Iterable[str]] = None,
+    ) -> List[T]:
+        """
+        Run ``query(shard, session)`` on several shards in parallel.
+
+        Each shard gets its own session under ``db``'s query budget; a query
+        on the primary alone runs inline on ``db``. Results come back in the order of ``names``
+        (every shard by default).
+        """
+        shards = [self.shards[name] for name in (self.shards if names is None else names)]
+        if len(shards) == 1 and shards[0].is_primary:
+            return [query(shards[0], db)]
+
+        def run(shard: Shard) -> T:
+            shard_db = shard.session_factory()
+            inherit(db, shard_db)
+            try:
+                return query(shard, shard_db)
+            finally:
+                shard_db.close()
+
+        return list(self._executor.map(run, shards))
+
+    def stats(self) -> dict:
+        """Configured shards and cached placements."""
+        return {
+            "shards": len(self.shards),
+            "placements": len(self._placements),
+            "inactive": len(self._inactive),
+            "unknown": len(self._unknown),
+        }
+
+    def create_schemas(self) -> None:
+        """Create the reading tables on every non-primary shard."""
+        metadata = shard_metadata()
+        for shard in self.shards.values():
+            if not shard.is_primary:
+                metadata.create_all(bind=shard.session_factory.kw["bind"])
+        if self.sharded:
+            logger.info(f"Reading shards: {', '.join(f'{s.name} (weight {s.weight:g})' for s in self.shards.values())}")
+
+
+shard_map = ShardMap(
+    urls=settings.shard_urls,
+    weights=settings.shard_weights,
+    vnodes=settings.shard_vnodes,
+    scatter_workers=settings.shard_scatter_workers,
+    unknown_ttl_seconds=settings.shard_unknown_device_ttl_seconds,
+)
+
+
+def run_placement_refresh() -> None:
+    """Reload device placements on a short-lived session."""
+    db = SessionLocal()
+    try:
+        shard_map.load_placements(db)
+    finally:
+        db.close()
@@ -0,0 +1,208 @@
+"""Online moves of devices' readings between shards."""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import insert_ignore
+from ..models import Device, ReadingForecast, ReadingSketch, SensorReading, Series, SketchDirtyBucket
+from ..utils import logger
+from .change_feed_service import ChangeFeedService
+from .range_cache import range_cache
+from .shard_map import PRIMARY, shard_map
+from .sketch_service import sketch_builder
+
+settings = get_settings()
+
+class Move(NamedTuple):
+    """A device whose stored placement differs from the ring's."""
+
+    device_id: str
+    source: str
+    target: str
+
+
+class ShardRebalancer:
+    """
+    Moves devices onto the shard the current ring assigns them.
+
+    A move runs while the API keeps ingesting:
+
+    1. Copy each device's series and readings to its target in ID batches,
+       remapping series IDs and skipping natural keys already there.
+    2. Point ``devices.shard`` at the target. New writes go there as soon
+       as each worker refreshes its placements.
+    3. Wait ``grace_seconds`` (two ``SHARD_PLACEMENT_REFRESH_SECONDS`` by
+       default) for every worker to pick up the new placements.
+    4. Copy again, deleting each batch from the source by the IDs just
+       copied. Repeat until the source holds none, so writes still
+       reaching it, or committed out of ID order, are moved, not lost.
+    5. If every reading copied was deleted, delete the device's sketches,
+       forecasts and series on the source; otherwise leave them for the
+       next run.
+
+    Copies are idempotent, so an interrupted move is finished by running
+    the tool again; sketches and forecasts on the target are built by the
+    regular cycles.
+    """
+
+    def __init__(self, grace_seconds: Optional[float] = None, batch_size: Optional[int] = None):
+        if grace_seconds is None:
+            grace_seconds = 2 * settings.shard_placement_refresh_seconds
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size or settings.purge_batch_size
+
+    @staticmethod
+    def plan(db: Session, limit: Optional[int] = None) -> List[Move]:
+        """Devices not on their ring owner, oldest first."""
+        moves = []
+        for device_id, name in db.execute(select(Device.id, Device.shard).order_by(Device.created_at.asc())):
+            source = name or PRIMARY
+            target = shard_map.ring_owner(device_id)
+            if source != target:
+                moves.append(Move(device_id, source, target))
+                if limit is not None and len(moves) >= limit:
+                    break
+        return moves
+
+    def run(self, db: Session, moves: List[Move]) -> dict:
+        """
+        Move the readings of several devices; ``db`` is a session on the primary.
+
+        All devices are copied and repointed first, so the grace period is
+        waited out once per call rather than once per device.
+
+        Returns:
+            dict: Devices moved, and readings copied and deleted
+        """
+        report = {"devices": 0, "copied": 0, "deleted": 0}
+        if not moves:
+            return report
+        for move in moves:
+            copied, _, _ = self._copy(db, move)
+            report["copied"] += copied
+            db.execute(update(Device).where(Device.id == move.device_id).values(shard=move.target))
+            ChangeFeedService.record(db, "device", "update", move.device_id, {"shard": move.target})
+            db.commit()
+            shard_map.pin(move.device_id, move.target)
+            logger.info(f"Rebalance: {move.device_id} copied to {move.target} ({copied} readings)")
+
+        logger.info(f"Rebalance: waiting {self.grace_seconds:g}s for workers to pick up new placements")
+        time.sleep(self.grace_seconds)
+
+        for move in moves:
+            source = shard_map.shards[move.source]
+            caught_up = moved = deleted = 0
+            with source.session(db) as source_db:
+                while True:
+                    copied, read, removed = self._copy(db, move, delete_copied=True)
+                    caught_up += copied
+                    moved += read
+                    deleted += removed
+                    if not self._has_readings(source_db, move.device_id):
+                        break
+                if deleted != moved:
+                    logger.error(
+                        f"Rebalance: {move.device_id} moved {moved} readings but deleted {deleted}; "
+                        f"keeping its series on {move.source}, run again to finish"
+                    )
+                    report["copied"] += caught_up
+                    report["deleted"] += deleted
+                    continue
+                self._delete_series(source_db, move.device_id)
+            source.catalog.forget_device(move.device_id)
+            range_cache.forget_device(move.device_id)
+            report["devices"] += 1
+            report["copied"] += caught_up
+            report["deleted"] += deleted
+            logger.info(
+                f"Rebalance: moved {move.device_id} {move.source} -> {move.target} "
+                f"({caught_up} caught up, {deleted} deleted)"
+            )
+        return report
+
+    def _copy(self, db: Session, move: Move, delete_copied: bool = False) -> Tuple[int, int, int]:
+        """
+        Copy a device's readings to its target in ID batches.
+
+        With ``delete_copied``, each batch is deleted from the source by the IDs
+        read, once it is committed on the target. Readings already on the
+        target count as copied.
+
+        Returns:
+            tuple: Rows inserted on the target, rows read and rows deleted
+        """
+        target = shard_map.shards[move.target]
+        with shard_map.shards[move.source].session(db) as source_db, target.session(db) as target_db:
+            series = source_db.execute(
+                select(Series.id, Series.sensor_type, Series.unit).where(Series.device_id == move.device_id)
+            ).all()
+            if not series:
+                return 0, 0, 0
+            target_ids = target.catalog.resolve_many(
+                target_db, [(move.device_id, sensor_type, unit) for _, sensor_type, unit in series]
+            )
+            mapping: Dict[int, int] = {
+                series_id: target_ids[(move.device_id, sensor_type, unit)] for series_id, sensor_type, unit in series
+            }
+
+            statement = insert_ignore(target_db, SensorReading.__table__, ("series_id", "timestamp"))
+            inserted = read = deleted = 0
+            after_id = 0
+            while True:
+                rows = source_db.execute(
+                    select(
+                        SensorReading.id,
+                        SensorReading.series_id,
+                        SensorReading.value,
+                        SensorReading.timestamp,
+                        SensorReading.created_at,
+                    )
+                    .where(SensorReading.series_id.in_(mapping), SensorReading.id > after_id)
+                    .order_by(SensorReading.id.asc())
+                    .limit(self.batch_size)
+                ).all()
+                if not rows:
+                    break
+                inserted += target_db.execute(
+                    statement,
+                    [
+                        {"series_id": mapping[series_id], "value": value, "timestamp": timestamp, "created_at": created}
+                        for _, series_id, value, timestamp, created in rows
+                    ],
+                ).rowcount
+                sketch_builder.mark(target_db, ((mapping[row[1]], row[3]) for row in rows))
+                target_db.commit()
+                read += len(rows)
+                if delete_copied:
+                    deleted += source_db.execute(
+                        delete(SensorReading).where(SensorReading.id.in_([row[0] for row in rows])),
+                        execution_options={"synchronize_session": False},
+                    ).rowcount
+                    source_db.commit()
+                after_id = rows[-1][0]
+                if len(rows) < self.batch_size:
+                    break
+        return inserted, read, deleted
+
+    @staticmethod
+    def _has_readings(source_db: Session, device_id: str) -> bool:
+        series_ids = select(Series.id).where(Series.device_id == device_id)
+        return source_db.execute(
+            select(SensorReading.id).where(SensorReading.series_id.in_(series_ids)).limit(1)
+        ).first() is not None
+
+    @staticmethod
+    def _delete_series(source_db: Session, device_id: str) -> None:
+        """Delete a device's sketches, their markers, forecasts and series."""
+        series_ids = select(Series.id).where(Series.device_id == device_id)
+        for model in (ReadingSketch, SketchDirtyBucket, ReadingForecast):
+            source_db.execute(
+                delete(model).where(model.series_id.in_(series_ids)),
+                execution_options={"synchronize_session": False},
+            )
+        source_db.execute(delete(Series).where(Series.device_id == device_id))
+        source_db.commit()
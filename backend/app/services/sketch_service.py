@@ -0,0 +1,522 @@
+"""Percentile queries answered from per-bucket quantile sketches."""
+
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, or_, select, true
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal, upsert
+from ..models import Device, ReadingSketch, SensorReading, Series, SketchDirtyBucket
+from ..utils import logger
+from .chunk_codec import EPOCH, to_micros
+from .compute_pool import compute_pool
+from .ddsketch import DDSketch
+from .metrics import metrics
+from .shard_map import shard_map
+
+settings = get_settings()
+
+SKETCH_COLUMNS = ("count", "total", "min_value", "max_value", "max_reading_id", "sketch", "updated_at")
+
+
+def _from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class SketchBuilder:
+    """
+    Keeps one DDSketch per series and time bucket in ``reading_sketches``.
+
+    Every ingest path marks the ``(series, bucket)`` pairs it writes in
+    ``sketch_dirty_buckets`` (see :meth:`mark`), in the transaction that
+    inserts the readings. Each cycle consumes the markers and rebuilds
+    those buckets from the ``(series_id, timestamp)`` index. Rebuilding
+    instead of adding to a stored sketch makes the cycle idempotent:
+    several workers may build the same bucket, and late readings, imports
+    and replays need no special handling. Sketches and markers live next
+    to their readings. Queries read marked buckets row by row (see
+    :meth:`unbuilt`), so readings written by any path count before the
+    builder gets to them, and the cost is bounded by the buckets written
+    since the last cycle rather than by the window.
+
+    Attributes:
+        width: Bucket width in microseconds
+        alpha: Relative accuracy of the sketches
+    """
+
+    def __init__(self, bucket_seconds: int = 3600, alpha: float = 0.01, scan_batch: int = 100_000):
+        self.width = bucket_seconds * 1_000_000
+        self.alpha = alpha
+        self.scan_batch = scan_batch
+        self._lock = threading.Lock()
+
+    def bucket_of(self, timestamp: datetime) -> int:
+        """Start (µs since the epoch) of the bucket holding ``timestamp``."""
+        micros = to_micros(timestamp)
+        return micros - micros % self.width
+
+    # -- marking ----------------------------------------------------------
+
+    def mark(self, db: Session, readings: Iterable[Tuple[int, datetime]]) -> None:
+        """Mark the buckets of ``(series_id, timestamp)`` pairs being written, without committing."""
+        self.mark_buckets(db, {(series_id, self.bucket_of(timestamp)) for series_id, timestamp in readings})
+
+    def mark_buckets(self, db: Session, buckets: Iterable[Tuple[int, int]]) -> None:
+        """
+        Mark distinct ``(series_id, bucket_start_us)`` pairs as holding unsummarized readings.
+
+        Called by writers before they commit their readings. A marker
+        already there is updated rather than skipped, which makes the
+        writer wait for a cycle consuming it to commit, so the reading is
+        either seen by that rebuild or marks the bucket again.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {"series_id": int(series_id), "bucket_start": _from_micros(int(bucket)), "marked_at": now}
+            for series_id, bucket in buckets
+        ]
+        if rows:
+            db.execute(upsert(db, SketchDirtyBucket, ("series_id", "bucket_start"), ("marked_at",)), rows)
+
+    # -- building ---------------------------------------------------------
+
+    def run(self, db: Session) -> int:
+        """
+        Rebuild every marked bucket, on every shard.
+
+        Returns:
+            int: Number of buckets rebuilt
+        """
+        rebuilt = 0
+        with self._lock:
+            for shard in shard_map.shards.values():
+                with shard.session(db) as shard_db:
+                    rebuilt += self._run_shard(shard_db)
+        metrics.inc("sketch.buckets_rebuilt", rebuilt)
+        return rebuilt
+
+    def _run_shard(self, db: Session) -> int:
+        """Rebuild the marked buckets of one shard, oldest markers first. Caller holds the lock."""
+        rebuilt = 0
+        while True:
+            markers = db.execute(
+                select(SketchDirtyBucket.id, SketchDirtyBucket.series_id, SketchDirtyBucket.bucket_start)
+                .order_by(SketchDirtyBucket.id.asc())
+                .limit(self.scan_batch)
+            ).all()
+            if not markers:
+                break
+            dirty: Dict[int, Set[int]] = defaultdict(set)
+            for _, series_id, bucket_start in markers:
+                dirty[series_id].add(to_micros(bucket_start))
+            # Consumed in the transaction rebuilding the buckets: the rebuild
+            # sees every reading committed with a marker it deleted.
+            db.execute(
+                delete(SketchDirtyBucket).where(SketchDirtyBucket.id.in_([marker[0] for marker in markers])),
+                execution_options={"synchronize_session": False},
+            )
+            rebuilt += self.rebuild(db, dirty)
+            if len(markers) < self.scan_batch:
+                break
+        return rebuilt
+
+    def unbuilt(self, db: Session, start: int, end: int, series_ids=None) -> Dict[int, Set[int]]:
+        """
+        Marked buckets in ``[start, end)`` (µs) on one shard, whose sketches miss readings.
+
+        Args:
+            db: Session on the shard
+            start: First bucket start of interest
+            end: Bucket start to stop before
+            series_ids: Select of the series of interest; every series if None
+
+        Returns:
+            Dict[int, Set[int]]: ``{series_id: {bucket_start_us, ...}}``
+        """
+        statement = select(SketchDirtyBucket.series_id, SketchDirtyBucket.bucket_start).where(
+            SketchDirtyBucket.bucket_start >= _from_micros(start),
+            SketchDirtyBucket.bucket_start < _from_micros(end),
+        )
+        if series_ids is not None:
+            statement = statement.where(SketchDirtyBucket.series_id.in_(series_ids))
+        pending: Dict[int, Set[int]] = defaultdict(set)
+        for series_id, bucket_start in db.execute(statement):
+            pending[series_id].add(to_micros(bucket_start))
+        return pending
+
+    def by_bucket(self, pending: Dict[int, Set[int]]) -> Dict[int, List[int]]:
+        """Invert ``{series_id: {bucket, ...}}`` into ``{bucket: [series_id, ...]}``."""
+        inverted: Dict[int, List[int]] = defaultdict(list)
+        for series_id, buckets in pending.items():
+            for bucket in buckets:
+                inverted[bucket].append(series_id)
+        return inverted
+
+    def in_buckets(self, pending: Dict[int, Set[int]]) -> list:
+        """Conditions selecting the readings of each pending ``(series, bucket)``."""
+        return [
+            SensorReading.series_id.in_(series_ids)
+            & (SensorReading.timestamp >= _from_micros(bucket))
+            & (SensorReading.timestamp < _from_micros(bucket + self.width))
+            for bucket, series_ids in self.by_bucket(pending).items()
+        ]
+
+    def built_only(self, pending: Dict[int, Set[int]]):
+        """Condition leaving out the stored sketches of each pending ``(series, bucket)``."""
+        stale = [
+            ReadingSketch.series_id.in_(series_ids) & (ReadingSketch.bucket_start == _from_micros(bucket))
+            for bucket, series_ids in self.by_bucket(pending).items()
+        ]
+        return ~or_(*stale) if stale else true()
+
+    def rebuild(self, db: Session, dirty: Dict[int, Set[int]]) -> int:
+        """
+        Recompute the sketches of ``{series_id: {bucket_start_us, ...}}`` and commit.
+
+        Buckets left without readings lose their sketch.
+        """
+        now = datetime.utcnow()
+        rows, empty = [], []
+        for series_id, buckets in dirty.items():
+            for first, last in self._runs(sorted(buckets)):
+                readings = db.execute(
+                    select(SensorReading.timestamp, SensorReading.value, SensorReading.id).where(
+                        SensorReading.series_id == series_id,
+                        SensorReading.timestamp >= _from_micros(first),
+                        SensorReading.timestamp < _from_micros(last + self.width),
+                    )
+                ).all()
+                grouped: Dict[int, List[Tuple[float, int]]] = defaultdict(list)
+                for timestamp, value, reading_id in readings:
+                    grouped[self.bucket_of(timestamp)].append((value, reading_id))
+                for bucket in range(first, last + 1, self.width):
+                    members = grouped.get(bucket)
+                    if not members:
+                        empty.append((series_id, _from_micros(bucket)))
+                        continue
+                    values = np.fromiter((member[0] for member in members), dtype=np.float64, count=len(members))
+                    rows.append(
+                        {
+                            "series_id": series_id,
+                            "bucket_start": _from_micros(bucket),
+                            "count": len(values),
+                            "total": float(values.sum()),
+                            "min_value": float(values.min()),
+                            "max_value": float(values.max()),
+                            "max_reading_id": max(member[1] for member in members),
+                            "sketch": DDSketch.from_values(values, self.alpha).to_bytes(),
+                            "updated_at": now,
+                        }
+                    )
+        if rows:
+            db.execute(upsert(db, ReadingSketch, ("series_id", "bucket_start"), SKETCH_COLUMNS), rows)
+        for series_id, bucket_start in empty:
+            db.execute(
+                delete(ReadingSketch).where(
+                    ReadingSketch.series_id == series_id, ReadingSketch.bucket_start == bucket_start
+                )
+            )
+        db.commit()
+        return len(rows) + len(empty)
+
+    def _runs(self, bucket_starts: List[int]) -> List[Tuple[int, int]]:
+        """Group sorted bucket starts into contiguous ``(first, last)`` runs."""
+        runs = []
+        for bucket in bucket_starts:
+            if runs and runs[-1][1] + self.width == bucket:
+                runs[-1] = (runs[-1][0], bucket)
+            else:
+                runs.append((bucket, bucket))
+        return runs
+
+    # -- deletes ----------------------------------------------------------
+
+    def clear_before(self, db: Session, cutoff: datetime) -> None:
+        """Drop sketches of buckets wholly before ``cutoff`` and rebuild the one straddling it, on every shard."""
+        straddling = self.bucket_of(cutoff)
+        for shard in shard_map.shards.values():
+            with shard.session(db) as shard_db:
+                shard_db.execute(delete(ReadingSketch).where(ReadingSketch.bucket_start < _from_micros(straddling)))
+                shard_db.commit()
+                if straddling == to_micros(cutoff):
+                    continue
+                series_ids = shard_db.execute(
+                    select(ReadingSketch.series_id).where(ReadingSketch.bucket_start == _from_micros(straddling))
+                ).scalars()
+                self.rebuild(shard_db, {series_id: {straddling} for series_id in series_ids})
+
+
+sketch_builder = SketchBuilder(
+    bucket_seconds=settings.sketch_bucket_seconds,
+    alpha=settings.sketch_relative_accuracy,
+    scan_batch=settings.sketch_scan_batch,
+)
+
+
+def merged_quantiles(blobs: List[bytes], values: np.ndarray, quantiles: List[float], alpha: float) -> list:
+    """Quantiles of serialized sketches merged with raw values; exact when there are no sketches."""
+    if not blobs:
+        return np.quantile(values, quantiles).tolist() if len(values) else [None] * len(quantiles)
+    sketch = DDSketch.merge_blobs(blobs, alpha).add_values(values)
+    return [sketch.quantile(q) for q in quantiles]
+
+
+class SketchService:
+    """
+    Fleet percentiles over arbitrary windows without reading every value.
+
+    Buckets fully inside the window are answered by merging their stored
+    sketches; only the partial buckets at either edge, and buckets with
+    readings the builder has not summarized yet, are read row by row. Count,
+    average, min and max are exact; quantiles are within
+    ``SKETCH_RELATIVE_ACCURACY`` of a true value.
+    """
+
+    @staticmethod
+    def _series_ids(
+        sensor_type: str,
+        device_ids: Optional[Sequence[str]],
+        location: Optional[str],
+        device_type: Optional[str],
+    ):
+        statement = select(Series.id).where(Series.sensor_type == sensor_type)
+        if device_ids:
+            statement = statement.where(Series.device_id.in_(device_ids))
+        if location is not None or device_type is not None:
+            statement = statement.join(Device, Device.id == Series.device_id)
+            if location is not None:
+                statement = statement.where(Device.location == location)
+            if device_type is not None:
+                statement = statement.where(Device.device_type == device_type)
+        return statement
+
+    @staticmethod
+    def _device_ids(
+        db: Session,
+        device_ids: Optional[Sequence[str]],
+        location: Optional[str],
+        device_type: Optional[str],
+    ) -> List[str]:
+        """IDs of the devices matching the filters, looked up on the primary."""
+        statement = select(Device.id)
+        if device_ids:
+            statement = statement.where(Device.id.in_(device_ids))
+        if location is not None:
+            statement = statement.where(Device.location == location)
+        if device_type is not None:
+            statement = statement.where(Device.device_type == device_type)
+        return list(db.execute(statement).scalars())
+
+    @staticmethod
+    def full_buckets(start: int, end: int) -> Tuple[int, int]:
+        """
+        Buckets ``[full_start, full_end)`` wholly inside the window in microseconds.
+
+        The span is empty (both ``end + 1``) when sketches are disabled.
+        Which of them are built is up to :meth:`SketchBuilder.unbuilt`.
+        """
+        width = sketch_builder.width
+        full_start = -(-start // width) * width
+        full_end = end + 1 - (end + 1) % width
+        if not settings.sketch_enabled or full_end <= full_start:
+            return end + 1, end + 1
+        return full_start, full_end
+
+    @staticmethod
+    def _pending(db: Session, series_ids, full_start: int, full_end: int) -> Dict[int, Set[int]]:
+        """Unbuilt full buckets of the selected series on one shard, to read row by row."""
+        if full_end <= full_start:
+            return {}
+        return sketch_builder.unbuilt(db, full_start, full_end, series_ids)
+
+    @staticmethod
+    def _raw_window(start: int, end: int, full_start: int, full_end: int, pending: Dict[int, Set[int]]):
+        """Readings of the window not answered by sketches: the edges and the unbuilt buckets."""
+        return or_(
+            (SensorReading.timestamp >= _from_micros(start)) & (SensorReading.timestamp < _from_micros(full_start)),
+            (SensorReading.timestamp >= _from_micros(full_end)) & (SensorReading.timestamp <= _from_micros(end)),
+            *sketch_builder.in_buckets(pending),
+        )
+
+    @staticmethod
+    def _partial(db: Session, series_ids, start: int, end: int, full_start: int, full_end: int) -> tuple:
+        """Sketch summaries of the built full buckets and raw values of the rest, on one shard."""
+        count, total, low, high, blobs = 0, 0.0, None, None, []
+        pending = SketchService._pending(db, series_ids, full_start, full_end)
+        if full_end > full_start:
+            summaries = db.execute(
+                select(
+                    ReadingSketch.count,
+                    ReadingSketch.total,
+                    ReadingSketch.min_value,
+                    ReadingSketch.max_value,
+                    ReadingSketch.sketch,
+                ).where(
+                    ReadingSketch.series_id.in_(series_ids),
+                    ReadingSketch.bucket_start >= _from_micros(full_start),
+                    ReadingSketch.bucket_start < _from_micros(full_end),
+                    sketch_builder.built_only(pending),
+                )
+            ).all()
+            if summaries:
+                count = sum(row.count for row in summaries)
+                total = sum(row.total for row in summaries)
+                low = min(row.min_value for row in summaries)
+                high = max(row.max_value for row in summaries)
+                blobs = [row.sketch for row in summaries]
+
+        raw = db.execute(
+            select(SensorReading.value).where(
+                SensorReading.series_id.in_(series_ids),
+                SketchService._raw_window(start, end, full_start, full_end, pending),
+            )
+        ).scalars()
+        return count, total, low, high, blobs, np.fromiter(raw, dtype=np.float64)
+
+    @staticmethod
+    def _bounded(q: float, value: Optional[float], low: Optional[float], high: Optional[float]):
+        """Exact extremes for q = 0 and 1; sketch midpoints never reported beyond the data."""
+        if value is None:
+            return None
+        if q == 0:
+            return low
+        if q == 1:
+            return high
+        return min(max(value, low), high)
+
+    @staticmethod
+    def percentiles(
+        db: Session,
+        sensor_type: str,
+        start_time: datetime,
+        end_time: datetime,
+        quantiles: Iterable[float],
+        device_ids: Optional[Sequence[str]] = None,
+        location: Optional[str] = None,
+        device_type: Optional[str] = None,
+    ) -> dict:
+        """
+        Quantiles of a sensor type across the selected devices in a window.
+
+        Args:
+            db: Database session
+            sensor_type: Sensor type to summarize
+            start_time: Start of the window (inclusive)
+            end_time: End of the window (inclusive)
+            quantiles: Quantiles in ``[0, 1]``
+            device_ids: Restrict to these devices
+            location: Restrict to devices at this location
+            device_type: Restrict to devices of this type
+
+        Returns:
+            dict: count, avg, min, max, the requested quantiles, and how many
+            sketch buckets and raw readings were used
+        """
+        start = to_micros(start_time)
+        end = to_micros(end_time)
+        full_start, full_end = SketchService.full_buckets(start, end)
+
+        names = None
+        if shard_map.sharded:
+            if location is not None or device_type is not None:
+                # Devices are only on the primary; shards are filtered by ID.
+                device_ids = SketchService._device_ids(db, device_ids, location, device_type)
+                location = device_type = None
+                names = []
+            if device_ids:
+                names = list(shard_map.group(device_ids))
+        series_ids = SketchService._series_ids(sensor_type, device_ids, location, device_type)
+        partials = shard_map.scatter(
+            db,
+            lambda shard, shard_db: SketchService._partial(shard_db, series_ids, start, end, full_start, full_end),
+            names,
+        )
+
+        count = sum(partial[0] for partial in partials)
+        total = sum(partial[1] for partial in partials)
+        lows = [partial[2] for partial in partials if partial[2] is not None]
+        highs = [partial[3] for partial in partials if partial[3] is not None]
+        low = min(lows) if lows else None
+        high = max(highs) if highs else None
+        blobs = [blob for partial in partials for blob in partial[4]]
+        values = np.concatenate([partial[5] for partial in partials]) if partials else np.empty(0)
+
+        quantiles = list(quantiles)
+        results = compute_pool.run(merged_quantiles, blobs, values, quantiles, sketch_builder.alpha)
+        if len(values):
+            count += len(values)
+            total += float(values.sum())
+            low = float(values.min()) if low is None else min(low, float(values.min()))
+            high = float(values.max()) if high is None else max(high, float(values.max()))
+
+        return {
+            "count": count,
+            "avg": total / count if count else None,
+            "min": low,
+            "max": high,
+            "percentiles": [
+                {"quantile": q, "value": SketchService._bounded(q, value, low, high)}
+                for q, value in zip(quantiles, results)
+            ],
+            "sketch_buckets": len(blobs),
+            "raw_readings": len(values),
+        }
+
+    @staticmethod
+    def average(
+        db: Session,
+        device_id: str,
+        sensor_type: str,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> Optional[float]:
+        """
+        Exact average of one device's sensor type in a window.
+
+        Built full buckets contribute their stored counts and totals, so
+        only the edges and unbuilt buckets are aggregated row by row; long
+        windows cost about as much as short ones.
+        """
+        start = to_micros(start_time)
+        end = to_micros(end_time)
+        full_start, full_end = SketchService.full_buckets(start, end)
+        series_ids = SketchService._series_ids(sensor_type, [device_id], None, None)
+        count, total = 0, 0.0
+        shard = shard_map.owner(device_id)
+        with shard.session(db) as shard_db:
+            pending = SketchService._pending(shard_db, series_ids, full_start, full_end)
+            if full_end > full_start:
+                row = shard_db.execute(
+                    select(func.sum(ReadingSketch.count), func.sum(ReadingSketch.total)).where(
+                        ReadingSketch.series_id.in_(series_ids),
+                        ReadingSketch.bucket_start >= _from_micros(full_start),
+                        ReadingSketch.bucket_start < _from_micros(full_end),
+                        sketch_builder.built_only(pending),
+                    )
+                ).one()
+                count, total = row[0] or 0, row[1] or 0.0
+            row = shard_db.execute(
+                select(func.count(SensorReading.id), func.sum(SensorReading.value)).where(
+                    SensorReading.series_id.in_(series_ids),
+                    SketchService._raw_window(start, end, full_start, full_end, pending),
+                )
+            ).one()
+        count += row[0] or 0
+        total += row[1] or 0.0
+        return total / count if count else None
+
+
+def run_sketch_cycle() -> None:
+    """Bring the sketches up to date on a short-lived session."""
+    db = SessionLocal()
+    try:
+        rebuilt = sketch_builder.run(db)
+        if rebuilt:
+            logger.info(f"Sketch cycle rebuilt {rebuilt} buckets")
+    finally:
+        db.close()
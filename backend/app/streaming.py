@@ -0,0 +1,141 @@
+"""Helpers for streaming large query results as newline-delimited JSON."""
+
+import heapq
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Select
+
+from .database import SessionLocal
+from .query_budget import inherit
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched per server-side cursor round-trip and emitted per body chunk.
+STREAM_BATCH_SIZE = 1000
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client asked for an NDJSON body via ``Accept``."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode(rows: Iterable[RowMapping]) -> bytes:
+    dumps = json.dumps
+    return "".join(dumps(dict(row), default=_encode_default, separators=(",", ":")) + "\n" for row in rows).encode()
+
+
+def _open(session_factory: sessionmaker, parent: Optional[Session]) -> Session:
+    db = session_factory()
+    if parent is not None:
+        inherit(parent, db)
+    return db
+
+
+def _iter_rows(
+    statement: Select, session_factory: sessionmaker, batch_size: int, parent: Optional[Session]
+) -> Iterator[RowMapping]:
+    db = _open(session_factory, parent)
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for partition in result.mappings().partitions():
+            yield from partition
+    finally:
+        db.close()
+
+
+def iter_ndjson(
+    statement: Select,
+    batch_size: int = STREAM_BATCH_SIZE,
+    session_factory: sessionmaker = SessionLocal,
+    parent: Optional[Session] = None,
+) -> Iterator[bytes]:
+    """
+    Execute ``statement`` on a server-side cursor and yield NDJSON chunks.
+
+    The generator owns its session so the connection stays checked out only
+    while the body is being sent, and is released as soon as the client
+    disconnects or the cursor is exhausted.
+
+    Args:
+        statement: Core ``select()`` of plain columns
+        batch_size: Rows per fetch and per emitted chunk
+        session_factory: Database to run on, the primary by default
+        parent: Request session whose query budget the stream runs under
+
+    Yields:
+        bytes: One chunk of newline-terminated JSON objects
+    """
+    db = _open(session_factory, parent)
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for partition in result.mappings().partitions():
+            yield _encode(partition)
+    finally:
+        db.close()
+
+
+def iter_merged_ndjson(
+    statement: Select,
+    session_factories: Sequence[sessionmaker],
+    key: str,
+    descending: bool = False,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    parent: Optional[Session] = None,
+) -> Iterator[bytes]:
+    """
+    Run ``statement`` on several databases and yield one NDJSON stream.
+
+    Every database streams through its own server-side cursor, and rows are
+    merged on column ``key``, which ``statement`` must be ordered by.
+    ``skip`` and ``limit`` apply to the merged stream; each database needs
+    to return at most ``skip + limit`` rows. Every stream runs under the
+    query budget of ``parent``, if given.
+    """
+    streams = [_iter_rows(statement, factory, batch_size, parent) for factory in session_factories]
+    rows = heapq.merge(*streams, key=lambda row: row[key], reverse=descending)
+    rows = islice(rows, skip, None if limit is None else skip + limit)
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            yield _encode(batch)
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def ndjson_response(
+    statement: Select,
+    batch_size: int = STREAM_BATCH_SIZE,
+    session_factory: sessionmaker = SessionLocal,
+    parent: Optional[Session] = None,
+) -> StreamingResponse:
+    """Wrap :func:`iter_ndjson` in a streaming response."""
+    return StreamingResponse(
+        iter_ndjson(statement, batch_size, session_factory, parent), media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+def merged_ndjson_response(
+    statement: Select, session_factories: Sequence[sessionmaker], key: str, **kwargs
+) -> StreamingResponse:
+    """Wrap :func:`iter_merged_ndjson` in a streaming response."""
+    return StreamingResponse(
+        iter_merged_ndjson(statement, session_factories, key, **kwargs), media_type=NDJSON_MEDIA_TYPE
+    )
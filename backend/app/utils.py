@@ -2,6 +2,7 @@
 
 import logging
 import sys
+from datetime import timedelta
 from pathlib import Path
 
 from .config import get_settings
@@ -46,3 +47,26 @@ def setup_logging() -> logging.Logger:
 
 # Initialize logger
 logger = setup_logging()
+
+
+_WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(window: str) -> timedelta:
+    """
+    Parse a compact duration such as ``15m``, ``1h`` or ``7d``.
+
+    Args:
+        window: Integer count followed by one of ``s``, ``m``, ``h``, ``d``
+
+    Returns:
+        timedelta: Parsed duration
+
+    Raises:
+        ValueError: If the string is malformed or not positive
+    """
+    window = window.strip().lower()
+    unit = _WINDOW_UNITS.get(window[-1:]) if window else None
+    if unit is None or not window[:-1].isdigit() or int(window[:-1]) <= 0:
+        raise ValueError(f"Invalid window '{window}', expected e.g. 15m, 1h or 7d")
+    return timedelta(seconds=int(window[:-1]) * unit)
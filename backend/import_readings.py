@@ -0,0 +1,81 @@
+"""Bulk import sensor readings from CSV or Parquet files.
+
+Usage:
+    python import_readings.py readings.csv [more.parquet ...] [--format csv|parquet]
+        [--chunk-rows N] [--rejects-dir DIR]
+
+Rejected rows of ``name.csv`` are written to ``name.csv.rejects.csv`` (or
+into ``--rejects-dir``) with their row number and reason.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.bulk_import import COLUMNS, ImportFormatError, detect_format, import_readings, iter_chunks
+
+
+class RejectFile:
+    """CSV of rejected rows, created on the first reject."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._writer = None
+
+    def write(self, rejects) -> None:
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(("row", "reason") + COLUMNS)
+        self._writer.writerows(rejects)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import sensor readings.")
+    parser.add_argument("files", nargs="+", help="CSV (optionally .gz) or Parquet files")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="Override the format implied by the extension")
+    parser.add_argument("--chunk-rows", type=int, help="Rows per chunk (default IMPORT_CHUNK_ROWS)")
+    parser.add_argument("--rejects-dir", help="Directory for reject files (default: next to each input)")
+    args = parser.parse_args()
+
+    failed = False
+    db = SessionLocal()
+    try:
+        for path in args.files:
+            reject_path = path + ".rejects.csv"
+            if args.rejects_dir:
+                reject_path = os.path.join(args.rejects_dir, os.path.basename(reject_path))
+            rejects = RejectFile(reject_path)
+            try:
+                with open(path, "rb") as stream:
+                    chunks = iter_chunks(stream, args.format or detect_format(path), path, args.chunk_rows)
+                    report = import_readings(db, chunks, on_rejects=rejects.write)
+            except (ImportFormatError, OSError) as e:
+                print(f"{path}: {str(e)}", file=sys.stderr)
+                failed = True
+                continue
+            finally:
+                rejects.close()
+            print(
+                f"{path}: {report['rows']} rows, {report['inserted']} inserted, "
+                f"{report['duplicates']} duplicates, {report['rejected']} rejected "
+                f"in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+            )
+            if report["rejected"]:
+                print(f"  rejects written to {reject_path}")
+    finally:
+        db.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
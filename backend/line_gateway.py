@@ -0,0 +1,92 @@
+"""Run the line-protocol ingestion gateway on its own.
+
+Usage:
+    python line_gateway.py [--host HOST] [--tcp-port N] [--udp-port N]
+
+Accepts lines like ``device_id,sensor_type=temperature,unit=C value=21.5 1697000000000``
+(epoch milliseconds, optional) over TCP and UDP. Ports default to
+GATEWAY_TCP_PORT and GATEWAY_UDP_PORT; pass 0 to disable one.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.services.heartbeat import heartbeat_tracker, run_heartbeat_cycle
+from app.services.line_gateway import line_gateway
+from app.services.metrics import metrics
+from app.utils import logger
+
+settings = get_settings()
+
+REPORT_SECONDS = 10.0
+
+
+async def report_throughput() -> None:
+    """Log lines and inserts per second, and persist device last-seen times."""
+    loop = asyncio.get_running_loop()
+    previous = metrics.snapshot()
+    while True:
+        await asyncio.sleep(REPORT_SECONDS)
+        try:
+            await loop.run_in_executor(None, run_heartbeat_cycle)
+        except Exception as e:
+            logger.error(f"Heartbeat cycle failed: {str(e)}")
+        current = metrics.snapshot()
+        rates = {
+            name: (current.get(f"gateway.{name}", 0) - previous.get(f"gateway.{name}", 0)) / REPORT_SECONDS
+            for name in ("lines", "inserted", "rejected", "malformed", "udp_dropped_lines")
+        }
+        previous = current
+        if rates["lines"] or rates["udp_dropped_lines"]:
+            logger.info(
+                "Line gateway: "
+                + ", ".join(f"{rate:.0f} {name.replace('_', ' ')}/s" for name, rate in rates.items())
+                + f", {line_gateway.stats()['open_connections']} connections"
+            )
+
+
+async def run() -> None:
+    db = SessionLocal()
+    try:
+        heartbeat_tracker.load(db)
+    finally:
+        db.close()
+    reporter = asyncio.create_task(report_throughput())
+    serving = asyncio.create_task(line_gateway.serve_forever())
+    # Stop cleanly, writing what is queued, on SIGTERM as well as Ctrl-C.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+    try:
+        await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        reporter.cancel()
+        run_heartbeat_cycle()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Line-protocol ingestion gateway.")
+    parser.add_argument("--host", default=settings.gateway_host, help="Interface to listen on")
+    parser.add_argument("--tcp-port", type=int, default=settings.gateway_tcp_port, help="TCP port, 0 to disable")
+    parser.add_argument("--udp-port", type=int, default=settings.gateway_udp_port, help="UDP port, 0 to disable")
+    args = parser.parse_args()
+
+    line_gateway.host = args.host
+    line_gateway.tcp_port = args.tcp_port
+    line_gateway.udp_port = args.udp_port
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
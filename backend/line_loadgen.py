@@ -0,0 +1,114 @@
+"""Load generator for the line-protocol gateway.
+
+Usage:
+    python line_loadgen.py [--host HOST] [--port N] [--udp] [--connections N]
+        [--seconds S] [--devices N] [--batch-lines N]
+
+Sends ``temperature`` readings for up to ``--devices`` existing devices as
+fast as the gateway accepts them, each line with a distinct timestamp so
+none are skipped as duplicates, and reports the rate sent. Over TCP the
+rate is bounded by the gateway's backpressure; compare it with the
+gateway's ``inserted/s`` log line or the ``gateway.*`` metrics on /health.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Device
+
+
+def device_ids(limit: int) -> list:
+    db = SessionLocal()
+    try:
+        return list(db.execute(select(Device.id).limit(limit)).scalars())
+    finally:
+        db.close()
+
+
+def render(devices: list, start_ms: int, count: int) -> bytes:
+    """``count`` lines cycling through ``devices``, timestamps one millisecond apart per device."""
+    lines = []
+    for i in range(count):
+        device = devices[i % len(devices)]
+        stamp = start_ms + i // len(devices)
+        lines.append(f"{device},sensor_type=temperature,unit=C value={20 + (i % 97) / 10} {stamp}\n")
+    return "".join(lines).encode()
+
+
+async def tcp_sender(host: str, port: int, devices: list, start_ms: int, batch: int, deadline: float) -> int:
+    _, writer = await asyncio.open_connection(host, port)
+    sent = 0
+    per_device = batch // len(devices) or 1
+    while time.monotonic() < deadline:
+        writer.write(render(devices, start_ms + sent // len(devices), per_device * len(devices)))
+        sent += per_device * len(devices)
+        # Blocks while the gateway is not reading.
+        await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    return sent
+
+
+def udp_sender(host: str, port: int, devices: list, start_ms: int, batch: int, deadline: float) -> int:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = 0
+    per_device = batch // len(devices) or 1
+    while time.monotonic() < deadline:
+        lines = render(devices, start_ms + sent // len(devices), per_device * len(devices)).splitlines(True)
+        # Datagrams of about 1 KB, well under common MTU-related limits.
+        for i in range(0, len(lines), 16):
+            sock.sendto(b"".join(lines[i : i + 16]), (host, port))
+        sent += len(lines)
+    sock.close()
+    return sent
+
+
+async def run(args, devices: list) -> int:
+    deadline = time.monotonic() + args.seconds
+    # Connections write disjoint timestamp ranges.
+    base_ms = int(time.time() * 1000) - 10**9
+    starts = [base_ms + c * 10**8 for c in range(args.connections)]
+    if args.udp:
+        loop = asyncio.get_running_loop()
+        jobs = [
+            loop.run_in_executor(None, udp_sender, args.host, args.port, devices, start, args.batch_lines, deadline)
+            for start in starts
+        ]
+    else:
+        jobs = [tcp_sender(args.host, args.port, devices, start, args.batch_lines, deadline) for start in starts]
+    return sum(await asyncio.gather(*jobs))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Line-protocol load generator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--udp", action="store_true", help="Send datagrams instead of TCP streams")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--devices", type=int, default=100, help="Existing devices to report for")
+    parser.add_argument("--batch-lines", type=int, default=5000, help="Lines rendered per write")
+    args = parser.parse_args()
+
+    devices = device_ids(args.devices)
+    if not devices:
+        print("No devices found; create some first (e.g. seed_data.py)", file=sys.stderr)
+        return 1
+    started = time.monotonic()
+    sent = asyncio.run(run(args, devices))
+    seconds = time.monotonic() - started
+    print(f"Sent {sent} lines in {seconds:.1f}s ({sent / seconds:.0f} lines/s) over {args.connections} connections")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
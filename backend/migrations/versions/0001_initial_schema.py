@@ -0,0 +1,82 @@
+"""Initial schema: devices, sensor_readings and alerts.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "devices",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("location", sa.String(255), nullable=False),
+        sa.Column("device_type", sa.String(100), nullable=False),
+        sa.Column("status", sa.String(50), nullable=False),
+        sa.Column("latitude", sa.Float, nullable=True),
+        sa.Column("longitude", sa.Float, nullable=True),
+        sa.Column("is_active", sa.Boolean, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_devices_id", "devices", ["id"])
+    op.create_index("ix_devices_name", "devices", ["name"])
+
+    op.create_table(
+        "sensor_readings",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column(
+            "device_id",
+            sa.String(36),
+            sa.ForeignKey("devices.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("sensor_type", sa.String(100), nullable=False),
+        sa.Column("value", sa.Float, nullable=False),
+        sa.Column("unit", sa.String(50), nullable=False),
+        sa.Column("timestamp", sa.DateTime, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_sensor_readings_id", "sensor_readings", ["id"])
+    op.create_index("ix_sensor_readings_device_id", "sensor_readings", ["device_id"])
+    op.create_index("ix_sensor_readings_sensor_type", "sensor_readings", ["sensor_type"])
+    op.create_index("ix_sensor_readings_timestamp", "sensor_readings", ["timestamp"])
+    op.create_index("idx_device_timestamp", "sensor_readings", ["device_id", "timestamp"])
+    op.create_index("idx_sensor_type_timestamp", "sensor_readings", ["sensor_type", "timestamp"])
+
+    op.create_table(
+        "alerts",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column(
+            "device_id",
+            sa.String(36),
+            sa.ForeignKey("devices.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("alert_type", sa.String(100), nullable=False),
+        sa.Column("severity", sa.String(50), nullable=False),
+        sa.Column("message", sa.String(500), nullable=False),
+        sa.Column("threshold_value", sa.Float, nullable=True),
+        sa.Column("actual_value", sa.Float, nullable=True),
+        sa.Column("is_resolved", sa.Boolean, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("resolved_at", sa.DateTime, nullable=True),
+    )
+    op.create_index("ix_alerts_id", "alerts", ["id"])
+    op.create_index("ix_alerts_device_id", "alerts", ["device_id"])
+    op.create_index("ix_alerts_created_at", "alerts", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("alerts")
+    op.drop_table("sensor_readings")
+    op.drop_table("devices")
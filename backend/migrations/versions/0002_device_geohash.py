@@ -0,0 +1,49 @@
+"""Add an indexed geohash column to devices and backfill it.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.geo_index import encode_geohash
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("devices") as batch_op:
+        batch_op.add_column(sa.Column("geohash", sa.String(12), nullable=True))
+        batch_op.create_index("ix_devices_geohash", ["geohash"])
+
+    bind = op.get_bind()
+    devices = sa.table(
+        "devices",
+        sa.column("id", sa.String),
+        sa.column("latitude", sa.Float),
+        sa.column("longitude", sa.Float),
+        sa.column("geohash", sa.String),
+    )
+    rows = bind.execute(
+        sa.select(devices.c.id, devices.c.latitude, devices.c.longitude).where(
+            devices.c.latitude.is_not(None), devices.c.longitude.is_not(None)
+        )
+    ).all()
+    if rows:
+        bind.execute(
+            devices.update()
+            .where(devices.c.id == sa.bindparam("device_id"))
+            .values(geohash=sa.bindparam("hash")),
+            [{"device_id": r.id, "hash": encode_geohash(r.latitude, r.longitude)} for r in rows],
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("devices") as batch_op:
+        batch_op.drop_index("ix_devices_geohash")
+        batch_op.drop_column("geohash")
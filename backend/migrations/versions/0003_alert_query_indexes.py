@@ -0,0 +1,34 @@
+"""Add composite and partial indexes for fleet-wide alert queries.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("idx_alert_resolved_created", "alerts", ["is_resolved", "created_at"])
+    op.create_index(
+        "idx_alert_device_resolved_created", "alerts", ["device_id", "is_resolved", "created_at"]
+    )
+    op.create_index(
+        "idx_alert_open_created",
+        "alerts",
+        ["created_at"],
+        postgresql_where=sa.text("is_resolved = false"),
+        sqlite_where=sa.text("is_resolved = 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_alert_open_created", table_name="alerts")
+    op.drop_index("idx_alert_device_resolved_created", table_name="alerts")
+    op.drop_index("idx_alert_resolved_created", table_name="alerts")
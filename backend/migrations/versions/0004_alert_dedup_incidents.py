@@ -0,0 +1,57 @@
+"""Add alert occurrence tracking and incidents for storm grouping.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "incidents",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("location", sa.String(255), nullable=False),
+        sa.Column("alert_type", sa.String(100), nullable=False),
+        sa.Column("severity", sa.String(50), nullable=False),
+        sa.Column("alert_count", sa.Integer, nullable=False),
+        sa.Column("is_resolved", sa.Boolean, nullable=False),
+        sa.Column("first_seen_at", sa.DateTime, nullable=False),
+        sa.Column("last_seen_at", sa.DateTime, nullable=False),
+        sa.Column("resolved_at", sa.DateTime, nullable=True),
+    )
+    op.create_index("ix_incidents_id", "incidents", ["id"])
+    op.create_index("idx_incident_resolved_last_seen", "incidents", ["is_resolved", "last_seen_at"])
+
+    with op.batch_alter_table("alerts") as batch_op:
+        batch_op.add_column(
+            sa.Column("occurrence_count", sa.Integer, nullable=False, server_default="1")
+        )
+        batch_op.add_column(sa.Column("incident_id", sa.String(36), nullable=True))
+        batch_op.add_column(sa.Column("last_seen_at", sa.DateTime, nullable=True))
+        batch_op.create_index("ix_alerts_incident_id", ["incident_id"])
+        batch_op.create_foreign_key(
+            "fk_alerts_incident_id", "incidents", ["incident_id"], ["id"], ondelete="SET NULL"
+        )
+
+    op.execute("UPDATE alerts SET last_seen_at = created_at")
+    with op.batch_alter_table("alerts") as batch_op:
+        batch_op.alter_column("occurrence_count", server_default=None)
+        batch_op.alter_column("last_seen_at", existing_type=sa.DateTime, nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("alerts") as batch_op:
+        batch_op.drop_constraint("fk_alerts_incident_id", type_="foreignkey")
+        batch_op.drop_index("ix_alerts_incident_id")
+        batch_op.drop_column("last_seen_at")
+        batch_op.drop_column("incident_id")
+        batch_op.drop_column("occurrence_count")
+    op.drop_table("incidents")
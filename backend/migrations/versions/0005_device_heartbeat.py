@@ -0,0 +1,33 @@
+"""Add heartbeat interval and last-seen tracking to devices.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("devices") as batch_op:
+        batch_op.add_column(sa.Column("heartbeat_interval_seconds", sa.Integer, nullable=True))
+        batch_op.add_column(sa.Column("last_seen_at", sa.DateTime, nullable=True))
+
+    # Seed last-seen from existing readings once, so devices that were
+    # reporting before the upgrade are tracked immediately.
+    op.execute(
+        "UPDATE devices SET last_seen_at = ("
+        "SELECT MAX(timestamp) FROM sensor_readings WHERE sensor_readings.device_id = devices.id)"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("devices") as batch_op:
+        batch_op.drop_column("last_seen_at")
+        batch_op.drop_column("heartbeat_interval_seconds")
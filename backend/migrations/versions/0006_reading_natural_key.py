@@ -0,0 +1,35 @@
+"""Make (device_id, sensor_type, timestamp) unique on sensor_readings.
+
+Existing duplicates are removed first, keeping the earliest inserted row.
+The constraint is required rather than optional: the ingest paths rely on
+it for ON CONFLICT DO NOTHING, which PostgreSQL rejects without a matching
+unique index.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM sensor_readings WHERE id NOT IN ("
+        "SELECT MIN(id) FROM sensor_readings GROUP BY device_id, sensor_type, timestamp)"
+    )
+    op.create_index(
+        "uq_reading_natural_key",
+        "sensor_readings",
+        ["device_id", "sensor_type", "timestamp"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_reading_natural_key", table_name="sensor_readings")
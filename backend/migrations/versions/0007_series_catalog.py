@@ -0,0 +1,115 @@
+"""Dictionary-encode readings through a series catalog.
+
+(device_id, sensor_type, unit) moves to a new ``series`` table and each
+reading keeps only an integer ``series_id``. The readings table is rebuilt
+with its existing IDs; the per-device and per-sensor-type composite
+indexes are replaced by one unique (series_id, timestamp) index.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def _reset_id_sequence() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "SELECT setval(pg_get_serial_sequence('sensor_readings', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM sensor_readings), 0) + 1, false)"
+        )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "series",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column(
+            "device_id",
+            sa.String(36),
+            sa.ForeignKey("devices.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("sensor_type", sa.String(100), nullable=False),
+        sa.Column("unit", sa.String(50), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.execute(
+        "INSERT INTO series (device_id, sensor_type, unit, created_at) "
+        "SELECT device_id, sensor_type, unit, MIN(created_at) FROM sensor_readings "
+        "GROUP BY device_id, sensor_type, unit"
+    )
+    op.create_index("uq_series_key", "series", ["device_id", "sensor_type", "unit"], unique=True)
+    op.create_index("ix_series_sensor_type", "series", ["sensor_type"])
+
+    op.create_table(
+        "sensor_readings_encoded",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column(
+            "series_id",
+            sa.Integer,
+            sa.ForeignKey("series.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("value", sa.Float, nullable=False),
+        sa.Column("timestamp", sa.DateTime, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.execute(
+        "INSERT INTO sensor_readings_encoded (id, series_id, value, timestamp, created_at) "
+        "SELECT r.id, s.id, r.value, r.timestamp, r.created_at FROM sensor_readings r "
+        "JOIN series s ON s.device_id = r.device_id AND s.sensor_type = r.sensor_type "
+        "AND s.unit = r.unit"
+    )
+    op.drop_table("sensor_readings")
+    op.rename_table("sensor_readings_encoded", "sensor_readings")
+    op.create_index("ix_sensor_readings_timestamp", "sensor_readings", ["timestamp"])
+    op.create_index("uq_reading_natural_key", "sensor_readings", ["series_id", "timestamp"], unique=True)
+    _reset_id_sequence()
+
+
+def downgrade() -> None:
+    op.create_table(
+        "sensor_readings_decoded",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column(
+            "device_id",
+            sa.String(36),
+            sa.ForeignKey("devices.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("sensor_type", sa.String(100), nullable=False),
+        sa.Column("value", sa.Float, nullable=False),
+        sa.Column("unit", sa.String(50), nullable=False),
+        sa.Column("timestamp", sa.DateTime, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.execute(
+        "INSERT INTO sensor_readings_decoded "
+        "(id, device_id, sensor_type, value, unit, timestamp, created_at) "
+        "SELECT r.id, s.device_id, s.sensor_type, r.value, s.unit, r.timestamp, r.created_at "
+        "FROM sensor_readings r JOIN series s ON s.id = r.series_id"
+    )
+    op.drop_table("sensor_readings")
+    op.rename_table("sensor_readings_decoded", "sensor_readings")
+    op.create_index("ix_sensor_readings_id", "sensor_readings", ["id"])
+    op.create_index("ix_sensor_readings_device_id", "sensor_readings", ["device_id"])
+    op.create_index("ix_sensor_readings_sensor_type", "sensor_readings", ["sensor_type"])
+    op.create_index("ix_sensor_readings_timestamp", "sensor_readings", ["timestamp"])
+    op.create_index("idx_device_timestamp", "sensor_readings", ["device_id", "timestamp"])
+    op.create_index("idx_sensor_type_timestamp", "sensor_readings", ["sensor_type", "timestamp"])
+    op.create_index(
+        "uq_reading_natural_key",
+        "sensor_readings",
+        ["device_id", "sensor_type", "timestamp"],
+        unique=True,
+    )
+    op.drop_table("series")
+    _reset_id_sequence()
@@ -0,0 +1,35 @@
+"""Add purge_jobs for background device deletes.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "purge_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("device_id", sa.String(36), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("readings_deleted", sa.Integer, nullable=False),
+        sa.Column("alerts_deleted", sa.Integer, nullable=False),
+        sa.Column("error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+    )
+    op.create_index("ix_purge_jobs_device_id", "purge_jobs", ["device_id"])
+    op.create_index("idx_purge_job_status_updated", "purge_jobs", ["status", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("purge_jobs")
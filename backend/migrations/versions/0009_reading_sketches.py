@@ -0,0 +1,42 @@
+"""Add reading_sketches for percentile queries.
+
+Sketches are built by the application's sketch cycle, which also covers
+readings stored before this migration.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reading_sketches",
+        sa.Column(
+            "series_id",
+            sa.Integer,
+            sa.ForeignKey("series.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("bucket_start", sa.DateTime, primary_key=True),
+        sa.Column("count", sa.Integer, nullable=False),
+        sa.Column("total", sa.Float, nullable=False),
+        sa.Column("min_value", sa.Float, nullable=False),
+        sa.Column("max_value", sa.Float, nullable=False),
+        sa.Column("max_reading_id", sa.Integer, nullable=False),
+        sa.Column("sketch", sa.LargeBinary, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_reading_sketches_max_reading_id", "reading_sketches", ["max_reading_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("reading_sketches")
@@ -0,0 +1,40 @@
+"""Add reading_forecasts for per-series forecasts.
+
+Forecasts are computed by the application's forecast cycle from the
+reading sketches.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reading_forecasts",
+        sa.Column(
+            "series_id",
+            sa.Integer,
+            sa.ForeignKey("series.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("origin", sa.DateTime, nullable=False),
+        sa.Column("step_seconds", sa.Integer, nullable=False),
+        sa.Column("steps", sa.Integer, nullable=False),
+        sa.Column("model", sa.SmallInteger, nullable=False),
+        sa.Column("bands", sa.LargeBinary, nullable=False),
+        sa.Column("fitted_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_reading_forecasts_fitted_at", "reading_forecasts", ["fitted_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("reading_forecasts")
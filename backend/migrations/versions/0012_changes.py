@@ -0,0 +1,36 @@
+"""Add changes, the outbox behind the change feed.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "changes",
+        sa.Column(
+            "seq",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            primary_key=True,
+            autoincrement=True,
+        ),
+        sa.Column("entity", sa.String(20), nullable=False),
+        sa.Column("op", sa.String(10), nullable=False),
+        sa.Column("entity_id", sa.String(36), nullable=True),
+        sa.Column("data", sa.JSON, nullable=True),
+        sa.Column("changed_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_changes_changed_at", "changes", ["changed_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("changes")
@@ -0,0 +1,32 @@
+"""Add sketch_watermarks recording how far the sketch builder has got.
+
+Percentile and average queries read buckets holding readings past the
+watermark row by row. Until the first sketch cycle after this migration
+writes a row, every bucket is read that way.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sketch_watermarks",
+        sa.Column("shard", sa.String(100), primary_key=True),
+        sa.Column("reading_id", sa.Integer, nullable=False),
+        sa.Column("recent_ids", sa.LargeBinary, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sketch_watermarks")
@@ -0,0 +1,58 @@
+"""Number changes in commit order.
+
+The outbox key becomes ``id``; ``seq``, the feed position, is assigned
+by the application's sequencer after the writing transaction commits,
+under a lock on the one row of ``change_sequence``. Existing changes
+keep their positions.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("changes") as batch:
+        batch.alter_column(
+            "seq",
+            new_column_name="id",
+            existing_type=sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            existing_nullable=False,
+        )
+    with op.batch_alter_table("changes") as batch:
+        batch.add_column(sa.Column("seq", sa.BigInteger, nullable=True))
+    op.execute("UPDATE changes SET seq = id")
+    op.create_index("ix_changes_seq", "changes", ["seq"], unique=True)
+
+    op.create_table(
+        "change_sequence",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("last_seq", sa.BigInteger, nullable=False),
+    )
+    op.execute("INSERT INTO change_sequence (id, last_seq) SELECT 1, COALESCE(MAX(seq), 0) FROM changes")
+
+
+def downgrade() -> None:
+    op.drop_table("change_sequence")
+    op.execute("DELETE FROM changes WHERE seq IS NULL")
+    # Keys become positions again; going through negatives avoids collisions.
+    op.execute("UPDATE changes SET id = -seq")
+    op.execute("UPDATE changes SET id = -id")
+    op.drop_index("ix_changes_seq", table_name="changes")
+    with op.batch_alter_table("changes") as batch:
+        batch.drop_column("seq")
+    with op.batch_alter_table("changes") as batch:
+        batch.alter_column(
+            "id",
+            new_column_name="seq",
+            existing_type=sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            existing_nullable=False,
+        )
@@ -0,0 +1,67 @@
+"""Allow one open alert per device and alert type.
+
+Open duplicates left from before deduplication, or opened concurrently
+by different workers, are folded into the newest: its occurrence count
+absorbs theirs and they are marked resolved.
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015"
+down_revision = "0014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    alerts = sa.table(
+        "alerts",
+        sa.column("id", sa.String),
+        sa.column("device_id", sa.String),
+        sa.column("alert_type", sa.String),
+        sa.column("is_resolved", sa.Boolean),
+        sa.column("occurrence_count", sa.Integer),
+        sa.column("created_at", sa.DateTime),
+        sa.column("resolved_at", sa.DateTime),
+    )
+    rows = bind.execute(
+        sa.select(alerts.c.id, alerts.c.device_id, alerts.c.alert_type, alerts.c.occurrence_count)
+        .where(alerts.c.is_resolved == sa.false())
+        .order_by(alerts.c.created_at.desc())
+    ).all()
+    keep = {}
+    for alert_id, device_id, alert_type, count in rows:
+        key = (device_id, alert_type)
+        if key not in keep:
+            keep[key] = [alert_id, count, []]
+        else:
+            keep[key][1] += count
+            keep[key][2].append(alert_id)
+    for alert_id, count, duplicates in keep.values():
+        if not duplicates:
+            continue
+        bind.execute(alerts.update().where(alerts.c.id == alert_id).values(occurrence_count=count))
+        bind.execute(
+            alerts.update()
+            .where(alerts.c.id.in_(duplicates))
+            .values(is_resolved=True, resolved_at=sa.func.current_timestamp())
+        )
+
+    op.create_index(
+        "uq_alert_open_key",
+        "alerts",
+        ["device_id", "alert_type"],
+        unique=True,
+        postgresql_where=sa.text("is_resolved = false"),
+        sqlite_where=sa.text("is_resolved = 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_alert_open_key", table_name="alerts")
@@ -0,0 +1,21 @@
+"""Index devices.updated_at for the spatial index refresh.
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0016"
+down_revision = "0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_devices_updated_at", "devices", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_devices_updated_at", table_name="devices")
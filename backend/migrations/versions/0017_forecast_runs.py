@@ -0,0 +1,28 @@
+"""Add forecast_runs so one worker per interval refits each shard.
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0017"
+down_revision = "0016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "forecast_runs",
+        sa.Column("shard", sa.String(100), primary_key=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("claimed_at", sa.DateTime, nullable=True),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("forecast_runs")
@@ -0,0 +1,99 @@
+"""Replace sketch_watermarks with sketch_dirty_buckets marked at ingest.
+
+Queries used to find unsummarized readings by scanning IDs past the
+builder's watermark, which cost up to a full window scan under load.
+Writers now mark each (series, bucket) they touch, and queries read raw
+rows only for the marked buckets. The buckets of readings the builder
+had not reached (from the rescan overlap below the watermark up) are
+marked here; shards other than the primary get the table from
+create_schemas and are not backfilled.
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-19
+"""
+
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import get_settings
+
+revision = "0018"
+down_revision = "0017"
+branch_labels = None
+depends_on = None
+
+# The old builder re-read this many IDs below its watermark.
+_RESCAN_OVERLAP = 256
+_BATCH = 50_000
+_EPOCH = datetime(1970, 1, 1)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sketch_dirty_buckets",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("series_id", sa.Integer, sa.ForeignKey("series.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("bucket_start", sa.DateTime, nullable=False),
+        sa.Column("marked_at", sa.DateTime, nullable=False),
+        sa.UniqueConstraint("series_id", "bucket_start", name="uq_sketch_dirty_bucket"),
+    )
+    op.create_index("ix_sketch_dirty_buckets_bucket_start", "sketch_dirty_buckets", ["bucket_start"])
+
+    bind = op.get_bind()
+    watermarks = sa.table("sketch_watermarks", sa.column("shard", sa.String), sa.column("reading_id", sa.Integer))
+    sketches = sa.table("reading_sketches", sa.column("max_reading_id", sa.Integer))
+    readings = sa.table(
+        "sensor_readings",
+        sa.column("id", sa.Integer),
+        sa.column("series_id", sa.Integer),
+        sa.column("timestamp", sa.DateTime),
+    )
+    built = bind.execute(sa.select(watermarks.c.reading_id).where(watermarks.c.shard == "primary")).scalar()
+    if built is None:
+        built = bind.execute(sa.select(sa.func.max(sketches.c.max_reading_id))).scalar() or 0
+    width = get_settings().sketch_bucket_seconds * 1_000_000
+    dirty = set()
+    after_id = built - _RESCAN_OVERLAP
+    while True:
+        rows = bind.execute(
+            sa.select(readings.c.id, readings.c.series_id, readings.c.timestamp)
+            .where(readings.c.id > after_id)
+            .order_by(readings.c.id)
+            .limit(_BATCH)
+        ).all()
+        for _, series_id, timestamp in rows:
+            micros = (timestamp - _EPOCH) // timedelta(microseconds=1)
+            dirty.add((series_id, micros - micros % width))
+        if len(rows) < _BATCH:
+            break
+        after_id = rows[-1][0]
+    if dirty:
+        marked_at = datetime.utcnow()
+        op.bulk_insert(
+            sa.table(
+                "sketch_dirty_buckets",
+                sa.column("series_id", sa.Integer),
+                sa.column("bucket_start", sa.DateTime),
+                sa.column("marked_at", sa.DateTime),
+            ),
+            [
+                {"series_id": series_id, "bucket_start": _EPOCH + timedelta(microseconds=bucket), "marked_at": marked_at}
+                for series_id, bucket in sorted(dirty)
+            ],
+        )
+    op.drop_table("sketch_watermarks")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "sketch_watermarks",
+        sa.Column("shard", sa.String(100), primary_key=True),
+        sa.Column("reading_id", sa.Integer, nullable=False),
+        sa.Column("recent_ids", sa.LargeBinary, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+    op.drop_index("ix_sketch_dirty_buckets_bucket_start", "sketch_dirty_buckets")
+    op.drop_table("sketch_dirty_buckets")
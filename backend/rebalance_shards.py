@@ -0,0 +1,51 @@
+"""Move devices' readings onto the shards the current ring assigns them.
+
+Usage:
+    python rebalance_shards.py [--dry-run] [--limit N] [--grace-seconds S] [--batch-size N]
+
+Run after adding a shard to SHARD_URLS or changing SHARD_WEIGHTS; the API
+keeps serving and ingesting while devices move. Every worker must run with
+the same shard settings, and --grace-seconds must cover their
+SHARD_PLACEMENT_REFRESH_SECONDS (twice that by default).
+"""
+
+import argparse
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.shard_map import shard_map
+from app.services.shard_rebalance import ShardRebalancer
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebalance device readings across shards.")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the planned moves")
+    parser.add_argument("--limit", type=int, default=None, help="Move at most this many devices")
+    parser.add_argument("--grace-seconds", type=float, default=None, help="Wait for workers to refresh placements")
+    parser.add_argument("--batch-size", type=int, default=None, help="Readings per copy and delete batch")
+    args = parser.parse_args()
+
+    shard_map.create_schemas()
+    db = SessionLocal()
+    try:
+        moves = ShardRebalancer.plan(db, args.limit)
+        routes = Counter((move.source, move.target) for move in moves)
+        print(f"{len(moves)} devices to move across {len(shard_map.shards)} shards")
+        for (source, target), count in sorted(routes.items()):
+            print(f"  {source} -> {target}: {count}")
+        if args.dry_run or not moves:
+            return 0
+        report = ShardRebalancer(args.grace_seconds, args.batch_size).run(db, moves)
+    finally:
+        db.close()
+
+    print(f"Moved {report['devices']} devices: {report['copied']} readings copied, {report['deleted']} deleted")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
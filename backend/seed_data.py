@@ -32,14 +32,14 @@ def seed_database():
             print(f"Created device: {device.name}")
         
         base_time = datetime.utcnow() - timedelta(hours=24)
+        readings = []
         
         for device in devices:
             if "Temperature" in device.name:
                 for i in range(24):
                     timestamp = base_time + timedelta(hours=i)
                     temp_value = 20 + random.uniform(-5, 10)
-                    SensorReadingService.create_reading(
-                        db,
+                    readings.append(
                         SensorReadingCreate(
                             device_id=device.id,
                             sensor_type="temperature",
@@ -48,14 +48,13 @@ def seed_database():
                             timestamp=timestamp,
                         )
                     )
-                print(f"Created temperature readings for {device.name}")
+                print(f"Generated temperature readings for {device.name}")
             
             if "Humidity" in device.name:
                 for i in range(24):
                     timestamp = base_time + timedelta(hours=i)
                     humidity_value = 40 + random.uniform(-10, 20)
-                    SensorReadingService.create_reading(
-                        db,
+                    readings.append(
                         SensorReadingCreate(
                             device_id=device.id,
                             sensor_type="humidity",
@@ -64,7 +63,10 @@ def seed_database():
                             timestamp=timestamp,
                         )
                     )
-                print(f"Created humidity readings for {device.name}")
+                print(f"Generated humidity readings for {device.name}")
+        
+        # One multi-row INSERT instead of a commit per reading
+        SensorReadingService.ingest_readings(db, readings)
         
         alerts_data = [
             {
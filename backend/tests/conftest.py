@@ -0,0 +1,88 @@
+"""Shared fixtures: one application on a throwaway SQLite database."""
+
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+# Settings are read once at import, so the environment is set up first.
+_DATA_DIR = tempfile.mkdtemp(prefix="iot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["DEVICE_RATE_LIMIT_PER_SECOND"] = "0"
+os.environ["IP_RATE_LIMIT_PER_SECOND"] = "0"
+os.environ["RANGE_CACHE_SPILL_DIR"] = os.path.join(_DATA_DIR, "spill")
+# A second shard new devices are never placed on, for moves between shards.
+os.environ["SHARD_URLS"] = json.dumps({"second": f"sqlite:///{os.path.join(_DATA_DIR, 'second.db')}"})
+os.environ["SHARD_WEIGHTS"] = json.dumps({"primary": 1, "second": 0})
+# Tests run the background cycles themselves.
+for _interval in (
+    "HEARTBEAT_TICK_SECONDS",
+    "PURGE_INTERVAL_SECONDS",
+    "PURGE_PROPAGATION_SECONDS",
+    "GEO_INDEX_REFRESH_SECONDS",
+    "HOT_STORE_SYNC_SECONDS",
+    "SKETCH_INTERVAL_SECONDS",
+    "FORECAST_INTERVAL_SECONDS",
+    "CHANGE_FEED_SEQUENCE_SECONDS",
+    "CHANGE_FEED_TRIM_INTERVAL_SECONDS",
+):
+    os.environ[_interval] = "3600"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+from .helpers import csv_file, hours_ago, reading  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client of the application, started once for the whole run."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def device_factory(client):
+    """Create devices through the API and return their IDs."""
+
+    def create(**fields) -> str:
+        body = {"name": f"test-{uuid.uuid4().hex[:8]}", "location": "Building A - Floor 1", "device_type": "sensor"}
+        body.update(fields)
+        response = client.post("/devices", json=body)
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    return create
+
+
+@pytest.fixture
+def device(device_factory) -> str:
+    """A fresh device."""
+    return device_factory()
+
+
+@pytest.fixture
+def now() -> datetime:
+    """Current time truncated to the second, as the API stores it."""
+    return datetime.utcnow().replace(microsecond=0)
+
+
+
+@pytest.fixture
+def day(client, device):
+    """
+    A device with one temperature reading every 10 minutes over the last day, imported in bulk.
+
+    Returns the device, the newest timestamp and the request bodies, newest first.
+    """
+    # Off the 10-minute grid of "now", so windows ending now never cut at a reading.
+    end = hours_ago(0) - timedelta(minutes=5)
+    rows = [reading(device, float(i % 50), end - timedelta(minutes=10 * i)) for i in range(144)]
+    response = client.post("/sensor-readings/import", files={"file": csv_file(rows)})
+    assert response.json()["inserted"] == 144
+    return device, end, rows
@@ -0,0 +1,28 @@
+"""Request bodies shared by the API tests."""
+
+from datetime import datetime, timedelta
+
+
+def reading(
+    device_id: str, value: float, timestamp: datetime, sensor_type: str = "temperature", unit: str = "C"
+) -> dict:
+    """Body of one reading for the ingest endpoints."""
+    return {
+        "device_id": device_id,
+        "sensor_type": sensor_type,
+        "value": value,
+        "unit": unit,
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+def csv_file(rows) -> tuple:
+    """``files`` entry uploading reading rows as CSV."""
+    lines = ["device_id,sensor_type,value,unit,timestamp"]
+    lines += [f"{r['device_id']},{r['sensor_type']},{r['value']},{r['unit']},{r['timestamp']}" for r in rows]
+    return ("readings.csv", ("\n".join(lines) + "\n").encode(), "text/csv")
+
+
+def hours_ago(hours: float) -> datetime:
+    """Now minus ``hours``, truncated to the second."""
+    return datetime.utcnow().replace(microsecond=0) - timedelta(hours=hours)
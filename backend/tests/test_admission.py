@@ -0,0 +1,101 @@
+"""Token buckets, all-or-nothing admission and the ingest concurrency cap."""
+
+from datetime import timedelta
+
+import pytest
+
+from app.services import admission
+from app.services.admission import ConcurrencyLimiter, Overloaded, RateLimitExceeded, TokenBucketLimiter
+
+from .helpers import reading
+
+
+def test_bucket_refuses_once_empty_and_refills(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: clock[0])
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+    for _ in range(3):
+        limiter.acquire("a")
+    with pytest.raises(RateLimitExceeded) as refused:
+        limiter.acquire("a")
+    assert refused.value.retry_after == pytest.approx(0.5)
+    limiter.acquire("b")
+
+    clock[0] += 0.5
+    limiter.acquire("a")
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("a")
+
+
+def test_cost_above_burst_is_admitted_into_debt(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: clock[0])
+    limiter = TokenBucketLimiter(rate=10.0, burst=5)
+    limiter.acquire("a", cost=20)
+    clock[0] += 1.0
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("a")
+    clock[0] += 1.0
+    limiter.acquire("a")
+
+
+def test_idle_keys_are_evicted():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, idle_seconds=0, max_keys=2)
+    for key in "abc":
+        limiter.acquire(key)
+    assert len(limiter) == 2
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    """Enabled per-device and per-client limiters with three tokens each."""
+    device = TokenBucketLimiter(rate=0.001, burst=3)
+    ip = TokenBucketLimiter(rate=0.001, burst=3)
+    monkeypatch.setattr(admission, "device_limiter", device)
+    monkeypatch.setattr(admission, "ip_limiter", ip)
+    return device, ip
+
+
+def test_refused_device_does_not_spend_client_tokens(limiters):
+    device, ip = limiters
+    device.acquire("busy", cost=3)
+    with pytest.raises(RateLimitExceeded) as refused:
+        admission.admit_ingest("busy", "10.0.0.1")
+    assert refused.value.key == "busy"
+    admission.admit_batch({"a": 2, "b": 1}, "10.0.0.1")
+
+
+def test_batch_is_admitted_all_or_nothing(limiters):
+    device, ip = limiters
+    device.acquire("c", cost=2)
+    with pytest.raises(RateLimitExceeded) as refused:
+        admission.admit_batch({"a": 1, "b": 1, "c": 2}, "10.0.0.2")
+    assert refused.value.key == "c"
+    # Nothing was charged to the client or the other devices.
+    admission.admit_batch({"a": 3}, "10.0.0.2")
+    admission.admit_batch({"b": 3})
+
+
+def test_batch_endpoint_refuses_with_retry_after(client, limiters, device, now):
+    device_bucket, ip = limiters
+    device_bucket.acquire(device)
+    readings = [reading(device, float(i), now - timedelta(seconds=i)) for i in range(3)]
+    response = client.post("/sensor-readings/batch", json={"readings": readings})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    response = client.post("/sensor-readings/batch", json={"readings": readings[:2]})
+    assert response.json()["inserted"] == 2
+    # The refused batch cost the client nothing.
+    ip.acquire("testclient")
+
+
+def test_concurrency_limiter_sheds_after_the_wait_budget():
+    limiter = ConcurrencyLimiter(max_concurrency=1, wait_budget=0.01)
+    with limiter.slot():
+        assert limiter.in_flight == 1
+        with pytest.raises(Overloaded):
+            with limiter.slot():
+                pass
+    assert (limiter.in_flight, limiter.rejected) == (0, 1)
+    with limiter.slot():
+        pass
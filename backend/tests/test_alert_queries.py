@@ -0,0 +1,65 @@
+"""Fleet-wide alert filters, the summary, and the indexes the open-alert listing uses."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+
+def alert(device_id: str, alert_type: str, severity: str = "LOW") -> dict:
+    return {"device_id": device_id, "alert_type": alert_type, "severity": severity, "message": "Check device"}
+
+
+def test_filters_work_without_a_device(client, device_factory):
+    alert_type = f"Type {device_factory()}"
+    devices = [device_factory() for _ in range(3)]
+    created = [
+        client.post("/alerts", json=alert(d, alert_type, severity)).json()
+        for d, severity in zip(devices, ("LOW", "HIGH", "HIGH"))
+    ]
+    client.post(f"/alerts/{created[2]['id']}/resolve").raise_for_status()
+
+    def listed(**params) -> list:
+        response = client.get("/alerts", params={"alert_type": alert_type, **params})
+        assert response.status_code == 200, response.text
+        return [a["id"] for a in response.json()]
+
+    assert listed() == [a["id"] for a in reversed(created)]
+    assert listed(severity="HIGH") == [created[2]["id"], created[1]["id"]]
+    assert listed(severity="HIGH", is_resolved=False) == [created[1]["id"]]
+    assert listed(device_id=devices[0]) == [created[0]["id"]]
+    assert listed(limit=1, skip=1) == [created[1]["id"]]
+
+    first = datetime.fromisoformat(created[0]["created_at"])
+    assert listed(end_time=(first - timedelta(seconds=1)).isoformat()) == []
+    assert len(listed(start_time=first.isoformat())) == 3
+    assert client.get("/alerts", params={"severity": "URGENT"}).status_code == 422
+
+
+def test_summary_counts_by_severity_and_state(client, device):
+    for severity in ("LOW", "CRITICAL"):
+        client.post("/alerts", json=alert(device, f"{severity} check", severity)).raise_for_status()
+    resolved = client.post("/alerts", json=alert(device, "Other check", "CRITICAL")).json()
+    client.post(f"/alerts/{resolved['id']}/resolve").raise_for_status()
+
+    summary = client.get("/alerts/summary", params={"device_id": device}).json()
+    assert (summary["total"], summary["unresolved"]) == (3, 2)
+    assert summary["by_severity"]["CRITICAL"] == {"resolved": 1, "unresolved": 1}
+    assert summary["by_severity"]["LOW"] == {"resolved": 0, "unresolved": 1}
+    assert summary["by_severity"]["HIGH"] == {"resolved": 0, "unresolved": 0}
+
+
+def test_open_alert_listing_is_served_from_an_index():
+    db = SessionLocal()
+    try:
+        plan = db.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT * FROM alerts WHERE is_resolved = 0 "
+                "ORDER BY created_at DESC LIMIT 100"
+            )
+        ).all()
+    finally:
+        db.close()
+    detail = " ".join(row[-1] for row in plan)
+    assert "USING INDEX" in detail and "TEMP B-TREE" not in detail
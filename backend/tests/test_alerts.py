@@ -0,0 +1,72 @@
+"""Alert deduplication, incidents and the one-open-alert-per-key rule."""
+
+from app.services.alert_index import alert_index
+
+
+def alert(device_id: str, severity: str = "LOW", alert_type: str = "High Temperature", **fields) -> dict:
+    body = {"device_id": device_id, "alert_type": alert_type, "severity": severity, "message": "Too hot"}
+    body.update(fields)
+    return body
+
+
+def test_repeats_fold_into_the_open_alert(client, device):
+    first = client.post("/alerts", json=alert(device, actual_value=30.0)).json()
+    second = client.post("/alerts", json=alert(device, "HIGH", actual_value=35.0)).json()
+    third = client.post("/alerts", json=alert(device, "MEDIUM", message="Still hot")).json()
+
+    assert first["id"] == second["id"] == third["id"]
+    assert third["occurrence_count"] == 3
+    assert (third["severity"], third["actual_value"], third["message"]) == ("HIGH", 35.0, "Still hot")
+    open_alerts = client.get("/alerts", params={"device_id": device, "is_resolved": False}).json()
+    assert [a["id"] for a in open_alerts] == [first["id"]]
+
+
+def test_resolved_alert_is_not_folded_into(client, device):
+    first = client.post("/alerts", json=alert(device)).json()
+    client.post(f"/alerts/{first['id']}/resolve").raise_for_status()
+    second = client.post("/alerts", json=alert(device)).json()
+    assert second["id"] != first["id"] and second["occurrence_count"] == 1
+
+
+def test_repeat_from_another_worker_folds_through_the_unique_index(client, device):
+    first = client.post("/alerts", json=alert(device)).json()
+    # As seen by a worker whose index never learned about the open alert.
+    alert_index.discard_alert(device, "High Temperature", first["id"])
+
+    second = client.post("/alerts", json=alert(device)).json()
+    assert second["id"] == first["id"] and second["occurrence_count"] == 2
+    assert alert_index.get_alert(device, "High Temperature") == first["id"]
+
+
+def test_reopening_while_another_is_open_conflicts(client, device):
+    first = client.post("/alerts", json=alert(device)).json()
+    client.post(f"/alerts/{first['id']}/resolve").raise_for_status()
+    second = client.post("/alerts", json=alert(device)).json()
+
+    response = client.put(f"/alerts/{first['id']}", json={"is_resolved": False})
+    assert response.status_code == 409
+    client.post(f"/alerts/{second['id']}/resolve").raise_for_status()
+    assert client.put(f"/alerts/{first['id']}", json={"is_resolved": False}).json()["is_resolved"] is False
+
+
+def test_alert_for_unknown_device_is_refused(client):
+    assert client.post("/alerts", json=alert("no-such-device")).status_code == 404
+
+
+def test_same_type_alerts_in_one_location_share_an_incident(client, device_factory):
+    location = f"Test site {device_factory()}"
+    devices = [device_factory(location=location) for _ in range(3)]
+    severities = ("LOW", "CRITICAL", "LOW")
+    alerts = [client.post("/alerts", json=alert(d, severity)).json() for d, severity in zip(devices, severities)]
+    other = client.post("/alerts", json=alert(devices[0], alert_type="Low Battery")).json()
+
+    incident_id = alerts[0]["incident_id"]
+    assert incident_id and {a["incident_id"] for a in alerts} == {incident_id}
+    assert other["incident_id"] != incident_id
+
+    incident = client.get(f"/alerts/incidents/{incident_id}").json()
+    assert (incident["alert_count"], incident["severity"]) == (3, "CRITICAL")
+    assert sorted(a["id"] for a in incident["alerts"]) == sorted(a["id"] for a in alerts)
+
+    client.post(f"/alerts/incidents/{incident_id}/resolve").raise_for_status()
+    assert all(client.get(f"/alerts/{a['id']}").json()["is_resolved"] for a in alerts)
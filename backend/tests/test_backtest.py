@@ -0,0 +1,118 @@
+"""detect_runs and _RunJoiner against a reference over whole series, and the backtest endpoint."""
+
+import operator
+import random
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from app.services.backtest_service import _RunJoiner, detect_runs
+
+COMPARE = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def reference_runs(readings, series_types, rule):
+    """
+    Runs breaking ``rule`` as ``(series, start, last, end, ongoing)``, walking each series in order.
+
+    A run ends at the reading that brought the value back; one still open
+    after the last reading ends at its last breaking reading.
+    """
+    type_code, comparison, threshold = rule
+    runs = []
+    for series in sorted(readings):
+        if series_types[series] != type_code:
+            continue
+        run = None
+        for timestamp, value in readings[series]:
+            if COMPARE[comparison](value, threshold):
+                run = (timestamp, timestamp) if run is None else (run[0], timestamp)
+            elif run is not None:
+                runs.append((series, run[0], run[1], timestamp, False))
+                run = None
+        if run is not None:
+            runs.append((series, run[0], run[1], run[1], True))
+    return sorted(runs)
+
+
+def chunked_runs(readings, series_types, rules, cuts):
+    """Runs per rule from ``detect_runs`` over the chunks between ``cuts``, joined by ``_RunJoiner``."""
+    rows = sorted((series, timestamp, value) for series, points in readings.items() for timestamp, value in points)
+    series_keys = np.array(sorted(series_types), dtype=np.int64)
+    types = np.array([series_types[s] for s in series_keys], dtype=np.int64)
+    joiners = [_RunJoiner() for _ in rules]
+    for lo, hi in zip(cuts[:-1], cuts[1:]):
+        chunk = [row for row in rows if lo <= row[1] < hi]
+        series = np.array([row[0] for row in chunk], dtype=np.int64)
+        timestamps = np.array([row[1] for row in chunk], dtype=np.int64)
+        values = np.array([row[2] for row in chunk], dtype=np.float64)
+        for joiner, runs in zip(joiners, detect_runs(series, timestamps, values, series_keys, types, rules)):
+            joiner.add(runs)
+    results = []
+    for joiner in joiners:
+        series, starts, lasts, ends, ongoing = joiner.finish()
+        results.append(
+            sorted(zip(series.tolist(), starts.tolist(), lasts.tolist(), ends.tolist(), ongoing.tolist()))
+        )
+    return results
+
+
+def random_readings(rng: random.Random, n_series: int, n_types: int, span: int):
+    readings, series_types = {}, {}
+    for series in rng.sample(range(1, 1000), n_series):
+        series_types[series] = rng.randrange(n_types)
+        timestamps = sorted(rng.sample(range(span), rng.randrange(0, 60)))
+        readings[series] = [(t, rng.choice([0.0, 1.0, 2.0, 3.0])) for t in timestamps]
+    return readings, series_types
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_joined_chunks_match_reference(seed):
+    rng = random.Random(seed)
+    span = 1000
+    readings, series_types = random_readings(rng, rng.randint(1, 8), 3, span)
+    rules = [(rng.randrange(3), rng.choice(list(COMPARE)), rng.choice([0.5, 1.0, 2.0, 2.5])) for _ in range(3)]
+    cuts = [0] + sorted(rng.sample(range(1, span), rng.randrange(0, 12))) + [span]
+
+    for rule, runs in zip(rules, chunked_runs(readings, series_types, rules, cuts)):
+        assert runs == reference_runs(readings, series_types, rule)
+
+
+def test_run_spanning_empty_chunks_stays_open():
+    readings = {7: [(0, 5.0), (10, 5.0), (95, 5.0), (99, 0.0)]}
+    types = {7: 0}
+    rule = (0, ">", 1.0)
+    runs = chunked_runs(readings, types, [rule], [0, 20, 40, 60, 80, 100])[0]
+    assert runs == [(7, 0, 95, 99, False)] == reference_runs(readings, types, rule)
+
+
+def test_run_breaking_to_the_end_is_ongoing():
+    readings = {3: [(0, 0.0), (5, 2.0), (6, 2.0)], 4: [(1, 2.0)]}
+    types = {3: 1, 4: 1}
+    rule = (1, ">=", 2.0)
+    runs = chunked_runs(readings, types, [rule], [0, 6, 10])[0]
+    assert runs == [(3, 5, 6, 6, True), (4, 1, 1, 1, True)] == reference_runs(readings, types, rule)
+
+
+def test_no_readings():
+    assert chunked_runs({}, {1: 0}, [(0, ">", 0.0)], [0, 10, 20]) == [[]]
+
+
+def test_backtest_endpoint(client, day):
+    device, end, rows = day
+    # Values count down from 49 to 0 every 50 readings, so "> 40" breaks in
+    # two runs of nine readings (80 minutes) and the three oldest (20 minutes);
+    # an alert lasts until the reading that recovers.
+    rule = {"sensor_type": "temperature", "comparison": ">", "value": 40, "min_duration_seconds": 30 * 60}
+    body = {"rules": [rule], "days": 2, "device_ids": [device], "end_time": (end + timedelta(minutes=1)).isoformat()}
+    response = client.post("/alerts/backtest", json=body)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["readings_scanned"] == len(rows)
+    (rule_result,) = result["rules"]
+    assert (rule_result["alerts"], rule_result["ongoing"], rule_result["devices_alerted"]) == (2, 0, 1)
+    assert rule_result["max_duration_seconds"] == 90 * 60
+
+    body["rules"][0]["min_duration_seconds"] = 0
+    assert client.post("/alerts/backtest", json=body).json()["rules"][0]["alerts"] == 3
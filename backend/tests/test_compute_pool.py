@@ -0,0 +1,83 @@
+"""Jobs in the compute pool's worker processes, their limits, and how routes answer when it is full."""
+
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from app.services.compute_pool import ComputeOverloaded, ComputePool, ComputeTimeout, compute_pool
+
+
+def scaled(values: np.ndarray, factor: float):
+    return values * factor, float(values.sum())
+
+
+def fail(message: str):
+    raise ValueError(message)
+
+
+def sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def pool():
+    started = ComputePool(workers=1, max_queue=0, job_timeout=5.0, shm_min_bytes=1024)
+    started.start()
+    try:
+        yield started
+    finally:
+        started.stop()
+
+
+def test_arrays_pass_through_shared_memory(pool):
+    for size in (10, 100_000, 300_000):
+        values = np.arange(size, dtype=np.float64)
+        doubled, total = pool.run(scaled, values, 2.0)
+        assert np.array_equal(doubled, values * 2) and total == values.sum()
+    assert pool.stats() == {"workers": 1, "idle": 1, "admitted": 0}
+
+
+def test_job_errors_reach_the_caller(pool):
+    with pytest.raises(RuntimeError, match="ValueError: bad input"):
+        pool.run(fail, "bad input")
+    assert pool.run(sleep, 0) == 0
+
+
+def test_runaway_job_is_killed_and_its_worker_replaced(pool):
+    with pytest.raises(ComputeTimeout):
+        pool.run(sleep, 10, timeout=0.2)
+    assert pool.stats()["workers"] == 1
+    assert pool.run(sleep, 0) == 0
+
+
+def test_full_pool_fails_fast(pool):
+    busy = threading.Thread(target=pool.run, args=(sleep, 0.5))
+    busy.start()
+    time.sleep(0.1)
+    try:
+        with pytest.raises(ComputeOverloaded):
+            pool.run(sleep, 0)
+    finally:
+        busy.join()
+
+
+def test_route_answers_503_when_the_pool_is_full(client, device, now, monkeypatch):
+    def overloaded(*args, **kwargs):
+        raise ComputeOverloaded(retry_after=2.0)
+
+    monkeypatch.setattr(compute_pool, "run", overloaded)
+    response = client.post(
+        "/sensor-readings/resample",
+        json={
+            "series": [{"device_id": device, "sensor_type": "temperature"}],
+            "start_time": (now - timedelta(hours=1)).isoformat(),
+            "end_time": now.isoformat(),
+            "step_seconds": 60,
+        },
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
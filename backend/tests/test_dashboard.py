@@ -0,0 +1,61 @@
+"""Results shared between identical requests, and the one-request dashboard summary."""
+
+import threading
+import time
+
+import pytest
+
+from app.services.dashboard_service import SharedResultCache, summary_cache
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = SharedResultCache(ttl_seconds=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return len(calls)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * 5 and len(calls) == 1
+    assert cache.get_or_compute("other", compute) == 2
+
+
+def test_failures_and_expired_results_are_recomputed():
+    cache = SharedResultCache(ttl_seconds=0.1)
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", lambda: int("x"))
+    assert cache.get_or_compute("k", lambda: 1) == 1
+    assert cache.get_or_compute("k", lambda: 2) == 1
+    time.sleep(0.15)
+    assert cache.get_or_compute("k", lambda: 3) == 3
+
+
+def test_summary(client, day):
+    device, end, rows = day
+    client.post(
+        "/alerts", json={"device_id": device, "alert_type": "High Temperature", "severity": "HIGH", "message": "Hot"}
+    ).raise_for_status()
+    summary_cache.clear()
+
+    params = {"limit": 1000, "history_device_id": device, "history_limit": 6, "sensor_type": "temperature"}
+    response = client.get("/dashboard/summary", params=params)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["history_device_id"] == device
+    assert [r["timestamp"] for r in body["history"]["temperature"]] == [r["timestamp"] for r in reversed(rows[:6])]
+    assert body["recent_alerts"][0]["device_id"] == device
+    assert body["alert_counts"]["by_severity"]["HIGH"]["unresolved"] >= 1
+    assert body["device_counts"]["total"] >= 1
+    assert device in {d["id"] for d in body["devices"]}
+    latest = [r for r in body["latest_readings"] if r["device_id"] == device]
+    assert [(r["sensor_type"], r["timestamp"]) for r in latest] == [("temperature", rows[0]["timestamp"])]
+
+    # Identical requests within the cache period get the same result.
+    assert client.get("/dashboard/summary", params=params).json()["generated_at"] == body["generated_at"]
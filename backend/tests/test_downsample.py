@@ -0,0 +1,116 @@
+"""lttb_indices against the textbook Largest-Triangle-Three-Buckets, and ranges downsampled with it."""
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from app.services.downsample import MINMAX_RATIO, lttb_indices
+
+
+def reference_lttb(x, y, n_out):
+    """Steinarsson's LTTB, one point at a time."""
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return list(range(n))
+    every = (n - 2) / (n_out - 2)
+    picked = [0]
+    a = 0
+    for bucket in range(n_out - 2):
+        next_lo = int(np.floor((bucket + 1) * every)) + 1
+        next_hi = min(int(np.floor((bucket + 2) * every)) + 1, n)
+        if bucket == n_out - 3:
+            mean_x, mean_y = x[n - 1], y[n - 1]
+        else:
+            mean_x = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+            mean_y = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        lo = int(np.floor(bucket * every)) + 1
+        hi = next_lo
+        best, best_area = lo, -1.0
+        for i in range(lo, hi):
+            area = abs((x[a] - mean_x) * (y[i] - y[a]) - (x[a] - x[i]) * (mean_y - y[a]))
+            if area > best_area:
+                best, best_area = i, area
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
+
+
+def reference_minmax(y, n_buckets):
+    """First and last points, and the min and max of equal-count interior buckets and of the leftover tail."""
+    n = len(y)
+    width = (n - 2) // n_buckets
+    picked = {0, n - 1}
+    bounds = [(1 + b * width, 1 + (b + 1) * width) for b in range(n_buckets)]
+    if 1 + n_buckets * width < n - 1:
+        bounds.append((1 + n_buckets * width, n - 1))
+    for lo, hi in bounds:
+        part = list(y[lo:hi])
+        picked.add(lo + part.index(min(part)))
+        picked.add(lo + part.index(max(part)))
+    return sorted(picked)
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 3), (100, 13), (500, 64), (1000, 300), (2 * MINMAX_RATIO * 50, 50)])
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_reference_without_preselection(n, n_out, seed):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(1, 10, n))
+    y = np.cumsum(rng.normal(0, 1, n))
+    assert lttb_indices(x, y, n_out).tolist() == reference_lttb(x.tolist(), y.tolist(), n_out)
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 20), (10_007, 100), (50_000, 999)])
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_reference_with_preselection(n, n_out, seed):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(1, 10, n))
+    y = np.cumsum(rng.normal(0, 1, n))
+    candidates = reference_minmax(y.tolist(), MINMAX_RATIO * n_out // 2)
+    expected = reference_lttb(x[candidates].tolist(), y[candidates].tolist(), n_out)
+    assert lttb_indices(x, y, n_out).tolist() == [candidates[i] for i in expected]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 50])
+def test_short_series_are_returned_whole(n):
+    x = np.arange(n, dtype=np.float64)
+    assert lttb_indices(x, x, 50).tolist() == list(range(n))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_preselection_keeps_extremes_and_endpoints(seed):
+    rng = np.random.default_rng(seed)
+    n, n_out = 200_000, 500
+    x = np.arange(n, dtype=np.float64) * 1_000_000
+    y = rng.normal(0, 1, n)
+    y[rng.integers(1, n - 1)] = 50.0
+    y[rng.integers(1, n - 1)] = -50.0
+
+    picked = lttb_indices(x, y, n_out)
+
+    assert len(picked) <= n_out
+    assert picked[0] == 0 and picked[-1] == n - 1
+    assert np.all(np.diff(picked) > 0)
+    assert int(np.argmax(y)) in picked
+    assert int(np.argmin(y)) in picked
+
+
+def test_range_with_max_points(client, day):
+    device, end, rows = day
+    params = {
+        "sensor_type": "temperature",
+        "start_time": (end - timedelta(hours=6)).isoformat(),
+        "end_time": end.isoformat(),
+    }
+    full = client.get(f"/sensor-readings/device/{device}/range", params=params).json()
+    expected = sorted(r["timestamp"] for r in rows if r["timestamp"] >= params["start_time"])
+    assert [r["timestamp"] for r in full] == expected
+
+    reduced = client.get(f"/sensor-readings/device/{device}/range", params={**params, "max_points": 10}).json()
+    assert len(reduced) == 10
+    assert reduced[0]["timestamp"] == expected[0] and reduced[-1]["timestamp"] == expected[-1]
+    assert {r["value"] for r in reduced} >= {max(r["value"] for r in full), min(r["value"] for r in full)}
+
+    few = client.get(f"/sensor-readings/device/{device}/range", params={**params, "max_points": 1000}).json()
+    assert few == full
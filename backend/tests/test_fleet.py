@@ -0,0 +1,47 @@
+"""Fleet aggregates per device group, merged across shards."""
+
+from datetime import timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.services.shard_map import PRIMARY
+from app.services.shard_rebalance import Move, ShardRebalancer
+
+from .helpers import hours_ago, reading
+
+
+def fleet(client, **params) -> list:
+    response = client.get("/analytics/fleet", params={"sensor_type": "temperature", "window": "2h", **params})
+    assert response.status_code == 200, response.text
+    return response.json()["groups"]
+
+
+def test_fleet_groups_devices_on_every_shard(client, device_factory):
+    location = f"Test site {device_factory()}"
+    device_type = f"type-{device_factory()}"
+    devices = [device_factory(location=location, device_type=device_type) for _ in range(3)]
+    values = []
+    for n, device in enumerate(devices):
+        rows = [reading(device, float(n * 100 + i), hours_ago(0.5) - timedelta(seconds=i)) for i in range(100)]
+        client.post("/sensor-readings/batch", json={"readings": rows}).raise_for_status()
+        values += [r["value"] for r in rows]
+    # Older than the window, so left out.
+    client.post("/sensor-readings", json=reading(devices[0], 1000.0, hours_ago(3))).raise_for_status()
+
+    db = SessionLocal()
+    try:
+        ShardRebalancer(grace_seconds=0).run(db, [Move(devices[2], PRIMARY, "second")])
+    finally:
+        db.close()
+
+    for group_by, name in (("location", location), ("device_type", device_type)):
+        group = next(g for g in fleet(client, group_by=group_by) if g["group"] == name)
+        assert (group["device_count"], group["count"]) == (3, 300)
+        assert (group["min"], group["max"]) == (min(values), max(values))
+        assert group["avg"] == pytest.approx(sum(values) / len(values))
+
+
+def test_fleet_refuses_a_bad_window(client):
+    params = {"group_by": "location", "sensor_type": "temperature", "window": "soon"}
+    assert client.get("/analytics/fleet", params=params).status_code == 400
@@ -0,0 +1,88 @@
+"""Forecast refits, their per-shard claims and the forecast endpoint."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database import SessionLocal
+from app.models import ForecastRun
+from app.services.forecast_service import ForecastBuilder
+from app.services.shard_map import shard_map
+
+SHARD = next(iter(shard_map.shards))
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def builder(**options) -> ForecastBuilder:
+    """A builder as one worker holds it, due on every cycle."""
+    return ForecastBuilder(interval_seconds=0, min_points=6, **options)
+
+
+def run_state(db, name: str = SHARD):
+    db.rollback()
+    return db.execute(select(ForecastRun.status, ForecastRun.claimed_at).where(ForecastRun.shard == name)).one()
+
+
+def test_forecast(client, day, db):
+    device, end, rows = day
+    params = {"sensor_type": "temperature"}
+    db.execute(update(ForecastRun).values(status="idle", claimed_at=None))
+    db.commit()
+    assert client.get(f"/sensor-readings/device/{device}/forecast", params=params).status_code == 404
+
+    assert builder().run(db) >= 1
+    forecast = client.get(f"/sensor-readings/device/{device}/forecast", params=params)
+    assert forecast.status_code == 200, forecast.text
+    body = forecast.json()
+    assert (body["device_id"], body["unit"]) == (device, "C")
+    assert body["points"] and all(p["lower"] <= p["value"] <= p["upper"] for p in body["points"])
+    assert run_state(db)[0] == "idle"
+
+    hours = client.get(f"/sensor-readings/device/{device}/forecast", params=dict(params, hours=3)).json()
+    assert len(hours["points"]) == 3
+
+
+def test_running_claim_blocks_other_workers_until_stale(db):
+    first, second = builder(), builder(stale_seconds=3600)
+    db.execute(update(ForecastRun).values(status="idle", claimed_at=None))
+    db.commit()
+    assert first.claim(db, SHARD) is not None
+    assert second.claim(db, SHARD) is None
+
+    db.execute(update(ForecastRun).values(claimed_at=datetime.utcnow() - timedelta(hours=2)))
+    db.commit()
+    assert second.claim(db, SHARD) is not None
+
+
+def test_worker_taken_over_leaves_the_new_claim_running(db, monkeypatch):
+    first, second = builder(), builder()
+    db.execute(update(ForecastRun).values(status="idle", claimed_at=None))
+    db.commit()
+    taken_over = []
+
+    def slow_refit(shard_db):
+        if taken_over:
+            return 0
+        # The first refit outlives its claim and another worker takes the shard over.
+        db.execute(
+            update(ForecastRun)
+            .where(ForecastRun.shard == SHARD)
+            .values(claimed_at=datetime.utcnow() - timedelta(hours=2))
+        )
+        db.commit()
+        taken_over.append(second.claim(db, SHARD))
+        return 0
+
+    monkeypatch.setattr(first, "_run_shard", slow_refit)
+    first.run(db)
+    assert taken_over[0] is not None
+    assert tuple(run_state(db)) == ("running", taken_over[0])
@@ -0,0 +1,78 @@
+"""GridIndex against a brute-force scan, and the near/within device queries."""
+
+import random
+
+import pytest
+
+from app.database import SessionLocal
+from app.services.geo_index import GridIndex, encode_geohash, haversine_km
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(7)
+    return {f"d{i}": (rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(2000)}
+
+
+def test_geohash():
+    assert encode_geohash(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+    assert encode_geohash(57.64911, 10.40744).startswith(encode_geohash(57.64911, 10.40744, precision=4))
+
+
+def test_index_matches_a_full_scan(points):
+    index = GridIndex(cell_degrees=1.0)
+    for device_id, (lat, lon) in points.items():
+        index.upsert(device_id, lat, lon)
+
+    for lat, lon, radius in ((10.0, 20.0, 800.0), (-40.0, 179.5, 500.0), (0.0, 0.0, 5.0)):
+        expected = sorted(
+            (haversine_km(lat, lon, *point), device_id)
+            for device_id, point in points.items()
+            if haversine_km(lat, lon, *point) <= radius
+        )
+        assert [device_id for device_id, _ in index.near(lat, lon, radius)] == [d for _, d in expected]
+
+    # A box across the antimeridian.
+    inside = {d for d, (lat, lon) in points.items() if -10 <= lat <= 10 and (lon >= 170 or lon <= -170)}
+    assert set(index.within(-10, 170, 10, -170)) == inside
+
+    index.upsert("d0", None, None)
+    index.remove("d1")
+    assert len(index) == len(points) - 2
+    assert "d0" not in index.within(-90, -180, 90, 180)
+
+
+def test_near_and_within(client, device_factory):
+    # A spot of its own, so devices of other tests stay out of the results.
+    lat, lon = 64.1, -21.9
+    close = device_factory(latitude=lat + 0.01, longitude=lon)
+    far = device_factory(latitude=lat + 0.2, longitude=lon)
+    device_factory(latitude=lat + 2, longitude=lon)
+
+    near = client.get("/devices/near", params={"lat": lat, "lon": lon, "radius_km": 50}).json()
+    assert [d["id"] for d in near] == [close, far]
+    assert near[0]["distance_km"] == pytest.approx(1.11, abs=0.01)
+    assert near[0]["geohash"] == encode_geohash(lat + 0.01, lon)
+
+    bbox = f"{lon - 0.1},{lat},{lon + 0.1},{lat + 0.1}"
+    assert [d["id"] for d in client.get("/devices/within", params={"bbox": bbox}).json()] == [close]
+
+    # Moving a device moves it in the index too.
+    client.put(f"/devices/{close}", json={"latitude": lat + 3}).raise_for_status()
+    assert client.get("/devices/within", params={"bbox": bbox}).json() == []
+
+    assert client.get("/devices/within", params={"bbox": "1,2,3"}).status_code == 400
+    assert client.get("/devices/within", params={"bbox": "0,50,1,40"}).status_code == 400
+
+
+def test_refresh_picks_up_devices_other_workers_wrote(client, device_factory):
+    other_worker = GridIndex()
+    db = SessionLocal()
+    try:
+        other_worker.load(db)
+        device = device_factory(latitude=-33.9, longitude=18.4)
+        assert device not in other_worker.within(-34, 18, -33, 19)
+        other_worker.refresh(db)
+    finally:
+        db.close()
+    assert device in other_worker.within(-34, 18, -33, 19)
@@ -0,0 +1,104 @@
+"""Timing wheel expiry and the heartbeat online/offline state machine across workers."""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.services.heartbeat import OFFLINE_ALERT_TYPE, HeartbeatTracker, TimingWheel
+
+TIMEOUT = 0.05
+
+
+def test_wheel_expires_only_past_deadlines():
+    wheel = TimingWheel(tick_seconds=1.0, size=8)
+    wheel.advance(100.0)
+    wheel.schedule("a", 102.0)
+    wheel.schedule("b", 103.5)
+    wheel.schedule("c", 102.0)
+    wheel.cancel("c")
+
+    assert wheel.advance(101.0) == []
+    assert wheel.advance(102.0) == ["a"]
+    # A deadline moved later is re-inserted instead of expiring.
+    wheel.schedule("b", 110.0)
+    assert wheel.advance(104.0) == []
+    assert wheel.advance(110.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_wheel_catches_up_after_a_stall():
+    wheel = TimingWheel(tick_seconds=1.0, size=4)
+    wheel.advance(0.0)
+    wheel.schedule("a", 2.0)
+    wheel.schedule("b", 50.0)
+    assert wheel.advance(20.0) == ["a"]
+    assert wheel.advance(60.0) == ["b"]
+
+
+def worker() -> HeartbeatTracker:
+    """A tracker as one API worker holds it, with a short timeout."""
+    return HeartbeatTracker(default_interval_seconds=TIMEOUT, grace_factor=1.0, tick_seconds=0.01)
+
+
+def cycle(tracker: HeartbeatTracker) -> None:
+    db = SessionLocal()
+    try:
+        tracker.run_once(db)
+    finally:
+        db.close()
+
+
+def go_silent(tracker: HeartbeatTracker, device_id: str) -> None:
+    tracker.beat(device_id, datetime.utcnow() - timedelta(seconds=1))
+    cycle(tracker)
+    time.sleep(TIMEOUT * 3)
+    cycle(tracker)
+
+
+def offline_alerts(client, device_id: str, is_resolved: bool) -> list:
+    params = {"device_id": device_id, "alert_type": OFFLINE_ALERT_TYPE, "is_resolved": is_resolved}
+    return client.get("/alerts", params=params).json()
+
+
+def test_silent_device_goes_offline_and_recovers_through_another_worker(client, device):
+    first, second = worker(), worker()
+    go_silent(first, device)
+    assert client.get(f"/devices/{device}").json()["status"] == "offline"
+    (alert,) = offline_alerts(client, device, is_resolved=False)
+
+    # The next reading reaches a worker that never saw the device go offline.
+    second.beat(device)
+    cycle(second)
+    assert client.get(f"/devices/{device}").json()["status"] == "active"
+    assert offline_alerts(client, device, is_resolved=False) == []
+    assert [a["id"] for a in offline_alerts(client, device, is_resolved=True)] == [alert["id"]]
+
+
+def test_device_reporting_through_another_worker_stays_online(client, device):
+    first, second = worker(), worker()
+    first.beat(device, datetime.utcnow() - timedelta(seconds=1))
+    cycle(first)
+    time.sleep(TIMEOUT * 3)
+    second.beat(device)
+    cycle(second)
+    cycle(first)
+    assert client.get(f"/devices/{device}").json()["status"] == "active"
+    assert offline_alerts(client, device, is_resolved=False) == []
+
+
+@pytest.mark.parametrize("change", [{"status": "maintenance"}, {"is_active": False}])
+def test_devices_not_active_are_neither_marked_nor_alerted(client, device, change):
+    client.put(f"/devices/{device}", json=change).raise_for_status()
+    before = client.get(f"/devices/{device}").json()["status"]
+    go_silent(worker(), device)
+    assert client.get(f"/devices/{device}").json()["status"] == before
+    assert offline_alerts(client, device, is_resolved=False) == []
+
+
+def test_beats_for_unknown_devices_are_dropped(client):
+    tracker = worker()
+    tracker.beat("no-such-device")
+    cycle(tracker)
+    assert tracker.last_seen("no-such-device") is None
@@ -0,0 +1,124 @@
+"""Compressed chunks, the hot window store, and ranges served from it around a sync."""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import SensorReading
+from app.services.chunk_codec import EncodedChunk
+from app.services.hot_store import HotWindowStore, run_hot_store_cycle
+from app.services.series_catalog import ReadingRow
+
+from .helpers import csv_file, hours_ago, reading
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def rows(device_id: str, start: datetime, count: int, step: int = 60) -> list:
+    return [
+        ReadingRow(i + 1, device_id, "temperature", float(i % 7), "C", start + timedelta(seconds=step * i), start)
+        for i in range(count)
+    ]
+
+
+def test_chunk_round_trip():
+    timestamps = np.cumsum(np.full(500, 60_000_000, dtype=np.int64)) + 1_700_000_000_000_000
+    values = np.sin(np.arange(500) / 10)
+    ids = np.arange(500, dtype=np.int64) * 3
+    created = timestamps + 250_000
+    chunk = EncodedChunk(timestamps, values, ids, created)
+    for decoded, original in zip(chunk.decode(), (timestamps, values, ids, created)):
+        assert np.array_equal(decoded, original)
+    assert (chunk.count, chunk.total) == (500, pytest.approx(values.sum()))
+    assert chunk.nbytes < sum(column.nbytes for column in (timestamps, values, ids, created)) / 2
+
+
+def test_store_answers_only_what_it_fully_holds(db):
+    store = HotWindowStore(window_hours=1, chunk_size=16)
+    points = rows("hot-a", hours_ago(0.5), 40)
+    store.add_many(points)
+    assert store.range("hot-a", "temperature", hours_ago(0.5)) is None
+
+    store.load(db)
+    store.add_many(points)
+    unit, (timestamps, values, ids, _) = store.range("hot-a", "temperature", hours_ago(0.5))
+    assert unit == "C" and ids.tolist() == [p.id for p in points]
+    assert store.latest("hot-a", "temperature").timestamp == points[-1].timestamp
+    total, count = store.average("hot-a", "temperature", points[10].timestamp)
+    assert (total, count) == (sum(p.value for p in points[10:]), 30)
+
+    # A late point lands inside a sealed chunk; a resent timestamp replaces its point.
+    late = points[3]._replace(id=99, value=50.0, timestamp=points[3].timestamp + timedelta(seconds=30))
+    store.add_many([late, points[5]._replace(value=-1.0)])
+    _, (_, values, ids, _) = store.range("hot-a", "temperature", points[0].timestamp, points[6].timestamp)
+    assert ids.tolist() == [1, 2, 3, 4, 99, 5, 6, 7]
+    assert values[ids == 6].tolist() == [-1.0]
+
+    # Older than the window, never held.
+    assert store.range("hot-a", "temperature", hours_ago(2)) is None
+
+
+def test_eviction_under_the_memory_cap_moves_coverage(db):
+    store = HotWindowStore(window_hours=6, chunk_size=64)
+    store.load(db)
+    # Room for a few chunks beyond what the other tests' readings take.
+    store.max_bytes = store.stats()["bytes"] + 4_000
+    points = rows("hot-b", hours_ago(5), 2000, step=7)
+    store.add_many(points)
+    store.trim()
+    assert store.stats()["bytes"] <= store.max_bytes
+    assert store.range("hot-b", "temperature", points[0].timestamp) is None
+    _, (timestamps, _, _, _) = store.range("hot-b", "temperature", points[-100].timestamp)
+    assert len(timestamps) == 100
+
+
+def test_sync_picks_up_rows_committed_out_of_id_order(client, device, db):
+    now = hours_ago(0)
+    created = client.post("/sensor-readings", json=reading(device, 1.0, now - timedelta(minutes=2))).json()
+    store = HotWindowStore()
+    store.load(db)
+    series_id = db.get(SensorReading, created["id"]).series_id
+    newest = db.execute(select(func.max(SensorReading.id))).scalar()
+
+    # The higher ID commits first; the lower one lands after the next sync.
+    db.add(SensorReading(id=newest + 2, series_id=series_id, value=3.0, timestamp=now))
+    db.commit()
+    store.sync(db)
+    db.add(SensorReading(id=newest + 1, series_id=series_id, value=2.0, timestamp=now - timedelta(minutes=1)))
+    db.commit()
+    store.sync(db)
+
+    _, (_, values, _, _) = store.range(device, "temperature", now - timedelta(minutes=5))
+    assert values.tolist() == [1.0, 2.0, 3.0]
+    assert store.latest(device, "temperature").timestamp == now
+
+
+def test_range_covers_imported_rows_around_a_hot_store_sync(client, device):
+    old = hours_ago(10)
+    imported = [reading(device, float(i), old - timedelta(seconds=i)) for i in range(2000)]
+    assert client.post("/sensor-readings/import", files={"file": csv_file(imported)}).json()["inserted"] == 2000
+    live = hours_ago(0)
+    assert client.post("/sensor-readings", json=reading(device, -1.0, live)).status_code == 201
+
+    params = {
+        "sensor_type": "temperature",
+        "start_time": hours_ago(11).isoformat(),
+        "end_time": (live + timedelta(minutes=1)).isoformat(),
+    }
+    # Before and after the store picks the imported rows up.
+    for sync in (False, True):
+        if sync:
+            run_hot_store_cycle()
+        readings = client.get(f"/sensor-readings/device/{device}/range", params=params).json()
+        assert len(readings) == 2001
+        assert readings[-1]["value"] == -1.0
@@ -0,0 +1,46 @@
+"""Readings resent on the same natural key, caught by the recent-key filter or the unique constraint."""
+
+from datetime import timedelta
+
+from app.services.ingest_dedup import RecentKeyFilter, recent_keys
+
+from .helpers import reading
+
+
+def test_recent_key_filter_is_bounded():
+    keys = RecentKeyFilter(per_device=2, max_devices=2)
+    keys.add_many([("a", 1), ("a", 2), ("a", 3), ("b", 1)])
+    assert not keys.seen("a", 1) and keys.seen("a", 2) and keys.seen("a", 3)
+
+    keys.add("c", 1)
+    assert not keys.seen("a", 2) and keys.seen("b", 1) and keys.seen("c", 1)
+    assert not RecentKeyFilter(per_device=0).enabled
+
+
+def test_single_reading_resent_returns_the_stored_one(client, device, now):
+    first = client.post("/sensor-readings", json=reading(device, 21.5, now))
+    assert first.status_code == 201
+
+    again = client.post("/sensor-readings", json=reading(device, 99.0, now))
+    assert again.status_code == 200
+    assert again.headers["X-Duplicate-Reading"] == "true"
+    assert (again.json()["id"], again.json()["value"]) == (first.json()["id"], 21.5)
+
+    # A worker that never saw the first request falls through to the unique constraint.
+    recent_keys.forget_device(device)
+    again = client.post("/sensor-readings", json=reading(device, 99.0, now))
+    assert again.status_code == 200 and again.json()["id"] == first.json()["id"]
+
+
+def test_batch_counts_duplicates_within_and_across_requests(client, device, now):
+    readings = [reading(device, float(i), now - timedelta(seconds=i)) for i in range(5)]
+    response = client.post("/sensor-readings/batch", json={"readings": readings + readings[:2]})
+    assert response.json() == {"received": 7, "inserted": 5, "duplicates": 2}
+
+    recent_keys.forget_device(device)
+    late = reading(device, 9.0, now + timedelta(seconds=1))
+    response = client.post("/sensor-readings/batch", json={"readings": readings[3:] + [late]})
+    assert response.json() == {"received": 3, "inserted": 1, "duplicates": 2}
+
+    listed = client.get("/sensor-readings", params={"device_id": device, "limit": 100}).json()
+    assert [r["value"] for r in listed] == [9.0, 0.0, 1.0, 2.0, 3.0, 4.0]
@@ -0,0 +1,57 @@
+"""Bulk import of CSV and Parquet files: duplicates, rejects and formats."""
+
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from .helpers import csv_file, hours_ago, reading
+
+
+def stored(client, device_id: str) -> list:
+    response = client.get("/sensor-readings/export", params={"device_id": device_id})
+    return [json.loads(row) for row in response.text.splitlines() if row]
+
+
+def test_import_twice_inserts_once(client, device):
+    rows = [reading(device, float(i), hours_ago(1) - timedelta(minutes=i)) for i in range(50)]
+    first = client.post("/sensor-readings/import", files={"file": csv_file(rows)})
+    assert first.status_code == 200
+    assert (first.json()["inserted"], first.json()["duplicates"], first.json()["rejected"]) == (50, 0, 0)
+
+    second = client.post("/sensor-readings/import", files={"file": csv_file(rows)})
+    assert (second.json()["inserted"], second.json()["duplicates"]) == (0, 50)
+    assert len(stored(client, device)) == 50
+
+
+def test_invalid_rows_are_rejected_with_their_row_number(client, device):
+    rows = [reading(device, float(i), hours_ago(1) - timedelta(minutes=i)) for i in range(4)]
+    rows[1] = dict(rows[1], value="warm")
+    rows[2] = dict(rows[2], device_id="no-such-device")
+    response = client.post("/sensor-readings/import", files={"file": csv_file(rows)}).json()
+    assert (response["rows"], response["inserted"], response["rejected"]) == (4, 2, 2)
+    assert [reject["row"] for reject in response["rejects"]] == [2, 3]
+    assert len(stored(client, device)) == 2
+
+
+def test_missing_column_is_refused(client):
+    content = b"device_id,sensor_type,value,unit\nd,temperature,1.0,C\n"
+    response = client.post("/sensor-readings/import", files={"file": ("readings.csv", content, "text/csv")})
+    assert response.status_code == 400
+
+
+def test_parquet_import(client, device):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    rows = [reading(device, float(i), hours_ago(1) - timedelta(minutes=i)) for i in range(20)]
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    columns["timestamp"] = [datetime.fromisoformat(timestamp) for timestamp in columns["timestamp"]]
+    table = pa.table(columns)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    files = {"file": ("readings.parquet", buffer.getvalue(), "application/octet-stream")}
+    response = client.post("/sensor-readings/import", files=files)
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 20
+    assert sorted(r["value"] for r in stored(client, device)) == [float(i) for i in range(20)]
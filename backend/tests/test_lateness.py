@@ -0,0 +1,43 @@
+"""Lateness counters per worker and watermarks from the newest stored reading."""
+
+from datetime import datetime, timedelta
+
+from app.services.lateness import LatenessTracker
+
+from .helpers import csv_file, hours_ago, reading
+
+
+def test_tracker_counts_reordered_and_late_readings():
+    tracker = LatenessTracker(lateness_seconds=60)
+    base = datetime(2026, 1, 1, 12)
+    assert tracker.add("d", "temperature", base)
+    assert tracker.add("d", "temperature", base + timedelta(seconds=90))
+    assert tracker.add("d", "temperature", base + timedelta(seconds=45))
+    assert not tracker.add("d", "temperature", base)
+    assert tracker.add("d", "humidity", base)
+    assert tracker.stats() == {"series": 2, "reordered": 1, "late": 1}
+
+    tracker.forget_device("d")
+    assert tracker.stats() == {"series": 0, "reordered": 0, "late": 0}
+
+
+def test_watermark_follows_the_newest_stored_reading(client, device):
+    newest = hours_ago(1)
+    for offset in (0, 30, 600):
+        body = reading(device, 1.0, newest - timedelta(seconds=offset))
+        assert client.post("/sensor-readings", json=body).status_code == 201
+    (series,) = client.get(f"/sensor-readings/device/{device}/watermark").json()
+    assert series["sensor_type"] == "temperature"
+    assert datetime.fromisoformat(series["max_event_time"]) == newest
+    assert datetime.fromisoformat(series["watermark"]) == newest - timedelta(seconds=60)
+    assert (series["reordered"], series["late"]) == (1, 1)
+
+    # Imports bypass the tracker, but whatever stored the reading, the watermark moves.
+    later = newest + timedelta(minutes=5)
+    client.post("/sensor-readings/import", files={"file": csv_file([reading(device, 2.0, later)])})
+    (series,) = client.get(f"/sensor-readings/device/{device}/watermark").json()
+    assert datetime.fromisoformat(series["max_event_time"]) == later
+
+
+def test_device_without_readings_has_no_watermarks(client, device):
+    assert client.get(f"/sensor-readings/device/{device}/watermark").json() == []
@@ -0,0 +1,84 @@
+"""Line gateway writes and their idempotency alongside the HTTP ingest paths."""
+
+import calendar
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.line_gateway import LineGateway
+
+from .helpers import csv_file, hours_ago, reading
+
+
+def line(
+    device_id: str, value: float, timestamp: datetime, sensor_type: str = "temperature", unit: str = "C"
+) -> bytes:
+    """One reading in line protocol, timestamped in epoch milliseconds."""
+    millis = calendar.timegm(timestamp.timetuple()) * 1000
+    return f"{device_id},sensor_type={sensor_type},unit={unit} value={value} {millis}\n".encode()
+
+
+def stored(client, device_id: str) -> dict:
+    """Every reading of a device as ``{(sensor_type, unit, timestamp): value}``."""
+    response = client.get("/sensor-readings/export", params={"device_id": device_id})
+    assert response.status_code == 200
+    rows = [json.loads(row) for row in response.text.splitlines() if row]
+    keys = [(row["sensor_type"], row["unit"], datetime.fromisoformat(row["timestamp"])) for row in rows]
+    assert len(set(keys)) == len(keys), "a reading was stored twice"
+    return {key: row["value"] for key, row in zip(keys, rows)}
+
+
+def test_line_gateway_write_twice_inserts_once(client, device, now):
+    data = b"".join(line(device, float(i), now - timedelta(seconds=i)) for i in range(10))
+    data += b"# a comment\nnot a line\n"
+    gateway = LineGateway()
+
+    first = gateway.write(data)
+    assert (first["lines"], first["inserted"], first["duplicates"], first["malformed"]) == (10, 10, 0, 1)
+    second = gateway.write(data)
+    assert (second["inserted"], second["duplicates"]) == (0, 10)
+    assert len(stored(client, device)) == 10
+
+
+def test_unknown_device_is_rejected(client, now):
+    report = LineGateway().write(line("no-such-device", 1.0, now))
+    assert (report["inserted"], report["rejected"]) == (0, 1)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_mixed_paths_keep_the_first_value_of_each_key(client, device_factory, seed):
+    rng = random.Random(seed)
+    devices = [device_factory(), device_factory()]
+    base = hours_ago(2)
+    keys = [
+        (device_id, sensor_type, unit, base + timedelta(seconds=second))
+        for device_id in devices
+        for sensor_type, unit in (("temperature", "C"), ("temperature", "F"), ("humidity", "%"))
+        for second in range(6)
+    ]
+    expected = {}
+    gateway = LineGateway()
+
+    for step in range(40):
+        chosen = rng.sample(keys, rng.randint(1, 8))
+        values = {key: float(step * 100 + i) for i, key in enumerate(chosen)}
+        bodies = [reading(d, values[(d, s, u, t)], t, s, u) for d, s, u, t in chosen]
+        path = rng.choice(["single", "batch", "import", "line"])
+        if path == "single":
+            chosen, bodies = chosen[:1], bodies[:1]
+            response = client.post("/sensor-readings", json=bodies[0])
+            assert response.status_code == (200 if chosen[0] in expected else 201)
+        elif path == "batch":
+            client.post("/sensor-readings/batch", json={"readings": bodies}).raise_for_status()
+        elif path == "import":
+            client.post("/sensor-readings/import", files={"file": csv_file(bodies)}).raise_for_status()
+        else:
+            gateway.write(b"".join(line(d, values[(d, s, u, t)], t, s, u) for d, s, u, t in chosen))
+        for key in chosen:
+            expected.setdefault(key, values[key])
+
+    for device_id in devices:
+        want = {(s, u, t): value for (d, s, u, t), value in expected.items() if d == device_id}
+        assert stored(client, device_id) == want
@@ -0,0 +1,137 @@
+"""parse_lines against a line-by-line reference parser."""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from app.services.line_protocol import parse_lines
+
+RECEIVED_MS = 1_700_000_000_000
+
+
+def reference_parse(data: bytes, received_ms: int):
+    """Readings as ``(device_id, sensor_type, unit, value, epoch ms)`` and the numbers of malformed lines."""
+    readings, errors = [], []
+    for number, raw in enumerate(data.split(b"\n")[:-1], 1):
+        line = raw.decode().removesuffix("\r")
+        if not line.strip() or line.strip().startswith("#"):
+            continue
+        parts = line.split(" ")
+        if len(parts) not in (2, 3) or not parts[1].startswith("value=") or len(parts[1]) == len("value="):
+            errors.append(number)
+            continue
+        device_id, _, tag_text = parts[0].partition(",")
+        tags = dict(tag.partition("=")[::2] for tag in tag_text.split(",")) if tag_text else {}
+        if not device_id or "=" in device_id or set(tags) != {"sensor_type", "unit"} or tag_text.count(",") != 1:
+            errors.append(number)
+            continue
+        try:
+            value = float(parts[1][len("value="):])
+        except ValueError:
+            value = math.nan
+        millis = received_ms
+        if len(parts) == 3:
+            if not parts[2]:
+                errors.append(number)
+                continue
+            try:
+                millis = int(parts[2])
+            except ValueError:
+                millis = None
+        readings.append((device_id, tags["sensor_type"], tags["unit"], value, millis))
+    return readings, errors
+
+
+def flatten(parsed):
+    """Parsed lines in the reference's shape; NaT timestamps become None."""
+    millis = parsed.timestamps.astype("datetime64[ms]")
+    rows = []
+    for i, key_index in enumerate(parsed.inverse.tolist()):
+        stamp = None if np.isnat(millis[i]) else int(millis[i].astype(np.int64))
+        rows.append((*parsed.keys[key_index], float(parsed.values[i]), stamp))
+    return rows
+
+
+def same(rows, expected):
+    assert len(rows) == len(expected)
+    for row, want in zip(rows, expected):
+        assert row[:3] == want[:3]
+        assert (math.isnan(row[3]) and math.isnan(want[3])) or row[3] == want[3]
+        assert row[4] == want[4]
+
+
+def random_line(rng: random.Random) -> str:
+    device_id = f"dev-{rng.randrange(20)}"
+    tags = [f"sensor_type={rng.choice(['temperature', 'humidity', 'co2'])}", f"unit={rng.choice(['C', '%', 'ppm'])}"]
+    rng.shuffle(tags)
+    value = rng.choice([str(rng.uniform(-100, 100)), str(rng.randrange(-50, 50)), "1e3", "-0.5"])
+    line = f"{device_id},{','.join(tags)} value={value}"
+    if rng.random() < 0.7:
+        line += f" {rng.randrange(1_600_000_000_000, 1_800_000_000_000)}"
+    return line
+
+
+MALFORMED = [
+    "dev-1,sensor_type=t,unit=C",
+    "dev-1,sensor_type=t,unit=C temp=1",
+    "dev-1,sensor_type=t,unit=C value=1 2 3",
+    "dev-1,sensor_type=t value=1",
+    "dev-1,sensor_type=t,unit=C,extra=x value=1",
+    ",sensor_type=t,unit=C value=1",
+    "dev=1,sensor_type=t,unit=C value=1",
+    "dev-1,sensor_type=t,unit=C value=",
+    "dev-1,sensor_type=t,unit=C  value=1",
+]
+SKIPPED = ["", "# a comment", "#dev-1,sensor_type=t,unit=C value=1"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_reference_on_random_blocks(seed):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(2000):
+        roll = rng.random()
+        if roll < 0.05:
+            lines.append(rng.choice(MALFORMED))
+        elif roll < 0.08:
+            lines.append(rng.choice(SKIPPED))
+        else:
+            lines.append(random_line(rng))
+    data = "".join(line + ("\r\n" if rng.random() < 0.1 else "\n") for line in lines).encode()
+
+    parsed = parse_lines(data, received_ms=RECEIVED_MS)
+    readings, errors = reference_parse(data, RECEIVED_MS)
+
+    same(flatten(parsed), readings)
+    assert [number for number, _, _ in parsed.errors] == errors
+    assert len(parsed.keys) == len(set(parsed.keys))
+
+
+def test_lines_without_timestamp_use_receive_time():
+    parsed = parse_lines(b"d1,sensor_type=t,unit=C value=1.5\n", received_ms=RECEIVED_MS)
+    assert flatten(parsed) == [("d1", "t", "C", 1.5, RECEIVED_MS)]
+
+
+def test_tag_order_does_not_split_series():
+    data = b"d1,sensor_type=t,unit=C value=1 1000\nd1,unit=C,sensor_type=t value=2 2000\n"
+    parsed = parse_lines(data)
+    assert parsed.keys == [("d1", "t", "C")]
+    assert parsed.inverse.tolist() == [0, 0]
+
+
+def test_unparseable_numbers_are_left_for_the_loader():
+    data = b"d1,sensor_type=t,unit=C value=abc 1000\nd1,sensor_type=t,unit=C value=1 soon\n"
+    same(flatten(parse_lines(data)), [("d1", "t", "C", math.nan, 1000), ("d1", "t", "C", 1.0, None)])
+
+
+def test_out_of_range_timestamps_are_nat():
+    data = b"d1,sensor_type=t,unit=C value=1 -5\nd1,sensor_type=t,unit=C value=1 999999999999999\n"
+    assert [row[4] for row in flatten(parse_lines(data))] == [None, None]
+
+
+def test_empty_and_unterminated_input():
+    assert parse_lines(b"").keys == []
+    # A line is only complete once its newline arrives.
+    assert parse_lines(b"d1,sensor_type=t,unit=C value=1").keys == []
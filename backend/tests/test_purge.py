@@ -0,0 +1,78 @@
+"""Device deletes, inline and through the purge job, and their propagation to other workers."""
+
+from datetime import timedelta
+
+from app.database import SessionLocal
+from app.services import purge_service
+from app.services.alert_index import alert_index
+from app.services.change_feed_service import run_change_feed_sequencer
+from app.services.purge_service import DeviceChangeFollower, run_purge_cycle
+
+from .helpers import reading
+
+
+def alert(device_id: str) -> dict:
+    return {"device_id": device_id, "alert_type": "High Temperature", "severity": "LOW", "message": "Too hot"}
+
+
+def gone(client, device_id: str, end) -> bool:
+    params = {
+        "sensor_type": "temperature",
+        "start_time": (end - timedelta(days=2)).isoformat(),
+        "end_time": end.isoformat(),
+    }
+    return (
+        client.get(f"/devices/{device_id}").status_code == 404
+        and client.get("/sensor-readings", params={"device_id": device_id}).json() == []
+        and client.get(f"/sensor-readings/device/{device_id}/range", params=params).json() == []
+        and client.get("/alerts", params={"device_id": device_id}).json() == []
+    )
+
+
+def test_small_device_is_deleted_within_the_request(client, day):
+    device, end, rows = day
+    client.post("/alerts", json=alert(device)).raise_for_status()
+
+    job = client.delete(f"/devices/{device}")
+    assert job.status_code == 202
+    body = job.json()
+    assert (body["status"], body["readings_deleted"], body["alerts_deleted"]) == ("completed", 144, 1)
+    assert client.get(f"/devices/purge-jobs/{body['id']}").json()["status"] == "completed"
+    assert gone(client, device, end)
+    assert client.delete(f"/devices/{device}").status_code == 404
+
+
+def test_large_device_is_left_to_the_purge_cycle(client, day, monkeypatch):
+    device, end, rows = day
+    monkeypatch.setattr(purge_service.settings, "purge_inline_max_readings", 100)
+    monkeypatch.setattr(purge_service.settings, "purge_batch_size", 50)
+
+    job = client.delete(f"/devices/{device}").json()
+    assert job["status"] == "pending"
+    assert client.delete(f"/devices/{device}").json()["id"] == job["id"]
+    # Inactive until the job has run.
+    response = client.post("/sensor-readings", json=reading(device, 1.0, end + timedelta(minutes=1)))
+    assert response.status_code == 409
+
+    run_purge_cycle()
+    done = client.get(f"/devices/purge-jobs/{job['id']}").json()
+    assert (done["status"], done["readings_deleted"]) == ("completed", 144)
+    assert gone(client, device, end)
+
+
+def test_other_workers_drop_deleted_devices(client, device, now):
+    client.post("/sensor-readings", json=reading(device, 1.0, now)).raise_for_status()
+    follower = DeviceChangeFollower()
+    db = SessionLocal()
+    try:
+        run_change_feed_sequencer()
+        follower.start(db)
+        client.delete(f"/devices/{device}").raise_for_status()
+        # As seen by a worker that still holds an open alert of the device.
+        alert_index.add_alert(device, "High Temperature", "an-alert-id")
+        run_change_feed_sequencer()
+        assert follower.run(db) == 1
+    finally:
+        db.close()
+    assert alert_index.get_alert(device, "High Temperature") is None
+    assert client.get("/devices/purge-jobs/no-such-job").status_code == 404
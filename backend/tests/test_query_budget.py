@@ -0,0 +1,99 @@
+"""Statement time budgets, cancellation and the scan budget of range and average reads."""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.query_budget import QueryCancelled, QueryTimeout, attach
+from app.services.sketch_service import run_sketch_cycle
+
+from .helpers import csv_file, hours_ago, reading
+
+settings = get_settings()
+
+# Counts far enough for SQLite to call the progress handler many times.
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000000) SELECT count(*) FROM n"
+)
+
+
+@pytest.fixture
+def old(client, device):
+    """A device with 200 readings a minute apart, older than the hot window. Returns the device and rows."""
+    start = hours_ago(settings.hot_store_window_hours + 24)
+    rows = [reading(device, float(i % 7), start + timedelta(minutes=i)) for i in range(200)]
+    response = client.post("/sensor-readings/import", files={"file": csv_file(rows)})
+    assert response.json()["inserted"] == 200
+    return device, rows
+
+
+def test_statement_past_its_budget_times_out():
+    db = SessionLocal()
+    try:
+        attach(db, 0.01)
+        with pytest.raises(QueryTimeout):
+            db.execute(SLOW_QUERY)
+    finally:
+        db.close()
+
+
+def test_cancelled_budget_stops_later_statements():
+    db = SessionLocal()
+    try:
+        budget = attach(db, 0)
+        budget.cancel()
+        with pytest.raises(QueryCancelled):
+            db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+
+def test_range_over_scan_budget_is_refused_with_422(client, old, monkeypatch):
+    device, rows = old
+    monkeypatch.setattr(settings, "query_max_scan_rows", 50)
+    params = {"sensor_type": "temperature", "start_time": rows[0]["timestamp"], "end_time": rows[-1]["timestamp"]}
+    response = client.get(f"/sensor-readings/device/{device}/range", params=params)
+    assert response.status_code == 422
+    assert "narrow the window" in response.json()["detail"]
+
+    # Streams are bounded by time, not rows.
+    streamed = client.get(
+        f"/sensor-readings/device/{device}/range", params=params, headers={"Accept": "application/x-ndjson"}
+    )
+    assert streamed.status_code == 200
+    assert len(streamed.text.splitlines()) == len(rows)
+
+    narrow = dict(params, end_time=rows[40]["timestamp"])
+    assert len(client.get(f"/sensor-readings/device/{device}/range", params=narrow).json()) == 41
+
+
+def test_average_over_scan_budget_is_answered_from_sketches(client, old, monkeypatch):
+    device, rows = old
+    params = {"sensor_type": "temperature", "hours": int(settings.hot_store_window_hours) + 48}
+    expected = sum(r["value"] for r in rows) / len(rows)
+    assert client.get(f"/sensor-readings/device/{device}/average", params=params).json()["average"] == (
+        pytest.approx(expected)
+    )
+
+    monkeypatch.setattr(settings, "query_max_scan_rows", 50)
+    run_sketch_cycle()
+    response = client.get(f"/sensor-readings/device/{device}/average", params=params)
+    assert response.json()["average"] == pytest.approx(expected)
+
+    monkeypatch.setattr(settings, "sketch_enabled", False)
+    response = client.get(f"/sensor-readings/device/{device}/average", params=params)
+    assert response.status_code == 422
+    assert "use fewer hours" in response.json()["detail"]
+
+
+def test_export_runs_under_its_route_time_budget(client, old, monkeypatch):
+    device, rows = old
+    timeouts = dict(settings.query_route_timeouts, **{"/sensor-readings/export": 1e-9})
+    monkeypatch.setattr(settings, "query_route_timeouts", timeouts)
+    # The body has started, so the timeout surfaces as a broken stream rather than a 504.
+    with pytest.raises(RuntimeError) as raised:
+        client.get("/sensor-readings/export", params={"device_id": device})
+    assert isinstance(raised.value.__cause__, QueryTimeout)
@@ -0,0 +1,72 @@
+"""Closed chunks of historical ranges, reused, spilled and invalidated by late writes."""
+
+from datetime import timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.services.range_cache import RangeCache
+
+from .helpers import csv_file, hours_ago, reading
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def test_closed_chunks_are_read_once(day, db, tmp_path, monkeypatch):
+    device, end, rows = day
+    start_time, end_time = end - timedelta(hours=20), end - timedelta(hours=10)
+    window = (start_time.isoformat(), end_time.isoformat())
+    expected = sorted(r["timestamp"] for r in rows if window[0] <= r["timestamp"] <= window[1])
+
+    # Room for a couple of chunks in memory; the rest spill to disk.
+    cache = RangeCache(max_bytes=600, spill_dir=str(tmp_path))
+    queries = []
+    query = cache._query
+    monkeypatch.setattr(cache, "_query", lambda *args: queries.append(args) or query(*args))
+
+    first = cache.read(db, device, "temperature", start_time, end_time)
+    assert [r.timestamp.isoformat() for r in first] == expected
+    assert len(queries) == 1
+    assert cache.stats()["spilled_chunks"] > 0
+
+    again = cache.read(db, device, "temperature", start_time, end_time)
+    assert again == first and len(queries) == 1
+
+    # Ranges reaching into the open chunk read the new closed chunks once, and that chunk every time.
+    cache.read(db, device, "temperature", start_time, end)
+    assert len(queries) == 3
+    cache.read(db, device, "temperature", start_time, end)
+    assert len(queries) == 4
+
+
+def test_late_writes_invalidate_their_chunks(client, device):
+    # Older than the hot window, so ranges go through the cache.
+    base = hours_ago(72).replace(minute=0, second=0)
+    rows = [reading(device, float(i), base + timedelta(minutes=10 * i)) for i in range(36)]
+    client.post("/sensor-readings/batch", json={"readings": rows}).raise_for_status()
+    params = {
+        "sensor_type": "temperature",
+        "start_time": base.isoformat(),
+        "end_time": (base + timedelta(hours=6)).isoformat(),
+    }
+
+    def values() -> list:
+        response = client.get(f"/sensor-readings/device/{device}/range", params=params)
+        assert response.status_code == 200, response.text
+        return [r["value"] for r in response.json()]
+
+    assert values() == [float(i) for i in range(36)]
+    late = reading(device, -1.0, base + timedelta(hours=2, minutes=5))
+    assert client.post("/sensor-readings", json=late).status_code == 201
+    assert values().count(-1.0) == 1
+
+    imported = reading(device, -2.0, base + timedelta(hours=4, minutes=5))
+    client.post("/sensor-readings/import", files={"file": csv_file([imported])}).raise_for_status()
+    assert sorted(values())[:2] == [-2.0, -1.0]
@@ -0,0 +1,95 @@
+"""Moves of devices' readings between shards, and writes refused for devices no shard knows."""
+
+import json
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import SensorReading, Series
+from app.services import shard_rebalance
+from app.services.shard_map import PRIMARY, shard_map
+from app.services.shard_rebalance import Move, ShardRebalancer
+
+from .helpers import reading
+
+TARGET = "second"
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def count_on(db, name: str, device_id: str) -> int:
+    with shard_map.shards[name].session(db) as shard_db:
+        return shard_db.execute(
+            select(func.count(SensorReading.id))
+            .join(Series, Series.id == SensorReading.series_id)
+            .where(Series.device_id == device_id)
+        ).scalar()
+
+
+def exported(client, device_id: str) -> list:
+    response = client.get("/sensor-readings/export", params={"device_id": device_id})
+    return [json.loads(row) for row in response.text.splitlines() if row]
+
+
+def test_move_copies_then_deletes_every_reading(client, day, db):
+    device, end, rows = day
+    before = exported(client, device)
+
+    report = ShardRebalancer(grace_seconds=0, batch_size=50).run(db, [Move(device, PRIMARY, TARGET)])
+    assert report == {"devices": 1, "copied": 144, "deleted": 144}
+    assert client.get(f"/devices/{device}").json()["shard"] == TARGET
+    assert count_on(db, PRIMARY, device) == 0
+    assert db.execute(select(Series.id).where(Series.device_id == device)).first() is None
+    assert [(r["timestamp"], r["value"]) for r in exported(client, device)] == [
+        (r["timestamp"], r["value"]) for r in before
+    ]
+
+    # Writes now land on the target.
+    response = client.post("/sensor-readings", json=reading(device, 1.0, end + timedelta(minutes=1)))
+    assert response.status_code == 201
+    assert count_on(db, TARGET, device) == 145
+
+
+def test_reading_committed_out_of_id_order_is_moved_not_deleted(client, day, db, monkeypatch):
+    device, end, rows = day
+    # Free the lowest ID of the device, so a late commit can take it during the grace period.
+    with shard_map.shards[PRIMARY].session(db) as source_db:
+        lowest = source_db.execute(
+            select(func.min(SensorReading.id))
+            .join(Series, Series.id == SensorReading.series_id)
+            .where(Series.device_id == device)
+        ).scalar()
+        late = source_db.get(SensorReading, lowest)
+        series_id = late.series_id
+        source_db.delete(late)
+        source_db.commit()
+    late_at = end + timedelta(minutes=3)
+
+    def late_commit(seconds):
+        session = SessionLocal()
+        try:
+            session.add(SensorReading(id=lowest, series_id=series_id, value=-1.0, timestamp=late_at))
+            session.commit()
+        finally:
+            session.close()
+
+    monkeypatch.setattr(shard_rebalance.time, "sleep", late_commit)
+    report = ShardRebalancer(grace_seconds=0, batch_size=50).run(db, [Move(device, PRIMARY, TARGET)])
+    assert report == {"devices": 1, "copied": 144, "deleted": 144}
+    assert count_on(db, PRIMARY, device) == 0
+    assert (late_at.isoformat(), -1.0) in {(r["timestamp"], r["value"]) for r in exported(client, device)}
+
+
+def test_unknown_device_is_refused(client, now):
+    assert client.post("/sensor-readings", json=reading("no-such-device", 1.0, now)).status_code == 404
+    response = client.post("/sensor-readings/batch", json={"readings": [reading("no-such-device", 1.0, now)]})
+    assert response.status_code == 404
@@ -0,0 +1,70 @@
+"""align_series gap filling, and several series resampled onto one grid through the API."""
+
+from datetime import timedelta
+
+import numpy as np
+
+from app.services.resample_service import align_series
+
+
+def grid(fill: str):
+    # Row 0: samples in cells 1 and 3 (two samples averaged in 3); row 1: no samples.
+    series_idx = np.array([0, 0, 0])
+    epoch_s = np.array([15.0, 31.0, 39.0])
+    values = np.array([2.0, 4.0, 8.0])
+    return align_series(series_idx, epoch_s, values, 2, 0.0, 10.0, 5, fill)
+
+
+def test_align_series_fills_gaps():
+    matrix, observed = grid("none")
+    assert observed.tolist() == [[False, True, False, True, False], [False] * 5]
+    assert np.isnan(matrix[0, [0, 2, 4]]).all() and matrix[0, [1, 3]].tolist() == [2.0, 6.0]
+    assert np.isnan(matrix[1]).all()
+
+    matrix, _ = grid("ffill")
+    assert np.isnan(matrix[0, 0]) and matrix[0, 1:].tolist() == [2.0, 2.0, 6.0, 6.0]
+
+    matrix, _ = grid("linear")
+    assert np.isnan(matrix[0, [0, 4]]).all() and matrix[0, 1:4].tolist() == [2.0, 4.0, 6.0]
+    assert np.isnan(matrix[1]).all()
+
+
+def test_resample(client, day, device_factory):
+    device, end, rows = day
+    empty = device_factory()
+    start = end - timedelta(hours=1)
+    response = client.post(
+        "/sensor-readings/resample",
+        json={
+            "series": [
+                {"device_id": device, "sensor_type": "temperature"},
+                {"device_id": empty, "sensor_type": "temperature"},
+            ],
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat(),
+            "step_seconds": 600,
+            "fill": "none",
+        },
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert len(body["timestamps"]) == 7
+    column, missing = body["series"]
+    by_time = {r["timestamp"]: r["value"] for r in rows}
+    expected = [by_time[(start + timedelta(minutes=10 * i)).isoformat()] for i in range(7)]
+    assert column["values"] == expected
+    assert all(column["observed"])
+    assert missing["values"] == [None] * 7 and not any(missing["observed"])
+
+
+def test_resample_refuses_oversized_grids(client, device, now):
+    response = client.post(
+        "/sensor-readings/resample",
+        json={
+            "series": [{"device_id": device, "sensor_type": "temperature"}],
+            "start_time": (now - timedelta(days=365)).isoformat(),
+            "end_time": now.isoformat(),
+            "step_seconds": 1,
+        },
+    )
+    assert response.status_code == 400
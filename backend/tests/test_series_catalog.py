@@ -0,0 +1,68 @@
+"""The series catalog, and readings read back through their series."""
+
+import pytest
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Series
+from app.services.series_catalog import SeriesCatalog
+
+from .helpers import reading
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def test_catalog_caches_series_once_committed(db, device):
+    catalog = SeriesCatalog()
+    key = (device, "humidity", "%")
+    catalog.resolve(db, *key)
+    db.rollback()
+    assert len(catalog) == 0
+    assert db.execute(select(Series.id).where(Series.device_id == device)).first() is None
+
+    series_id = catalog.resolve(db, *key)
+    assert len(catalog) == 0
+    db.commit()
+    assert len(catalog) == 1 and catalog.key_of(series_id) == key
+
+    # Another worker resolving the same key finds the committed row.
+    assert SeriesCatalog().resolve_many(db, [key, (device, "humidity", "g/m3")])[key] == series_id
+    db.commit()
+
+    catalog.forget_device(device)
+    assert len(catalog) == 0
+
+
+def test_list_get_and_latest(client, day):
+    device, end, rows = day
+    listed = client.get("/sensor-readings", params={"device_id": device, "limit": 10}).json()
+    assert [r["timestamp"] for r in listed] == [r["timestamp"] for r in rows[:10]]
+    assert {(r["sensor_type"], r["unit"]) for r in listed} == {("temperature", "C")}
+
+    one = client.get(f"/sensor-readings/{listed[0]['id']}").json()
+    assert (one["device_id"], one["value"]) == (device, rows[0]["value"])
+    assert client.get("/sensor-readings/999999999").status_code == 404
+
+    latest = client.get(f"/sensor-readings/device/{device}/latest", params={"sensor_type": "temperature"})
+    assert latest.json()["timestamp"] == rows[0]["timestamp"]
+    missing = client.get(f"/sensor-readings/device/{device}/latest", params={"sensor_type": "pressure"})
+    assert missing.status_code == 404
+
+
+def test_other_unit_at_the_same_timestamp_is_a_new_reading(client, device, now):
+    celsius = client.post("/sensor-readings", json=reading(device, 20.0, now))
+    fahrenheit = client.post("/sensor-readings", json=reading(device, 68.0, now, unit="F"))
+    assert celsius.status_code == fahrenheit.status_code == 201
+    assert celsius.json()["id"] != fahrenheit.json()["id"]
+
+    again = client.post("/sensor-readings", json=reading(device, 70.0, now, unit="F"))
+    assert again.status_code == 200 and again.json()["id"] == fahrenheit.json()["id"]
+    listed = client.get("/sensor-readings", params={"device_id": device}).json()
+    assert sorted((r["unit"], r["value"]) for r in listed) == [("C", 20.0), ("F", 68.0)]
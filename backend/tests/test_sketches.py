@@ -0,0 +1,102 @@
+"""Percentiles from the sketches, and the dirty buckets every ingest path marks for the builder."""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Series, SketchDirtyBucket
+from app.services.sketch_service import run_sketch_cycle
+
+from .helpers import csv_file, hours_ago, reading
+
+
+def dirty_buckets(device_id: str) -> set:
+    db = SessionLocal()
+    try:
+        return set(
+            db.execute(
+                select(SketchDirtyBucket.bucket_start)
+                .join(Series, Series.id == SketchDirtyBucket.series_id)
+                .where(Series.device_id == device_id)
+            ).scalars()
+        )
+    finally:
+        db.close()
+
+
+def percentiles(client, device_id: str, start, end) -> dict:
+    params = {
+        "sensor_type": "temperature",
+        "device_id": device_id,
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat(),
+        "q": [0.0, 0.5, 1.0],
+    }
+    response = client.get("/analytics/percentiles", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_percentiles_across_a_location(client, device_factory):
+    location = f"Test site {device_factory()}"
+    devices = [device_factory(location=location) for _ in range(3)]
+    values = []
+    for n, device in enumerate(devices):
+        rows = [reading(device, float(n * 100 + i), hours_ago(0.5) - timedelta(seconds=i)) for i in range(100)]
+        client.post("/sensor-readings/batch", json={"readings": rows}).raise_for_status()
+        values += [r["value"] for r in rows]
+
+    response = client.get(
+        "/analytics/percentiles",
+        params={"sensor_type": "temperature", "location": location, "window": "2h", "q": [0.0, 0.5, 1.0]},
+    )
+    result = response.json()
+    assert result["count"] == 300
+    assert (result["min"], result["max"]) == (min(values), max(values))
+    median = next(p["value"] for p in result["percentiles"] if p["quantile"] == 0.5)
+    assert median == pytest.approx(sorted(values)[150], rel=0.02)
+
+
+@pytest.mark.parametrize("path", ["single", "batch", "import"])
+def test_every_ingest_path_marks_its_buckets(client, device, path):
+    base = hours_ago(6).replace(minute=0, second=0)
+    rows = [reading(device, float(i), base + timedelta(minutes=25 * i)) for i in range(6)]
+    if path == "single":
+        for row in rows:
+            assert client.post("/sensor-readings", json=row).status_code == 201
+    elif path == "batch":
+        client.post("/sensor-readings/batch", json={"readings": rows}).raise_for_status()
+    else:
+        client.post("/sensor-readings/import", files={"file": csv_file(rows)}).raise_for_status()
+    assert dirty_buckets(device) == {base + timedelta(hours=h) for h in range(3)}
+
+    run_sketch_cycle()
+    assert dirty_buckets(device) == set()
+
+
+def test_only_marked_buckets_are_read_row_by_row(client, device):
+    start = hours_ago(6).replace(minute=0, second=0)
+    # Three full hourly buckets and no partial edge.
+    end = start + timedelta(hours=3) - timedelta(microseconds=1)
+    rows = [reading(device, float(i), start + timedelta(minutes=6 * i)) for i in range(30)]
+    client.post("/sensor-readings/batch", json={"readings": rows}).raise_for_status()
+
+    before = percentiles(client, device, start, end)
+    assert (before["count"], before["sketch_buckets"], before["raw_readings"]) == (30, 0, 30)
+
+    run_sketch_cycle()
+    built = percentiles(client, device, start, end)
+    assert (built["count"], built["sketch_buckets"], built["raw_readings"]) == (30, 3, 0)
+
+    late = reading(device, 100.0, start + timedelta(minutes=31))
+    assert client.post("/sensor-readings", json=late).status_code == 201
+    marked = percentiles(client, device, start, end)
+    assert (marked["count"], marked["sketch_buckets"], marked["raw_readings"]) == (31, 2, 11)
+    assert marked["max"] == 100.0
+
+    run_sketch_cycle()
+    rebuilt = percentiles(client, device, start, end)
+    assert (rebuilt["count"], rebuilt["sketch_buckets"], rebuilt["raw_readings"]) == (31, 3, 0)
+    assert rebuilt["max"] == 100.0
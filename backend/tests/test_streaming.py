@@ -0,0 +1,96 @@
+"""NDJSON streams of readings and their compression."""
+
+import asyncio
+import json
+import zlib
+
+import pytest
+
+from app.middleware import CompressionMiddleware
+
+ROWS = [{"n": i, "text": "x" * 40} for i in range(100)]
+
+
+def lines(text: str) -> list:
+    return [json.loads(row) for row in text.splitlines() if row]
+
+
+def test_export_streams_every_row_in_order(client, day):
+    device, end, rows = day
+    response = client.get("/sensor-readings/export", params={"device_id": device})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [r["timestamp"] for r in lines(response.text)] == sorted(r["timestamp"] for r in rows)
+
+    window = {"device_id": device, "start_time": rows[9]["timestamp"], "end_time": rows[0]["timestamp"]}
+    exported = lines(client.get("/sensor-readings/export", params=window).text)
+    assert [r["timestamp"] for r in exported] == [r["timestamp"] for r in reversed(rows[:10])]
+
+
+def test_list_streams_when_asked_for_ndjson(client, day):
+    device, end, rows = day
+    response = client.get(
+        "/sensor-readings",
+        params={"device_id": device, "skip": 5, "limit": 20},
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [r["timestamp"] for r in lines(response.text)] == [r["timestamp"] for r in rows[5:25]]
+
+
+def test_export_is_gzipped_for_clients_accepting_it(client, day):
+    device, end, rows = day
+    response = client.get("/sensor-readings/export", params={"device_id": device}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(lines(response.text)) == len(rows)
+
+
+def test_export_is_zstd_compressed_when_preferred(client, day):
+    zstandard = pytest.importorskip("zstandard")
+    device, end, rows = day
+    with client.stream(
+        "GET", "/sensor-readings/export", params={"device_id": device}, headers={"Accept-Encoding": "zstd, gzip"}
+    ) as response:
+        assert response.headers["content-encoding"] == "zstd"
+        raw = b"".join(response.iter_raw())
+    text = zstandard.ZstdDecompressor().decompressobj().decompress(raw).decode()
+    assert len(lines(text)) == len(rows)
+
+
+def test_small_bodies_are_sent_uncompressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def run_streaming(chunks, accept_encoding: str) -> list:
+    """Send ``chunks`` through the middleware as one streamed body; returns the messages it sends on."""
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=16)(scope, receive, send))
+    return sent
+
+
+def test_gzip_stream_flushes_every_chunk():
+    chunks = [("".join(json.dumps(row) + "\n" for row in ROWS[i : i + 10])).encode() for i in range(0, 100, 10)]
+    sent = run_streaming(chunks, "gzip")
+    start, bodies = sent[0], [message["body"] for message in sent[1:]]
+    assert dict(start["headers"])[b"content-encoding"] == b"gzip"
+    assert len(bodies) == len(chunks)
+
+    # Each chunk decodes as soon as it arrives, without waiting for the end of the stream.
+    decoder = zlib.decompressobj(31)
+    for body, chunk in zip(bodies, chunks):
+        assert decoder.decompress(body) == chunk
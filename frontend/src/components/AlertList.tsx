@@ -42,6 +42,9 @@ export const AlertList: React.FC<AlertListProps> = ({ alerts, onResolve, onDelet
                     <div className="flex items-center gap-2">
                       <h3 className="font-semibold text-gray-900">{alert.alert_type}</h3>
                       <span className={`text-xs font-bold ${config.color}`}>{alert.severity}</span>
+                      {alert.occurrence_count > 1 && (
+                        <span className="text-xs font-semibold text-gray-600">×{alert.occurrence_count}</span>
+                      )}
                       {alert.is_resolved && (
                         <span className="text-xs font-bold text-green-600 flex items-center gap-1">
                           <CheckCircle className="w-3 h-3" /> Resolved
@@ -56,6 +59,9 @@ export const AlertList: React.FC<AlertListProps> = ({ alerts, onResolve, onDelet
                     )}
                     <p className="text-xs text-gray-500 mt-1">
                       {new Date(alert.created_at).toLocaleString()}
+                      {alert.occurrence_count > 1 && alert.last_seen_at && (
+                        <> · last seen {new Date(alert.last_seen_at).toLocaleString()}</>
+                      )}
                     </p>
                   </div>
                 </div>
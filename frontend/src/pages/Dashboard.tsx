@@ -10,7 +10,7 @@ import { Activity, AlertTriangle, Zap, TrendingUp } from 'lucide-react';
 import { Header, StatCard, DeviceList, AlertList, Chart } from '@/components';
 import { useAppStore } from '@/store';
 import { apiClient } from '@/services/api';
-import { Device, Alert } from '@/types';
+import { Device, SensorReading } from '@/types';
 
 export const Dashboard: React.FC = () => {
   const {
@@ -18,6 +18,7 @@ export const Dashboard: React.FC = () => {
     setDevices,
     alerts,
     setAlerts,
+    setReadings,
     isLoading,
     setIsLoading,
     error,
@@ -30,33 +31,24 @@ export const Dashboard: React.FC = () => {
   const [chartData, setChartData] = useState<Array<{ timestamp: string; temperature: number; humidity: number }>>([]);
 
   useEffect(() => {
-    loadData();
-    const interval = setInterval(loadData, 30000);
+    loadData(selectedDevice?.id);
+    const interval = setInterval(() => loadData(selectedDevice?.id), 30000);
     return () => clearInterval(interval);
-  }, []);
+  }, [selectedDevice]);
 
-  useEffect(() => {
-    if (selectedDevice) {
-      loadChartData(selectedDevice.id);
-    } else if (devices.length > 0) {
-      loadChartData(devices[0].id);
-    }
-  }, [selectedDevice, devices]);
-
-  const loadData = async () => {
+  const loadData = async (deviceId?: string) => {
     setIsLoading(true);
     try {
-      const [devicesData, alertsData, devStats, alertStats] = await Promise.all([
-        apiClient.getDevices(),
-        apiClient.getAlerts(),
-        apiClient.getDeviceStats(),
-        apiClient.getAlertStats(),
-      ]);
-
-      setDevices(devicesData);
-      setAlerts(alertsData);
-      setDeviceStats(devStats);
-      setAlertStats(alertStats);
+      // One request returns the lists, the counts and the chart history of
+      // the selected (or first) device.
+      const summary = await apiClient.getDashboardSummary(deviceId);
+
+      setDevices(summary.devices);
+      setAlerts(summary.recent_alerts);
+      setReadings(summary.latest_readings);
+      setDeviceStats(summary.device_counts);
+      setAlertStats(summary.alert_counts);
+      setChartData(toChartData(summary.history));
       setError(null);
     } catch (err) {
       setError('Failed to load data. Please try again.');
@@ -66,28 +58,16 @@ export const Dashboard: React.FC = () => {
     }
   };
 
-  const loadChartData = async (deviceId: string) => {
-    try {
-      const [tempReadings, humidityReadings] = await Promise.all([
-        apiClient.getSensorReadings(deviceId, 'temperature', 0, 24).catch(() => []),
-        apiClient.getSensorReadings(deviceId, 'humidity', 0, 24).catch(() => []),
-      ]);
-
-      const tempMap = new Map(tempReadings.map((r: any) => [new Date(r.timestamp || r.created_at).toISOString(), r.value]));
-      const humidityMap = new Map(humidityReadings.map((r: any) => [new Date(r.timestamp || r.created_at).toISOString(), r.value]));
-
-      const allTimestamps = Array.from(new Set([...tempMap.keys(), ...humidityMap.keys()])).sort();
-      const data = allTimestamps.slice(-6).map(ts => ({
-        timestamp: new Date(ts).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
-        temperature: tempMap.get(ts) || 0,
-        humidity: humidityMap.get(ts) || 0,
-      }));
+  const toChartData = (history: Record<string, SensorReading[]>) => {
+    const tempMap = new Map((history.temperature || []).map((r) => [new Date(r.timestamp || r.created_at).toISOString(), r.value]));
+    const humidityMap = new Map((history.humidity || []).map((r) => [new Date(r.timestamp || r.created_at).toISOString(), r.value]));
 
-      setChartData(data.length > 0 ? data : []);
-    } catch (err) {
-      console.error('Error loading chart data:', err);
-      setChartData([]);
-    }
+    const allTimestamps = Array.from(new Set([...tempMap.keys(), ...humidityMap.keys()])).sort();
+    return allTimestamps.slice(-6).map(ts => ({
+      timestamp: new Date(ts).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
+      temperature: tempMap.get(ts) || 0,
+      humidity: humidityMap.get(ts) || 0,
+    }));
   };
 
   const handleDeleteDevice = async (deviceId: string) => {
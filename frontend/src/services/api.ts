@@ -6,7 +6,7 @@
  */
 
 import axios, { AxiosInstance, AxiosError } from 'axios';
-import { Device, SensorReading, Alert } from '@/types';
+import { Device, SensorReading, Alert, DashboardSummary } from '@/types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -93,6 +93,19 @@ class ApiClient {
     return response.data;
   }
 
+  async getReadingsInRange(
+    deviceId: string,
+    sensorType: string,
+    startTime: string,
+    endTime: string,
+    maxPoints?: number
+  ): Promise<SensorReading[]> {
+    const response = await this.client.get(`/sensor-readings/device/${deviceId}/range`, {
+      params: { sensor_type: sensorType, start_time: startTime, end_time: endTime, max_points: maxPoints },
+    });
+    return response.data;
+  }
+
   async getAverageValue(
     deviceId: string,
     sensorType: string,
@@ -123,7 +136,9 @@ class ApiClient {
     return response.data;
   }
 
-  async createAlert(alert: Omit<Alert, 'id' | 'created_at' | 'resolved_at'>): Promise<Alert> {
+  async createAlert(
+    alert: Omit<Alert, 'id' | 'created_at' | 'resolved_at' | 'last_seen_at' | 'occurrence_count' | 'incident_id'>
+  ): Promise<Alert> {
     const response = await this.client.post('/alerts', alert);
     return response.data;
   }
@@ -147,6 +162,15 @@ class ApiClient {
     return response.data;
   }
 
+  // ============ Dashboard Endpoints ============
+
+  async getDashboardSummary(historyDeviceId?: string, historyLimit = 24): Promise<DashboardSummary> {
+    const response = await this.client.get('/dashboard/summary', {
+      params: { history_device_id: historyDeviceId, history_limit: historyLimit },
+    });
+    return response.data;
+  }
+
   // ============ Health Check ============
 
   async healthCheck(): Promise<{ status: string }> {
@@ -11,6 +11,8 @@ export interface Device {
   latitude?: number;
   longitude?: number;
   is_active: boolean;
+  heartbeat_interval_seconds?: number;
+  last_seen_at?: string;
   created_at: string;
   updated_at: string;
 }
@@ -34,10 +36,28 @@ export interface Alert {
   threshold_value?: number;
   actual_value?: number;
   is_resolved: boolean;
+  occurrence_count: number;
+  incident_id?: string;
   created_at: string;
+  last_seen_at?: string;
   resolved_at?: string;
 }
 
+export interface DashboardSummary {
+  generated_at: string;
+  devices: Device[];
+  device_counts: { total: number; active: number };
+  alert_counts: {
+    total: number;
+    unresolved: number;
+    by_severity: Record<string, { resolved: number; unresolved: number }>;
+  };
+  recent_alerts: Alert[];
+  latest_readings: SensorReading[];
+  history_device_id?: string;
+  history: Record<string, SensorReading[]>;
+}
+
 export interface ApiResponse<T> {
   data?: T;
   error?: string;